@@ -0,0 +1,101 @@
+"""
+Benchmark converting the JSON-LD files in jsonld/ to triples.
+
+Compares rdflib's JSON-LD parser with the flat-context fast path of
+`validation.flatjsonld`, both given the same processed context, such
+that only the conversion of the ``@graph`` and adding the triples to
+the graph are timed.  The ``@graph`` of each file is scaled up by
+cloning its entries.  Reports the best time of `--repeat` runs and the
+throughput in triples per second, and checks that both graphs are
+isomorphic.
+
+Usage:
+
+    python benchmarks/bench_jsonld.py [--scale 1 10] [--repeat 3] [FILE ...]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from rdflib import Graph
+from rdflib.compare import isomorphic
+from rdflib.plugins.parsers.jsonld import Parser
+from rdflib.plugins.shared.jsonld.context import Context
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir))
+
+# pylint: disable=wrong-import-position,import-error
+from bench_jsonldwriter import clones
+from validation.flatjsonld import to_graph
+
+
+def parse_rdflib(data, context):
+    graph = Graph()
+    Parser().parse(data, context, graph)
+    return graph
+
+
+def parse_flat(data, context):
+    graph = Graph()
+    if not to_graph(data, context, graph):
+        raise ValueError("the document is not supported by the fast path")
+    return graph
+
+
+METHODS = {"rdflib": parse_rdflib, "flat": parse_flat}
+
+
+def best_time(method, data, context, repeat):
+    """Return the graph and the fastest time of `repeat` runs."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        graph = method(data, context)
+        times.append(time.perf_counter() - start)
+    return graph, min(times)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "files", nargs="*", default=sorted(rootdir.glob("jsonld/*.jsonld"))
+    )
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'file':40} {'scale':>6} {'method':7} {'triples':>8} "
+        f"{'time (s)':>9} {'triples/s':>10} {'speedup':>8}"
+    )
+    for path in args.files:
+        path = Path(path)
+        with open(path, "rt", encoding="utf-8") as f:
+            doc = json.load(f)
+        context = Context(base=path.absolute().as_uri())
+        context.load(doc.pop("@context"))
+        for scale in args.scale:
+            data = {"@graph": list(clones(doc["@graph"], scale))}
+            graphs, times = {}, {}
+            for name, method in METHODS.items():
+                graphs[name], times[name] = best_time(
+                    method, data, context, args.repeat
+                )
+                n = len(graphs[name])
+                print(
+                    f"{path.name[:40]:40} {scale:>6} {name:7} {n:>8} "
+                    f"{times[name]:>9.4f} {n / times[name]:>10.0f} "
+                    f"{times['rdflib'] / times[name]:>7.2f}x"
+                )
+            if scale == 1 and not isomorphic(graphs["rdflib"], graphs["flat"]):
+                print(f"{path.name}: the graphs are not isomorphic")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark writing of the JSON-LD outputs in jsonld/.
+
+Compares writing the document with ``json.dump(..., indent=2)`` (as
+step 2 and the agents script did) to the JsonLdWriter in its three
+modes.  The ``@graph`` of a repository file is scaled up by cloning its
+entries once, and all methods write the same list of entries, such
+that only writing is measured.  Reports write time, peak traced memory
+(on top of the input) and file size.
+
+Usage:
+
+    python benchmarks/bench_jsonldwriter.py [--scale 1 10 100] [--file F]
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir / "scripts"))
+
+# pylint: disable=wrong-import-position,import-error
+from jsonldwriter import JsonLdWriter
+
+
+def clones(graph, scale):
+    """Yield `scale` copies of the entries in `graph` with unique ids."""
+    for i in range(scale):
+        for entry in graph:
+            entry = copy.deepcopy(entry)
+            entry["@id"] = f"{entry['@id']}-{i}"
+            yield entry
+
+
+def bench_json_dump(path, context, graph):
+    doc = {"@context": context, "@graph": graph}
+    with open(path, "wt", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+
+
+def bench_writer(mode):
+    def run(path, context, graph):
+        with JsonLdWriter(path, context, mode=mode) as writer:
+            writer.writemany(graph)
+
+    return run
+
+
+METHODS = {
+    "json.dump(indent=2)": bench_json_dump,
+    "writer indent": bench_writer("indent"),
+    "writer compact": bench_writer("compact"),
+    "writer ndjson": bench_writer("ndjson"),
+}
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--file",
+        default=rootdir / "jsonld" / "pink_googlespreadsheet_resources.jsonld",
+    )
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    with open(args.file, "rt", encoding="utf-8") as f:
+        doc = json.load(f)
+    context, graph = doc["@context"], doc["@graph"]
+
+    print(
+        f"{'method':22} {'scale':>6} {'time (s)':>9} "
+        f"{'peak (MB)':>10} {'size (KB)':>10}"
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "out.jsonld"
+        for scale in args.scale:
+            entries = list(clones(graph, scale))
+            for name, method in METHODS.items():
+                tracemalloc.start()
+                start = time.perf_counter()
+                method(path, context, entries)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                size = os.path.getsize(path)
+                print(
+                    f"{name:22} {scale:>6} {elapsed:>9.3f} "
+                    f"{peak / 1e6:>10.2f} {size / 1e3:>10.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Benchmark the annotation pipeline on synthetic spreadsheets.
+
+Generates SW, DATASETTYPE and AGENTS sheets with `--rows` software rows
+(see `synthsheets.py`), prepares them as step 1 and the agents script
+do, and pushes them through the stages of the pipeline:
+
+- "correct": `correct_pink_dataframes` and writing the cleaned csv,
+- "tabledoc": `TableDoc.parse_csv` and `asdicts()`,
+- "store": `store()` to one rdflib triplestore, as in step 2, and
+- "validate": SHACL validation of the triplestore with the SSbD shapes.
+
+For each stage the time and the peak traced memory (tracemalloc) are
+reported, and for each size the peak memory (max RSS) of the process.
+Each size runs in its own process, such that the memory of one size
+does not count for the next.  Tracing memory slows down the stages;
+with `--no-trace` only the times and max RSS are recorded.
+
+Loading the ontology, the context and the shapes is timed separately
+("setup").  Like the pipeline, this needs network access, unless
+`--ontology`, `--context` and `--shapes` are local files.
+
+The results are written as json, which can be compared with the
+results of another commit:
+
+    python benchmarks/bench_pipeline.py --output before.json
+    git checkout other-branch
+    python benchmarks/bench_pipeline.py --compare before.json
+
+Usage:
+
+    python benchmarks/bench_pipeline.py [--rows 100 1000 10000]
+        [--seed 0] [--no-trace] [--output bench_pipeline.json]
+        [--compare old.json]
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir / "scripts"))
+sys.path.insert(0, str(rootdir))
+
+# pylint: disable=wrong-import-position,import-error
+from bench_queries import git_commit, max_rss_mb
+from synthsheets import CHEMICAL_CLASSES, sheet_headers, synthetic_sheets
+
+ONTOLOGY_URL = "https://ssbd-ontology.github.io/core/core-inferred.ttl"
+CONTEXT_URL = "https://w3id.org/ssbd/context/"
+SHAPES_URLS = [
+    "https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/"
+    "gh-pages/shacl/shapes.ttl",
+    "https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/"
+    "gh-pages/shacl/shapes-ssbd.ttl",
+]
+STAGES = ("correct", "tabledoc", "store", "validate")
+
+
+class Stages:
+    """Record the time and peak traced memory of named stages."""
+
+    def __init__(self, trace: bool = True):
+        self.trace = trace
+        self.results: dict = {}
+
+    def run(self, stage: str, func, *args, **kwargs):
+        """Call `func` and add its time and memory to `stage`."""
+        if self.trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            result = self.results.setdefault(stage, {"seconds": 0.0})
+            result["seconds"] += time.perf_counter() - start
+            if self.trace:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                result["peak_mb"] = max(result.get("peak_mb", 0), peak / 1e6)
+            result["rss_mb"] = max_rss_mb()
+
+
+def prepare(sheets: dict, merge_columns) -> dict:
+    """Return the sheets to correct, prepared as in step 1 and the
+    agents script."""
+    sw = sheets["sw"]
+    ssbd_cols = [c for c in sw.columns if c.startswith("SSbD Assessment")]
+    sw = sw.drop(columns=["inputDatasetType", "outputDatasetType"] + ssbd_cols)
+    sw["chemicalClass"] = sw.apply(
+        merge_columns, axis=1, class_cols=list(CHEMICAL_CLASSES)
+    )
+    sw = sw.drop(columns=list(CHEMICAL_CLASSES) + ["indicator"])
+    sw["@type"] = "pink:Software"
+
+    datasettypes = sheets["datasettypes"].drop(columns=["indicator"])
+    datasettypes["@type"] = [["owl:Class"]] * len(datasettypes)
+
+    agents = sheets["agents"].drop(
+        columns=["e-mail", "affiliation.name", "affiliation.id"]
+    )
+    agents["@type"] = [["prov:Agent"]] * len(agents)
+    return {"sw": sw, "datasettypes": datasettypes, "agents": agents}
+
+
+def worker(rows: int, seed: int, trace: bool, sources: dict) -> dict:
+    """Run the pipeline on synthetic sheets with `rows` SW rows."""
+    # pylint: disable=import-outside-toplevel
+    from ontopy import get_ontology
+    from tripper import Triplestore
+    from tripper.datadoc import get_context, store
+    from tripper.datadoc.tabledoc import TableDoc
+
+    from parseutils import (
+        PREFIXES,
+        correct_pink_dataframes,
+        list_columns,
+        merge_columns,
+        property_iri_dict,
+    )
+    from validation.validate import load_shapes, shacl_validate
+
+    setup = time.perf_counter()
+    onto = get_ontology(sources["ontology"]).load()
+    context = get_context(sources["context"], theme=None)
+    shapes = load_shapes(sources["shapes"][0])
+    for url in sources["shapes"][1:]:
+        shapes.parse(url, format="turtle")
+    setup = time.perf_counter() - setup
+
+    start = time.perf_counter()
+    sheets = synthetic_sheets(
+        rows,
+        seed=seed,
+        headers=sheet_headers(property_iri_dict),
+        list_columns=list_columns,
+    )
+    generate = time.perf_counter() - start
+
+    stages = Stages(trace)
+    ts = Triplestore("rdflib")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prepared = prepare(sheets, merge_columns)
+        for name, df in prepared.items():
+            csvfile = Path(tmpdir) / f"{name}_clean.csv"
+
+            def correct(df=df, csvfile=csvfile):
+                corrected = correct_pink_dataframes(df, onto)
+                corrected.to_csv(csvfile, index=False)
+
+            def tabledoc(csvfile=csvfile):
+                return TableDoc.parse_csv(
+                    csvfile, context=context, prefixes=PREFIXES
+                ).asdicts()
+
+            stages.run("correct", correct)
+            resources = stages.run("tabledoc", tabledoc)
+            stages.run(
+                "store",
+                store,
+                ts,
+                resources,
+                context=context,
+                prefixes=PREFIXES,
+            )
+
+    conforms, _, _ = stages.run(
+        "validate",
+        shacl_validate,
+        data_graph=ts.backend.graph,
+        shacl_graph=shapes,
+        inference="rdfs",
+        abort_on_first=False,
+    )
+    return {
+        "rows": rows,
+        "sheet_rows": {name: len(df) for name, df in sheets.items()},
+        "triples": len(ts.backend.graph),
+        "conforms": bool(conforms),
+        "setup_s": setup,
+        "generate_s": generate,
+        "stages": stages.results,
+        "peak_rss_mb": max_rss_mb(),
+    }
+
+
+def run(rows: int, seed: int, trace: bool, sources: dict) -> dict:
+    """Run `worker` in a new process."""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(worker, rows, seed, trace, sources).result()
+
+
+def compare(old: dict, new: dict) -> None:
+    """Print the stage times of `new` relative to `old`."""
+    before = {
+        (r["rows"], stage): stats["seconds"]
+        for r in old["results"]
+        for stage, stats in r["stages"].items()
+    }
+    print(f"\nCompared with {old.get('commit')} (time, new / old):")
+    for r in new["results"]:
+        for stage, stats in r["stages"].items():
+            key = (r["rows"], stage)
+            if before.get(key):
+                ratio = f"{stats['seconds'] / before[key]:6.2f}x"
+            else:
+                ratio = "     -"
+            print(f"  {r['rows']:7} rows {stage:9} {ratio}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[100, 1000, 10000]
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-trace",
+        dest="trace",
+        action="store_false",
+        help="Do not trace the memory of each stage.",
+    )
+    parser.add_argument("--ontology", default=ONTOLOGY_URL)
+    parser.add_argument("--context", default=CONTEXT_URL)
+    parser.add_argument("--shapes", nargs="+", default=SHAPES_URLS)
+    parser.add_argument("--output", default="bench_pipeline.json")
+    parser.add_argument(
+        "--compare", help="Results of an earlier run to compare with."
+    )
+    args = parser.parse_args()
+    sources = {
+        "ontology": args.ontology,
+        "context": args.context,
+        "shapes": args.shapes,
+    }
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "trace": args.trace,
+        "results": [],
+    }
+    for rows in args.rows:
+        result = run(rows, args.seed, args.trace, sources)
+        report["results"].append(result)
+        print(
+            f"{rows} rows: {result['triples']} triples, "
+            f"{'conforms' if result['conforms'] else 'does not conform'}, "
+            f"setup {result['setup_s']:.2f} s, "
+            f"generate {result['generate_s']:.2f} s, "
+            f"peak {result['peak_rss_mb']:.0f} MB"
+        )
+        print(f"  {'stage':9} {'time (s)':>9} {'peak (MB)':>10}")
+        for stage in STAGES:
+            stats = result["stages"].get(stage, {})
+            peak = stats.get("peak_mb")
+            print(
+                f"  {stage:9} {stats.get('seconds', 0):9.3f} "
+                f"{f'{peak:10.1f}' if peak is not None else '         -'}"
+            )
+
+    with open(args.output, "wt", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, "rt", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
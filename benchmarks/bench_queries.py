@@ -0,0 +1,278 @@
+"""
+Benchmark the search_pink_kb queries on scaled knowledge bases.
+
+Runs the registered queries of `scripts/queries.py` on knowledge bases
+of the shape of the PINK resources cloned 10, 100 and 1000 times (see
+`clonekb.py`), with the in-memory rdflib store and, if oxrdflib is
+installed, an in-memory Oxigraph store.  For each query the latency of
+the first run (which includes preparing the query) and the latency
+percentiles over `--repeat` further runs are recorded, and for each
+knowledge base the load and closure times and the peak memory (max
+RSS) of the process holding it.
+
+Each (backend, factor) runs in its own process, such that the memory
+of one knowledge base does not count for the next, and a query taking
+longer than `--timeout` seconds (all runs together) is recorded as
+timed out instead of stalling the benchmark.
+
+The results are written as json, which can be compared with the
+results of another commit:
+
+    python benchmarks/bench_queries.py --output before.json
+    git checkout other-branch
+    python benchmarks/bench_queries.py --compare before.json
+
+Usage:
+
+    python benchmarks/bench_queries.py [--factor 10 100 1000]
+        [--backend rdflib oxigraph] [--repeat 5] [--timeout 60]
+        [--output bench_queries.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+import rdflib
+from rdflib import Dataset, URIRef
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir / "scripts"))
+
+# pylint: disable=wrong-import-position,import-error
+from clonekb import cloned_kb
+from kbstore import has_oxigraph
+from queries import registry
+from subclassindex import CLOSURE_GRAPH, SubClassIndex
+
+BACKENDS = {"rdflib": "default", "oxigraph": "Oxigraph"}
+
+# Parameters of the queries
+BINDINGS = {
+    "query5": {"activity": URIRef("https://w3id.org/pink/activity/activity0")},
+    "query_all": {
+        "targetProperty": URIRef(
+            "http://semanticscience.org/resource/CHEMINF_000085"
+        )
+    },
+}
+
+
+def percentile(values: list, q: float) -> float:
+    """Return the `q`-th percentile of `values` (nearest rank)."""
+    values = sorted(values)
+    rank = max(0, min(len(values) - 1, round(q / 100 * len(values)) - 1))
+    return values[rank]
+
+
+def max_rss_mb() -> float:
+    """Return the peak resident memory of this process in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+
+def worker(backend: str, factor: int, names: list, repeat: int, messages):
+    """Build a knowledge base and run the queries `names` on it.
+
+    Puts a ("kb", stats) message on the `messages` queue when the
+    knowledge base is loaded, a ("query", name, stats) message for
+    each query and finally a ("done", stats) message.
+    """
+    start = time.perf_counter()
+    dataset = Dataset(store=BACKENDS[backend])
+    dataset.default_union = True
+    kb = dataset.graph(URIRef("https://example.com/kb"))
+    kb.addN((s, p, o, kb) for s, p, o in cloned_kb(factor))
+    loaded = time.perf_counter()
+    SubClassIndex(dataset).materialise(dataset.graph(CLOSURE_GRAPH))
+    closed = time.perf_counter()
+    messages.put(
+        (
+            "kb",
+            {
+                "triples": len(kb),
+                "load_s": loaded - start,
+                "closure_s": closed - loaded,
+                "kb_rss_mb": max_rss_mb(),
+            },
+        )
+    )
+
+    for name in names:
+        bindings = BINDINGS.get(name, {})
+        start = time.perf_counter()
+        rows = registry.run(dataset, name, **bindings)
+        first = time.perf_counter() - start
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            registry.run(dataset, name, **bindings)
+            times.append(time.perf_counter() - start)
+        stats = {
+            "rows": len(rows),
+            "runs": repeat,
+            "first": first,
+            "min": min(times),
+            "p50": percentile(times, 50),
+            "p90": percentile(times, 90),
+            "p99": percentile(times, 99),
+            "max": max(times),
+        }
+        messages.put(("query", name, stats))
+    messages.put(("done", {"peak_rss_mb": max_rss_mb()}))
+
+
+def receive(messages, process, timeout: float):
+    """Return the next message of `process`, or None if it did not send
+    one within `timeout` seconds or died."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return messages.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                return None
+    return None
+
+
+def run(backend: str, factor: int, repeat: int, timeout: float) -> dict:
+    """Run the queries on a knowledge base of size `factor`."""
+    queries: Dict[str, dict] = {}
+    result = {"backend": backend, "factor": factor, "queries": queries}
+    pending = list(registry)
+    while pending:
+        messages: multiprocessing.Queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=worker,
+            args=(backend, factor, pending, repeat, messages),
+        )
+        process.start()
+        message = receive(messages, process, float("inf"))
+        if message is None:
+            raise RuntimeError(f"loading the {factor}x {backend} KB failed")
+        result.update(message[1])
+        while pending:
+            message = receive(messages, process, timeout)
+            if message is None:
+                queries[pending.pop(0)] = {"timeout": timeout}
+                process.terminate()
+                break
+            _, name, stats = message
+            queries[name] = stats
+            pending.remove(name)
+        else:
+            message = receive(messages, process, timeout)
+            if message is not None:
+                result.update(message[1])
+        process.join()
+    return result
+
+
+def git_commit() -> Optional[str]:
+    """Return the current commit of the repository, if any."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=rootdir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: dict, new: dict) -> None:
+    """Print the median latencies of `new` relative to `old`."""
+    before = {
+        (r["backend"], r["factor"], name): stats.get("p50")
+        for r in old["results"]
+        for name, stats in r["queries"].items()
+    }
+    print(f"\nCompared with {old.get('commit')} (p50, new / old):")
+    for r in new["results"]:
+        for name, stats in r["queries"].items():
+            key = (r["backend"], r["factor"], name)
+            if before.get(key) and stats.get("p50"):
+                ratio = f"{stats['p50'] / before[key]:6.2f}x"
+            else:
+                ratio = "     -"
+            print(f"  {r['backend']:9} {r['factor']:5}x {name:10} {ratio}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--factor", type=int, nargs="+", default=[10, 100, 1000]
+    )
+    parser.add_argument(
+        "--backend",
+        nargs="+",
+        choices=list(BACKENDS),
+        default=["rdflib", "oxigraph"] if has_oxigraph() else ["rdflib"],
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60,
+        help="Maximum time of all runs of one query, in seconds.",
+    )
+    parser.add_argument("--output", default="bench_queries.json")
+    parser.add_argument(
+        "--compare", help="Results of an earlier run to compare with."
+    )
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "rdflib": rdflib.__version__,
+        "repeat": args.repeat,
+        "results": [],
+    }
+    for factor in args.factor:
+        for backend in args.backend:
+            result = run(backend, factor, args.repeat, args.timeout)
+            report["results"].append(result)
+            peak = result.get("peak_rss_mb", result["kb_rss_mb"])
+            print(
+                f"{factor}x {backend}: {result['triples']} triples, "
+                f"load {result['load_s']:.2f} s, "
+                f"closure {result['closure_s']:.2f} s, peak {peak:.0f} MB"
+            )
+            print(
+                f"  {'query':10} {'rows':>6} {'first':>9} {'p50':>9} "
+                f"{'p90':>9} {'p99':>9}"
+            )
+            for name, stats in result["queries"].items():
+                if "timeout" in stats:
+                    print(f"  {name:10}  timed out after {args.timeout} s")
+                    continue
+                print(
+                    f"  {name:10} {stats['rows']:6} {stats['first']:8.4f}s "
+                    f"{stats['p50']:8.4f}s {stats['p90']:8.4f}s "
+                    f"{stats['p99']:8.4f}s"
+                )
+
+    with open(args.output, "wt", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare, "rt", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
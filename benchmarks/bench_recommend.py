@@ -0,0 +1,115 @@
+"""
+Benchmark batch software recommendations against per-property SPARQL.
+
+Answers "which software can use property X" for a number of CHEMINF
+properties of a synthetic knowledge base (see `tests/synthkb.py`), once
+by running QUERY_ALL of `scripts/queries.py` for each property and once
+with a single `recommend.Recommender` call, and checks that both give
+the same software.  The time to build the recommender (subclass index,
+restriction table and adjacency maps) is reported separately, as well
+as the time of `Recommender.recommend_all()`.
+
+Usage:
+
+    python benchmarks/bench_recommend.py [--scale 0.3 1 3] [--targets 50]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+from rdflib import Dataset, URIRef
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir / "scripts"))
+sys.path.insert(0, str(rootdir / "tests"))
+
+# pylint: disable=wrong-import-position,import-error
+from kbstore import has_oxigraph
+from queries import registry
+from recommend import Recommender
+from subclassindex import CLOSURE_GRAPH, SubClassIndex
+from synthkb import CHEMINF, synthetic_kb
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", type=float, nargs="+", default=[0.3, 1, 3])
+    parser.add_argument(
+        "--targets",
+        type=int,
+        default=50,
+        help="Number of properties to recommend software for.",
+    )
+    parser.add_argument(
+        "--store",
+        choices=["oxigraph", "memory"],
+        default="oxigraph" if has_oxigraph() else "memory",
+    )
+    args = parser.parse_args()
+
+    for scale in args.scale:
+        dataset = Dataset(
+            store="Oxigraph" if args.store == "oxigraph" else "default"
+        )
+        dataset.default_union = True
+        kb = dataset.graph(URIRef("https://example.com/kb"))
+        kb.addN((s, p, o, kb) for s, p, o in synthetic_kb(scale))
+        index = SubClassIndex(dataset)
+        index.materialise(dataset.graph(CLOSURE_GRAPH))
+
+        properties = sorted(
+            index.descendants(CHEMINF.CHEMINF_000018)
+            | index.descendants(CHEMINF.CHEMINF_000085)
+        )
+        targets = [CHEMINF.CHEMINF_000018, CHEMINF.CHEMINF_000085]
+        targets += random.Random(0).sample(
+            properties, min(len(properties), args.targets - 2)
+        )
+
+        start = time.perf_counter()
+        sparql = {
+            target: {
+                row.software
+                for row in registry.run(
+                    dataset, "query_all", targetProperty=target
+                )
+            }
+            for target in targets
+        }
+        tsparql = time.perf_counter() - start
+
+        start = time.perf_counter()
+        recommender = Recommender(dataset, index=index)
+        built = time.perf_counter()
+        paths = recommender.recommend(targets)
+        done = time.perf_counter()
+        allpaths = recommender.recommend_all()
+        doneall = time.perf_counter()
+
+        batch = {target: set() for target in targets}
+        for path in paths:
+            batch[path.target].add(path.software)
+        assert batch == sparql, "results differ"
+
+        print(
+            f"scale {scale} ({args.store}): {len(kb)} triples, "
+            f"{len(targets)} properties, {len(paths)} paths"
+        )
+        print(f"  sparql per property  {tsparql:8.4f} s")
+        print(f"  build recommender    {built - start:8.4f} s")
+        print(
+            f"  batch recommend      {done - built:8.4f} s "
+            f"({tsparql / (done - built):.0f}x)"
+        )
+        print(
+            f"  recommend all        {doneall - done:8.4f} s "
+            f"({len(allpaths)} paths)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark the sharded SHACL validation of step 2.
+
+Validates the PINK resources, scaled up by cloning (see `clonekb.py`),
+once with a single pyshacl call and once with `validate_sharded()` in
+each number of worker processes, checks that the verdict and the number
+of results are the same and reports the times.  Run it on a machine
+with at least as many CPUs as workers to see whether sharding pays off,
+and from which graph size.
+
+The shapes are read from ``--shapes`` or, by default, generated from
+the fixture ontology of the validation tests.
+
+Usage:
+
+    python benchmarks/bench_sharded.py [--scale 1 4 16] [--workers 2 4]
+    python benchmarks/bench_sharded.py --shapes validation/shapes.ttl
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from rdflib import SH, Graph
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir))
+sys.path.insert(0, str(rootdir / "benchmarks"))
+
+# pylint: disable=wrong-import-position,import-error
+from clonekb import cloned_kb
+from pyshacl import validate
+
+from validation import generate_shacl
+from validation.sharded import validate_sharded
+
+ONTOLOGY = rootdir / "validation" / "tests" / "ontology.ttl"
+
+
+def load_shapes(path):
+    """Return the shapes graph in `path`, or generated from ONTOLOGY."""
+    if path:
+        return Graph().parse(path, format="turtle")
+    return generate_shacl.generate_shapes(
+        ONTOLOGY.parent, None, Graph().parse(ONTOLOGY)
+    )
+
+
+def timed(func, *args, **kwargs):
+    """Return the result and run time of ``func(*args, **kwargs)``."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--shapes", help="Turtle file with the shapes")
+    args = parser.parse_args()
+
+    shapes = load_shapes(args.shapes)
+    print(f"{os.cpu_count()} CPUs, {len(shapes)} shape triples")
+    print(
+        f"{'scale':>6} {'triples':>8} {'workers':>8} {'time (s)':>9} "
+        f"{'results':>8}"
+    )
+    for scale in args.scale:
+        data = cloned_kb(scale)
+        (conforms, graph, _), elapsed = timed(
+            validate, data, shacl_graph=shapes, inference="rdfs"
+        )
+        nresults = len(set(graph.objects(None, SH.result)))
+        print(
+            f"{scale:>6} {len(data):>8} {'single':>8} {elapsed:>9.2f} "
+            f"{nresults:>8}"
+        )
+        for workers in args.workers:
+            (sharded_conforms, graph, _), elapsed = timed(
+                validate_sharded,
+                data,
+                shapes,
+                max_workers=workers,
+                inference="rdfs",
+            )
+            sharded_results = len(set(graph.objects(None, SH.result)))
+            assert sharded_conforms == conforms
+            assert sharded_results == nresults
+            print(
+                f"{scale:>6} {len(data):>8} {workers:>8} {elapsed:>9.2f} "
+                f"{sharded_results:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
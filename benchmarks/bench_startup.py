@@ -0,0 +1,169 @@
+"""
+Benchmark the startup time of the scripts and the validation package.
+
+Each target (an import or a command line call) is run in a new
+interpreter with ``python -X importtime``.  The import time of the
+target is the sum of the cumulative times of the top-level imports
+reported by the interpreter, which includes the interpreter's own
+startup imports.  The slowest top-level imports are listed, such that a
+dependency imported at startup instead of at first use stands out.
+
+With `--check`, the benchmark fails if a target exceeds its budget in
+`BUDGETS` (seconds) or imports one of its `FORBIDDEN` modules.  The
+same budgets are enforced by ``tests/test_startup.py``.
+
+Usage:
+
+    python benchmarks/bench_startup.py [--repeat 5] [--top 5] [--check]
+"""
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+rootdir = Path(__file__).resolve().parent.parent
+
+# Interpreter arguments of each target
+TARGETS = {
+    "import parseutils": ["-c", "import parseutils"],
+    "import instrument": ["-c", "import instrument"],
+    "import validation.validate": ["-c", "import validation.validate"],
+    "validate.py --help": ["validation/validate.py", "--help"],
+}
+
+# Maximum import time of each target, in seconds
+BUDGETS = {
+    "import parseutils": 0.25,
+    "import instrument": 0.25,
+    "import validation.validate": 0.5,
+    "validate.py --help": 0.5,
+}
+
+# Heavy dependencies that must be imported at first use, not at startup
+HEAVY = ("pandas", "dateutil", "ontopy", "tripper", "pyshacl")
+FORBIDDEN = {
+    "import parseutils": HEAVY,
+    "import instrument": HEAVY,
+    "import validation.validate": ("pyshacl",),
+    "validate.py --help": ("pyshacl",),
+}
+
+_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)")
+
+
+class Startup(NamedTuple):
+    """Import times of one run of a target.
+
+    Attributes:
+        seconds: Total import time.
+        imports: Dict mapping the top-level imports to their cumulative
+            time in seconds.
+        modules: Names of all imported modules.
+    """
+
+    seconds: float
+    imports: Dict[str, float]
+    modules: List[str]
+
+
+def parse_importtime(stderr: str) -> Startup:
+    """Parse the ``-X importtime`` output of an interpreter."""
+    imports: Dict[str, float] = {}
+    modules = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        modules.append(name)
+        # Nested imports are indented by two more spaces per level
+        if len(indent) <= 1:
+            imports[name] = int(cumulative) / 1e6
+    return Startup(sum(imports.values()), imports, modules)
+
+
+def measure(target: str) -> Startup:
+    """Run `target` once and return its import times."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(rootdir / "scripts"), str(rootdir)]
+        + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *TARGETS[target]],
+        cwd=rootdir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def best_of(target: str, repeat: int = 3) -> Startup:
+    """Return the fastest of `repeat` runs of `target`."""
+    runs = [measure(target) for _ in range(repeat)]
+    return min(runs, key=lambda startup: startup.seconds)
+
+
+def violations(
+    target: str, startup: Startup, factor: float = 1.0
+) -> List[str]:
+    """Return the budget violations of `target`.
+
+    Parameters:
+        target: Name of the target.
+        startup: Import times of the target.
+        factor: Factor applied to the budget.
+    """
+    errors = []
+    budget = BUDGETS[target] * factor
+    if startup.seconds > budget:
+        errors.append(
+            f"{target}: imports take {startup.seconds:.3f} s, budget "
+            f"{budget:.3f} s"
+        )
+    loaded = {name.split(".")[0] for name in startup.modules}
+    for name in FORBIDDEN.get(target, ()):
+        if name in loaded:
+            errors.append(f"{target}: imports {name} at startup")
+    return errors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark."""
+    import argparse  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--top", type=int, default=5, help="Number of imports to list."
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 if a budget is exceeded.",
+    )
+    args = parser.parse_args(argv)
+
+    errors = []
+    for target in TARGETS:
+        startup = best_of(target, args.repeat)
+        print(
+            f"{target:28} {startup.seconds:7.3f} s "
+            f"(budget {BUDGETS[target]:.2f} s)"
+        )
+        slowest = sorted(startup.imports.items(), key=lambda i: -i[1])
+        for name, seconds in slowest[: args.top]:
+            print(f"    {name:32} {seconds:7.3f} s")
+        errors.extend(violations(target, startup))
+    for error in errors:
+        print(error)
+    return 1 if args.check and errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Benchmark the search_pink_kb queries with and without the subclass index.
+
+Runs the canned queries of `scripts/queries.py` on a synthetic
+knowledge base (see `tests/synthkb.py`), once with ``rdfs:subClassOf+``
+property paths and once with the materialised
+``pink:subClassOfTransitive`` closure, checks that both give the same
+results and reports the query times and the time to build the index.
+
+The knowledge base is stored in an in-memory Oxigraph store (as used by
+`kbstore.py`) or, with ``--store memory``, in a plain rdflib store.
+Note that rdflib's own query evaluator is slow on QUERY_ALL at scales
+above 0.1 regardless of the closure, since its join ordering evaluates
+the independent single-variable patterns first.
+
+Usage:
+
+    python benchmarks/bench_subclass.py [--scale 0.3 1 3] [--repeat 3]
+    python benchmarks/bench_subclass.py --store memory --scale 0.1
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from rdflib import Dataset, URIRef
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir / "scripts"))
+sys.path.insert(0, str(rootdir / "tests"))
+
+# pylint: disable=wrong-import-position,import-error
+from kbstore import has_oxigraph
+from queries import registry, with_property_paths
+from subclassindex import CLOSURE_GRAPH, SubClassIndex
+from synthkb import synthetic_kb
+
+# Parameters of the queries
+BINDINGS = {
+    "query5": {"activity": URIRef("https://w3id.org/pink/activity/activity0")},
+    "query_all": {
+        "targetProperty": URIRef(
+            "http://semanticscience.org/resource/CHEMINF_000085"
+        )
+    },
+}
+
+
+def timed(graph: Dataset, query: str, bindings: dict, repeat: int):
+    """Return (best time, result rows) of running `query` on `graph`."""
+    best = float("inf")
+    rows = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = set(graph.query(query, initBindings=bindings))
+        best = min(best, time.perf_counter() - start)
+    return best, rows
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--scale", type=float, nargs="+", default=[0.3, 1, 3])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--store",
+        choices=["oxigraph", "memory"],
+        default="oxigraph" if has_oxigraph() else "memory",
+    )
+    args = parser.parse_args()
+
+    for scale in args.scale:
+        dataset = Dataset(
+            store="Oxigraph" if args.store == "oxigraph" else "default"
+        )
+        dataset.default_union = True
+        kb = dataset.graph(URIRef("https://example.com/kb"))
+        kb.addN((s, p, o, kb) for s, p, o in synthetic_kb(scale))
+
+        start = time.perf_counter()
+        index = SubClassIndex(dataset)
+        built = time.perf_counter()
+        ntriples = index.materialise(dataset.graph(CLOSURE_GRAPH))
+        done = time.perf_counter()
+        print(
+            f"scale {scale} ({args.store}): {len(kb)} triples, "
+            f"{len(index)} classes, index {built - start:.3f} s, "
+            f"{ntriples} closure triples in {done - built:.3f} s"
+        )
+
+        print(f"  {'query':10} {'rows':>6} {'path':>9} {'index':>9} speedup")
+        for name in registry:
+            query = registry[name].text
+            bindings = BINDINGS.get(name, {})
+            tpath, rows_path = timed(
+                dataset, with_property_paths(query), bindings, args.repeat
+            )
+            tindex, rows_index = timed(dataset, query, bindings, args.repeat)
+            assert rows_path == rows_index, f"{name}: results differ"
+            print(
+                f"  {name:10} {len(rows_index):6} {tpath:8.4f}s "
+                f"{tindex:8.4f}s {tpath / tindex:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Knowledge base of the shape of the PINK resources, scaled up by cloning.
+
+`cloned_kb(factor)` copies the resources of
+jsonld/pink_googlespreadsheet_resources.jsonld (activities, software,
+dataset types and their restrictions) `factor` times, renaming the
+resources of each copy, such that the number of resources, assessments
+and restrictions grows linearly with `factor` while their shape is that
+of the current spreadsheet.  The restrictions are read with
+`RestrictionTable.from_jsonld()` since their CURIEs are not expanded by
+the JSON-LD context.
+
+The ontologies and datamodels the resources refer to are not in this
+repository.  They are stood in for by `synthetic_kb()` of
+tests/synthkb.py at `SYNTHETIC_SCALE` per cloning factor, and the SSBD
+assessment classes used by the resources are declared subclasses of
+ssbd:Assessment.
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict
+
+from rdflib import OWL, RDF, RDFS, BNode, Graph, Literal, URIRef
+
+rootdir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(rootdir / "scripts"))
+sys.path.insert(0, str(rootdir / "tests"))
+
+# pylint: disable=wrong-import-position,import-error
+from restrictions import RestrictionTable
+from synthkb import SSBD, synthetic_kb
+
+RESOURCES = rootdir / "jsonld" / "pink_googlespreadsheet_resources.jsonld"
+
+# Scale of the synthetic ontology and datamodels per cloning factor
+SYNTHETIC_SCALE = 0.1
+
+
+def resource_graph(path: Path = RESOURCES) -> Graph:
+    """Return the resources of the JSON-LD file `path` as a graph."""
+    graph = Graph().parse(path, format="json-ld")
+    for restriction in set(graph.subjects(RDF.type, OWL.Restriction)):
+        graph.remove((None, None, restriction))
+        graph.remove((restriction, None, None))
+    for row in RestrictionTable.from_jsonld(path):
+        restriction = BNode()
+        graph.add((row.cls, RDFS.subClassOf, restriction))
+        graph.add((restriction, RDF.type, OWL.Restriction))
+        graph.add((restriction, OWL.onProperty, row.property))
+        graph.add((restriction, row.kind, row.filler))
+        if row.cardinality is not None:
+            cardinality = Literal(row.cardinality)
+            graph.add((restriction, OWL.qualifiedCardinality, cardinality))
+    for superclass in set(graph.objects(None, RDFS.subClassOf)):
+        if (
+            isinstance(superclass, URIRef)
+            and superclass.startswith(str(SSBD))
+            and superclass.endswith("Assessment")
+            and superclass != SSBD.Assessment
+        ):
+            graph.add((superclass, RDFS.subClassOf, SSBD.Assessment))
+    return graph
+
+
+def cloned_kb(factor: int, path: Path = RESOURCES) -> Graph:
+    """Return `factor` copies of the resources in `path`, together with a
+    synthetic ontology of scale ``SYNTHETIC_SCALE * factor``."""
+    template = resource_graph(path)
+    local = {s for s in template.subjects(RDF.type) if isinstance(s, URIRef)}
+    graph = synthetic_kb(SYNTHETIC_SCALE * factor)
+    for copy in range(factor):
+        bnodes: Dict[BNode, BNode] = {}
+
+        def rename(term, copy=copy, bnodes=bnodes):
+            if isinstance(term, BNode):
+                return bnodes.setdefault(term, BNode())
+            if copy and term in local:
+                return URIRef(f"{term}-{copy}")
+            return term
+
+        graph.addN((rename(s), p, rename(o), graph) for s, p, o in template)
+    return graph
@@ -0,0 +1,331 @@
+"""
+Synthetic PINK spreadsheets for scale tests of the pipeline.
+
+Generates the SW, DATASETTYPE and AGENTS sheets, as downloaded by step 1
+and `parse_pink_google_docs_agents.py`, and the datum table derived from
+the datasettypes (``datamodels.csv``), with any number of rows.  The
+sheets have the features the pipeline corrects and converts:
+
+- list cells separated by commas, semicolons or spaces,
+- identifiers with and without prefix (``SW000001``, ``mw:SW000002``),
+- release dates in different formats,
+- tier levels followed by explanations,
+- empty cells, and comment and unnamed columns,
+
+and the resources refer to each other (creators are agents, input and
+output dataset types are datasettypes).
+
+The columns are generated by Tripper keyword.  Given the term
+definitions of `parseutils`, the columns are named by the spreadsheet
+property of each keyword and the list columns are the multi-valued
+keywords:
+
+    from parseutils import list_columns, property_iri_dict
+    sheets = synthetic_sheets(
+        10000,
+        headers=sheet_headers(property_iri_dict),
+        list_columns=list_columns,
+    )
+
+Usage:
+
+    python benchmarks/synthsheets.py 10000 [--output synthsheets]
+        [--seed 0] [--termdefs]
+"""
+
+import random
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Union
+
+import pandas as pd
+
+# Number of rows of each sheet relative to the number of SW rows
+SIZES = {"sw": 1.0, "datasettypes": 1.0, "agents": 0.5}
+
+# Sheet headers of keywords not named by their keyword, if the term
+# definitions are not given
+HEADERS = {"@id": "identifier"}
+
+# Multi-valued keywords, if the term definitions are not given
+LIST_COLUMNS = (
+    "keyword",
+    "creator",
+    "curator",
+    "format",
+    "inputDatasetType",
+    "outputDatasetType",
+)
+
+CHEMICAL_CLASSES = (
+    "chemicalClass[by type]",
+    "chemicalClass[by size]",
+    "chemicalClass[by functionality]",
+)
+ASSESSMENTS = (
+    "ToxicityAssessment",
+    "ExposureAssessment",
+    "LifeCycleAssessment",
+    "FunctionalityAssessment",
+    "SocialSustainabilityAssessment",
+    "EconomicSustainabilityAssessment",
+)
+DATUMS = 8
+WORDS = (
+    "nanoparticle coating surface toxicity exposure release model "
+    "dissolution aggregation zeta potential polymer cytotoxicity qsar "
+    "emission solvent catalyst lifecycle cost screening dose uptake"
+).split()
+DATE_FORMATS = ("%Y-%m-%d", "%d %B %Y", "%m/%d/%Y", "%B %Y", "%Y")
+LICENSES = ("MIT", "Apache-2.0", "GPL-3.0-only", "CC-BY-4.0")
+SEPARATORS = (", ", ",", "; ", " ")
+
+
+class _Sheet:
+    """Random values of one sheet."""
+
+    def __init__(self, rng: random.Random, list_columns: Iterable[str]):
+        self.rng = rng
+        self.list_columns = set(list_columns)
+
+    def words(self, n: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def date(self) -> str:
+        day = pd.Timestamp("2015-01-01") + pd.Timedelta(
+            days=self.rng.randrange(4000)
+        )
+        return day.strftime(self.rng.choice(DATE_FORMATS))
+
+    def cell(self, keyword: str, choices, most: int = 3) -> Optional[str]:
+        """Return a cell of `keyword` with values from `choices`.
+
+        List columns get up to `most` values.
+        """
+        if not choices:
+            return None
+        n = 1
+        if keyword in self.list_columns:
+            n = self.rng.randint(1, min(most, len(choices)))
+        separator = self.rng.choice(SEPARATORS)
+        return separator.join(self.rng.sample(list(choices), n))
+
+    def maybe(self, value, p: float = 0.1):
+        """Return `value`, or None with probability `p`."""
+        return None if self.rng.random() < p else value
+
+
+def _agents(sheet: _Sheet, n: int) -> pd.DataFrame:
+    rng = sheet.rng
+    rows = []
+    for i in range(n):
+        if rng.random() < 0.8:
+            iri = f"https://orcid.org/0000-000{i % 10}-{i // 10:04d}-{i:04d}"
+            name = f"{sheet.words(1).title()} Person {i}"
+        else:
+            iri = f"https://ror.org/0{i:08x}"
+            name = f"{sheet.words(2).title()} Institute {i}"
+        rows.append(
+            {
+                "@id": iri,
+                "name": name,
+                "e-mail": f"agent{i}@example.com",
+                "affiliation.name": sheet.maybe(f"Institute {i % 50}"),
+                "affiliation.id": sheet.maybe(
+                    f"https://ror.org/0{i % 50:08x}"
+                ),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def _datasettypes(sheet: _Sheet, n: int) -> pd.DataFrame:
+    rng = sheet.rng
+    properties = [f"cheminf:CHEMINF_{i:06d}" for i in range(200, 400)]
+    rows = []
+    for i in range(n):
+        row = {
+            "@id": f"datasettype:DT{i:06d}",
+            "datamodel": (f"empadm:DM{i:06d}" if rng.random() < 0.3 else None),
+            "title": f"{sheet.words(2)} dataset {i}",
+            "description": sheet.maybe(sheet.words(12)),
+            "format": sheet.cell(
+                "format", ("text/csv", "application/json", "image/tiff")
+            ),
+            "keyword": sheet.maybe(sheet.cell("keyword", WORDS)),
+            "indicator": sheet.maybe(sheet.words(1), 0.5),
+        }
+        datums = rng.sample(properties, rng.randint(0, DATUMS))
+        for j in range(DATUMS):
+            row[f"datum{j + 1}"] = datums[j] if j < len(datums) else None
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _sw(
+    sheet: _Sheet, n: int, agents: list, datasettypes: list
+) -> pd.DataFrame:
+    rng = sheet.rng
+    classes = [f"cheminf:CHEMINF_{i:06d}" for i in range(100)]
+    rows = []
+    for i in range(n):
+        ident = f"SW{i:06d}"
+        tier = rng.choice(("tierlevel1", "tierlevel2", "tierlevel3"))
+        row = {
+            "@id": f"mw:{ident}" if rng.random() < 0.1 else ident,
+            "title": f"{sheet.words(2).title()} {i}",
+            "description": sheet.maybe(sheet.words(20)),
+            "keyword": sheet.maybe(sheet.cell("keyword", WORDS, 5)),
+            "tierLevel": sheet.maybe(
+                f"{tier} ({sheet.words(3)})" if rng.random() < 0.5 else tier
+            ),
+            "hasAPI": rng.choice(("TRUE", "FALSE")),
+            "hasGUI": rng.choice(("TRUE", "FALSE")),
+            "accessRights": rng.choice(("PUBLIC", "NON_PUBLIC")),
+            "license": sheet.maybe(
+                f"https://spdx.org/licenses/{rng.choice(LICENSES)}"
+            ),
+            "creator": sheet.cell("creator", agents),
+            "curator": sheet.maybe(sheet.cell("curator", agents, 2)),
+            "documentation": sheet.maybe(f"https://example.org/docs/{ident}"),
+            "version": sheet.maybe(
+                f"{rng.randint(0, 5)}.{rng.randint(0, 20)}.{rng.randint(0, 9)}"
+            ),
+            "releaseDate": sheet.maybe(sheet.date()),
+            "indicator": sheet.maybe(sheet.words(1), 0.5),
+            "inputDatasetType": sheet.cell("inputDatasetType", datasettypes),
+            "outputDatasetType": sheet.cell("outputDatasetType", datasettypes),
+            "title (comment)": sheet.maybe(sheet.words(4), 0.8),
+        }
+        for column in CHEMICAL_CLASSES:
+            row[column] = sheet.maybe(
+                ", ".join(rng.sample(classes, rng.randint(1, 3))), 0.5
+            )
+        for j, assessment in enumerate(rng.sample(ASSESSMENTS, 2)):
+            row[f"SSbD Assessment {j + 1}"] = sheet.maybe(assessment, 0.3)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def datamodels_table(datasettypes: pd.DataFrame) -> pd.DataFrame:
+    """Return the datum table of `datasettypes`, as derived by step 1."""
+    prefixes = {
+        "datasettype:": "https://pink-project.eu/datasettype/",
+        "empadm:": "https://empa.ch/datamodel/",
+    }
+
+    def iri(value):
+        for prefix, namespace in prefixes.items():
+            if value.startswith(prefix):
+                return namespace + value[len(prefix) :]
+        return value
+
+    datums = [c for c in datasettypes.columns if c.startswith("datum")]
+    identifier = datasettypes["@id"]
+    table = datasettypes[datums].copy()
+    table["@id"] = datasettypes["datamodel"].fillna(identifier).map(iri)
+    table["description"] = "This is the datamodel for " + identifier
+    table["title"] = identifier + "-datamodel"
+    return table[table[datums].notna().any(axis=1)]
+
+
+def sheet_headers(properties: Mapping[str, str]) -> Dict[str, str]:
+    """Return a dict mapping keywords to the spreadsheet headers.
+
+    Parameters:
+        properties: Dict mapping spreadsheet properties to keywords,
+            like `parseutils.property_iri_dict`.
+    """
+    headers: Dict[str, str] = {}
+    for prop, keyword in properties.items():
+        if isinstance(prop, str) and isinstance(keyword, str):
+            headers.setdefault(keyword, prop)
+    return headers
+
+
+def synthetic_sheets(
+    rows: int,
+    seed: int = 0,
+    headers: Optional[Mapping[str, str]] = None,
+    list_columns: Iterable[str] = LIST_COLUMNS,
+) -> Dict[str, pd.DataFrame]:
+    """Return synthetic PINK sheets with `rows` software resources.
+
+    Parameters:
+        rows: Number of rows of the SW sheet.  The other sheets are
+            scaled according to `SIZES`.
+        seed: Seed of the random values.
+        headers: Dict mapping keywords to spreadsheet headers.  Defaults
+            to `HEADERS`.
+        list_columns: Keywords with multiple values.
+
+    Returns:
+        Dict mapping "sw", "datasettypes", "agents" and "datamodels" to
+        the sheets.
+    """
+    rng = random.Random(seed)
+    sheet = _Sheet(rng, list_columns)
+    sizes = {name: max(1, int(rows * size)) for name, size in SIZES.items()}
+    agents = _agents(sheet, sizes["agents"])
+    datasettypes = _datasettypes(sheet, sizes["datasettypes"])
+    sw = _sw(
+        sheet, sizes["sw"], list(agents["@id"]), list(datasettypes["@id"])
+    )
+    datamodels = datamodels_table(datasettypes)
+    datasettypes["Unnamed: 20"] = None
+
+    headers = HEADERS if headers is None else headers
+    sheets = {"sw": sw, "datasettypes": datasettypes, "agents": agents}
+    for df in sheets.values():
+        df.rename(columns=headers, inplace=True)
+    sheets["datamodels"] = datamodels
+    return sheets
+
+
+def write_sheets(
+    sheets: Mapping[str, pd.DataFrame], directory: Union[str, Path]
+) -> Dict[str, Path]:
+    """Write `sheets` as csv files to `directory` and return the paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for name, df in sheets.items():
+        paths[name] = directory / f"{name}.csv"
+        df.to_csv(paths[name], index=False)
+    return paths
+
+
+def main():
+    """Write synthetic sheets."""
+    import argparse  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("rows", type=int, help="Number of SW rows.")
+    parser.add_argument("--output", default="synthsheets")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--termdefs",
+        action="store_true",
+        help="Name the columns by the term definitions of parseutils.",
+    )
+    args = parser.parse_args()
+
+    kwargs = {}
+    if args.termdefs:
+        # pylint: disable=import-outside-toplevel,import-error
+        import sys
+
+        rootdir = Path(__file__).resolve().parent.parent
+        sys.path.insert(0, str(rootdir / "scripts"))
+        from parseutils import list_columns, property_iri_dict
+
+        kwargs = {
+            "headers": sheet_headers(property_iri_dict),
+            "list_columns": list_columns,
+        }
+    sheets = synthetic_sheets(args.rows, seed=args.seed, **kwargs)
+    for name, path in write_sheets(sheets, args.output).items():
+        print(f"Wrote {path} ({len(sheets[name])} rows)")
+
+
+if __name__ == "__main__":
+    main()
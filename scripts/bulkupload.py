@@ -0,0 +1,420 @@
+"""
+Bulk upload of triples to a SPARQL endpoint.
+
+Instead of one HTTP round trip per triple (``kb.add((s, p, o))`` via
+the sparqlwrapper backend), the triples are sent in chunks, either as
+SPARQL ``INSERT DATA`` requests or as Graph Store Protocol POSTs of
+N-Triples.  All requests go through a pooled keep-alive session, and the
+number of concurrent requests is limited.
+
+Blank nodes are only meaningful within a single request, so triples are
+chunked per resource (the concise bounded description of each named
+subject, merged with the other resources sharing its blank nodes) and a
+resource is never split between two chunks.
+
+Requests are retried on connection errors and overload responses.  If
+the response to a request is lost (a read error), the request is only
+resent when repeating it does no harm: ``DELETE DATA``, ``INSERT DATA``
+without blank nodes and the load of the staging graph in
+`BulkUploader.replace_graph()`.  Inserting blank nodes twice would
+create two copies of them.
+
+Usage:
+
+    python scripts/bulkupload.py googlespreadsheet_resources.add.nt \\
+        --update-url <repository>/statements --keyring PINK_graphdb
+"""
+
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from rdflib import BNode, Graph, Variable
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+Triple = Tuple
+
+
+@dataclass
+class UploadStats:
+    """Statistics of a bulk operation."""
+
+    triples: int = 0
+    requests: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        rate = self.triples / self.seconds if self.seconds else 0
+        return (
+            f"{self.triples} triples in {self.requests} requests, "
+            f"{self.seconds:.2f} s ({rate:.0f} triples/s)"
+        )
+
+
+def has_bnodes(triples: Iterable[Triple]) -> bool:
+    """Return whether any of `triples` contains a blank node."""
+    return any(isinstance(t, BNode) for triple in triples for t in triple)
+
+
+def resource_groups(graph: Graph) -> Iterator[List[Triple]]:
+    """Yield the triples of `graph` grouped per named subject.
+
+    Each group is the concise bounded description of a subject, i.e.
+    all its triples including the blank nodes it refers to.  Triples
+    with blank-node subjects that are not reachable from any named
+    subject form one last group.  Groups that share a blank node are
+    merged, so that every blank node is in a single group.
+    """
+    groups = []
+    seen: set = set()
+    for subject in sorted(set(graph.subjects()), key=str):
+        if isinstance(subject, BNode):
+            continue
+        group = [t for t in graph.cbd(subject) if t not in seen]
+        seen.update(group)
+        if group:
+            groups.append(group)
+    rest = [t for t in graph if t not in seen]
+    if rest:
+        groups.append(rest)
+
+    # Union-find over the groups, joined by their blank nodes
+    parent = list(range(len(groups)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: dict = {}
+    for i, group in enumerate(groups):
+        for triple in group:
+            for term in triple:
+                if isinstance(term, BNode):
+                    parent[find(i)] = find(owner.setdefault(term, i))
+
+    merged: Dict[int, List[Triple]] = {}
+    for i, group in enumerate(groups):
+        merged.setdefault(find(i), []).extend(group)
+    yield from merged.values()
+
+
+def packed(
+    groups: Iterable[List[Triple]], chunk_size: int
+) -> Iterator[List[Triple]]:
+    """Yield lists of about `chunk_size` triples by concatenating `groups`.
+
+    A group is never split, so a chunk may be larger than `chunk_size`.
+    """
+    chunk: List[Triple] = []
+    for group in groups:
+        if chunk and len(chunk) + len(group) > chunk_size:
+            yield chunk
+            chunk = []
+        chunk.extend(group)
+    if chunk:
+        yield chunk
+
+
+def chunked(graph: Graph, chunk_size: int) -> Iterator[List[Triple]]:
+    """Yield lists of about `chunk_size` triples without splitting groups."""
+    return packed(resource_groups(graph), chunk_size)
+
+
+def ntriples(triples: Sequence[Triple]) -> str:
+    """Return `triples` serialised as N-Triples."""
+    return "".join(f"{s.n3()} {p.n3()} {o.n3()} .\n" for s, p, o in triples)
+
+
+def _pattern(triples: Sequence[Triple]) -> str:
+    """Return `triples` as a SPARQL pattern with blank nodes as variables."""
+    variables: dict = {}
+
+    def term(t):
+        if isinstance(t, BNode):
+            if t not in variables:
+                variables[t] = Variable(f"b{len(variables)}")
+            return variables[t].n3()
+        return t.n3()
+
+    return "".join(f"{term(s)} {term(p)} {term(o)} .\n" for s, p, o in triples)
+
+
+def _in_graph(body: str, graph: Optional[str]) -> str:
+    return f"GRAPH <{graph}> {{\n{body}}}\n" if graph else body
+
+
+class BulkUploader:
+    """Chunked, concurrent upload of triples to a SPARQL endpoint.
+
+    Parameters:
+        update_url: Url of the SPARQL update service.
+        graph_store_url: Url of the Graph Store Protocol service.  If
+            given, triples are added with GSP POSTs of N-Triples instead
+            of ``INSERT DATA`` requests.
+        username: User name for basic authentication.
+        password: Password for basic authentication.
+        chunk_size: Approximate number of triples per request.
+        max_workers: Maximum number of concurrent requests (and size of
+            the connection pool).
+        retries: Number of retries on connection errors and on the HTTP
+            status codes 429 and 503.  Requests that can safely be
+            repeated are also retried on read errors and on the status
+            codes 500, 502 and 504.
+        backoff: Backoff factor between retries, in seconds.
+        timeout: Timeout for each request, in seconds.
+    """
+
+    def __init__(
+        self,
+        update_url: str,
+        graph_store_url: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        chunk_size: int = 5000,
+        max_workers: int = 4,
+        retries: int = 5,
+        backoff: float = 0.5,
+        timeout: float = 120,
+    ):
+        self.update_url = update_url
+        self.graph_store_url = graph_store_url
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        # Requests that can be repeated safely are retried on any error.
+        # Other requests are only retried if the server did not handle
+        # them.  Both share one connection pool.
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=max_workers,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=None,  # also retry POST, PUT and DELETE
+            ),
+        )
+        single = HTTPAdapter(
+            max_retries=Retry(
+                total=retries,
+                read=0,
+                backoff_factor=backoff,
+                status_forcelist=(429, 503),
+                allowed_methods=None,
+            )
+        )
+        single.poolmanager = adapter.poolmanager
+        self.session = requests.Session()
+        self.single_session = requests.Session()
+        for session, adapt in (
+            (self.session, adapter),
+            (self.single_session, single),
+        ):
+            session.mount("http://", adapt)
+            session.mount("https://", adapt)
+            if username is not None:
+                session.auth = (username, password or "")
+
+    def close(self) -> None:
+        """Close the connection pool."""
+        self.session.close()
+        self.single_session.close()
+
+    def __enter__(self) -> "BulkUploader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def update(self, update: str, repeatable: bool = False) -> None:
+        """Send a single SPARQL update request.
+
+        Parameters:
+            update: The SPARQL update.
+            repeatable: Whether sending `update` twice has the same effect
+                as sending it once.  Only such requests are retried on
+                read errors.
+        """
+        session = self.session if repeatable else self.single_session
+        response = session.post(
+            self.update_url,
+            data=update.encode("utf-8"),
+            headers={"Content-Type": "application/sparql-update"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+    def _post_ntriples(
+        self, body: str, graph: Optional[str], repeatable: bool
+    ) -> None:
+        params = {"graph": graph} if graph else {"default": ""}
+        session = self.session if repeatable else self.single_session
+        response = session.post(
+            self.graph_store_url,  # type: ignore[arg-type]
+            params=params,
+            data=body.encode("utf-8"),
+            headers={"Content-Type": "application/n-triples"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+
+    def _run(self, func, chunks) -> UploadStats:
+        """Call `func` on each chunk with at most `max_workers` threads."""
+        stats = UploadStats()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(func, chunk) for chunk in chunks]
+            for future, chunk in zip(futures, chunks):
+                future.result()  # re-raise any exception
+                stats.triples += len(chunk)
+                stats.requests += 1
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def insert(
+        self,
+        graph: Graph,
+        named_graph: Optional[str] = None,
+        staging: bool = False,
+    ):
+        """Add all triples in `graph` to the endpoint.
+
+        Parameters:
+            graph: The triples to add.
+            named_graph: IRI of the named graph to add to.  The default
+                graph is used if not given.
+            staging: Whether `named_graph` is a staging graph that is
+                loaded from scratch, so that all requests may be retried.
+
+        Returns:
+            UploadStats for the upload.
+        """
+
+        def add(chunk):
+            repeatable = staging or not has_bnodes(chunk)
+            if self.graph_store_url:
+                self._post_ntriples(ntriples(chunk), named_graph, repeatable)
+            else:
+                body = _in_graph(ntriples(chunk), named_graph)
+                self.update(f"INSERT DATA {{\n{body}}}", repeatable)
+
+        return self._run(add, list(chunked(graph, self.chunk_size)))
+
+    def delete(self, graph: Graph, named_graph: Optional[str] = None):
+        """Remove all triples in `graph` from the endpoint.
+
+        Groups without blank nodes are removed in chunks with ``DELETE
+        DATA``.  Blank nodes cannot be addressed directly, so each group
+        with blank nodes is removed with its own ``DELETE WHERE``,
+        treating the blank nodes as variables.  The pattern must match a
+        group as a whole.
+
+        Returns:
+            UploadStats for the removal.
+        """
+
+        def remove(chunk):
+            if has_bnodes(chunk):
+                body = _in_graph(_pattern(chunk), named_graph)
+                self.update(f"DELETE WHERE {{\n{body}}}")
+            else:
+                body = _in_graph(ntriples(chunk), named_graph)
+                self.update(f"DELETE DATA {{\n{body}}}", repeatable=True)
+
+        plain: List[List[Triple]] = []
+        patterns: List[List[Triple]] = []
+        for group in resource_groups(graph):
+            (patterns if has_bnodes(group) else plain).append(group)
+        chunks = list(packed(plain, self.chunk_size)) + patterns
+        return self._run(remove, chunks)
+
+    def replace_graph(self, graph: Graph, named_graph: str) -> UploadStats:
+        """Atomically replace the content of a named graph.
+
+        The triples are first uploaded in chunks to a temporary staging
+        graph, which then replaces `named_graph` in a single ``MOVE``
+        operation.  Readers never see a partially uploaded graph.
+        """
+        staging = f"{named_graph}-staging-{uuid.uuid4().hex}"
+        try:
+            stats = self.insert(graph, staging, staging=True)
+            self.update(
+                f"MOVE SILENT GRAPH <{staging}> TO GRAPH <{named_graph}>"
+            )
+        except Exception:
+            self.update(f"DROP SILENT GRAPH <{staging}>", repeatable=True)
+            raise
+        stats.requests += 1
+        return stats
+
+
+def main() -> None:
+    """Upload RDF files to a SPARQL endpoint."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Bulk upload RDF files to a SPARQL endpoint."
+    )
+    parser.add_argument("files", nargs="+", help="RDF files to upload.")
+    parser.add_argument("--update-url", required=True)
+    parser.add_argument("--graph-store-url")
+    parser.add_argument("--graph", help="IRI of named graph to upload to.")
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="Atomically replace the content of --graph.",
+    )
+    parser.add_argument(
+        "--delete",
+        action="store_true",
+        help="Remove the triples in the files instead of adding them.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument(
+        "--keyring",
+        metavar="SERVICE",
+        help="Keyring service to get username and password from, "
+        "e.g. PINK_graphdb.",
+    )
+    args = parser.parse_args()
+
+    username = password = None
+    if args.keyring:
+        import keyring
+
+        username = keyring.get_password(args.keyring, "username")
+        password = keyring.get_password(args.keyring, "password")
+
+    graph = Graph()
+    for filename in args.files:
+        graph.parse(filename)
+
+    with BulkUploader(
+        args.update_url,
+        graph_store_url=args.graph_store_url,
+        username=username,
+        password=password,
+        chunk_size=args.chunk_size,
+        max_workers=args.max_workers,
+    ) as uploader:
+        if args.delete:
+            stats = uploader.delete(graph, args.graph)
+        elif args.replace:
+            if not args.graph:
+                parser.error("--replace requires --graph")
+            stats = uploader.replace_graph(graph, args.graph)
+        else:
+            stats = uploader.insert(graph, args.graph)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
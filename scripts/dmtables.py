@@ -0,0 +1,180 @@
+"""
+Cached, parallel generation of the datamodels of step 3.
+
+Each row of ``datamodels.csv`` defines one DLite datamodel.  A row is
+keyed by a hash of its ``datum*`` columns together with the columns
+identifying the datamodel (``@id``, title and description), since DLite
+identifies a datamodel by its URI, and of the unit handling of DMTable.
+The triples of each generated datamodel are cached as N-Triples in
+``dmcache/<hash>.nt``, and rows whose hash is cached (from an earlier
+run, or an identical row) are not generated again.
+
+The remaining rows are split into chunks converted by a process pool,
+with `DMTable.from_csv`, `get_datamodels()` and `to_triplestore()` per
+row.  The output is written as N-Triples by concatenating the cached
+files of all rows, without building a graph of all datamodels.
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from instrument import cache
+
+CACHE_DIR = Path("dmcache")
+
+# Columns identifying a datamodel, in addition to the datum columns
+IDENTITY = ("@id", "title", "description")
+
+logger = logging.getLogger(__name__)
+
+
+def row_key(
+    header: Sequence[str], row: Sequence[str], unit_handling: str = "ignore"
+) -> str:
+    """Return the hash of the datum and identity columns of `row`,
+    converted with `unit_handling`."""
+    values = sorted(
+        (column, value)
+        for column, value in zip(header, row)
+        if value and (column.startswith("datum") or column in IDENTITY)
+    )
+    data = json.dumps([unit_handling, values], ensure_ascii=False).encode(
+        "utf-8"
+    )
+    return hashlib.sha256(data).hexdigest()
+
+
+def convert_rows(
+    header: Sequence[str],
+    rows: Sequence[Sequence[str]],
+    unit_handling: str = "ignore",
+) -> List[str]:
+    """Generate the datamodel of each of `rows`.
+
+    Returns:
+        List with the triples of each datamodel as N-Triples.
+    """
+    # pylint: disable=import-outside-toplevel
+    from dlite.table import DMTable
+    from tripper import Triplestore
+
+    ntriples = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        csvfile = os.path.join(tmpdir, "row.csv")
+        for row in rows:
+            with open(csvfile, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerow(row)
+            dmtable = DMTable.from_csv(csvfile, unit_handling=unit_handling)
+            dmtable.get_datamodels()
+            ts = Triplestore("rdflib")
+            dmtable.to_triplestore(ts)
+            ntriples.append(ts.backend.graph.serialize(format="nt"))
+    return ntriples
+
+
+def _chunks(items: list, n: int) -> List[list]:
+    """Split `items` into at most `n` chunks of similar size."""
+    size = -(-len(items) // n) if items else 1
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def generate_datamodels(
+    csvfile: Union[str, Path],
+    output: Union[str, Path],
+    cache_dir: Union[str, Path] = CACHE_DIR,
+    max_workers: Optional[int] = None,
+    unit_handling: str = "ignore",
+) -> Dict[str, int]:
+    """Generate the datamodels of `csvfile` and write them to `output`.
+
+    Parameters:
+        csvfile: Datamodel table, as written by step 1.
+        output: N-Triples file to write.
+        cache_dir: Directory of the cached datamodel triples.  Cached
+            files of rows no longer in `csvfile` are removed.
+        max_workers: Maximum number of worker processes.  Defaults to
+            the number of CPUs.  If 1, the rows are converted in the
+            current process.
+        unit_handling: How DMTable handles units.
+
+    Returns:
+        Dict with the number of "rows", "cached" rows and "generated"
+        datamodels.
+    """
+    start = time.perf_counter()
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(csvfile, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+
+    keys = [row_key(header, row, unit_handling) for row in rows]
+    missing: Dict[str, List[str]] = {}
+    for key, row in zip(keys, rows):
+        if key not in missing and not (cache_dir / f"{key}.nt").exists():
+            missing[key] = row
+
+    todo: List[Tuple[str, List[str]]] = list(missing.items())
+    nworkers = min(max_workers or os.cpu_count() or 1, len(todo)) or 1
+    chunks = _chunks(todo, nworkers)
+    args = [
+        (header, [row for _, row in chunk], unit_handling) for chunk in chunks
+    ]
+    if nworkers == 1:
+        results = [convert_rows(*a) for a in args]
+    else:
+        # Fork if possible, since step 3 is not guarded by
+        # `if __name__ == "__main__"`
+        methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context(
+            "fork" if "fork" in methods else None
+        )
+        with ProcessPoolExecutor(
+            max_workers=nworkers, mp_context=mp_context
+        ) as executor:
+            futures = [executor.submit(convert_rows, *a) for a in args]
+            results = [future.result() for future in futures]
+    for chunk, ntriples in zip(chunks, results):
+        for (key, _), text in zip(chunk, ntriples):
+            tmp = cache_dir / f"{key}.tmp"
+            tmp.write_text(text, encoding="utf-8")
+            tmp.replace(cache_dir / f"{key}.nt")
+    generated = time.perf_counter()
+
+    with open(output, "w", encoding="utf-8") as out:
+        for key in dict.fromkeys(keys):
+            with open(cache_dir / f"{key}.nt", encoding="utf-8") as f:
+                out.write(f.read())
+    current = set(keys)
+    for path in cache_dir.glob("*.nt"):
+        if path.stem not in current:
+            path.unlink()
+
+    logger.info(
+        "generated %d of %d datamodels with %d workers in %.2f s, "
+        "wrote %s in %.2f s",
+        len(todo),
+        len(rows),
+        nworkers,
+        generated - start,
+        output,
+        time.perf_counter() - generated,
+    )
+    cache("datamodels", hits=len(rows) - len(todo), misses=len(todo))
+    return {
+        "rows": len(rows),
+        "cached": len(rows) - len(todo),
+        "generated": len(todo),
+    }
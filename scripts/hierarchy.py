@@ -0,0 +1,207 @@
+"""
+Class hierarchies for the drop-down lists of the annotation tool.
+
+`Hierarchy` reads the direct ``rdfs:subClassOf`` edges and the labels of
+an ontology graph once into dicts, and walks the tree below any number
+of root classes to any depth without further queries on the graph.
+Labels and descendants are memoized.
+
+The hierarchy is written in one of the `FORMATS`:
+
+- "csv": one row per path with the columns level1, level2, ...
+- "json": the same rows as a list of objects.
+- "tree": nested objects with the iri, label and children of each
+  class.
+
+Levels below the root follow the direct subclasses, except the last
+level, which lists all (direct and indirect) subclasses of its parent.
+For the SSBD assessments and three levels, this gives the
+``assessment_hierarchy.csv`` of `make_drop_down_list_source.py`.
+"""
+
+import csv
+import json
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from rdflib import RDFS, SKOS, Graph, URIRef
+
+# Label predicates, in order of preference
+LABELS = (SKOS.altLabel, SKOS.prefLabel, RDFS.label)
+
+FORMATS = ("csv", "json", "tree")
+
+
+class Hierarchy:
+    """Subclass tree of the named classes of a graph.
+
+    Parameters:
+        graph: Ontology graph.
+        labels: Label predicates, in order of preference.
+        lang: Preferred language of the labels.  Labels without
+            language are used if there is none in this language.
+    """
+
+    def __init__(
+        self,
+        graph: Graph,
+        labels: Sequence[URIRef] = LABELS,
+        lang: str = "en",
+    ):
+        self.children: Dict[URIRef, List[URIRef]] = {}
+        for sub, sup in graph.subject_objects(RDFS.subClassOf, unique=True):
+            if isinstance(sub, URIRef) and isinstance(sup, URIRef):
+                self.children.setdefault(sup, []).append(sub)
+
+        # Best label of each class: (rank, label), where the rank orders
+        # by predicate and prefers the language `lang`
+        best: Dict[URIRef, tuple] = {}
+        self.by_label: Dict[str, URIRef] = {}
+        for i, predicate in enumerate(labels):
+            for cls, label in graph.subject_objects(predicate):
+                if not isinstance(cls, URIRef):
+                    continue
+                language = getattr(label, "language", None)
+                if language not in (lang, None):
+                    continue
+                rank = (i, language != lang)
+                if cls not in best or rank < best[cls][0]:
+                    best[cls] = (rank, str(label))
+                self.by_label.setdefault(str(label), cls)
+        self.labels = {cls: label for cls, (_, label) in best.items()}
+        self._descendants: Dict[URIRef, List[URIRef]] = {}
+
+    def label(self, cls: URIRef) -> str:
+        """Return the label of `cls`, or its local name if it has none."""
+        label = self.labels.get(cls)
+        if label is None:
+            name = str(cls).rsplit("#", 1)[-1]
+            label = self.labels[cls] = name.rsplit("/", 1)[-1]
+        return label
+
+    def resolve(self, root: Union[str, URIRef]) -> Tuple[URIRef, str]:
+        """Return the class with the IRI or label `root` and its label.
+
+        A class given by label keeps that label.
+        """
+        if str(root) in self.by_label:
+            return self.by_label[str(root)], str(root)
+        if isinstance(root, URIRef) or "://" in root:
+            return URIRef(root), self.label(URIRef(root))
+        raise ValueError(f"no class labelled {root!r}")
+
+    def subclasses(self, cls: URIRef) -> List[URIRef]:
+        """Return the direct subclasses of `cls`, sorted by label."""
+        return sorted(self.children.get(cls, ()), key=self.label)
+
+    def descendants(self, cls: URIRef) -> List[URIRef]:
+        """Return all subclasses of `cls`, sorted by label."""
+        if cls not in self._descendants:
+            seen: Set[URIRef] = set()
+            stack = list(self.children.get(cls, ()))
+            while stack:
+                sub = stack.pop()
+                if sub not in seen and sub != cls:
+                    seen.add(sub)
+                    stack.extend(self.children.get(sub, ()))
+            self._descendants[cls] = sorted(seen, key=self.label)
+        return self._descendants[cls]
+
+    def _below(self, cls: URIRef, level: int, depth: int) -> List[URIRef]:
+        """Return the classes listed below `cls` at `level` (from 1)."""
+        if level >= depth:
+            return []
+        if level == depth - 1:
+            return self.descendants(cls)
+        return self.subclasses(cls)
+
+    def rows(
+        self, roots: Iterable[Union[str, URIRef]], depth: int = 3
+    ) -> List[List[str]]:
+        """Return the paths below `roots` as rows of `depth` labels.
+
+        Paths ending above the last level are padded with empty strings.
+        """
+        rows: List[List[str]] = []
+
+        def walk(cls, path, level):
+            below = self._below(cls, level, depth)
+            if not below:
+                rows.append(path + [""] * (depth - len(path)))
+            for sub in below:
+                if sub not in path_classes:
+                    path_classes.append(sub)
+                    walk(sub, path + [self.label(sub)], level + 1)
+                    path_classes.pop()
+
+        for root in roots:
+            cls, name = self.resolve(root)
+            path_classes = [cls]
+            walk(cls, [name], 1)
+        return rows
+
+    def tree(
+        self, roots: Iterable[Union[str, URIRef]], depth: int = 3
+    ) -> List[dict]:
+        """Return the hierarchy below `roots` as nested dicts."""
+
+        def node(cls, name, level, ancestors):
+            item = {"iri": str(cls), "label": name}
+            children = [
+                node(sub, self.label(sub), level + 1, ancestors | {sub})
+                for sub in self._below(cls, level, depth)
+                if sub not in ancestors
+            ]
+            if children:
+                item["children"] = children
+            return item
+
+        tree = []
+        for root in roots:
+            cls, name = self.resolve(root)
+            tree.append(node(cls, name, 1, {cls}))
+        return tree
+
+    def write(
+        self,
+        path: Union[str, Path],
+        roots: Sequence[Union[str, URIRef]],
+        depth: int = 3,
+        fmt: Optional[str] = None,
+    ) -> None:
+        """Write the hierarchy below `roots` to `path`.
+
+        Parameters:
+            path: Output file.
+            roots: IRIs or labels of the root classes.
+            depth: Number of levels, including the roots.
+            fmt: One of `FORMATS`.  Defaults to "csv" for ``.csv`` files
+                and "json" otherwise.
+        """
+        path = Path(path)
+        if fmt is None:
+            fmt = "csv" if path.suffix == ".csv" else "json"
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}")
+        header = [f"level{i}" for i in range(1, depth + 1)]
+        if fmt == "csv":
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(self.rows(roots, depth))
+            return
+        if fmt == "json":
+            data = [dict(zip(header, row)) for row in self.rows(roots, depth)]
+        else:
+            data = self.tree(roots, depth)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
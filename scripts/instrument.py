@@ -0,0 +1,301 @@
+"""
+Instrumentation of the pipeline stages.
+
+The pipeline scripts report progress with leveled logging and record
+numbers in a `Metrics` object:
+
+- spans: the time of each stage (see `STAGES`), the number of calls,
+  the resident memory (RSS) at the end of the stage and its growth
+  during the stage, and stage counts, like the number of rows or
+  triples,
+- counters, like the number of replaced IRIs or SHACL violations, and
+- caches: hits and misses, e.g. of unchanged rows or cached datamodels.
+
+Stages are timed with
+
+    with span("correct", rows=len(df)) as s:
+        df = correct(df)
+        s.count("columns", len(df.columns))
+
+Spans of the same stage add up and may be nested (e.g. "expand" within
+"correct").  Each call of a function is timed by decorating it with
+``@timed("correct", rows=len)``, where the counts are functions of the
+first argument.  Times measured elsewhere, e.g. in a worker process, are
+added with `record()`, without memory.
+
+At the end of a script, `write_metrics()` adds the metrics of the
+script to the JSON file ``metrics.json``, with one entry per script,
+such that the metrics of all steps end up in the same file.
+
+The log level is given by the ``PINK_LOG_LEVEL`` environment variable
+(default "INFO").  Per-value messages, like each IRI replaced by
+`check_for_uris`, are logged at level DEBUG.
+"""
+
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+try:
+    import resource
+except ImportError:
+    resource = None  # type: ignore[assignment]  # not on Windows
+
+STAGES = (
+    "download",
+    "correct",
+    "expand",
+    "uricheck",
+    "tabledoc",
+    "store",
+    "validate",
+    "serialize",
+)
+
+METRICS_FILE = Path("metrics.json")
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+logger = logging.getLogger(__name__)
+
+
+def max_rss_mb() -> Optional[float]:
+    """Return the peak resident memory of this process in MB.
+
+    Returns None if the `resource` module is not available.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+
+def rss_mb() -> Optional[float]:
+    """Return the current resident memory of this process in MB.
+
+    Where /proc is not available, the peak resident memory is returned,
+    and None if that is not available either.
+    """
+    if resource is None:
+        return None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return max_rss_mb()
+    return pages * resource.getpagesize() / 1024**2
+
+
+def setup_logging(level: Optional[Union[int, str]] = None) -> None:
+    """Configure logging of the pipeline scripts.
+
+    Parameters:
+        level: Log level.  Defaults to the ``PINK_LOG_LEVEL``
+            environment variable, or "INFO".
+    """
+    if level is None:
+        level = os.environ.get("PINK_LOG_LEVEL", "INFO")
+    if isinstance(level, str):
+        level = level.upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+
+class Span:
+    """Measurements of one stage.
+
+    Attributes:
+        stage: Name of the stage.
+        seconds: Total time.
+        calls: Number of times the stage was entered.
+        rss_mb: Largest resident memory at the end of a call.
+        rss_delta_mb: Largest growth of the resident memory during a
+            call.
+        counts: Dict of stage counts, like "rows" or "triples".
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.seconds = 0.0
+        self.calls = 0
+        self.rss_mb = 0.0
+        self.rss_delta_mb = 0.0
+        self.counts: Dict[str, int] = {}
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add `n` to the count `name` of this stage."""
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def asdict(self) -> dict:
+        """Return the measurements as a dict."""
+        return {
+            "seconds": round(self.seconds, 6),
+            "calls": self.calls,
+            "rss_mb": round(self.rss_mb, 1),
+            "rss_delta_mb": round(self.rss_delta_mb, 1),
+            **self.counts,
+        }
+
+
+class Metrics:
+    """Spans, counters and cache statistics of a script."""
+
+    def __init__(self):
+        self.spans: Dict[str, Span] = {}
+        self.counters: Dict[str, int] = {}
+        self.caches: Dict[str, Dict[str, int]] = {}
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _span(self, stage: str) -> Span:
+        with self._lock:
+            if stage not in self.spans:
+                self.spans[stage] = Span(stage)
+            return self.spans[stage]
+
+    @contextmanager
+    def span(self, stage: str, **counts: int) -> Iterator[Span]:
+        """Context manager timing `stage`.
+
+        Keyword arguments are added to the counts of the stage.
+        """
+        span = self._span(stage)
+        for name, n in counts.items():
+            span.count(name, n)
+        rss = rss_mb()
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            seconds = time.perf_counter() - start
+            self.record(stage, seconds)
+            end_rss = rss_mb()
+            if rss is not None and end_rss is not None:
+                with self._lock:
+                    span.rss_mb = max(span.rss_mb, end_rss)
+                    span.rss_delta_mb = max(span.rss_delta_mb, end_rss - rss)
+            logger.debug("%s: %.3f s", stage, seconds)
+
+    def timed(self, stage: str, **counts: Callable[[Any], int]) -> Callable:
+        """Decorator timing each call of a function as `stage`.
+
+        Keyword arguments map count names to functions of the first
+        argument of the call, e.g. ``rows=len``.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(
+                    stage, **{name: f(args[0]) for name, f in counts.items()}
+                ):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, stage: str, seconds: float, **counts: int) -> None:
+        """Add a call of `seconds` and `counts` to `stage`."""
+        span = self._span(stage)
+        with self._lock:
+            span.seconds += seconds
+            span.calls += 1
+            for name, n in counts.items():
+                span.count(name, n)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add `n` to the counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def cache(self, name: str, hits: int = 0, misses: int = 0) -> None:
+        """Add `hits` and `misses` to the statistics of cache `name`."""
+        with self._lock:
+            stats = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            stats["hits"] += hits
+            stats["misses"] += misses
+
+    def asdict(self) -> dict:
+        """Return the metrics as a dict."""
+        with self._lock:
+            caches = {}
+            for name, stats in self.caches.items():
+                total = stats["hits"] + stats["misses"]
+                caches[name] = {
+                    **stats,
+                    "hit_rate": (
+                        round(stats["hits"] / total, 4) if total else None
+                    ),
+                }
+            result: Dict[str, Any] = {
+                "seconds": round(time.perf_counter() - self.start, 6),
+            }
+            peak = max_rss_mb()
+            if peak is not None:
+                result["peak_rss_mb"] = round(peak, 1)
+            result.update(
+                spans={k: v.asdict() for k, v in self.spans.items()},
+                counters=dict(self.counters),
+                caches=caches,
+            )
+            return result
+
+    def write(self, name: str, path: Union[str, Path] = METRICS_FILE) -> dict:
+        """Add the metrics as entry `name` to the JSON file `path`.
+
+        Entries of other scripts in `path` are kept.
+
+        Returns:
+            The metrics written.
+        """
+        path = Path(path)
+        data = {}
+        if path.exists():
+            try:
+                with open(path, "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+            except ValueError:
+                logger.warning("overwriting invalid metrics file %s", path)
+        data[name] = metrics = self.asdict()
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        tmp.replace(path)
+        peak = metrics.get("peak_rss_mb")
+        logger.info(
+            "%s finished in %.2f s%s, metrics written to %s",
+            name,
+            metrics["seconds"],
+            f", peak {peak:.0f} MB" if peak is not None else "",
+            path,
+        )
+        return metrics
+
+    def reset(self) -> None:
+        """Remove all measurements."""
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.caches.clear()
+            self.start = time.perf_counter()
+
+
+# Metrics of the running script
+metrics = Metrics()
+span = metrics.span
+timed = metrics.timed
+record = metrics.record
+count = metrics.count
+cache = metrics.cache
+
+
+def write_metrics(name: str, path: Union[str, Path] = METRICS_FILE) -> dict:
+    """Write the metrics of the running script as entry `name`."""
+    return metrics.write(name, path)
@@ -0,0 +1,160 @@
+"""
+Streaming writer for the JSON-LD files in jsonld/.
+
+The ``@context`` is written once, followed by the ``@graph`` entries one
+at a time, so entries can be written as they are produced.  Three
+output modes are supported:
+
+- "indent": Same output as ``json.dump(doc, f, indent=2)`` (default).
+  `write_jsonld()` simply calls ``json.dump()`` in this mode.  Written
+  entry by entry with `JsonLdWriter`, it is about 1.5 times slower,
+  since every entry is indented separately.
+- "compact": No indentation and one ``@graph`` entry per line.  Uses
+  the fast C encoder of the json module and is about 1.5 times faster
+  than ``json.dump(indent=2)``, with 20% smaller files.
+- "ndjson": Newline-delimited JSON.  The first line is an object with
+  only the ``@context``, followed by one resource per line, so that
+  readers can stream the output.
+
+The compact and NDJSON modes write non-ASCII characters as they are
+(``ensure_ascii=False``), the indent mode escapes them like
+``json.dump()``.
+
+Example:
+
+    with JsonLdWriter("jsonld/pink-agents.jsonld", context) as writer:
+        for resource in resources:
+            writer.write(resource)
+"""
+
+import json
+from pathlib import Path
+from typing import IO, Iterable, Optional, Union
+
+MODES = ("indent", "compact", "ndjson")
+
+
+def _indent(text: str, prefix: str) -> str:
+    return text.replace("\n", "\n" + prefix)
+
+
+class JsonLdWriter:
+    """Write a JSON-LD document with a ``@graph`` incrementally.
+
+    Parameters:
+        dest: File name or open text file to write to.
+        context: The JSON-LD context.  Written once at the start.
+        mode: One of "indent", "compact" or "ndjson".
+    """
+
+    def __init__(
+        self,
+        dest: Union[str, Path, IO[str]],
+        context: Union[dict, list, str],
+        mode: str = "indent",
+    ):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got '{mode}'")
+        self.mode = mode
+        self.count = 0
+        if isinstance(dest, (str, Path)):
+            self._file: IO[str] = open(dest, "wt", encoding="utf-8")
+            self._close = True
+        else:
+            self._file = dest
+            self._close = False
+        self._write_head(context)
+
+    def _write_head(self, context) -> None:
+        f = self._file
+        if self.mode == "indent":
+            ctx = _indent(json.dumps(context, indent=2), "  ")
+            f.write('{\n  "@context": ' + ctx + ',\n  "@graph": [')
+        elif self.mode == "compact":
+            ctx = json.dumps(
+                context, separators=(",", ":"), ensure_ascii=False
+            )
+            f.write('{"@context":' + ctx + ',"@graph":[')
+        else:
+            f.write(json.dumps({"@context": context}, ensure_ascii=False))
+            f.write("\n")
+
+    def write(self, resource: dict) -> None:
+        """Write one ``@graph`` entry."""
+        f = self._file
+        if self.mode == "indent":
+            sep = ",\n    " if self.count else "\n    "
+            f.write(sep + _indent(json.dumps(resource, indent=2), "    "))
+        elif self.mode == "compact":
+            f.write(",\n" if self.count else "\n")
+            f.write(
+                json.dumps(resource, separators=(",", ":"), ensure_ascii=False)
+            )
+        else:
+            f.write(json.dumps(resource, ensure_ascii=False))
+            f.write("\n")
+        self.count += 1
+
+    def writemany(self, resources: Iterable[dict]) -> None:
+        """Write several ``@graph`` entries."""
+        for resource in resources:
+            self.write(resource)
+
+    def close(self) -> None:
+        """Finish the document and close the file if we opened it."""
+        f = self._file
+        if self.mode == "indent":
+            f.write("\n  ]\n}" if self.count else "]\n}")
+        elif self.mode == "compact":
+            f.write("\n]}\n" if self.count else "]}\n")
+        if self._close:
+            f.close()
+
+    def __enter__(self) -> "JsonLdWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_jsonld(
+    dest: Union[str, Path, IO[str]],
+    doc: dict,
+    mode: str = "indent",
+) -> int:
+    """Write a JSON-LD document with ``@context`` and ``@graph``.
+
+    Returns:
+        Number of written ``@graph`` entries.
+    """
+    if mode == "indent":
+        # The whole document is in memory anyway, and json.dump() is
+        # faster than indenting each entry separately
+        graph = doc.get("@graph", [])
+        out = {"@context": doc.get("@context", {}), "@graph": graph}
+        if isinstance(dest, (str, Path)):
+            with open(dest, "wt", encoding="utf-8") as f:
+                json.dump(out, f, indent=2)
+        else:
+            json.dump(out, dest, indent=2)
+        return len(graph)
+    with JsonLdWriter(dest, doc.get("@context", {}), mode=mode) as writer:
+        writer.writemany(doc.get("@graph", []))
+    return writer.count
+
+
+def load_jsonld(path: Union[str, Path], mode: Optional[str] = None) -> dict:
+    """Load a JSON-LD document written in any of the modes.
+
+    NDJSON files are detected by the ".ndjson" or ".jsonl" suffix,
+    unless `mode` is given.
+    """
+    path = Path(path)
+    if mode is None:
+        mode = "ndjson" if path.suffix in (".ndjson", ".jsonl") else "indent"
+    with open(path, "rt", encoding="utf-8") as f:
+        if mode != "ndjson":
+            return json.load(f)
+        head = json.loads(f.readline())
+        graph = [json.loads(line) for line in f if line.strip()]
+    return {"@context": head.get("@context", {}), "@graph": graph}
@@ -0,0 +1,496 @@
+"""
+Local HTTP service keeping the knowledge base warm.
+
+Loads the persistent KB store (see `kbstore.py`) once and serves
+
+    GET/POST /sparql          SPARQL protocol (query in the ``query``
+                              parameter or as application/sparql-query)
+    GET  /queries             names and parameters of the named queries
+    GET  /queries/<name>      run a named query of `queries.registry`,
+                              with its parameters as query parameters
+    POST /reload              sync all sources, or only ``?source=...``
+    GET  /metrics             request timing metrics (Prometheus text)
+    GET  /health              status and version of the KB
+
+Requests are served by concurrent threads.  Queries hold a shared lock
+and reloads an exclusive one, such that a query never sees a half
+loaded source.  Results of the named queries are cached until a source
+changes.  With ``--watch``, local source files are checked
+periodically and reloaded when changed.
+
+Usage:
+
+    python scripts/kbservice.py --port 8088 [--watch 10] [sources ...]
+    curl http://localhost:8088/queries/query_all \\
+        -G -d targetProperty=http://semanticscience.org/resource/CHEMINF_000085
+    curl -X POST 'http://localhost:8088/reload?source=resources.ttl'
+"""
+
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+from rdflib import BNode, Literal, URIRef
+
+from kbstore import SOURCES, STORE_DIR, KBStore, is_remote
+from queries import prepare, registry
+from subclassindex import update_closure
+
+# Quantiles reported for the request times
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Result formats of SELECT/ASK and of CONSTRUCT/DESCRIBE queries, by
+# media type
+RESULT_FORMATS = {
+    "application/sparql-results+json": "json",
+    "application/json": "json",
+    "application/sparql-results+xml": "xml",
+    "text/csv": "csv",
+}
+GRAPH_FORMATS = {
+    "text/turtle": "turtle",
+    "application/n-triples": "nt",
+    "application/ld+json": "json-ld",
+}
+
+
+class RWLock:
+    """Readers-writer lock.
+
+    Any number of readers may hold the lock at the same time, while a
+    writer holds it alone.  Waiting writers have precedence over new
+    readers.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting = 0
+
+    @contextmanager
+    def read(self):
+        """Context manager holding the lock for reading."""
+        with self._cond:
+            while self._writing or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Context manager holding the lock for writing."""
+        with self._cond:
+            self._waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class Metrics:
+    """Request counts and timings per endpoint.
+
+    Parameters:
+        window: Number of most recent requests per endpoint the
+            quantiles are computed from.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.samples: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def observe(self, endpoint: str, seconds: float, error: bool = False):
+        """Record a request to `endpoint` that took `seconds`."""
+        with self._lock:
+            self.counts[endpoint] += 1
+            self.seconds[endpoint] += seconds
+            self.samples[endpoint].append(seconds)
+            if error:
+                self.errors[endpoint] += 1
+
+    def render(self, **gauges) -> str:
+        """Return the metrics in the Prometheus text format.
+
+        Keyword arguments are added as gauges.
+        """
+        lines = [
+            "# TYPE kbservice_request_seconds summary",
+        ]
+        with self._lock:
+            for endpoint in sorted(self.counts):
+                samples = sorted(self.samples[endpoint])
+                label = f'endpoint="{endpoint}"'
+                for q in QUANTILES:
+                    rank = min(len(samples) - 1, int(q * len(samples)))
+                    value = samples[rank]
+                    lines.append(
+                        f'kbservice_request_seconds{{{label},quantile="{q}"}}'
+                        f" {value:.6f}"
+                    )
+                lines.append(
+                    f"kbservice_request_seconds_sum{{{label}}} "
+                    f"{self.seconds[endpoint]:.6f}"
+                )
+                lines.append(
+                    f"kbservice_request_seconds_count{{{label}}} "
+                    f"{self.counts[endpoint]}"
+                )
+            lines.append("# TYPE kbservice_request_errors_total counter")
+            for endpoint in sorted(self.counts):
+                lines.append(
+                    f'kbservice_request_errors_total{{endpoint="{endpoint}"}}'
+                    f" {self.errors[endpoint]}"
+                )
+        for name, value in gauges.items():
+            lines.append(f"# TYPE kbservice_{name} gauge")
+            lines.append(f"kbservice_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _term_json(term) -> Optional[dict]:
+    """Return `term` in the SPARQL 1.1 query results JSON format."""
+    if term is None:
+        return None
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    value = {"type": "literal", "value": str(term)}
+    if isinstance(term, Literal):
+        if term.language:
+            value["xml:lang"] = term.language
+        elif term.datatype:
+            value["datatype"] = str(term.datatype)
+    return value
+
+
+class KBService:
+    """The warm knowledge base of the service.
+
+    Parameters:
+        sources: Urls or file names of the sources.
+        path: Directory of the KB store.
+        persistent: Whether to use a persistent (Oxigraph) store.  By
+            default, it is used if oxrdflib is installed.
+    """
+
+    def __init__(
+        self,
+        sources: Iterable[str] = SOURCES,
+        path: Union[str, Path] = STORE_DIR,
+        persistent: Optional[bool] = None,
+    ):
+        self.sources = list(sources)
+        self.kbstore = KBStore(path, persistent=persistent)
+        self.lock = RWLock()
+        self.metrics = Metrics()
+        self.reloads = 0
+        self._mtimes: Dict[str, float] = {}
+        self._closure: Optional[str] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reload()
+
+    def reload(
+        self, sources: Optional[List[str]] = None, refresh: bool = False
+    ) -> Dict[str, str]:
+        """Sync `sources` (default all) with the store.
+
+        Queries wait while sources are reloaded.
+
+        Returns:
+            Dict mapping each source to "loaded", "reloaded" or
+            "unchanged".
+        """
+        for source in sources or ():
+            if source not in self.sources:
+                raise ValueError(f"not a source of the service: {source}")
+        with self.lock.write():
+            status = self.kbstore.sync(sources or self.sources, refresh)
+            if sources is None:
+                self.kbstore.prune(self.sources)
+            if self.kbstore.version != self._closure:
+                update_closure(self.kbstore)
+                self._closure = self.kbstore.version
+            self.reloads += 1
+        for source in sources or self.sources:
+            if not is_remote(source) and Path(source).exists():
+                self._mtimes[source] = Path(source).stat().st_mtime
+        return status
+
+    def watch(self, interval: float) -> None:
+        """Reload local sources whose files have changed, checking every
+        `interval` seconds in a background thread."""
+
+        def run():
+            while not self._stop.wait(interval):
+                changed = [
+                    source
+                    for source, mtime in self._mtimes.items()
+                    if Path(source).exists()
+                    and Path(source).stat().st_mtime != mtime
+                ]
+                if changed:
+                    self.reload(changed)
+
+        self._watcher = threading.Thread(target=run, daemon=True)
+        self._watcher.start()
+
+    def sparql(self, query: str):
+        """Run a SPARQL query and return the rdflib result.
+
+        Errors parsing or evaluating the query are raised as ValueError.
+        """
+        # pylint: disable=broad-except
+        try:
+            if not self.kbstore.persistent:
+                # rdflib's evaluator would parse the query in this thread
+                query = prepare(query)
+            with self.lock.read():
+                result = self.kbstore.dataset.query(query)
+                if result.type == "SELECT":
+                    result.bindings  # pylint: disable=pointless-statement
+        except Exception as exc:
+            raise ValueError(f"{type(exc).__name__}: {exc}") from exc
+        return result
+
+    def named(self, name: str, **parameters) -> dict:
+        """Run a named query and return the result as SPARQL JSON."""
+        with self.lock.read():
+            rows = registry.run(
+                self.kbstore.dataset,
+                name,
+                version=self.kbstore.version,
+                **parameters,
+            )
+        names = list(registry[name].row._fields)
+        return {
+            "head": {"vars": names},
+            "results": {
+                "bindings": [
+                    {
+                        var: _term_json(value)
+                        for var, value in zip(names, row)
+                        if value is not None
+                    }
+                    for row in rows
+                ]
+            },
+        }
+
+    def health(self) -> dict:
+        """Return the status of the service."""
+        return {
+            "status": "ok",
+            "version": self.kbstore.version,
+            "sources": {
+                source: state.triples
+                for source, state in self.kbstore.manifest.items()
+            },
+            "reloads": self.reloads,
+        }
+
+    def close(self) -> None:
+        """Stop watching and close the store."""
+        self._stop.set()
+        with self.lock.write():
+            self.kbstore.close()
+
+
+class KBRequestHandler(BaseHTTPRequestHandler):
+    """Request handler of `KBServer`."""
+
+    server: "KBServer"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: Union[str, bytes], media_type: str):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", media_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _accept(self, formats: Dict[str, str], default: str) -> str:
+        """Return the media type of `formats` accepted by the client."""
+        accept = self.headers.get("Accept", "")
+        for item in accept.split(","):
+            media_type = item.split(";")[0].strip()
+            if media_type in formats:
+                return media_type
+        return default
+
+    def _handle(self, method: str) -> None:
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        endpoint = parts[0] or "health"
+        start = time.perf_counter()
+        try:
+            status, body, media_type = self._route(method, parts, params)
+        except LookupError as exc:
+            status, body = 404, json.dumps({"error": str(exc)})
+        except ValueError as exc:
+            status, body = 400, json.dumps({"error": str(exc)})
+        except Exception as exc:  # pylint: disable=broad-except
+            error = f"{type(exc).__name__}: {exc}"
+            status, body = 500, json.dumps({"error": error})
+        if status != 200:
+            media_type = "application/json"
+        # Recorded before responding, such that a client sees its own
+        # request in the metrics
+        self.server.service.metrics.observe(
+            endpoint, time.perf_counter() - start, error=status != 200
+        )
+        self._send(status, body, media_type)
+
+    def _route(self, method: str, parts: List[str], params: Dict[str, str]):
+        """Serve a request to the path `parts`.
+
+        Returns:
+            Tuple of (status, body, media type) of the response.
+        """
+        service = self.server.service
+        endpoint = parts[0] or "health"
+        data: Any
+        if endpoint == "sparql":
+            return self._sparql(method, params)
+        if endpoint == "queries" and len(parts) == 1:
+            data = {name: list(registry[name].parameters) for name in registry}
+        elif endpoint == "queries" and len(parts) == 2:
+            if parts[1] not in registry:
+                raise LookupError(f"no query named {parts[1]}")
+            data = service.named(parts[1], **params)
+        elif endpoint == "reload" and method == "POST":
+            source = params.get("source")
+            data = service.reload(
+                [source] if source else None,
+                refresh=params.get("refresh", "") in ("1", "true"),
+            )
+        elif endpoint == "metrics":
+            metrics = service.metrics.render(
+                reloads_total=service.reloads,
+                triples=sum(service.health()["sources"].values()),
+            )
+            return 200, metrics, "text/plain; version=0.0.4"
+        elif endpoint == "health":
+            data = service.health()
+        else:
+            raise LookupError(f"not found: /{'/'.join(parts)}")
+        return 200, json.dumps(data), "application/json"
+
+    def _sparql(self, method: str, params: Dict[str, str]):
+        query = params.get("query")
+        if method == "POST":
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length).decode("utf-8")
+            media_type = self.headers.get("Content-Type", "").split(";")[0]
+            if media_type == "application/sparql-query":
+                query = body
+            else:
+                query = parse_qs(body).get("query", [query])[-1]
+        if not query:
+            raise ValueError("missing query")
+        result = self.server.service.sparql(query)
+        if result.type in ("CONSTRUCT", "DESCRIBE"):
+            media_type = self._accept(GRAPH_FORMATS, "text/turtle")
+            body = result.graph.serialize(format=GRAPH_FORMATS[media_type])
+        else:
+            media_type = self._accept(
+                RESULT_FORMATS, "application/sparql-results+json"
+            )
+            body = result.serialize(format=RESULT_FORMATS[media_type])
+        return 200, body, media_type
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve a GET request."""
+        self._handle("GET")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Serve a POST request."""
+        self._handle("POST")
+
+
+class KBServer(ThreadingHTTPServer):
+    """Threading HTTP server of a `KBService`."""
+
+    daemon_threads = True
+
+    def __init__(self, address, service: KBService, verbose: bool = False):
+        super().__init__(address, KBRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def main() -> None:
+    """Run the service."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Serve the PINK knowledge base over HTTP."
+    )
+    parser.add_argument(
+        "sources",
+        nargs="*",
+        default=SOURCES,
+        help="Urls or files to serve.  Defaults to the sources of "
+        "search_pink_kb.py.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="Reload changed local sources, checking at this interval.",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Log every request."
+    )
+    args = parser.parse_args()
+
+    service = KBService(args.sources, args.store)
+    if args.watch:
+        service.watch(args.watch)
+    server = KBServer((args.host, args.port), service, verbose=args.verbose)
+    print(f"Serving the knowledge base on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,601 @@
+"""
+Persistent on-disk knowledge base for `search_pink_kb.py`.
+
+The ontologies and the generated turtle files are loaded into a
+persistent store, with one named graph per source.  A manifest records
+the sha256 hash of the content each graph was loaded from, so a source
+is only parsed again when its content has changed.  Once the store is
+warm, opening the knowledge base takes milliseconds instead of
+re-parsing EMMO and the other sources on every launch.
+
+Local files are hashed on every open (cheap).  Remote sources are
+downloaded to ``<store>/sources/`` and only re-fetched when they are
+older than `max_age` seconds (or with ``refresh=True``).
+
+The store uses the embedded Oxigraph engine via the optional
+`oxrdflib` package.  Without it, an in-memory rdflib Dataset is used
+and all sources are parsed from the local copies at every start.
+
+`KBStore.export()` streams each source to its own N-Triples or N-Quads
+file (optionally gzipped), skipping sources whose content has not
+changed since the last export.
+
+Usage:
+
+    python scripts/kbstore.py                # load/update the default KB
+    python scripts/kbstore.py --refresh      # also re-fetch remote sources
+    python scripts/kbstore.py --list
+    python scripts/kbstore.py --export export --format nq --gzip
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import re
+import time
+import warnings
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, Dict, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from rdflib import OWL, Dataset, URIRef
+from rdflib.parser import URLInputSource
+from rdflib.plugins.serializers.nt import _nt_row
+from rdflib.util import guess_format
+
+from subclassindex import update_closure
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = Path("kbstore")
+EXPORT_DIR = Path("export")
+
+# Sources of the PINK knowledge base, as loaded by search_pink_kb.py
+SOURCES = [
+    "https://w3id.org/ssbd/",  # Ontology
+    "https://w3id.org/emmo/1.0.3",
+    "pink-agents.ttl",  # agents
+    "googlespreadsheet_resources.ttl",  # All the resources
+    "datamodels.nt",  # datamodels
+]
+
+# Refetch remote sources after one day by default
+MAX_AGE = 24 * 3600
+
+CONTENT_TYPES = {
+    "text/turtle": "turtle",
+    "application/x-turtle": "turtle",
+    "application/rdf+xml": "xml",
+    "application/xml": "xml",
+    "text/xml": "xml",
+    "application/n-triples": "nt",
+    "text/plain": "nt",
+    "text/n3": "n3",
+    "application/ld+json": "json-ld",
+    "application/trig": "trig",
+}
+
+# Oxigraph parsers that load directly into the store
+OX_FORMATS = {
+    "turtle": "ox-turtle",
+    "xml": "ox-xml",
+    "nt": "ox-nt",
+    "n3": "ox-n3",
+    "trig": "ox-trig",
+}
+
+EXTENSIONS = {
+    "turtle": ".ttl",
+    "xml": ".rdf",
+    "nt": ".nt",
+    "n3": ".n3",
+    "json-ld": ".jsonld",
+    "trig": ".trig",
+}
+
+# File extensions of the export formats
+EXPORT_FORMATS = {"nt": ".nt", "nq": ".nq"}
+
+
+@dataclass
+class SourceState:
+    """Manifest entry of a loaded source."""
+
+    graph: str
+    hash: str
+    format: str
+    triples: int
+    loaded: float
+    fetched: float = 0.0
+    path: str = ""
+
+
+def is_remote(source: str) -> bool:
+    """Return true if `source` is an http(s) url."""
+    return source.startswith(("http://", "https://"))
+
+
+def graph_iri(source: str) -> str:
+    """Return the IRI of the named graph holding `source`."""
+    if is_remote(source):
+        return source
+    return Path(source).resolve().as_uri()
+
+
+def _source_of(iri: str) -> str:
+    """Return the source (url or file name) of the graph IRI `iri`."""
+    if iri.startswith("file:"):
+        return url2pathname(urlparse(iri).path)
+    return iri
+
+
+def export_name(source: str) -> str:
+    """Return the base name of the export file of `source`.
+
+    The name is made from the url or file name of the source and a
+    short hash of its graph IRI, such that different sources never
+    share a file.
+    """
+    iri = graph_iri(source)
+    if is_remote(source):
+        name = source.split("://", 1)[1].rstrip("/")
+    else:
+        name = Path(source).stem
+    name = re.sub(r"[^A-Za-z0-9.-]+", "_", name)
+    digest = hashlib.sha256(iri.encode("utf-8")).hexdigest()[:8]
+    return f"{name}-{digest}"
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """Return the sha256 hash of the content of a file."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _open_text(path: Path, compress: bool) -> IO[str]:
+    """Open `path` for writing text, gzip-compressed if `compress`."""
+    if compress:
+        # A moderate level is much faster than the default of 9
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    return open(path, "wt", encoding="utf-8")
+
+
+def has_oxigraph() -> bool:
+    """Return true if the Oxigraph rdflib store is available."""
+    # pylint: disable=import-outside-toplevel,unused-import
+    try:
+        import oxrdflib  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class KBStore:
+    """A persistent dataset with one named graph per source.
+
+    Parameters:
+        path: Directory of the store.
+        max_age: Maximum age in seconds of the local copy of a remote
+            source before it is downloaded again.
+        persistent: Whether to use the persistent Oxigraph store.  The
+            default is to use it if `oxrdflib` is installed.
+
+    Attributes:
+        dataset: The rdflib Dataset.  Its default graph is the union of
+            all named graphs, so queries see all sources.
+        manifest: Dict mapping sources to their `SourceState`.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = STORE_DIR,
+        max_age: float = MAX_AGE,
+        persistent: Optional[bool] = None,
+    ):
+        self.path = Path(path)
+        self.max_age = max_age
+        if persistent is None:
+            persistent = has_oxigraph()
+            if not persistent:
+                warnings.warn(
+                    "oxrdflib is not installed, using an in-memory store. "
+                    "Install oxrdflib for a persistent knowledge base."
+                )
+        self.persistent = persistent
+        (self.path / "sources").mkdir(parents=True, exist_ok=True)
+
+        if persistent:
+            location = self.path / "oxigraph"
+            self.dataset = Dataset(store="Oxigraph")
+            self.dataset.open(str(location), create=not location.exists())
+        else:
+            self.dataset = Dataset()
+        self.dataset.default_union = True
+
+        # Sources loaded by this instance
+        self._loaded: set = set()
+        self.manifest: Dict[str, SourceState] = {}
+        manifest = self._manifest_path()
+        if manifest.exists():
+            with open(manifest, "rt", encoding="utf-8") as f:
+                self.manifest = {
+                    k: SourceState(**v) for k, v in json.load(f).items()
+                }
+
+    def _manifest_path(self) -> Path:
+        # The in-memory store is empty at start, so its loaded graphs
+        # must not be recorded in the manifest of the persistent store
+        name = "manifest.json" if self.persistent else "sources.json"
+        return self.path / name
+
+    def _save_manifest(self) -> None:
+        path = self._manifest_path()
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(
+                {k: asdict(v) for k, v in self.manifest.items()}, f, indent=2
+            )
+        tmp.replace(path)
+
+    @property
+    def version(self) -> str:
+        """Hash identifying the content of all loaded sources."""
+        content = sorted((k, v.hash) for k, v in self.manifest.items())
+        data = json.dumps(content).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def close(self) -> None:
+        """Close the store."""
+        if self.persistent:
+            self.dataset.close()
+
+    def __enter__(self) -> "KBStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _fetch(self, url: str, refresh: bool):
+        """Return (path, format, fetched) of the local copy of `url`."""
+        state = self.manifest.get(url)
+        if (
+            state
+            and not refresh
+            and Path(state.path).exists()
+            and time.time() - state.fetched < self.max_age
+        ):
+            return Path(state.path), state.format, state.fetched
+
+        source = URLInputSource(url)
+        data = source.getByteStream().read()
+        fmt = CONTENT_TYPES.get(source.content_type or "")
+        fmt = fmt or guess_format(source.url) or guess_format(url) or "xml"
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        path = self.path / "sources" / f"{name}{EXTENSIONS.get(fmt, '')}"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        return path, fmt, time.time()
+
+    def _load(self, iri: str, path: Path, fmt: str) -> int:
+        """Replace the named graph `iri` with the content of `path`."""
+        graph = self.dataset.graph(URIRef(iri))
+        self.dataset.remove_graph(graph)
+        graph = self.dataset.graph(URIRef(iri))
+        if self.persistent and fmt in OX_FORMATS:
+            try:
+                graph.parse(str(path), format=OX_FORMATS[fmt], publicID=iri)
+                return len(graph)
+            except Exception:  # pylint: disable=broad-exception-caught
+                # The Oxigraph parsers are stricter than rdflib.  Fall
+                # back to the rdflib parser for the whole source.
+                self.dataset.remove_graph(graph)
+                graph = self.dataset.graph(URIRef(iri))
+        graph.parse(str(path), format=fmt, publicID=iri)
+        return len(graph)
+
+    def sync(
+        self, sources: Iterable[str] = SOURCES, refresh: bool = False
+    ) -> Dict[str, str]:
+        """Make sure that the store holds the current content of `sources`.
+
+        Parameters:
+            sources: Urls or file names of the sources.
+            refresh: Whether to download remote sources regardless of
+                the age of their local copies.
+
+        Returns:
+            Dict mapping each source to "loaded", "reloaded" or
+            "unchanged".
+        """
+        status = {}
+        for source in sources:
+            start = time.perf_counter()
+            if is_remote(source):
+                path, fmt, fetched = self._fetch(source, refresh)
+            else:
+                path, fetched = Path(source), 0.0
+                fmt = guess_format(source) or "turtle"
+            digest = file_hash(path)
+
+            iri = graph_iri(source)
+            state = self.manifest.get(source)
+            if (
+                state
+                and state.hash == digest
+                and state.graph == iri
+                and (self.persistent or source in self._loaded)
+            ):
+                if fetched != state.fetched:
+                    state.fetched = fetched
+                    self._save_manifest()
+                status[source] = "unchanged"
+                continue
+
+            # Forget the old state first, so that an interrupted load
+            # is redone at the next start
+            if self.manifest.pop(source, None):
+                self._save_manifest()
+            ntriples = self._load(iri, path, fmt)
+            self._loaded.add(source)
+            self.manifest[source] = SourceState(
+                graph=iri,
+                hash=digest,
+                format=fmt,
+                triples=ntriples,
+                loaded=time.time(),
+                fetched=fetched,
+                path=str(path),
+            )
+            self._save_manifest()
+            status[source] = "reloaded" if state else "loaded"
+            logger.info(
+                "%s %s: %d triples in %.2f s",
+                status[source],
+                source,
+                ntriples,
+                time.perf_counter() - start,
+            )
+        return status
+
+    def sync_imports(self, source: str, refresh: bool = False) -> List[str]:
+        """Sync `source` and, transitively, the ontologies it imports.
+
+        The ``owl:imports`` of each synced graph are followed, like
+        ontopy's ``get_ontology().load()`` does.  Imports with a
+        ``file:`` IRI are read from the local file.
+
+        Parameters:
+            source: Url or file name of the ontology.
+            refresh: Whether to download remote sources regardless of
+                the age of their local copies.
+
+        Returns:
+            List of the sources of the import closure, starting with
+            `source`.
+        """
+        sources = [source]
+        seen = {graph_iri(source)}
+        for current in sources:
+            self.sync([current], refresh=refresh)
+            graph = self.dataset.graph(URIRef(graph_iri(current)))
+            for imported in sorted(graph.objects(None, OWL.imports)):
+                if isinstance(imported, URIRef) and str(imported) not in seen:
+                    seen.add(str(imported))
+                    sources.append(_source_of(str(imported)))
+        return sources
+
+    def export(
+        self,
+        directory: Union[str, Path] = EXPORT_DIR,
+        fmt: str = "nt",
+        compress: bool = False,
+        sources: Optional[Iterable[str]] = None,
+    ) -> Dict[str, str]:
+        """Write the graph of each source to its own file in `directory`.
+
+        The triples are streamed as N-Triples or N-Quads, so the export
+        needs no more memory than the store.  N-Quads files name the
+        graph of their source, so concatenating them (also gzipped)
+        gives the whole knowledge base as one dataset.  A manifest
+        ``export.json`` records the content hash each file was written
+        from, and sources whose content, format and compression are
+        unchanged are not written again.
+
+        Parameters:
+            directory: Directory of the exported files.
+            fmt: "nt" (N-Triples) or "nq" (N-Quads).
+            compress: Whether to gzip the files.
+            sources: Sources to export.  Defaults to all loaded sources,
+                in which case the files of other sources are removed.
+
+        Returns:
+            Dict mapping each source to "written" or "unchanged".
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(
+                f"export format must be one of {list(EXPORT_FORMATS)}"
+            )
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / "export.json"
+        exported = {}
+        if path.exists():
+            with open(path, "rt", encoding="utf-8") as f:
+                exported = json.load(f)
+
+        def save():
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(exported, f, indent=2)
+            tmp.replace(path)
+
+        if sources is None:
+            sources = list(self.manifest)
+            for source in set(exported) - set(sources):
+                (directory / exported.pop(source)["file"]).unlink(
+                    missing_ok=True
+                )
+                save()
+
+        status = {}
+        for source in sources:
+            if source not in self.manifest:
+                raise ValueError(f"source is not loaded: {source}")
+            state = self.manifest[source]
+            name = export_name(source) + EXPORT_FORMATS[fmt]
+            if compress:
+                name += ".gz"
+            entry = {"file": name, "hash": state.hash}
+            if exported.get(source) == entry and (directory / name).exists():
+                status[source] = "unchanged"
+                continue
+            old = exported.pop(source, None)
+            if old:
+                (directory / old["file"]).unlink(missing_ok=True)
+                save()
+            start = time.perf_counter()
+            ntriples = self._write(directory / name, state.graph, fmt)
+            exported[source] = entry
+            save()
+            status[source] = "written"
+            logger.info(
+                "exported %s: %d triples to %s in %.2f s",
+                source,
+                ntriples,
+                name,
+                time.perf_counter() - start,
+            )
+        return status
+
+    def _write(self, path: Path, iri: str, fmt: str) -> int:
+        """Stream the graph `iri` to `path` and return its size."""
+        graph = self.dataset.graph(URIRef(iri))
+        # N-Quads rows are N-Triples rows with the graph name added
+        end = f" {URIRef(iri).n3()} .\n" if fmt == "nq" else " .\n"
+        tmp = path.with_name(path.name + ".tmp")
+        ntriples = 0
+        with _open_text(tmp, compress=path.suffix == ".gz") as f:
+            for triple in graph:
+                f.write(_nt_row(triple)[:-3] + end)
+                ntriples += 1
+        tmp.replace(path)
+        return ntriples
+
+    def remove(self, source: str) -> None:
+        """Remove the named graph of `source` from the store."""
+        state = self.manifest.pop(source, None)
+        if state:
+            self.dataset.remove_graph(self.dataset.graph(URIRef(state.graph)))
+            self._save_manifest()
+
+    def prune(self, sources: Iterable[str]) -> List[str]:
+        """Remove all sources that are not in `sources`.
+
+        Returns:
+            List of removed sources.
+        """
+        keep = set(sources)
+        removed = [s for s in self.manifest if s not in keep]
+        for source in removed:
+            self.remove(source)
+        return removed
+
+
+def open_kb(
+    sources: Iterable[str] = SOURCES,
+    path: Union[str, Path] = STORE_DIR,
+    refresh: bool = False,
+    max_age: float = MAX_AGE,
+    closure: bool = True,
+):
+    """Open the knowledge base as a tripper rdflib Triplestore.
+
+    The store at `path` is synced with `sources` first, so only new or
+    changed sources are parsed.  If `closure` is true, the transitive
+    closure of ``rdfs:subClassOf`` is materialised as
+    ``pink:subClassOfTransitive`` triples (see `subclassindex.py`).
+
+    Returns:
+        Tuple of (triplestore, kbstore).  Close the kbstore when done.
+    """
+    from tripper import (  # pylint: disable=import-outside-toplevel
+        Triplestore,
+    )
+
+    sources = list(sources)
+    start = time.perf_counter()
+    kbstore = KBStore(path, max_age=max_age)
+    kbstore.sync(sources, refresh=refresh)
+    kbstore.prune(sources)
+    if closure:
+        update_closure(kbstore)
+    logger.info("opened knowledge base in %.2f s", time.perf_counter() - start)
+    # Passing the dataset with `graph=` would make the backend count all
+    # triples in the store, so it is assigned afterwards
+    ts = Triplestore("rdflib")
+    ts.backend.graph = kbstore.dataset
+    for prefix, namespace in ts.namespaces.items():
+        ts.backend.bind(prefix, namespace)
+    return ts, kbstore
+
+
+def main() -> None:
+    """Load or update the persistent knowledge base."""
+    import argparse
+
+    from instrument import setup_logging
+
+    parser = argparse.ArgumentParser(
+        description="Load or update the persistent PINK knowledge base."
+    )
+    parser.add_argument(
+        "sources",
+        nargs="*",
+        default=SOURCES,
+        help="Urls or files to load.  Defaults to the sources of "
+        "search_pink_kb.py.",
+    )
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Download remote sources even if the local copy is recent.",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the loaded sources."
+    )
+    parser.add_argument(
+        "--export",
+        metavar="DIR",
+        help="Export each source to its own file in this directory.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(EXPORT_FORMATS),
+        default="nt",
+        help="Format of the exported files.",
+    )
+    parser.add_argument(
+        "--gzip", action="store_true", help="Gzip the exported files."
+    )
+    args = parser.parse_args()
+    setup_logging()
+
+    with KBStore(args.store) as kbstore:
+        if not args.list:
+            kbstore.sync(args.sources, refresh=args.refresh)
+        for source, state in kbstore.manifest.items():
+            print(f"{source}: {state.triples} triples, {state.hash[:12]}")
+        if args.export:
+            kbstore.export(args.export, fmt=args.format, compress=args.gzip)
+
+
+if __name__ == "__main__":
+    main()
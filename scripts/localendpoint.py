@@ -0,0 +1,315 @@
+"""
+Local stand-in for a SPARQL endpoint, built on rdflib.
+
+Serves a rdflib Dataset over HTTP with the parts of the SPARQL 1.1
+protocol that the PINK scripts use:
+
+- ``/sparql``: SPARQL query (GET with ``?query=`` or POST).
+- ``/update``: SPARQL update (POST).
+- ``/data``: Graph Store Protocol (GET, POST, PUT and DELETE with
+  ``?graph=<iri>`` or ``?default``), using N-Triples.
+
+It is meant for tests and local experiments, not as a production
+triplestore.  Example:
+
+    with LocalEndpoint() as endpoint:
+        uploader = BulkUploader(endpoint.update_url)
+        ...
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from rdflib import Dataset, Graph, URIRef
+from rdflib.graph import DATASET_DEFAULT_GRAPH_ID
+
+
+class EndpointHandler(BaseHTTPRequestHandler):
+    """Request handler serving the dataset of a `LocalEndpoint`."""
+
+    # Keep-alive connections
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Silence the default logging to stderr."""
+
+    def setup(self):
+        super().setup()
+        with self.server.endpoint.lock:
+            self.server.endpoint.connections += 1
+
+    # Helpers
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status: int, body: bytes = b"", ctype="text/plain"):
+        endpoint = self.server.endpoint
+        with endpoint.lock:
+            if endpoint.drop_next > 0:
+                # The request is handled but the response is lost
+                endpoint.drop_next -= 1
+                self.close_connection = True
+                return
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _params(self) -> dict:
+        return parse_qs(urlparse(self.path).query, keep_blank_values=True)
+
+    def _form(self, body: bytes) -> dict:
+        ctype = self.headers.get("Content-Type", "")
+        if ctype.startswith("application/x-www-form-urlencoded"):
+            return parse_qs(body.decode("utf-8"))
+        return {}
+
+    def _target_graph(self) -> Optional[Graph]:
+        params = self._params()
+        dataset = self.server.endpoint.dataset
+        if "graph" in params:
+            return dataset.graph(URIRef(params["graph"][0]))
+        if "default" in params:
+            return dataset.graph(DATASET_DEFAULT_GRAPH_ID)
+        return None
+
+    def _accept(self) -> bool:
+        """Count the request and return false if it should fail."""
+        endpoint = self.server.endpoint
+        with endpoint.lock:
+            endpoint.requests.append((self.command, urlparse(self.path).path))
+            if endpoint.fail_next > 0:
+                endpoint.fail_next -= 1
+                self._reply(503, b"Service unavailable (simulated)")
+                return False
+        return True
+
+    # SPARQL protocol
+    def _query(self, query: str):
+        endpoint = self.server.endpoint
+        try:
+            with endpoint.lock:
+                result = endpoint.dataset.query(query)
+                if result.type in ("CONSTRUCT", "DESCRIBE"):
+                    body = result.serialize(format="nt")
+                    ctype = "application/n-triples"
+                else:
+                    body = result.serialize(format="json")
+                    ctype = "application/sparql-results+json"
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self._reply(400, f"Query failed: {exc}".encode("utf-8"))
+            return
+        self._reply(200, body, ctype)
+
+    def _update(self, update: str):
+        endpoint = self.server.endpoint
+        try:
+            with endpoint.lock:
+                endpoint.dataset.update(update)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self._reply(400, f"Update failed: {exc}".encode("utf-8"))
+            return
+        self._reply(204)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle SPARQL queries and Graph Store GET requests."""
+        if not self._accept():
+            return
+        path = urlparse(self.path).path
+        if path == "/sparql":
+            query = self._params().get("query")
+            if not query:
+                self._reply(400, b"Missing 'query' parameter")
+            else:
+                self._query(query[0])
+        elif path == "/data":
+            graph = self._target_graph()
+            if graph is None:
+                self._reply(400, b"Missing 'graph' or 'default' parameter")
+                return
+            with self.server.endpoint.lock:
+                body = graph.serialize(format="nt", encoding="utf-8")
+            self._reply(200, body, "application/n-triples")
+        else:
+            self._reply(404)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Handle SPARQL queries and updates and Graph Store POST."""
+        body = self._body()
+        if not self._accept():
+            return
+        path = urlparse(self.path).path
+        ctype = self.headers.get("Content-Type", "")
+        form = self._form(body)
+        if path == "/sparql":
+            query = form.get("query", [body.decode("utf-8")])[0]
+            self._query(query)
+        elif path == "/update":
+            update = form.get("update", [body.decode("utf-8")])[0]
+            self._update(update)
+        elif path == "/data":
+            graph = self._target_graph()
+            if graph is None:
+                self._reply(400, b"Missing 'graph' or 'default' parameter")
+                return
+            fmt = "turtle" if "turtle" in ctype else "nt"
+            with self.server.endpoint.lock:
+                graph.parse(data=body.decode("utf-8"), format=fmt)
+            self._reply(204)
+        else:
+            self._reply(404)
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        """Replace a graph (Graph Store Protocol)."""
+        body = self._body()
+        if not self._accept():
+            return
+        graph = self._target_graph()
+        if graph is None or urlparse(self.path).path != "/data":
+            self._reply(400)
+            return
+        ctype = self.headers.get("Content-Type", "")
+        fmt = "turtle" if "turtle" in ctype else "nt"
+        new = Graph().parse(data=body.decode("utf-8"), format=fmt)
+        with self.server.endpoint.lock:
+            graph.remove((None, None, None))
+            for triple in new:
+                graph.add(triple)
+        self._reply(204)
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        """Drop a graph (Graph Store Protocol)."""
+        if not self._accept():
+            return
+        graph = self._target_graph()
+        if graph is None or urlparse(self.path).path != "/data":
+            self._reply(400)
+            return
+        with self.server.endpoint.lock:
+            graph.remove((None, None, None))
+        self._reply(204)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    endpoint: "LocalEndpoint"
+
+
+class LocalEndpoint:
+    """A local SPARQL endpoint serving a rdflib Dataset.
+
+    Parameters:
+        dataset: Dataset to serve.  A new empty dataset by default.
+        host: Interface to bind to.
+        port: Port to listen on.  The default (0) picks a free port.
+        handler: Request handler class.
+
+    Attributes:
+        requests: List of (method, path) for all received requests.
+        connections: Number of accepted TCP connections.
+        fail_next: Number of following requests that should fail with
+            503 (used for testing retries).
+        drop_next: Number of following requests whose connection should
+            be closed after handling them, without a response (used for
+            testing retries on read errors).
+    """
+
+    def __init__(
+        self,
+        dataset: Optional[Dataset] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        handler: type = EndpointHandler,
+    ):
+        self.dataset = dataset if dataset is not None else Dataset()
+        self.lock = threading.RLock()
+        self.requests: list = []
+        self.connections = 0
+        self.fail_next = 0
+        self.drop_next = 0
+        self._server = _Server((host, port), handler)
+        self._server.endpoint = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base url of the endpoint."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    @property
+    def query_url(self) -> str:
+        """Url of the SPARQL query service."""
+        return f"{self.url}/sparql"
+
+    @property
+    def update_url(self) -> str:
+        """Url of the SPARQL update service."""
+        return f"{self.url}/update"
+
+    @property
+    def graph_store_url(self) -> str:
+        """Url of the Graph Store Protocol service."""
+        return f"{self.url}/data"
+
+    def start(self) -> "LocalEndpoint":
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve in the current thread until interrupted."""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "LocalEndpoint":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    """Serve a local endpoint, optionally preloaded with RDF files."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("files", nargs="*", help="RDF files to preload.")
+    parser.add_argument("--port", type=int, default=3030)
+    args = parser.parse_args()
+
+    endpoint = LocalEndpoint(port=args.port)
+    for filename in args.files:
+        name = URIRef(Path(filename).resolve().as_uri())
+        endpoint.dataset.graph(name).parse(filename)
+    urls = {
+        "query": endpoint.query_url,
+        "update": endpoint.update_url,
+        "data": endpoint.graph_store_url,
+    }
+    print(json.dumps(urls, indent=2))
+    try:
+        endpoint.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
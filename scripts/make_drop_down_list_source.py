@@ -1,32 +1,87 @@
 """
 This script is used to generate a csv file that can be used as the source for the drop down lists in the annotation tool. It reads the ontology and extracts the relevant classes and their labels to create a hierarchy of level 1, level 2, and level 3 classes. The resulting csv file has three columns: level1, level2, and level3, which can be used to populate the drop down lists in the annotation tool.
-"""
-from ontopy import get_ontology
-import csv
 
-level1 = ['Functionality Assessment', 'Safety Assessment', 'Environmental Sustainability Assessment', 'Social Sustainability Assessment', 'Economic Sustainability Assessment']
+The subclass tree is read once from the ontology in the KB store (see
+`kbstore.py` and `hierarchy.py`).  Other roots, depths and formats
+(csv, json or a nested json tree) can be given on the command line,
+e.g.
 
-onto = get_ontology('https://w3id.org/ssbd/').load()
+    python scripts/make_drop_down_list_source.py --depth 4 \\
+        --format tree --output assessment_hierarchy.json
 
-d = []
+Like ontopy's ``get_ontology().load()``, the ontologies imported by the
+ontology (``owl:imports``, transitively) are synced too, and the
+hierarchy is read from all of them.
+
+The output is only regenerated when the content of the ontology, of its
+imports or the options have changed.
+"""
+import argparse
+import hashlib
+import json
+import logging
+from pathlib import Path
 
-for l in level1:
-    level2 = onto[l].subclasses()
-    for k in level2:
-        k_name = k.altLabel.en[0]
-        level3 = list(m.altLabel.en[0]  for m in onto.get_descendants(k))
-        if len(level3) > 0:
-            for n in level3:
-                d.append([l, k_name, n])
-        else:
-            d.append([l, k_name, ""])
-        
+from rdflib import URIRef
+from rdflib.graph import ReadOnlyGraphAggregate
 
+from hierarchy import FORMATS, Hierarchy
+from instrument import setup_logging
+from kbstore import STORE_DIR, KBStore, graph_iri
+
+logger = logging.getLogger(__name__)
+
+level1 = ['Functionality Assessment', 'Safety Assessment', 'Environmental Sustainability Assessment', 'Social Sustainability Assessment', 'Economic Sustainability Assessment']
 
-with open("assessment_hierarchy.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["level1", "level2", "level3"])
-    writer.writerows(d)
+parser = argparse.ArgumentParser(
+    description="Generate the source of the drop-down lists."
+)
+parser.add_argument(
+    "roots",
+    nargs="*",
+    default=level1,
+    help="Labels or IRIs of the level 1 classes.",
+)
+parser.add_argument("--ontology", default="https://w3id.org/ssbd/")
+parser.add_argument("--depth", type=int, default=3)
+parser.add_argument("--format", choices=FORMATS)
+parser.add_argument("--output", default="assessment_hierarchy.csv")
+parser.add_argument("--store", default=str(STORE_DIR))
+parser.add_argument(
+    "--force", action="store_true", help="Regenerate the output anyway."
+)
+args = parser.parse_args()
+setup_logging()
 
-print("Wrote assessment_hierarchy.csv")
+with KBStore(args.store) as kbstore:
+    sources = kbstore.sync_imports(args.ontology)
+    options = [
+        [kbstore.manifest[source].hash for source in sources],
+        args.roots,
+        args.depth,
+        args.format,
+    ]
+    key = hashlib.sha256(json.dumps(options).encode("utf-8")).hexdigest()
 
+    # Keys of the generated outputs
+    path = Path(args.store) / "hierarchy.json"
+    keys = {}
+    if path.exists():
+        with open(path, "rt", encoding="utf-8") as f:
+            keys = json.load(f)
+    output = str(Path(args.output).resolve())
+    if not args.force and keys.get(output) == key and Path(output).exists():
+        logger.info("%s is up to date", args.output)
+    else:
+        graph = ReadOnlyGraphAggregate(
+            [
+                kbstore.dataset.graph(URIRef(graph_iri(source)))
+                for source in sources
+            ]
+        )
+        hierarchy = Hierarchy(graph)
+        hierarchy.write(args.output, args.roots, args.depth, args.format)
+        keys[output] = key
+        with open(path, "wt", encoding="utf-8") as f:
+            json.dump(keys, f, indent=2)
+        logger.info("wrote %s", args.output)
@@ -1,15 +1,19 @@
 """
 Script used to parse the google spreadsheet used by the
 model and dataset providers for documenting the PINK agents.
+
+The time, memory and counts of each stage are added to metrics.json
+(see instrument.py).
 """
 
-import json
+import logging
 import re
 import sys
 from pathlib import Path
 
 import pandas as pd
 from ontopy import get_ontology
+from rdflib import SH
 from tripper import Triplestore
 from tripper.datadoc import (
     get_context,
@@ -20,16 +24,29 @@ from tripper.datadoc.tabledoc import TableDoc
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 # pylint: disable=wrong-import-position,import-error
+from validation.documentloader import cached_path
 from validation.validate import load_shapes, shacl_validate
 
 from parseutils import (
     correct_pink_dataframes,
     PREFIXES,
 )
+from jsonldwriter import write_jsonld
+from instrument import count, setup_logging, span, write_metrics
+
+setup_logging()
+logger = logging.getLogger("agents")
+
+# Output mode of jsonld/pink-agents.jsonld: "indent", "compact" or
+# "ndjson" (see jsonldwriter.py)
+JSONLD_MODE = "indent"
 
 # import the pink ontology for accessing labels and
 # convert to IRIs (just before storing into the triplestore)
-onto = get_ontology("https://ssbd-ontology.github.io/core/core-inferred.ttl").load()
+with span("download"):
+    onto = get_ontology(
+        "https://ssbd-ontology.github.io/core/core-inferred.ttl"
+    ).load()
 
 ts = Triplestore('rdflib')
 
@@ -38,7 +55,9 @@ AGENTS_URL = (
     "1o1buVRFL5wIrFxGDG6Oo7EDnA7dgxxoZRpa2JpwX0BU/export?format=csv&"
     "gid=1445327120"
 )
-agents = pd.read_csv(AGENTS_URL)
+with span("download") as s:
+    agents = pd.read_csv(AGENTS_URL)
+    s.count("rows", len(agents))
 
 # Get pink keywords
 #kw = get_keywords(theme=None)
@@ -48,60 +67,66 @@ agents = pd.read_csv(AGENTS_URL)
 #    redefine="allow",
 #)
 
-context = get_context(
-    "https://w3id.org/ssbd/context/", theme=None
-)
+with span("download"):
+    context = get_context(
+        cached_path("https://w3id.org/ssbd/context/"), theme=None
+    )
 
 # Agents
-print("PREPARING AGENT DOCUMENTATION")
+logger.info("PREPARING AGENT DOCUMENTATION")
 agents["@type"] = [["prov:Agent"]] * len(agents)
 agents = agents.drop(columns=["e-mail", "affiliation.name", "affiliation.id"])
 #agents = agents[~agents["identifier"].isin(ts.subjects())]
 
 agents_corrected = correct_pink_dataframes(agents, onto)
 agents_corrected.to_csv("agents_clean.csv", index=False)
-agentdocumentation = TableDoc.parse_csv(
-    "agents_clean.csv",
-    #keywords=kw,
-    context=context,
-    prefixes=PREFIXES,
-)
-
-ad = agentdocumentation.save(ts)
+with span("tabledoc", tables=1):
+    agentdocumentation = TableDoc.parse_csv(
+        "agents_clean.csv",
+        #keywords=kw,
+        context=context,
+        prefixes=PREFIXES,
+    )
+
+with span("store") as s:
+    ad = agentdocumentation.save(ts)
+    s.count("triples", len(ts.backend.graph))
 
 # Get absolute current path
 root_path = Path(__file__).parent.parent.resolve()
 validation_path = root_path / "validation"
-shacl_graph = load_shapes("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes.ttl")
-shacl_graph.parse("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes-ssbd.ttl", format="turtle")
-
-
-conforms, results_graph, report = shacl_validate(
-    data_graph=ts.backend.graph,
-    shacl_graph=shacl_graph,
-    inference="rdfs",
-    abort_on_first=False,
+with span("download"):
+    shacl_graph = load_shapes("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes.ttl")
+    shacl_graph.parse("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes-ssbd.ttl", format="turtle")
+
+
+with span("validate", triples=len(ts.backend.graph)):
+    conforms, results_graph, report = shacl_validate(
+        data_graph=ts.backend.graph,
+        shacl_graph=shacl_graph,
+        inference="rdfs",
+        abort_on_first=False,
+    )
+count(
+    "violations",
+    len(set(results_graph.subjects(SH.resultSeverity, SH.Violation))),
 )
 
 
 if not conforms:
-    print("Validation failed.")
-    print(report)
+    logger.error("Validation failed.\n%s", report)
 
 if conforms:
-    print("Validation passed")
-    print("unfortunately direct pushing is no longer possible")
-    print("making a jsonld from my graph")
-    ts.serialize("pink-agents.ttl", format="turtle")
-    
-    graph = dict()
-
-    graph['@context'] = ad['@context']
-    graph['@graph'] = ad['@graph']
-
-    # Store the jsonlds for joh
-    with open('jsonld/pink-agents.jsonld', 'wt') as f: 
-        json.dump(graph, f, indent=2)
+    logger.info("Validation passed")
+    logger.info("unfortunately direct pushing is no longer possible")
+    logger.info("making a jsonld from my graph")
+    with span("serialize", triples=len(ts.backend.graph)):
+        ts.serialize("pink-agents.ttl", format="turtle")
+
+        # Store the jsonlds for joh (see JSONLD_MODE)
+        write_jsonld("jsonld/pink-agents.jsonld", ad, mode=JSONLD_MODE)
+
+write_metrics("agents")
 
 
 
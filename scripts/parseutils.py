@@ -1,23 +1,26 @@
 """
 Utility functions for parsing and correcting the dataframes from the spreadsheet.
+
+Importing this module is cheap: pandas, dateutil and ontopy are imported
+by the functions that need them, and the term definitions spreadsheet
+is downloaded at the first access to `list_columns` or
+`property_iri_dict`.  The helpers for single values (like `add_prefix`
+and `convert_to_iri`) do not import pandas.
 """
 
+import functools
+import logging
+import math
 import re
 import sys
-from pathlib import Path
-
-import dateutil
-import pandas as pd
-from ontopy.exceptions import NoSuchLabelError
-from tripper.datadoc import (
-    get_context,
-    get_keywords,
-)
+from typing import TYPE_CHECKING, Any, Dict
 
-sys.path.append(str(Path(__file__).resolve().parents[1]))
+from instrument import cache, count, span, timed
 
-# pylint: disable=wrong-import-position,import-error
-from validation.validate import load_shapes, shacl_validate
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
 
 
 TERMDEF_URL = (
@@ -42,31 +45,65 @@ PREFIXES: dict[str, str] = {
 }
 
 
-def _load_termdefs() -> pd.DataFrame:
+def _load_termdefs() -> "pd.DataFrame":
     """Read the fixed term definitions spreadsheet."""
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
     return pd.read_csv(TERMDEF_URL, skiprows=2)
 
 
-_TERMDEFS = _load_termdefs()
+@functools.lru_cache(maxsize=None)
+def _termdefs() -> dict:
+    """Return the attributes derived from the term definitions.
 
-list_columns: list[str] = [
-    *_TERMDEFS.loc[_TERMDEFS["SingleValue"] == False, "Tripper_keyword"].tolist(),
-    "@id",
-    "@type",
-]
+    The spreadsheet is downloaded at the first call.
+    """
+    with span("download"):
+        termdefs = _load_termdefs()
+    single = termdefs["SingleValue"] == False  # noqa: E712
+    return {
+        "_TERMDEFS": termdefs,
+        "list_columns": [
+            *termdefs.loc[single, "Tripper_keyword"].tolist(),
+            "@id",
+            "@type",
+        ],
+        "property_iri_dict": {
+            prop: iri
+            for prop, iri in zip(
+                termdefs["Property"], termdefs["Tripper_keyword"]
+            )
+        },
+    }
 
-property_iri_dict: dict[str, str] = {
-    prop: iri
-    for prop, iri in zip(_TERMDEFS["Property"], _TERMDEFS["Tripper_keyword"])
-}
 
+def __getattr__(name):
+    """Return the term definition attributes `list_columns`,
+    `property_iri_dict` and `_TERMDEFS`, loading them at first access."""
+    if name in ("_TERMDEFS", "list_columns", "property_iri_dict"):
+        return _termdefs()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _isna(value) -> bool:
+    """Return whether the scalar `value` is missing, like `pd.isna()`.
+
+    Pandas is only asked about values that are not None or float, and
+    only if it is already imported (a pandas value implies that it is).
+    """
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    pd = sys.modules.get("pandas")
+    return pd is not None and pd.isna(value) is True
 
 
 def convert_to_iri(value, prefixes=PREFIXES):
     """
     Convert a value to an IRI if it starts with a known prefix.
     If the value is empty or NaN, return it as is."""
-    if pd.isna(value) or str(value).strip() == "":
+    if _isna(value) or str(value).strip() == "":
         return value  # Return as is if empty or NaN
     value = str(value).strip()
     for prefix, iri in prefixes.items():
@@ -80,7 +117,7 @@ def add_prefix(value, prefix="pink"):
     """
     if isinstance(value, list):
         return [add_prefix(v, prefix) for v in value]
-    if pd.isna(value) or str(value).strip() == "":
+    if _isna(value) or str(value).strip() == "":
         return value  # Return as is if empty or NaN
     value = str(value).strip()
     if (
@@ -100,7 +137,7 @@ def remove_extra_text(value):
     as some curators desired explanations on the tier level, 
     which should be removed.
     """
-    if pd.isna(value) or str(value).strip() == "":
+    if _isna(value) or str(value).strip() == "":
         return value  # Return as is if empty or NaN
     return value.strip().split(" ")[0]
 
@@ -121,7 +158,7 @@ def merge_columns(row, class_cols, prefix=None):
         if isinstance(cell, list):
             parts = cell
 
-        elif pd.isna(cell):
+        elif _isna(cell):
             continue
         else:
             parts = str(cell).split(",")
@@ -144,7 +181,7 @@ def split_to_list(value):
     """
     if not isinstance(value, str):
         return value  # Return as is if not a string
-    if pd.isna(value) or str(value).strip() == "":
+    if _isna(value) or str(value).strip() == "":
         return None  # Return None if empty or NaN
     # Split on comma, semicolon, pipe, or space
     parts = re.split(r"[,\s;|]+", value)
@@ -153,12 +190,18 @@ def split_to_list(value):
     return cleaned
 
 
-def expand_df(df: pd.DataFrame) -> pd.DataFrame:
+@timed("expand", rows=len)
+def expand_df(df: "pd.DataFrame") -> "pd.DataFrame":
     """
     Expand the dataframe: Any column whose values are lists
     will be expanded into multiple columns (all using the same header),
     with blanks where the lists were shorter.
+
+    The rows keep their index.
     """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    index = df.index
     # reindex
     df = df.reset_index(drop=True)
 
@@ -166,7 +209,7 @@ def expand_df(df: pd.DataFrame) -> pd.DataFrame:
     for col in df.columns:
         is_list_col = df[col].apply(lambda v: isinstance(v, list)).any()
         if is_list_col:
-            print('column', col, 'is a list column')
+            logger.debug("column %s is a list column", col)
             sub = pd.DataFrame(
                 df[col]
                 .apply(lambda v: v if isinstance(v, list) and v else [None])
@@ -178,6 +221,7 @@ def expand_df(df: pd.DataFrame) -> pd.DataFrame:
             parts.append(df[[col]])
 
     out = pd.concat(parts, axis=1)
+    out.index = index
     # clean the output (not the original df)
     out = out.map(lambda x: x.strip() if isinstance(x, str) else x)
     out = out.replace(r"^\s*$", "", regex=True).fillna("")
@@ -185,16 +229,31 @@ def expand_df(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def check_for_uris(df: pd.DataFrame, ontology) -> pd.DataFrame:
+def check_for_uris(df: "pd.DataFrame", ontology) -> "pd.DataFrame":
     """
     Check all values in the dataframe.
     If they are a URI (starting with http://, https://, or prefix:),
     check that they exist in the ontology. If so, replace with the IRI.
+
+    Each distinct value is only looked up once.
     """
+    # pylint: disable=import-outside-toplevel
+    from ontopy.exceptions import NoSuchLabelError
+
+    processed: Dict[str, Any] = {}
+    hits = 0
 
     def process_value(val):
+        nonlocal hits
         if not isinstance(val, str):
             return val
+        if val in processed:
+            hits += 1
+            return processed[val]
+        processed[val] = result = lookup(val)
+        return result
+
+    def lookup(val):
 
         # Detect URI-like values
         if (
@@ -210,30 +269,73 @@ def check_for_uris(df: pd.DataFrame, ontology) -> pd.DataFrame:
                 lookup_val = val.split(":", 1)[1]
             try:
                 term = ontology[lookup_val]
-                print(f"Replacing {val} with IRI: {term.iri}")
+                logger.debug("Replacing %s with IRI: %s", val, term.iri)
+                count("iris_replaced")
                 return term.iri
             except NoSuchLabelError:
                 # If there is a space in the value return None,
                 # As areal uri cannot have spaces
                 if " " in val:
-                    print(
-                        f"Value '{val}' looks like a URI but contains spaces. Smart to check this."
+                    logger.warning(
+                        "Value '%s' looks like a URI but contains spaces. "
+                        "Smart to check this.",
+                        val,
                     )
+                    count("uris_with_spaces")
                 return val
         return val
 
-    df = df.map(process_value)
+    with span("uricheck", cells=df.size):
+        df = df.map(process_value)
+    cache("uricheck", hits=hits, misses=len(processed))
     return df
 
 
-def correct_pink_dataframes(df, ontology):
+def reject_rows(df: "pd.DataFrame", validator) -> "pd.DataFrame":
+    """Drop the rows of an expanded dataframe that cannot pass the
+    SHACL validation.
+
+    The reasons are logged as warnings and the rows are counted as
+    "rows_rejected".
+
+    Parameters:
+        df: Expanded dataframe (see `expand_df()`).
+        validator: A `validation.frames.FrameValidator`.
+
+    Returns:
+        The rows that passed the checks.
+    """
+    with span("prevalidate", rows=len(df)):
+        reasons = validator.check(df)
+    rejected = reasons != ""
+    if rejected.any():
+        ids = df.loc[:, df.columns == "@id"].iloc[:, 0]
+        for index in reasons.index[rejected]:
+            logger.warning(
+                "Rejected row %s (%s): %s", index, ids[index], reasons[index]
+            )
+        count("rows_rejected", int(rejected.sum()))
+    return df[~rejected]
+
+
+@timed("correct", rows=len)
+def correct_pink_dataframes(df, ontology, validator=None):
     """
     Correct the pink dataframes by:
     - Adding prefixes to values in certain columns
     - Merging class columns into a single column
     - Splitting columns with multiple values into lists
     - Checking for URIs and replacing with IRIs from the ontology
+    - Rejecting the rows that cannot pass the SHACL validation, if a
+      `validator` (a `validation.frames.FrameValidator`) is given
+
+    The rows keep the index of `df`.
     """
+    # pylint: disable=import-outside-toplevel
+    import pandas as pd
+    from dateutil import parser
+
+    termdefs = _termdefs()
     # Remove columns that have nan as header (these are from empty columns in the spreadsheet)
     df = df.loc[:, ~df.columns.isna()]
     # Remove all columns starting with 'Datum' (these go into the datamodel)
@@ -246,14 +348,14 @@ def correct_pink_dataframes(df, ontology):
     # These are for the curators filling out the spreadsheet and should
     # be looked at with them.
     df = df.drop(columns=[col for col in df.columns if "(comment)" in col])
-    df.rename(columns=property_iri_dict, inplace=True)
+    df.rename(columns=termdefs["property_iri_dict"], inplace=True)
     #  remove rows with empty @id
     df.dropna(subset=["@id"], inplace=True)
     # Convert releaseDate to ISO format (YYYY-MM-DD)
     if "releaseDate" in df.columns:
         df["releaseDate"] = df["releaseDate"].apply(
             lambda x: (
-                dateutil.parser.parse(x).isoformat() if pd.notna(x) else None
+                parser.parse(x).isoformat() if pd.notna(x) else None
             )
         )
 
@@ -273,10 +375,12 @@ def correct_pink_dataframes(df, ontology):
 
     # Change possible lists to lists
     #print("columns", df.columns)
-    for col in set(list_columns).intersection(df.columns):
-        print(col)
+    for col in set(termdefs["list_columns"]).intersection(df.columns):
+        logger.debug("splitting list column %s", col)
         df[col] = df[col].apply(split_to_list)
     expanded_df = expand_df(df)
     expanded_df = check_for_uris(expanded_df, ontology)
+    if validator is not None:
+        expanded_df = reject_rows(expanded_df, validator)
 
     return expanded_df
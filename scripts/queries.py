@@ -0,0 +1,466 @@
+"""
+SPARQL queries of `search_pink_kb.py`.
+
+The queries use the materialised ``pink:subClassOfTransitive`` closure
+(see `subclassindex.py`) instead of ``rdfs:subClassOf+`` property
+paths.  Use `with_property_paths()` to run them against a store without
+the closure, e.g. a remote GraphDB repository.  QUERY4 keeps the
+property path: Oxigraph evaluates it from the fixed ``ssbd:Assessment``
+end, which is faster than scanning the closure (0.0035 s vs 0.0047 s
+with ``benchmarks/bench_subclass.py`` at scale 1).
+
+QUERY5 and QUERY_ALL take the parameters ``?activity`` and
+``?targetProperty``, respectively, which are bound when the query is
+run instead of being formatted into the query text.  Parameters must be
+projected (Oxigraph only substitutes projected variables).
+
+All queries are registered in `registry`, which prepares each query
+once and caches the results per knowledge base version:
+
+    rows = registry.run(
+        kbstore.dataset,
+        "query_all",
+        version=kbstore.version,
+        targetProperty="http://semanticscience.org/resource/CHEMINF_000085",
+    )
+    for row in rows:
+        print(row.software)
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+from rdflib import Graph, URIRef
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.sparql import Query
+from rdflib.term import Node
+
+QUERY1 = """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX pink: <https://pink-project.eu/>
+PREFIX cheminf: <http://semanticscience.org/resource/>
+
+SELECT DISTINCT ?subclass ?label
+WHERE {
+  ?subclass pink:subClassOfTransitive cheminf:CHEMINF_000018 .
+  OPTIONAL { ?subclass rdfs:label ?label }
+}
+ORDER BY ?label
+"""
+
+QUERY2 = """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX pink: <https://pink-project.eu/>
+PREFIX cheminf: <http://semanticscience.org/resource/>
+
+SELECT DISTINCT ?subclass ?label
+WHERE {
+  ?subclass pink:subClassOfTransitive cheminf:CHEMINF_000085 .
+  OPTIONAL { ?subclass rdfs:label ?label }
+}
+ORDER BY ?label
+"""
+
+QUERY3 = """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX pink: <https://pink-project.eu/>
+PREFIX owl:  <http://www.w3.org/2002/07/owl#>
+PREFIX emmo: <https://w3id.org/emmo#>
+PREFIX datasettype: <https://pink-project.eu/datasettype/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+PREFIX dcterms: <http://purl.org/dc/terms/>
+PREFIX ssbd: <https://w3id.org/ssbd/>
+
+SELECT DISTINCT ?datasetType ?label ?prefLabel ?description ?cardinality ?restrictionType
+WHERE {
+  ?datasetType pink:subClassOfTransitive ssbd:Dataset .
+
+  ?datasetType rdfs:subClassOf ?restriction .
+
+  ?restriction a owl:Restriction ;
+               owl:onProperty emmo:EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e .
+
+  {
+    # Pattern 1: qualified restriction
+    ?restriction owl:onClass <https://pink-project.eu/datasettype/SMILES#SMILES> .
+    OPTIONAL { ?restriction owl:qualifiedCardinality ?cardinality . }
+    BIND(owl:onClass AS ?restrictionType)
+  }
+  UNION
+  {
+    # Pattern 2: standard OWL restrictions
+    ?restriction ?restrictionType <https://pink-project.eu/datasettype/SMILES#SMILES> .
+    VALUES ?restrictionType {
+      owl:someValuesFrom
+      owl:allValuesFrom
+      owl:hasValue
+    }
+  }
+
+  OPTIONAL { ?datasetType rdfs:label ?label . }
+  OPTIONAL { ?datasetType skos:prefLabel ?prefLabel . }
+  OPTIONAL { ?datasetType dcterms:description ?description . }
+}
+ORDER BY ?prefLabel ?label ?datasetType
+"""
+
+QUERY4 = """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX pink: <https://pink-project.eu/>
+PREFIX owl:  <http://www.w3.org/2002/07/owl#>
+PREFIX datasettype: <https://pink-project.eu/datasettype/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+PREFIX dcterms: <http://purl.org/dc/terms/>
+PREFIX ssbd: <https://w3id.org/ssbd/>
+
+SELECT DISTINCT
+  ?assessment
+  (COALESCE(?prefLabel, ?label, ?title, STR(?assessment)) AS ?name)
+  (COALESCE(?description, "") AS ?descriptionText)
+  ?restrictionType
+WHERE {
+  ?assessment rdfs:subClassOf+ ssbd:Assessment .
+
+  ?assessment rdfs:subClassOf ?restriction .
+
+  ?restriction a owl:Restriction ;
+               owl:onProperty ssbd:hasInput .
+
+  {
+    ?restriction owl:onClass datasettype:SMILES .
+    BIND(owl:onClass AS ?restrictionType)
+  }
+  UNION
+  {
+    ?restriction ?restrictionType datasettype:SMILES .
+    VALUES ?restrictionType {
+      owl:someValuesFrom
+      owl:allValuesFrom
+      owl:hasValue
+    }
+  }
+
+  OPTIONAL { ?assessment rdfs:label ?label . }
+  OPTIONAL { ?assessment skos:prefLabel ?prefLabel . }
+  OPTIONAL { ?assessment dcterms:title ?title . }
+  OPTIONAL { ?assessment dcterms:description ?description . }
+}
+ORDER BY ?name ?assessment
+"""
+
+QUERY5 = """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX owl:  <http://www.w3.org/2002/07/owl#>
+PREFIX ssbd: <https://w3id.org/ssbd/>
+PREFIX dcterms: <http://purl.org/dc/terms/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+
+SELECT DISTINCT
+  ?activity
+  ?software
+  (COALESCE(?softwarePrefLabel, ?softwareLabel, ?softwareTitle, STR(?software)) AS ?softwareName)
+WHERE {
+  ?activity rdfs:subClassOf ?restriction .
+
+  ?restriction a owl:Restriction ;
+               owl:onProperty ssbd:hasSoftware ;
+               owl:hasValue ?software .
+
+  OPTIONAL { ?software skos:prefLabel ?softwarePrefLabel . }
+  OPTIONAL { ?software rdfs:label ?softwareLabel . }
+  OPTIONAL { ?software dcterms:title ?softwareTitle . }
+}
+ORDER BY ?softwareName
+"""
+
+QUERY_ALL = """
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+PREFIX pink: <https://pink-project.eu/>
+PREFIX owl:  <http://www.w3.org/2002/07/owl#>
+PREFIX emmo: <https://w3id.org/emmo#>
+PREFIX datasettype: <https://pink-project.eu/datasettype/>
+PREFIX cheminf: <http://semanticscience.org/resource/>
+PREFIX ssbd: <https://w3id.org/ssbd/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+PREFIX dcterms: <http://purl.org/dc/terms/>
+
+SELECT DISTINCT ?targetProperty ?software
+
+WHERE {
+  # 1. Find subclasses of the requested CHEMINF property
+  ?propertyClass pink:subClassOfTransitive ?targetProperty .
+
+  # 2. Find dataset types that have this property class as datum
+  # Are not considering datamoedels with uri neq to datasettype
+  ?datasetType pink:subClassOfTransitive ssbd:Dataset ;
+               rdfs:subClassOf ?datasetRestriction .
+
+  ?datasetRestriction a owl:Restriction ;
+                      owl:onProperty emmo:EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e .
+
+  {
+    ?datasetRestriction owl:onClass ?propertyClass .
+  }
+  UNION
+  {
+    ?datasetRestriction ?datasetRestrictionType ?propertyClass .
+    VALUES ?datasetRestrictionType {
+      owl:someValuesFrom
+      owl:allValuesFrom
+      owl:hasValue
+    }
+  }
+
+  # 3. Find assessments/activities that have this dataset type as input
+  ?assessment pink:subClassOfTransitive ssbd:Assessment ;
+              rdfs:subClassOf ?inputRestriction .
+
+  ?inputRestriction a owl:Restriction ;
+                    owl:onProperty ssbd:hasInput .
+
+  {
+    ?inputRestriction owl:onClass ?datasetType .
+  }
+  UNION
+  {
+    ?inputRestriction ?inputRestrictionType ?datasetType .
+    VALUES ?inputRestrictionType {
+      owl:someValuesFrom
+      owl:allValuesFrom
+      owl:hasValue
+    }
+  }
+
+  # 4. Find software used by those assessments/activities
+  ?assessment rdfs:subClassOf ?softwareRestriction .
+
+  ?softwareRestriction a owl:Restriction ;
+                       owl:onProperty ssbd:hasSoftware ;
+                       owl:hasValue ?software .
+
+  OPTIONAL { ?propertyClass rdfs:label ?propertyLabel . }
+
+  OPTIONAL { ?datasetType rdfs:label ?datasetLabel . }
+  OPTIONAL { ?datasetType skos:prefLabel ?datasetPrefLabel . }
+
+  OPTIONAL { ?assessment rdfs:label ?assessmentLabel . }
+  OPTIONAL { ?assessment skos:prefLabel ?assessmentPrefLabel . }
+  OPTIONAL { ?assessment dcterms:title ?assessmentTitle . }
+
+  OPTIONAL { ?software rdfs:label ?softwareLabel . }
+  OPTIONAL { ?software skos:prefLabel ?softwarePrefLabel . }
+  OPTIONAL { ?software dcterms:title ?softwareTitle . }
+}
+ORDER BY ?softwareName ?assessmentName ?datasetName ?propertyName
+"""
+
+
+def with_property_paths(query: str) -> str:
+    """Return `query` with ``rdfs:subClassOf+`` property paths.
+
+    Replaces ``pink:subClassOfTransitive`` with the equivalent (but
+    slower) property path.
+    """
+    return query.replace("pink:subClassOfTransitive", "rdfs:subClassOf+")
+
+
+# Whether the store types evaluate SPARQL themselves (e.g. Oxigraph)
+_NATIVE: Dict[type, bool] = {}
+
+# The SPARQL parser of rdflib (pyparsing) is not thread-safe
+_PARSE_LOCK = threading.Lock()
+
+
+def prepare(text: str) -> Query:
+    """Prepare the SPARQL query `text`.  Safe to call from threads."""
+    with _PARSE_LOCK:
+        return prepareQuery(text)
+
+
+def _native(graph: Graph) -> bool:
+    """Return whether the store of `graph` has its own query engine.
+
+    Such stores (like Oxigraph) take the query text, while rdflib's own
+    evaluator takes the prepared query.
+    """
+    store_type = type(graph.store)
+    if store_type not in _NATIVE:
+        try:
+            graph.store.query("ASK {}", {}, {}, "__UNION__")
+            _NATIVE[store_type] = True
+        except NotImplementedError:
+            _NATIVE[store_type] = False
+    return _NATIVE[store_type]
+
+
+class NamedQuery:
+    """A registered SPARQL query.
+
+    Parameters:
+        name: Name of the query.
+        text: The SPARQL query.
+        parameters: Names of the variables that must be bound when the
+            query is run.
+
+    """
+
+    def __init__(self, name: str, text: str, parameters: Sequence[str] = ()):
+        self.name = name
+        self.text = text
+        self.parameters = tuple(parameters)
+        self._row: Any = None
+        self._prepared: Optional[Query] = None
+
+    @property
+    def prepared(self) -> Query:
+        """The parsed and algebrized query, prepared on first use."""
+        if self._prepared is None:
+            return self._prepare()
+        return self._prepared
+
+    @property
+    def row(self) -> Any:
+        """Named tuple type of the result rows.
+
+        Created from the projected variables when the query is prepared.
+        """
+        if self._row is None:
+            self._prepare()
+        return self._row
+
+    def _prepare(self) -> Query:
+        prepared = prepare(self.text)
+        names = [str(v) for v in prepared.algebra["PV"]]
+        unprojected = set(self.parameters) - set(names)
+        if unprojected:
+            raise ValueError(
+                f"parameters of query {self.name} are not projected: "
+                f"{sorted(unprojected)}"
+            )
+        # The name and fields of the row type are only known at run time
+        row = namedtuple(  # type: ignore[misc]
+            f"{self.name.title()}Row", names
+        )
+        self._prepared, self._row = prepared, row
+        return prepared
+
+    def bindings(self, **values) -> Dict[str, Node]:
+        """Return the initial bindings for the parameter `values`.
+
+        Strings are taken to be IRIs.
+        """
+        missing = set(self.parameters) - set(values)
+        unknown = set(values) - set(self.parameters)
+        if missing or unknown:
+            raise ValueError(
+                f"query {self.name} takes the parameters {self.parameters}"
+                f", got {tuple(values)}"
+            )
+        return {
+            name: value if isinstance(value, Node) else URIRef(value)
+            for name, value in values.items()
+        }
+
+    def execute(self, graph: Graph, **values) -> List[tuple]:
+        """Run the query on `graph` and return the rows as `row` tuples."""
+        prepared = self.prepared
+        bindings = self.bindings(**values)
+        query = self.text if _native(graph) else prepared
+        result = graph.query(query, initBindings=bindings)
+        return [self.row(*row) for row in result]
+
+
+class QueryRegistry:
+    """Named SPARQL queries with a result cache.
+
+    Parameters:
+        maxsize: Maximum number of cached results.
+
+    Attributes:
+        hits: Number of results returned from the cache.
+        misses: Number of results computed by running the query.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.queries: Dict[str, NamedQuery] = {}
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(
+        self, name: str, text: str, parameters: Sequence[str] = ()
+    ) -> NamedQuery:
+        """Register `text` as query `name` and return it.
+
+        The query is prepared on first use.
+        """
+        query = self.queries[name] = NamedQuery(name, text, parameters)
+        return query
+
+    def __getitem__(self, name: str) -> NamedQuery:
+        return self.queries[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.queries
+
+    def __iter__(self):
+        return iter(self.queries)
+
+    def run(
+        self,
+        graph: Graph,
+        name: str,
+        version: Optional[Hashable] = None,
+        **values,
+    ) -> List[tuple]:
+        """Run query `name` on `graph` with the parameter `values`.
+
+        Parameters:
+            graph: Graph to query.
+            name: Name of a registered query.
+            version: Version stamp of the content of `graph`, e.g.
+                `kbstore.KBStore.version`.  Results are cached per
+                (query, parameters, version).  If None, the query is
+                always run.
+            values: Parameters of the query.
+
+        Returns:
+            List of result rows, as named tuples of rdflib terms.
+        """
+        query = self.queries[name]
+        if version is None:
+            return query.execute(graph, **values)
+        key = (
+            name,
+            tuple(sorted(query.bindings(**values).items())),
+            version,
+        )
+        with self._lock:
+            if key in self._cache:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return list(self._cache[key])
+            self.misses += 1
+        rows = query.execute(graph, **values)
+        with self._lock:
+            self._cache[key] = tuple(rows)
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return rows
+
+    def clear(self) -> None:
+        """Clear the result cache."""
+        with self._lock:
+            self._cache.clear()
+
+
+registry = QueryRegistry()
+registry.register("query1", QUERY1)
+registry.register("query2", QUERY2)
+registry.register("query3", QUERY3)
+registry.register("query4", QUERY4)
+registry.register("query5", QUERY5, parameters=["activity"])
+registry.register("query_all", QUERY_ALL, parameters=["targetProperty"])
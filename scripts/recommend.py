@@ -0,0 +1,293 @@
+"""
+Batch software recommendations from the knowledge base.
+
+Answers the question of `QUERY_ALL` in `queries.py` -- which software
+can use a given (CHEMINF) property -- for many properties at once, and
+returns the rows of `QUERY3`, `QUERY4` and `QUERY5` from the restriction
+table.
+Adjacency maps along the path
+
+    property --(hasDatum)--> dataset type --(hasInput)--> assessment
+        --(hasSoftware)--> software
+
+are built once from the restriction table and the subclass closure,
+after which each recommendation is a few dictionary lookups instead of
+a seven-pattern SPARQL join.
+
+Example:
+
+    recommender = Recommender(graph)
+    for path in recommender.recommend([CHEMINF.CHEMINF_000085]):
+        print(path.software_label, "via", path.assessment_label)
+"""
+
+from collections import defaultdict
+from itertools import product
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from rdflib import DCTERMS, OWL, RDFS, SKOS, Graph, Literal, Namespace, URIRef
+from rdflib.term import Node
+
+from restrictions import VALUE_KINDS, RestrictionTable
+from subclassindex import SubClassIndex
+
+SSBD = Namespace("https://w3id.org/ssbd/")
+EMMO = Namespace("https://w3id.org/emmo#")
+HAS_DATUM = EMMO.EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e
+
+# Label properties, in the order of preference of the queries
+LABELS = (SKOS.prefLabel, RDFS.label, DCTERMS.title)
+
+
+class RecommendationPath(NamedTuple):
+    """A path from a property to a software, with labels."""
+
+    target: Node
+    property: Node
+    property_label: str
+    dataset_type: Node
+    dataset_type_label: str
+    assessment: Node
+    assessment_label: str
+    software: Node
+    software_label: str
+
+
+class DatasetTypeRow(NamedTuple):
+    """A row of `QUERY3`: a dataset type with a datum."""
+
+    datasetType: Node
+    label: Optional[Node]
+    prefLabel: Optional[Node]
+    description: Optional[Node]
+    cardinality: Optional[Node]
+    restrictionType: Node
+
+
+class AssessmentRow(NamedTuple):
+    """A row of `QUERY4`: an assessment taking a dataset type as input."""
+
+    assessment: Node
+    name: Node
+    descriptionText: Node
+    restrictionType: Node
+
+
+class SoftwareRow(NamedTuple):
+    """A row of `QUERY5`: a software of an activity."""
+
+    activity: Node
+    software: Node
+    softwareName: Node
+
+
+def _order(term: Optional[Node]) -> tuple:
+    """Sort key placing unbound values first, like SPARQL ORDER BY."""
+    return (0, "") if term is None else (1, str(term))
+
+
+class Recommender:
+    """Recommend software for properties.
+
+    Parameters:
+        graph: The knowledge base.  Used for the labels and to build
+            `index` and `table` if they are not given.
+        index: Subclass closure of the knowledge base.
+        table: Restriction table of the knowledge base.
+    """
+
+    def __init__(
+        self,
+        graph: Graph,
+        index: Optional[SubClassIndex] = None,
+        table: Optional[RestrictionTable] = None,
+    ):
+        self.graph = graph
+        self.index = index if index is not None else SubClassIndex(graph)
+        self.table = table = (
+            table if table is not None else RestrictionTable.from_graph(graph)
+        )
+        self._labels: Dict[Node, str] = {}
+
+        # Adjacency maps
+        self.datasets: Dict[Node, Set[Node]] = defaultdict(set)
+        self.assessments: Dict[Node, Set[Node]] = defaultdict(set)
+        self.software: Dict[Node, Set[Node]] = defaultdict(set)
+        is_subclass = self.index.is_subclass
+        for row in table:
+            if row.kind not in VALUE_KINDS:
+                continue
+            if row.property == HAS_DATUM:
+                if is_subclass(row.cls, SSBD.Dataset):
+                    self.datasets[row.filler].add(row.cls)
+            elif row.property == SSBD.hasInput:
+                if is_subclass(row.cls, SSBD.Assessment):
+                    self.assessments[row.filler].add(row.cls)
+            elif row.property == SSBD.hasSoftware:
+                if row.kind == OWL.hasValue:
+                    self.software[row.cls].add(row.filler)
+
+    def label(self, node: Node) -> str:
+        """Return the preferred label of `node` (or its IRI)."""
+        if node not in self._labels:
+            for pred in LABELS:
+                value = self.graph.value(node, pred)
+                if value is not None:
+                    self._labels[node] = str(value)
+                    break
+            else:
+                self._labels[node] = str(node)
+        return self._labels[node]
+
+    def _values(self, node: Node, pred: Node) -> list:
+        """Return the values of `pred` of `node`, or [None] (OPTIONAL)."""
+        return list(self.graph.objects(node, pred)) or [None]
+
+    def _names(self, node: Node) -> List[Node]:
+        """Return ``COALESCE(?prefLabel, ?label, ?title, STR(node))``."""
+        names = {}
+        for values in product(*(self._values(node, p) for p in LABELS)):
+            name = next((v for v in values if v is not None), None)
+            names[Literal(str(node)) if name is None else name] = True
+        return list(names)
+
+    def dataset_types(self, datum: Node) -> List[DatasetTypeRow]:
+        """Return the dataset types having `datum` as datum.
+
+        The rows are those of `QUERY3` (with `datum` in place of
+        ``datasettype:SMILES#SMILES``).
+        """
+        rows = {}
+        for r in self.table.restrictions(property=HAS_DATUM, filler=datum):
+            if r.kind not in VALUE_KINDS:
+                continue
+            if not self.index.is_subclass(r.cls, SSBD.Dataset):
+                continue
+            cardinality = None
+            if (
+                r.kind == OWL.onClass
+                and r.cardinality_kind == OWL.qualifiedCardinality
+            ):
+                cardinality = Literal(r.cardinality)
+            for label, pref_label, description in product(
+                self._values(r.cls, RDFS.label),
+                self._values(r.cls, SKOS.prefLabel),
+                self._values(r.cls, DCTERMS.description),
+            ):
+                row = DatasetTypeRow(
+                    r.cls, label, pref_label, description, cardinality, r.kind
+                )
+                rows[row] = True
+        return sorted(
+            rows,
+            key=lambda row: (
+                _order(row.prefLabel),
+                _order(row.label),
+                _order(row.datasetType),
+            ),
+        )
+
+    def assessments_for(self, dataset_type: Node) -> List[AssessmentRow]:
+        """Return the assessments taking `dataset_type` as input.
+
+        The rows are those of `QUERY4` (with `dataset_type` in place of
+        ``datasettype:SMILES``).
+        """
+        rows = {}
+        for r in self.table.restrictions(
+            property=SSBD.hasInput, filler=dataset_type
+        ):
+            if r.kind not in VALUE_KINDS:
+                continue
+            if not self.index.is_subclass(r.cls, SSBD.Assessment):
+                continue
+            for name, description in product(
+                self._names(r.cls),
+                self._values(r.cls, DCTERMS.description),
+            ):
+                if description is None:
+                    description = Literal("")
+                rows[AssessmentRow(r.cls, name, description, r.kind)] = True
+        return sorted(
+            rows, key=lambda row: (_order(row.name), _order(row.assessment))
+        )
+
+    def activity_software(self, activity: Node) -> List[SoftwareRow]:
+        """Return the software of `activity`, as the rows of `QUERY5`."""
+        activity = URIRef(activity) if isinstance(activity, str) else activity
+        rows = {
+            SoftwareRow(activity, software, name): True
+            for software in self.table.fillers(
+                activity, SSBD.hasSoftware, kinds=[OWL.hasValue]
+            )
+            for name in self._names(software)
+        }
+        return sorted(rows, key=lambda row: _order(row.softwareName))
+
+    def _paths(self, target: Node, prop: Node) -> List[tuple]:
+        return [
+            (target, prop, dataset, assessment, software)
+            for dataset in self.datasets.get(prop, ())
+            for assessment in self.assessments.get(dataset, ())
+            for software in self.software.get(assessment, ())
+        ]
+
+    def recommend(
+        self, targets: Iterable[Node], labels: bool = True
+    ) -> List[RecommendationPath]:
+        """Return all paths from subclasses of `targets` to software.
+
+        A path starts at a (direct or indirect) subclass of a target,
+        as ``?property rdfs:subClassOf+ <target>`` in `QUERY_ALL`.
+
+        Parameters:
+            targets: IRIs of the properties to recommend software for.
+            labels: Whether to look up labels.  If false, the label
+                fields are empty.
+        """
+        paths = []
+        for target in targets:
+            target = URIRef(target) if isinstance(target, str) else target
+            for prop in self.index.descendants(target):
+                paths.extend(self._paths(target, prop))
+        return [self._path(p, labels) for p in sorted(paths)]
+
+    def recommend_all(self, labels: bool = True) -> List[RecommendationPath]:
+        """Return the paths of all properties leading to any software.
+
+        Every class having a path to a software through one of its
+        subclasses is included as a target.
+        """
+        paths: List[tuple] = []
+        for prop in list(self.datasets):
+            found = self._paths(None, prop)
+            if not found:
+                continue
+            for target in self.index.ancestors(prop):
+                paths.extend((target,) + p[1:] for p in found)
+        return [self._path(p, labels) for p in sorted(paths)]
+
+    def software_for(self, targets: Iterable[Node]) -> Dict[Node, Set[Node]]:
+        """Return a dict mapping each target to its set of software."""
+        result: Dict[Node, Set[Node]] = {}
+        for target in targets:
+            target = URIRef(target) if isinstance(target, str) else target
+            result[target] = {
+                p.software for p in self.recommend([target], labels=False)
+            }
+        return result
+
+    def _path(self, path: tuple, labels: bool) -> RecommendationPath:
+        target, prop, dataset, assessment, software = path
+        label = self.label if labels else (lambda node: "")
+        return RecommendationPath(
+            target,
+            prop,
+            label(prop),
+            dataset,
+            label(dataset),
+            assessment,
+            label(assessment),
+            software,
+            label(software),
+        )
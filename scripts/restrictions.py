@@ -0,0 +1,378 @@
+"""
+Flat, indexed table of the OWL restrictions in the knowledge base.
+
+The class descriptions use ``owl:Restriction`` blank nodes in their
+``rdfs:subClassOf`` lists, e.g. an assessment taking a dataset type as
+input:
+
+    ssbd:SomeAssessment rdfs:subClassOf [
+        a owl:Restriction ;
+        owl:onProperty ssbd:hasInput ;
+        owl:someValuesFrom datasettype:SMILES ] .
+
+`RestrictionTable` extracts all of them once into rows of (class,
+property, kind, filler, cardinality, cardinality kind), where kind is
+one of
+``owl:someValuesFrom``, ``owl:allValuesFrom``, ``owl:hasValue`` or
+``owl:onClass`` (qualified cardinality restrictions), and indexes the
+rows on class and on (property, filler).  Lookups like "assessments
+that take datasettype X" are then dictionary hits:
+
+    table = RestrictionTable.from_graph(graph)
+    table.classes(SSBD.hasInput, DATASETTYPE.SMILES)
+
+The table can also be extracted from the ``subClassOf`` lists of the
+JSON-LD files in jsonld/, without parsing them to RDF.
+"""
+
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from rdflib import OWL, RDF, RDFS, Graph, Literal, URIRef
+from rdflib.term import Node
+from rdflib.util import from_n3
+
+# Restriction kinds relating a class to a filler
+VALUE_KINDS = (
+    OWL.someValuesFrom,
+    OWL.allValuesFrom,
+    OWL.hasValue,
+    OWL.onClass,
+)
+
+# Version of the row format of `RestrictionTable.save()`
+FORMAT = 2
+
+# Cardinality predicates, in order of preference
+CARDINALITIES = (
+    OWL.qualifiedCardinality,
+    OWL.minQualifiedCardinality,
+    OWL.maxQualifiedCardinality,
+    OWL.cardinality,
+    OWL.minCardinality,
+    OWL.maxCardinality,
+)
+
+
+class Restriction(NamedTuple):
+    """A restriction on `cls`.
+
+    `filler` is None for unqualified cardinality restrictions, whose
+    kind is then the cardinality predicate.  `cardinality` is the value
+    of the (qualified) cardinality, if any, and `cardinality_kind` its
+    predicate.
+    """
+
+    cls: Node
+    property: URIRef
+    kind: URIRef
+    filler: Optional[Node]
+    cardinality: Optional[int] = None
+    cardinality_kind: Optional[URIRef] = None
+
+
+class RestrictionTable:
+    """Indexed table of `Restriction` rows."""
+
+    # pylint: disable=redefined-builtin
+
+    def __init__(self, rows: Iterable[Restriction] = ()):
+        self.rows: List[Restriction] = []
+        self._by_class: Dict[Node, List[Restriction]] = defaultdict(list)
+        self._by_filler: Dict[Tuple, List[Restriction]] = defaultdict(list)
+        for row in rows:
+            self.add(row)
+
+    def add(self, row: Restriction) -> None:
+        """Add a row to the table and its indexes."""
+        self.rows.append(row)
+        self._by_class[row.cls].append(row)
+        self._by_filler[(row.property, row.filler)].append(row)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def restrictions(
+        self,
+        cls: Optional[Node] = None,
+        property: Optional[URIRef] = None,
+        filler: Optional[Node] = None,
+        kinds: Optional[Iterable[URIRef]] = None,
+    ) -> List[Restriction]:
+        """Return the rows matching the given (non-None) values.
+
+        Uses the class index if `cls` is given and the (property,
+        filler) index if both `property` and `filler` are given.
+        """
+        if property is not None and filler is not None:
+            rows = self._by_filler.get((property, filler), [])
+        elif cls is not None:
+            rows = self._by_class.get(cls, [])
+        else:
+            rows = self.rows
+        kinds = set(kinds) if kinds is not None else None
+        return [
+            r
+            for r in rows
+            if (cls is None or r.cls == cls)
+            and (property is None or r.property == property)
+            and (filler is None or r.filler == filler)
+            and (kinds is None or r.kind in kinds)
+        ]
+
+    def classes(
+        self,
+        property: URIRef,
+        filler: Node,
+        kinds: Iterable[URIRef] = VALUE_KINDS,
+    ) -> Set[Node]:
+        """Return the classes restricted on `property` to `filler`.
+
+        E.g. ``classes(SSBD.hasInput, X)`` returns all classes taking X
+        as input.
+        """
+        kinds = set(kinds)
+        return {
+            r.cls
+            for r in self._by_filler.get((property, filler), [])
+            if r.kind in kinds
+        }
+
+    def fillers(
+        self,
+        cls: Node,
+        property: URIRef,
+        kinds: Iterable[URIRef] = VALUE_KINDS,
+    ) -> Set[Node]:
+        """Return the fillers of the restrictions on `property` of `cls`.
+
+        E.g. ``fillers(activity, SSBD.hasSoftware)`` returns the
+        software of an activity.
+        """
+        kinds = set(kinds)
+        return {
+            r.filler
+            for r in self._by_class.get(cls, [])
+            if r.property == property and r.kind in kinds
+        }
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "RestrictionTable":
+        """Extract the restrictions in the ``rdfs:subClassOf`` of classes."""
+        table = cls()
+        for restriction in graph.subjects(RDF.type, OWL.Restriction):
+            classes = list(graph.subjects(RDFS.subClassOf, restriction))
+            if not classes:
+                continue
+            prop = graph.value(restriction, OWL.onProperty)
+            if prop is None:
+                continue
+            cardinality = None
+            cardinality_kind = None
+            for pred in CARDINALITIES:
+                value = graph.value(restriction, pred)
+                if value is not None:
+                    cardinality = _int(value)
+                    cardinality_kind = pred
+                    break
+            rows = [
+                (kind, filler)
+                for kind in VALUE_KINDS
+                for filler in graph.objects(restriction, kind)
+            ]
+            if not rows and cardinality_kind is not None:
+                rows = [(cardinality_kind, None)]
+            for subclass in classes:
+                for kind, filler in rows:
+                    table.add(
+                        Restriction(
+                            subclass,
+                            prop,
+                            kind,
+                            filler,
+                            cardinality,
+                            cardinality_kind,
+                        )
+                    )
+        return table
+
+    @classmethod
+    def from_jsonld(
+        cls, doc: Union[dict, str, Path], prefixes: Optional[dict] = None
+    ) -> "RestrictionTable":
+        """Extract the restrictions in the ``subClassOf`` lists of a
+        JSON-LD document (a dict or a path) as written by step 2.
+
+        Prefixed names are expanded with the prefixes of the context
+        and `prefixes`.
+        """
+        if isinstance(doc, dict):
+            data = doc
+        else:
+            with open(doc, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        context = data.get("@context", {})
+        allprefixes = {
+            k: v
+            for k, v in context.items()
+            if isinstance(v, str) and v.endswith(("/", "#"))
+        }
+        allprefixes.update(prefixes or {})
+        allprefixes.setdefault("owl", str(OWL))
+
+        def expand(value: str) -> str:
+            if ":" in value:
+                prefix, name = value.split(":", 1)
+                if prefix in allprefixes:
+                    return allprefixes[prefix] + name
+            return value
+
+        def term(value) -> Node:
+            if isinstance(value, dict):
+                if "@id" in value:
+                    return URIRef(expand(value["@id"]))
+                return Literal(
+                    value.get("@value"),
+                    lang=value.get("@language"),
+                    datatype=value.get("@type") and expand(value["@type"]),
+                )
+            if isinstance(value, str):
+                expanded = expand(value)
+                if expanded.startswith(("http://", "https://", "urn:")):
+                    return URIRef(expanded)
+            return Literal(value)
+
+        table = cls()
+        for entry in data.get("@graph", []):
+            if "@id" not in entry:
+                continue
+            subclass = URIRef(expand(entry["@id"]))
+            superclasses = entry.get("subClassOf")
+            if superclasses is None:
+                superclasses = entry.get("rdfs:subClassOf", [])
+            if not isinstance(superclasses, list):
+                superclasses = [superclasses]
+            for restriction in superclasses:
+                if not isinstance(restriction, dict):
+                    continue
+                if expand(restriction.get("@type", "")) != str(
+                    OWL.Restriction
+                ):
+                    continue
+                values = {expand(k): v for k, v in restriction.items()}
+                prop = values.get(str(OWL.onProperty))
+                if prop is None:
+                    continue
+                prop = term(prop)
+                cardinality = None
+                cardinality_kind = None
+                for pred in CARDINALITIES:
+                    if str(pred) in values:
+                        cardinality = _int(term(values[str(pred)]))
+                        cardinality_kind = pred
+                        break
+                rows: List[Tuple[URIRef, Optional[Node]]] = []
+                for kind in VALUE_KINDS:
+                    fillers = values.get(str(kind), [])
+                    if not isinstance(fillers, list):
+                        fillers = [fillers]
+                    rows.extend((kind, term(f)) for f in fillers)
+                if not rows and cardinality_kind is not None:
+                    rows = [(cardinality_kind, None)]
+                for kind, filler in rows:
+                    table.add(
+                        Restriction(
+                            subclass,
+                            prop,
+                            kind,
+                            filler,
+                            cardinality,
+                            cardinality_kind,
+                        )
+                    )
+        return table
+
+    def save(self, path: Union[str, Path], **metadata) -> None:
+        """Store the table as json, together with `metadata`."""
+        rows = [
+            [
+                r.cls.n3(),
+                r.property.n3(),
+                r.kind.n3(),
+                None if r.filler is None else r.filler.n3(),
+                r.cardinality,
+                (
+                    None
+                    if r.cardinality_kind is None
+                    else r.cardinality_kind.n3()
+                ),
+            ]
+            for r in self.rows
+        ]
+        with open(path, "wt", encoding="utf-8") as f:
+            json.dump(dict(metadata, rows=rows), f)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Tuple["RestrictionTable", dict]:
+        """Load a table stored with `save()`.
+
+        Returns:
+            Tuple of (table, metadata).
+        """
+        with open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        rows = data.pop("rows")
+        table = cls(
+            Restriction(
+                from_n3(c),
+                from_n3(p),
+                from_n3(k),
+                None if v is None else from_n3(v),
+                n,
+                None if nk is None else from_n3(nk),
+            )
+            for c, p, k, v, n, nk in rows
+        )
+        return table, data
+
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value.toPython() if isinstance(value, Literal) else value)
+    except (TypeError, ValueError):
+        return None
+
+
+def restriction_table(kbstore) -> RestrictionTable:
+    """Return the restriction table of a `kbstore.KBStore`.
+
+    The table is stored in the store directory and only extracted again
+    when a source has changed.
+    """
+    path = kbstore.path / "restrictions.json"
+    metadata = {"version": kbstore.version, "format": FORMAT}
+    if kbstore.persistent and path.exists():
+        try:
+            table, stored = RestrictionTable.load(path)
+        except ValueError:  # rows of an older format
+            stored = {}
+        if stored == metadata:
+            return table
+    table = RestrictionTable.from_graph(kbstore.dataset)
+    if kbstore.persistent:
+        table.save(path, **metadata)
+    return table
@@ -0,0 +1,476 @@
+"""
+Row-level change tracking for the spreadsheet tables.
+
+Every spreadsheet row is hashed and keyed on its ``@id``.  Step 1 only
+corrects rows that were added or changed since the previous run and
+reuses the stored corrected cells for all other rows.  Step 2 only
+converts, stores and validates the changed rows and writes a delta of
+triples to add and remove next to the full snapshot.
+
+The state is kept in the ``rowstate/`` directory of the current working
+directory (i.e. next to the cleaned csv files).  Step 1 writes it as a
+pending state, which step 2 promotes with `promote_state()` once the
+triples have passed the validation.  Until then, step 1 compares the
+rows with the last validated state, such that the deltas of several
+runs accumulate.  The state also records a version of the correction
+(see `version_hash()`); a state of another version is not reused.
+"""
+
+import csv
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import pandas as pd
+from rdflib import BNode, Graph, URIRef
+
+import parseutils
+from instrument import cache
+from parseutils import add_prefix, convert_to_iri
+
+ROWSTATE_DIR = Path("rowstate")
+
+logger = logging.getLogger(__name__)
+
+# A corrected row is stored as a list of [column, value] pairs, since
+# the expanded tables may have several columns with the same header.
+Cells = List[List[str]]
+
+
+@dataclass
+class RowDelta:
+    """Identifiers of rows that were added, changed or removed."""
+
+    added: Set[str] = field(default_factory=set)
+    changed: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    # Rows that the correction rejected and that are not in the tables
+    rejected: Set[str] = field(default_factory=set)
+
+    @property
+    def processed(self) -> Set[str]:
+        """Identifiers of rows that must be (re)processed."""
+        return self.added | self.changed
+
+    @property
+    def stale(self) -> Set[str]:
+        """Identifiers of rows whose old triples must be removed."""
+        return self.changed | self.removed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def update(self, other: "RowDelta") -> None:
+        """Merge `other` into this delta."""
+        self.added |= other.added
+        self.changed |= other.changed
+        self.removed |= other.removed
+        self.rejected |= other.rejected
+
+    def asdict(self) -> dict:
+        """Return a json-serialisable dict representation."""
+        return {
+            "added": sorted(self.added),
+            "changed": sorted(self.changed),
+            "removed": sorted(self.removed),
+            "rejected": sorted(self.rejected),
+        }
+
+    @classmethod
+    def fromdict(cls, d: dict) -> "RowDelta":
+        """Create a RowDelta from the output of `asdict()`."""
+        return cls(
+            added=set(d.get("added", [])),
+            changed=set(d.get("changed", [])),
+            removed=set(d.get("removed", [])),
+            rejected=set(d.get("rejected", [])),
+        )
+
+
+def _normalise(value):
+    """Return a json-serialisable and hashable representation of a cell."""
+    if isinstance(value, list):
+        return [_normalise(v) for v in value]
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value).strip()
+
+
+def hash_row(row: pd.Series) -> str:
+    """Return a sha256 hash of the content of a dataframe row."""
+    content = {str(col): _normalise(val) for col, val in row.items()}
+    data = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def version_hash(*parts: Union[str, bytes, Path]) -> str:
+    """Return a sha256 hash identifying the version of the correction.
+
+    Parameters:
+        parts: Strings, bytes or paths of files (like the ontology and
+            the source of the correcting functions) that the corrected
+            cells depend on.
+    """
+    sha = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, Path):
+            part = part.read_bytes()
+        elif isinstance(part, str):
+            part = part.encode("utf-8")
+        sha.update(hashlib.sha256(part).digest())
+    return sha.hexdigest()
+
+
+def id_column(df: pd.DataFrame) -> str:
+    """Return the name of the column in `df` that becomes ``@id``."""
+    if "@id" in df.columns:
+        return "@id"
+    for col in df.columns:
+        if parseutils.property_iri_dict.get(col) == "@id":
+            return col
+    raise KeyError("No column mapping to '@id' in dataframe")
+
+
+def row_keys(df: pd.DataFrame) -> pd.Series:
+    """Return the ``@id`` of each row, prefixed as in step 1."""
+    return df[id_column(df)].apply(add_prefix, prefix="pink")
+
+
+def row_hashes(df: pd.DataFrame) -> Dict[str, str]:
+    """Return a dict mapping ``@id`` to the hash of each row in `df`.
+
+    Rows without an ``@id`` are ignored.  If several rows have the same
+    ``@id``, the last one wins (as it would when storing the triples).
+    """
+    keys = row_keys(df)
+    return {
+        key: hash_row(row)
+        for key, (_, row) in zip(keys, df.iterrows())
+        if isinstance(key, str) and key
+    }
+
+
+def diff_hashes(old: Dict[str, str], new: Dict[str, str]) -> RowDelta:
+    """Compare two dicts of row hashes and return the delta."""
+    return RowDelta(
+        added={k for k in new if k not in old},
+        changed={k for k in new if k in old and old[k] != new[k]},
+        removed={k for k in old if k not in new},
+    )
+
+
+def _state_path(name: str, pending: bool) -> Path:
+    suffix = ".pending.json" if pending else ".json"
+    return ROWSTATE_DIR / f"{name}{suffix}"
+
+
+def load_state(name: str, pending: bool = False) -> dict:
+    """Load the stored row state for table `name`.
+
+    Parameters:
+        name: Name of the table.
+        pending: Whether to load the pending state written by step 1
+            instead of the last validated state.
+
+    Returns:
+        Dict with the keys "hashes" (``@id`` to row hash), "rows"
+        (``@id`` to corrected cells) and "version".  All are empty if
+        no state has been stored yet.
+    """
+    path = _state_path(name, pending)
+    if not path.exists():
+        return {"hashes": {}, "rows": {}, "version": ""}
+    with open(path, "rt", encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("version", "")
+    return state
+
+
+def save_state(
+    name: str,
+    hashes: Dict[str, str],
+    rows: Dict[str, Cells],
+    version: str = "",
+    pending: bool = True,
+):
+    """Store row hashes and corrected cells for table `name`.
+
+    The state is stored as pending, unless `pending` is false.
+    """
+    ROWSTATE_DIR.mkdir(exist_ok=True)
+    state = {"hashes": hashes, "rows": rows, "version": version}
+    path = _state_path(name, pending)
+    with open(path, "wt", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+
+
+def promote_state(name: str) -> bool:
+    """Make the pending state of table `name` the validated state.
+
+    Called by step 2 when the triples of the tables have passed the
+    validation.  Returns false if there is no pending state.
+    """
+    path = _state_path(name, pending=True)
+    if not path.exists():
+        return False
+    path.replace(_state_path(name, pending=False))
+    return True
+
+
+def save_delta(name: str, delta: RowDelta) -> None:
+    """Store the delta of the last run of table `name` for step 2."""
+    ROWSTATE_DIR.mkdir(exist_ok=True)
+    path = ROWSTATE_DIR / f"{name}.delta.json"
+    with open(path, "wt", encoding="utf-8") as f:
+        json.dump(delta.asdict(), f, indent=2)
+
+
+def load_delta(name: str) -> Optional[RowDelta]:
+    """Load the delta stored by step 1, or None if there is none."""
+    path = ROWSTATE_DIR / f"{name}.delta.json"
+    if not path.exists():
+        return None
+    with open(path, "rt", encoding="utf-8") as f:
+        return RowDelta.fromdict(json.load(f))
+
+
+def df_to_cells(df: pd.DataFrame) -> List[Cells]:
+    """Return the rows of an expanded dataframe as lists of cells."""
+    headers = [str(col) for col in df.columns]
+    return [
+        [
+            [col, "" if pd.isna(val) else str(val)]
+            for col, val in zip(headers, row)
+        ]
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+
+def write_cells_csv(path: Union[str, Path], rows: Iterable[Cells]) -> None:
+    """Write rows of cells to a csv file that TableDoc can parse.
+
+    Columns that occur several times within a row (expanded list
+    columns) are padded to the largest multiplicity over all rows.
+    """
+    rows = list(rows)
+    multiplicity: Dict[str, int] = {}
+    for cells in rows:
+        counts: Dict[str, int] = {}
+        for col, _ in cells:
+            counts[col] = counts.get(col, 0) + 1
+        for col, n in counts.items():
+            multiplicity[col] = max(multiplicity.get(col, 0), n)
+
+    headers = [col for col, n in multiplicity.items() for _ in range(n)]
+    with open(path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for cells in rows:
+            values: Dict[str, List[str]] = {}
+            for col, val in cells:
+                values.setdefault(col, []).append(val)
+            line = []
+            for col, n in multiplicity.items():
+                vals = values.get(col, [])
+                line.extend(vals + [""] * (n - len(vals)))
+            writer.writerow(line)
+
+
+def incremental_correct(
+    name: str,
+    df: pd.DataFrame,
+    correct: Callable[[pd.DataFrame], pd.DataFrame],
+    version: str = "",
+) -> RowDelta:
+    """Correct only the added and changed rows of a spreadsheet table.
+
+    Writes the full cleaned table to ``<name>_clean.csv`` and the
+    added/changed rows to ``<name>_delta.csv``.  The delta (compared to
+    the last validated state) and the new state are stored as pending
+    for step 2.
+
+    Rows that `correct` drops (like the rows rejected by the
+    pre-validation) are corrected again in the next run.  A rejected
+    new row is left out of the cleaned tables, while a rejected changed
+    row keeps its previous corrected cells.
+
+    Parameters:
+        name: Name of the table, e.g. "sw".
+        df: Dataframe as read from the spreadsheet (before correction).
+        correct: Function correcting a dataframe, typically
+            ``lambda df: correct_pink_dataframes(df, onto)``.  The
+            corrected rows must keep their index.
+        version: Version of the correction (see `version_hash()`).  All
+            rows are corrected again if it differs from the version of
+            the stored state.
+
+    Returns:
+        The delta of this run compared to the last validated state.
+    """
+    keys = row_keys(df)
+    df = df[keys.apply(lambda k: isinstance(k, str) and k != "")]
+    keys = keys[df.index]
+
+    state = load_state(name)
+    if state["version"] != version:
+        # Correct all rows again, but keep their previous cells for the
+        # rows that are rejected
+        state["hashes"] = dict.fromkeys(state["hashes"], "")
+    hashes = row_hashes(df)
+    delta = diff_hashes(state["hashes"], hashes)
+    rows: Dict[str, Cells] = {
+        key: cells
+        for key, cells in state["rows"].items()
+        if key in hashes and key not in delta.processed
+    }
+
+    mask = keys.isin(delta.processed)
+    if mask.any():
+        corrected = correct(df[mask])
+        for key, cells in zip(keys[corrected.index], df_to_cells(corrected)):
+            rows[key] = cells
+        for key in set(keys[mask]) - set(keys[corrected.index]):
+            if key in state["rows"]:
+                rows[key] = state["rows"][key]
+                hashes[key] = state["hashes"][key]
+                delta.changed.discard(key)
+            else:
+                del hashes[key]
+                delta.added.discard(key)
+                delta.changed.discard(key)
+                if key in state["hashes"]:
+                    delta.removed.add(key)
+                delta.rejected.add(key)
+    logger.info(
+        "%s: %d added, %d changed, %d removed, %d rejected, "
+        "%d rows in total",
+        name,
+        len(delta.added),
+        len(delta.changed),
+        len(delta.removed),
+        len(delta.rejected),
+        len(hashes),
+    )
+    cache(
+        "rows",
+        hits=len(hashes) - len(delta.processed),
+        misses=len(delta.processed),
+    )
+
+    ordered = [key for key in dict.fromkeys(keys) if key in rows]
+    write_cells_csv(f"{name}_clean.csv", (rows[k] for k in ordered))
+    write_cells_csv(
+        f"{name}_delta.csv",
+        (rows[k] for k in ordered if k in delta.processed),
+    )
+    save_state(name, hashes, rows, version)
+    save_delta(name, delta)
+    return delta
+
+
+def expand_ids(ids: Iterable[str], prefixes: dict) -> Set[URIRef]:
+    """Expand (possibly prefixed) identifiers to IRIs."""
+    return {URIRef(convert_to_iri(i, prefixes)) for i in ids}
+
+
+def triple_delta(
+    snapshot: Graph, new: Graph, stale: Iterable[URIRef]
+) -> Tuple[Graph, Graph]:
+    """Return the triples to add to and remove from `snapshot`.
+
+    The old description (CBD, including restriction blank nodes) of
+    every stale resource is removed and all triples in `new` are added.
+    Triples without blank nodes that occur on both sides are dropped
+    from the delta, since they need no update.
+
+    Parameters:
+        snapshot: Graph with the previous full snapshot.
+        new: Graph with the triples of the added and changed resources.
+        stale: IRIs of the changed and removed resources.
+
+    Returns:
+        Tuple of (add, remove) graphs.
+    """
+    remove = Graph()
+    for iri in stale:
+        snapshot.cbd(iri, target_graph=remove)
+
+    add = Graph()
+    for triple in new:
+        add.add(triple)
+
+    for triple in list(add):
+        if any(isinstance(t, BNode) for t in triple):
+            continue
+        if triple in remove:
+            add.remove(triple)
+            remove.remove(triple)
+    return add, remove
+
+
+def referring_subjects(graph: Graph, iris: Iterable[URIRef]) -> Set[URIRef]:
+    """Return the resources in `graph` that refer to any of `iris`.
+
+    References from blank nodes (like restrictions) are followed up to
+    the resources describing them.
+    """
+    found: Set[URIRef] = set()
+    seen = set()
+    stack = list(iris)
+    while stack:
+        node = stack.pop()
+        for subject in graph.subjects(None, node, unique=True):
+            if subject in seen:
+                continue
+            seen.add(subject)
+            if isinstance(subject, BNode):
+                stack.append(subject)
+            elif isinstance(subject, URIRef):
+                found.add(subject)
+    return found
+
+
+def apply_triple_delta(snapshot: Graph, add: Graph, remove: Graph) -> None:
+    """Update `snapshot` in place with the given delta."""
+    for triple in remove:
+        snapshot.remove(triple)
+    for triple in add:
+        snapshot.add(triple)
+
+
+def apply_jsonld_delta(
+    doc: dict, entries: List[dict], stale: Iterable[str], prefixes: dict
+) -> dict:
+    """Update the ``@graph`` of a stored JSON-LD document.
+
+    Entries whose ``@id`` is in `stale` or in `entries` are replaced by
+    `entries`.  Identifiers are compared after prefix expansion.
+    """
+    ctx = doc.get("@context", {})
+    allprefixes = {
+        k: v
+        for k, v in ctx.items()
+        if isinstance(v, str) and v.endswith(("/", "#"))
+    }
+    allprefixes.update(prefixes)
+
+    def key(entry):
+        return convert_to_iri(entry.get("@id", ""), allprefixes)
+
+    drop = {convert_to_iri(i, allprefixes) for i in stale}
+    drop.update(key(e) for e in entries)
+    graph = [e for e in doc.get("@graph", []) if key(e) not in drop]
+    doc["@graph"] = graph + entries
+    return doc
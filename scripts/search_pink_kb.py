@@ -1,7 +1,38 @@
+import argparse
+
 from tripper import Triplestore
 from tripper.datadoc import search
 import keyring
 
+from instrument import setup_logging
+from kbstore import open_kb
+from queries import registry
+from recommend import Recommender
+from restrictions import restriction_table
+from sparqlprofile import profile_query
+from rdflib import URIRef
+
+SMILES = URIRef("https://pink-project.eu/datasettype/SMILES")
+SMILES_DATUM = URIRef("https://pink-project.eu/datasettype/SMILES#SMILES")
+
+parser = argparse.ArgumentParser(description="Search the PINK knowledge base.")
+parser.add_argument(
+    "--profile",
+    nargs="*",
+    metavar="QUERY",
+    help="Print the rdflib evaluation profile of the named queries "
+    "(of all queries if no names are given).",
+)
+parser.add_argument(
+    "--export",
+    default="export",
+    metavar="DIR",
+    help="Directory to export the sources to, one N-Quads file per "
+    "source.  Only changed sources are written again.",
+)
+args = parser.parse_args()
+setup_logging()
+
 
 # Connect to PINK KB
 
@@ -16,288 +47,112 @@ import keyring
 #        update_iri="https://graphdb.pink-project.eu/repositories/testing/statements",
 #        )
 
-
-kb = Triplestore('rdflib')
-
-kb.parse('https://w3id.org/ssbd/')  # Ontology
-kb.parse('https://w3id.org/emmo/1.0.3')
-kb.parse('pink-agents.ttl') # agents
-kb.parse('googlespreadsheet_resources.ttl') # All the resources
-kb.parse('datamodels.ttl') # datamodels
-
-
-
-query1 = """
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX cheminf: <http://semanticscience.org/resource/>
-
-SELECT DISTINCT ?subclass ?label
-WHERE {
-  ?subclass rdfs:subClassOf+ cheminf:CHEMINF_000018 .
-  OPTIONAL { ?subclass rdfs:label ?label }
-}
-ORDER BY ?label
-"""
-
-results1 = kb.query(query1)
-
-query2 = """
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX cheminf: <http://semanticscience.org/resource/>
-
-SELECT DISTINCT ?subclass ?label
-WHERE {
-  ?subclass rdfs:subClassOf+ cheminf:CHEMINF_000085 .
-  OPTIONAL { ?subclass rdfs:label ?label }
-}
-ORDER BY ?label
-"""
-
-results2 = kb.query(query2)
-
-
-query3 = """
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-PREFIX emmo: <https://w3id.org/emmo#>
-PREFIX datasettype: <https://pink-project.eu/datasettype/>
-PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-PREFIX dcterms: <http://purl.org/dc/terms/>
-PREFIX ssbd: <https://w3id.org/ssbd/>
-
-SELECT DISTINCT ?datasetType ?label ?prefLabel ?description ?cardinality ?restrictionType
-WHERE {
-  ?datasetType rdfs:subClassOf+ ssbd:Dataset .
-
-  ?datasetType rdfs:subClassOf ?restriction .
-
-  ?restriction a owl:Restriction ;
-               owl:onProperty emmo:EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e .
-
-  {
-    # Pattern 1: qualified restriction
-    ?restriction owl:onClass <https://pink-project.eu/datasettype/SMILES#SMILES> .
-    OPTIONAL { ?restriction owl:qualifiedCardinality ?cardinality . }
-    BIND(owl:onClass AS ?restrictionType)
-  }
-  UNION
-  {
-    # Pattern 2: standard OWL restrictions
-    ?restriction ?restrictionType <https://pink-project.eu/datasettype/SMILES#SMILES> .
-    VALUES ?restrictionType {
-      owl:someValuesFrom
-      owl:allValuesFrom
-      owl:hasValue
-    }
-  }
-
-  OPTIONAL { ?datasetType rdfs:label ?label . }
-  OPTIONAL { ?datasetType skos:prefLabel ?prefLabel . }
-  OPTIONAL { ?datasetType dcterms:description ?description . }
-}
-ORDER BY ?prefLabel ?label ?datasetType
-"""
-
-results3 = kb.query(query3)
-
-
-
-
-query4 = """
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-PREFIX datasettype: <https://pink-project.eu/datasettype/>
-PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-PREFIX dcterms: <http://purl.org/dc/terms/>
-PREFIX ssbd: <https://w3id.org/ssbd/>
-
-SELECT DISTINCT
-  ?assessment
-  (COALESCE(?prefLabel, ?label, ?title, STR(?assessment)) AS ?name)
-  (COALESCE(?description, "") AS ?descriptionText)
-  ?restrictionType
-WHERE {
-  ?assessment rdfs:subClassOf+ ssbd:Assessment .
-
-  ?assessment rdfs:subClassOf ?restriction .
-
-  ?restriction a owl:Restriction ;
-               owl:onProperty ssbd:hasInput .
-
-  {
-    ?restriction owl:onClass datasettype:SMILES .
-    BIND(owl:onClass AS ?restrictionType)
-  }
-  UNION
-  {
-    ?restriction ?restrictionType datasettype:SMILES .
-    VALUES ?restrictionType {
-      owl:someValuesFrom
-      owl:allValuesFrom
-      owl:hasValue
-    }
-  }
-
-  OPTIONAL { ?assessment rdfs:label ?label . }
-  OPTIONAL { ?assessment skos:prefLabel ?prefLabel . }
-  OPTIONAL { ?assessment dcterms:title ?title . }
-  OPTIONAL { ?assessment dcterms:description ?description . }
-}
-ORDER BY ?name ?assessment
-"""
-
-results4 = kb.query(query4)
-
+# To fill the remote KB, do not add triples one by one with kb.add(),
+# but upload them in bulk, e.g.
+#from bulkupload import BulkUploader
+#with BulkUploader(
+#    "https://graphdb.pink-project.eu/repositories/testing/statements",
+#    username=username,
+#    password=password,
+#) as uploader:
+#    uploader.replace_graph(graph, "https://w3id.org/pink/resources")
+
+
+# Open the persistent local KB (in `kbstore/`), with one named graph per
+# source.  Only sources whose content has changed since the last run
+# are parsed again.  Use `python scripts/kbstore.py --refresh` to
+# re-download the ontologies.
+kb, kbstore = open_kb([
+    'https://w3id.org/ssbd/',  # Ontology
+    'https://w3id.org/emmo/1.0.3',
+    'pink-agents.ttl', # agents
+    'googlespreadsheet_resources.ttl', # All the resources
+    'datamodels.nt', # datamodels
+])
+
+
+# The queries (in queries.py) use the materialised subclass closure
+# `pink:subClassOfTransitive` instead of `rdfs:subClassOf+` paths.
+# Wrap them in `with_property_paths()` when querying a remote KB.
+# They are registered by name, prepared once and their results are
+# cached until a source of the KB changes.
+# With --profile, the time spent in each BGP, OPTIONAL, UNION, ... of
+# the queries is printed.
+def profiled(name):
+    return args.profile is not None and (
+        not args.profile or name in args.profile
+    )
+
+
+def query(name, **parameters):
+    if profiled(name):
+        # The rows of the profiled run are the results
+        named = registry[name]
+        profile, rows = profile_query(
+            kbstore.dataset, named.prepared, named.bindings(**parameters)
+        )
+        print(f"Profile of {name}:")
+        print(profile.report())
+        variables = named.prepared.algebra["PV"]
+        return [named.row(*(row.get(v) for v in variables)) for row in rows]
+    return registry.run(
+        kbstore.dataset, name, version=kbstore.version, **parameters
+    )
+
+results1 = query("query1")
+
+results2 = query("query2")
+
+
+# Queries 3, 4, 5 and query_all only follow owl:Restriction blank nodes,
+# so they are answered from the restriction table (stored in
+# `kbstore/`) and adjacency maps built from it once, where lookups are
+# dictionary hits.  The SPARQL queries are only run to profile them.
+restrictions = restriction_table(kbstore)
+recommender = Recommender(kbstore.dataset, table=restrictions)
 
 activity_uri = "https://w3id.org/pink/activity/activity0"
 
-query5 = f"""
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-PREFIX ssbd: <https://w3id.org/ssbd/>
-PREFIX dcterms: <http://purl.org/dc/terms/>
-PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-
-SELECT DISTINCT
-  ?activity
-  ?software
-  (COALESCE(?softwarePrefLabel, ?softwareLabel, ?softwareTitle, STR(?software)) AS ?softwareName)
-WHERE {{
-  BIND(<{activity_uri}> AS ?activity)
-
-  ?activity rdfs:subClassOf ?restriction .
-
-  ?restriction a owl:Restriction ;
-               owl:onProperty ssbd:hasSoftware ;
-               owl:hasValue ?software .
-
-  OPTIONAL {{ ?software skos:prefLabel ?softwarePrefLabel . }}
-  OPTIONAL {{ ?software rdfs:label ?softwareLabel . }}
-  OPTIONAL {{ ?software dcterms:title ?softwareTitle . }}
-}}
-ORDER BY ?softwareName
-"""
-
-results5 = kb.query(query5)
-
-
-
-
 target_property = "http://www.semanticweb.org/ontologies/cheminf.owl#CHEMINF_000085"
 
 
 target_property = "http://semanticscience.org/resource/CHEMINF_000085"
 
-query_all = f"""
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-PREFIX owl:  <http://www.w3.org/2002/07/owl#>
-PREFIX emmo: <https://w3id.org/emmo#>
-PREFIX datasettype: <https://pink-project.eu/datasettype/>
-PREFIX cheminf: <http://semanticscience.org/resource/>
-PREFIX ssbd: <https://w3id.org/ssbd/>
-PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
-PREFIX dcterms: <http://purl.org/dc/terms/>
-
-SELECT DISTINCT ?software
-
-WHERE {{
-  # 1. Find subclasses of the requested CHEMINF property
-  ?propertyClass rdfs:subClassOf+ <{target_property}> .
-
-  # 2. Find dataset types that have this property class as datum
-  # Are not considering datamoedels with uri neq to datasettype
-  ?datasetType rdfs:subClassOf+ ssbd:Dataset ;
-               rdfs:subClassOf ?datasetRestriction .
-
-  ?datasetRestriction a owl:Restriction ;
-                      owl:onProperty emmo:EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e .
-
-  {{
-    ?datasetRestriction owl:onClass ?propertyClass .
-  }}
-  UNION
-  {{
-    ?datasetRestriction ?datasetRestrictionType ?propertyClass .
-    VALUES ?datasetRestrictionType {{
-      owl:someValuesFrom
-      owl:allValuesFrom
-      owl:hasValue
-    }}
-  }}
-
-  # 3. Find assessments/activities that have this dataset type as input
-  ?assessment rdfs:subClassOf+ ssbd:Assessment ;
-              rdfs:subClassOf ?inputRestriction .
-
-  ?inputRestriction a owl:Restriction ;
-                    owl:onProperty ssbd:hasInput .
-
-  {{
-    ?inputRestriction owl:onClass ?datasetType .
-  }}
-  UNION
-  {{
-    ?inputRestriction ?inputRestrictionType ?datasetType .
-    VALUES ?inputRestrictionType {{
-      owl:someValuesFrom
-      owl:allValuesFrom
-      owl:hasValue
-    }}
-  }}
-
-  # 4. Find software used by those assessments/activities
-  ?assessment rdfs:subClassOf ?softwareRestriction .
-
-  ?softwareRestriction a owl:Restriction ;
-                       owl:onProperty ssbd:hasSoftware ;
-                       owl:hasValue ?software .
-
-  OPTIONAL {{ ?propertyClass rdfs:label ?propertyLabel . }}
-
-  OPTIONAL {{ ?datasetType rdfs:label ?datasetLabel . }}
-  OPTIONAL {{ ?datasetType skos:prefLabel ?datasetPrefLabel . }}
-
-  OPTIONAL {{ ?assessment rdfs:label ?assessmentLabel . }}
-  OPTIONAL {{ ?assessment skos:prefLabel ?assessmentPrefLabel . }}
-  OPTIONAL {{ ?assessment dcterms:title ?assessmentTitle . }}
-
-  OPTIONAL {{ ?software rdfs:label ?softwareLabel . }}
-  OPTIONAL {{ ?software skos:prefLabel ?softwarePrefLabel . }}
-  OPTIONAL {{ ?software dcterms:title ?softwareTitle . }}
-}}
-ORDER BY ?softwareName ?assessmentName ?datasetName ?propertyName
-"""
-
-results_all = kb.query(query_all)
-
-for row in results_all:
-    print(row)
-
-
-
-
-
-kb.serialize('everything.ttl', format='turtle')
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+# Dataset types with SMILES as datum (the rows of query3)
+results3 = recommender.dataset_types(SMILES_DATUM)
 
+# Assessments taking SMILES as input (the rows of query4)
+results4 = recommender.assessments_for(SMILES)
 
+# Software of an activity (the rows of query5)
+results5 = recommender.activity_software(activity_uri)
 
+for name, parameters in [
+    ("query3", {}),
+    ("query4", {}),
+    ("query5", {"activity": activity_uri}),
+    ("query_all", {"targetProperty": target_property}),
+]:
+    if profiled(name):
+        query(name, **parameters)
 
 
+# Software that can use the target property (cf. query_all), with the
+# full property -> dataset type -> assessment -> software paths.  Use
+# `recommend_all()` for all properties at once.
+results_all = recommender.recommend([target_property])
+for path in results_all:
+    print(
+        path.software_label,
+        path.assessment_label,
+        path.dataset_type_label,
+        path.property_label,
+        sep=" <- ",
+    )
 
 
+# Export one gzipped N-Quads file per source instead of one big turtle
+# file, e.g. `zcat export/*.nq.gz` gives the whole knowledge base
+kbstore.export(args.export, fmt="nq", compress=True)
 
+kbstore.close()
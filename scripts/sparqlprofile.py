@@ -0,0 +1,333 @@
+"""
+Profile SPARQL queries evaluated by rdflib.
+
+`profile_query()` runs a query with rdflib's own evaluator while timing
+every node of its algebra tree (BGP, Join, OPTIONAL, UNION, ...), and
+returns a `Profile` whose `report()` prints the tree with, for each
+node, the number of evaluations, the solutions produced and the time
+spent in it (total and excluding its children).  Nodes are flagged if
+they
+
+- contain property paths (PATH),
+- join groups of patterns that share no variables (CARTESIAN), or
+- take at least a given fraction of the query time themselves (HOT).
+
+Oxigraph stores evaluate queries with their own engine; the profile
+shows how rdflib's evaluator would run the query on them.
+
+rdflib's evaluator calls the module-level ``evaluate.evalPart``, which
+is replaced while a query is profiled.  Profiles are taken one at a
+time, and queries evaluated by other threads meanwhile (like those of
+kbservice.py) are passed through without being recorded.
+
+Usage:
+
+    python scripts/sparqlprofile.py query_all \\
+        targetProperty=http://semanticscience.org/resource/CHEMINF_000085
+    python scripts/sparqlprofile.py --file query.rq
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+from rdflib import Graph, URIRef, Variable
+from rdflib.paths import Path
+from rdflib.plugins.sparql import evaluate, prepareQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.plugins.sparql.sparql import Query
+from rdflib.term import Node
+
+# Names of the algebra nodes in the SPARQL syntax
+SYNTAX = {"LeftJoin": "OPTIONAL", "Union": "UNION", "Minus": "MINUS"}
+
+# Child nodes of the algebra nodes
+CHILDREN = ("p", "p1", "p2")
+
+# Held while evaluate.evalPart is replaced
+_PATCH_LOCK = threading.Lock()
+
+
+@dataclass
+class NodeStats:
+    """Statistics of an algebra node.
+
+    Attributes:
+        calls: Number of times the node was evaluated.
+        solutions: Number of solutions it produced in total.
+        time: Time spent evaluating the node, including its children.
+    """
+
+    calls: int = 0
+    solutions: int = 0
+    time: float = 0.0
+
+
+def _variables(part: CompValue) -> Set[Variable]:
+    return set(getattr(part, "_vars", None) or ())
+
+
+def _components(triples: List[tuple], bound: Set[Variable]) -> int:
+    """Return the number of groups of `triples` connected by (unbound)
+    variables."""
+    parent: Dict[Variable, Variable] = {}
+
+    def find(var):
+        while parent.setdefault(var, var) != var:
+            var = parent[var]
+        return var
+
+    roots = set()
+    for triple in triples:
+        variables = [
+            t for t in triple if isinstance(t, Variable) and t not in bound
+        ]
+        if not variables:
+            continue
+        root = find(variables[0])
+        for var in variables[1:]:
+            parent[find(var)] = root
+    for triple in triples:
+        for t in triple:
+            if isinstance(t, Variable) and t not in bound:
+                roots.add(find(t))
+                break
+    return len(roots)
+
+
+class Profile:
+    """Statistics of the algebra nodes of a query evaluation.
+
+    Attributes:
+        query: The prepared query.
+        bound: Variables bound by the initial bindings.
+        stats: Dict mapping the ids of the algebra nodes to their
+            `NodeStats`.
+        total: Time of the whole evaluation.
+        rows: Number of result rows.
+    """
+
+    def __init__(self, query: Query, bound: Set[Variable]):
+        self.query = query
+        self.bound = bound
+        self.stats: Dict[int, NodeStats] = {}
+        self.total = 0.0
+        self.rows = 0
+
+    def _iterate(self, solutions, stats: NodeStats):
+        """Yield `solutions`, timing the work of producing each."""
+        iterator = iter(solutions)
+        while True:
+            start = time.perf_counter()
+            try:
+                solution = next(iterator)
+            except StopIteration:
+                stats.time += time.perf_counter() - start
+                return
+            stats.time += time.perf_counter() - start
+            stats.solutions += 1
+            yield solution
+
+    def wrap(self, evalpart):
+        """Return `evalpart` (rdflib's evalPart) recording statistics of
+        the evaluations in the current thread."""
+        thread = threading.get_ident()
+
+        def evalPart(ctx, part):  # pylint: disable=invalid-name
+            if threading.get_ident() != thread:
+                return evalpart(ctx, part)
+            stats = self.stats.setdefault(id(part), NodeStats())
+            stats.calls += 1
+            start = time.perf_counter()
+            result = evalpart(ctx, part)
+            stats.time += time.perf_counter() - start
+            if isinstance(result, Mapping):  # query forms
+                if "bindings" in result:
+                    result["bindings"] = self._iterate(
+                        result["bindings"], stats
+                    )
+                return result
+            return self._iterate(result, stats)
+
+        return evalPart
+
+    def nodes(self) -> Iterator[Tuple[int, CompValue]]:
+        """Yield (depth, node) for the nodes of the algebra tree."""
+        stack = [(0, self.query.algebra)]
+        while stack:
+            depth, part = stack.pop()
+            yield depth, part
+            for key in reversed(CHILDREN):
+                child = part.get(key)
+                if isinstance(child, CompValue) and id(child) in self.stats:
+                    stack.append((depth + 1, child))
+
+    def self_time(self, part: CompValue) -> float:
+        """Return the time spent in `part`, excluding its children."""
+        stats = self.stats.get(id(part), NodeStats())
+        children = sum(
+            self.stats[id(part[key])].time
+            for key in CHILDREN
+            if isinstance(part.get(key), CompValue)
+            and id(part[key]) in self.stats
+        )
+        return max(0.0, stats.time - children)
+
+    def flags(self, part: CompValue, hot: float = 0.2) -> List[str]:
+        """Return the flags of `part`.
+
+        Parameters:
+            part: Node of the algebra tree.
+            hot: Fraction of the query time above which the node is
+                flagged as HOT.
+        """
+        flags = []
+        if part.name == "BGP":
+            if any(isinstance(t[1], Path) for t in part.triples):
+                flags.append("PATH")
+            if _components(part.triples, self.bound) > 1:
+                flags.append("CARTESIAN")
+        elif part.name in ("Join", "LeftJoin"):
+            left = _variables(part.p1) - self.bound
+            right = _variables(part.p2) - self.bound
+            if left and right and not left & right:
+                flags.append("CARTESIAN")
+        if self.total and self.self_time(part) >= hot * self.total:
+            flags.append(f"HOT {self.self_time(part) / self.total:.0%}")
+        return flags
+
+    def _label(self, part: CompValue) -> str:
+        name = part.name
+        if name in SYNTAX:
+            name = f"{SYNTAX[name]} ({name})"
+        return name
+
+    def _triples(self, part: CompValue) -> List[str]:
+        nsm = self.query.prologue.namespace_manager
+        return [
+            " ".join(
+                t.n3(nsm) if isinstance(t, (Node, Path)) else str(t)
+                for t in triple
+            )
+            for triple in part.triples
+        ]
+
+    def report(self, hot: float = 0.2) -> str:
+        """Return the profile as an indented algebra tree."""
+        lines = [
+            f"{self.rows} rows in {self.total:.4f} s",
+            f"{'node':48} {'calls':>7} {'rows':>8} {'total s':>9} "
+            f"{'self s':>9}  flags",
+        ]
+        for depth, part in self.nodes():
+            stats = self.stats.get(id(part), NodeStats())
+            label = "  " * depth + self._label(part)
+            lines.append(
+                f"{label:48} {stats.calls:7} {stats.solutions:8} "
+                f"{stats.time:9.4f} {self.self_time(part):9.4f}  "
+                + ", ".join(self.flags(part, hot))
+            )
+            if part.name == "BGP":
+                for triple in self._triples(part):
+                    lines.append("  " * (depth + 2) + triple)
+        hottest = sorted(
+            (p for _, p in self.nodes()), key=self.self_time, reverse=True
+        )[:3]
+        lines.append("Most expensive nodes:")
+        for part in hottest:
+            lines.append(
+                f"  {self._label(part)}: {self.self_time(part):.4f} s "
+                f"{', '.join(self.flags(part, hot))}"
+            )
+        return "\n".join(lines)
+
+
+def profile_query(
+    graph: Graph,
+    query: Union[str, Query],
+    initBindings: Optional[Mapping[str, Node]] = None,
+) -> Tuple[Profile, list]:
+    """Evaluate `query` on `graph` with rdflib and profile it.
+
+    Parameters:
+        graph: Graph to query.
+        query: SPARQL query, as text or prepared.
+        initBindings: Initial variable bindings.
+
+    Returns:
+        Tuple of (profile, result rows).
+    """
+    # pylint: disable=invalid-name
+    if isinstance(query, str):
+        query = prepareQuery(query)
+    initBindings = dict(initBindings or {})
+    profile = Profile(query, {Variable(name) for name in initBindings})
+    with _PATCH_LOCK:
+        original = evaluate.evalPart
+        evaluate.evalPart = profile.wrap(original)
+        try:
+            start = time.perf_counter()
+            result = evaluate.evalQuery(graph, query, initBindings)
+            rows = list(result["bindings"])
+            profile.total = time.perf_counter() - start
+        finally:
+            evaluate.evalPart = original
+    profile.rows = len(rows)
+    return profile, rows
+
+
+def main() -> None:
+    """Profile a query on the persistent knowledge base."""
+    import argparse
+
+    from kbstore import STORE_DIR, open_kb
+    from queries import registry
+
+    parser = argparse.ArgumentParser(
+        description="Profile a SPARQL query on the PINK knowledge base."
+    )
+    parser.add_argument(
+        "query",
+        nargs="?",
+        help=f"Name of a registered query: {', '.join(registry)}.",
+    )
+    parser.add_argument(
+        "parameters",
+        nargs="*",
+        help="Query parameters as name=IRI.",
+    )
+    parser.add_argument("--file", help="File with a SPARQL query.")
+    parser.add_argument("--store", default=str(STORE_DIR))
+    parser.add_argument(
+        "--hot",
+        type=float,
+        default=0.2,
+        help="Flag nodes taking at least this fraction of the time.",
+    )
+    args = parser.parse_args()
+    if not args.query and not args.file:
+        parser.error("give a query name or --file")
+
+    if args.file:
+        with open(args.file, "rt", encoding="utf-8") as f:
+            query = f.read()
+        if args.query:
+            args.parameters.insert(0, args.query)
+    else:
+        query = registry[args.query].prepared
+    bindings = {}
+    for parameter in args.parameters:
+        name, value = parameter.split("=", 1)
+        bindings[name] = URIRef(value)
+
+    _, kbstore = open_kb(path=args.store)
+    try:
+        profile, _ = profile_query(kbstore.dataset, query, bindings)
+    finally:
+        kbstore.close()
+    print(profile.report(hot=args.hot))
+
+
+if __name__ == "__main__":
+    main()
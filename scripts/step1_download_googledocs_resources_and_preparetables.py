@@ -6,13 +6,18 @@ This script downloads, parses and corrects data from the
 google spreadsheet before it is saved to a csv file. 
 The csv files are then used in the next step to create 
 triples and save them to the triplestore.
+
+The time, memory and counts of each stage are added to metrics.json
+(see instrument.py).
 """
 
+import logging
 import sys
 from pathlib import Path
 
 import pandas as pd
 from ontopy import get_ontology
+from rdflib import Graph
 from tripper import Triplestore
 from tripper.datadoc import (
     get_context,
@@ -23,18 +28,29 @@ from tripper.datadoc import (
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 
+import parseutils
+import rowdelta
 from parseutils import (
     PREFIXES as prefixes,
     convert_to_iri,
     correct_pink_dataframes,
+    list_columns,
     merge_columns,
 )
+from rowdelta import incremental_correct, row_keys, version_hash
+from instrument import setup_logging, span, write_metrics
+from validation.documentloader import cached_path, default_loader
+from validation.frames import FrameValidator
 
+setup_logging()
+logger = logging.getLogger("step1")
 
 
 # import the pink ontology for accessing labels and
 # convert to IRIs (just before storing into the triplestore)
-onto = get_ontology("https://ssbd-ontology.github.io/core/core-inferred.ttl").load()
+ONTOLOGY_URL = "https://ssbd-ontology.github.io/core/core-inferred.ttl"
+with span("download"):
+    onto = get_ontology(ONTOLOGY_URL).load()
 
 # Get data from Google Sheets
 # Software documentation
@@ -43,7 +59,9 @@ SW_URL = (
     "1o1buVRFL5wIrFxGDG6Oo7EDnA7dgxxoZRpa2JpwX0BU/export?format=csv&"
     "gid=1707023773"
 )
-sw = pd.read_csv(SW_URL)
+with span("download") as s:
+    sw = pd.read_csv(SW_URL)
+    s.count("rows", len(sw))
 
 # Dataset documentation
 DATASETTYPE_URL = (
@@ -51,7 +69,9 @@ DATASETTYPE_URL = (
     "1o1buVRFL5wIrFxGDG6Oo7EDnA7dgxxoZRpa2JpwX0BU/export?format=csv&"
     "gid=1581267372"
 )
-datasettypes = pd.read_csv(DATASETTYPE_URL)
+with span("download") as s:
+    datasettypes = pd.read_csv(DATASETTYPE_URL)
+    s.count("rows", len(datasettypes))
 
 # Make a datamodel dataframe from the dataset documentation, by selecting the columns that start with "Datum"
 # @id will be set to the value in column "datamodel"
@@ -102,16 +122,50 @@ datamodels.to_csv("datamodels.csv", index=False)
 
 
 # Get pink keywords
-kw = get_keywords(theme=None)
-kw.load_yaml(
-    "https://raw.githubusercontent.com/ssbd-ontology/core/refs/"
-    "heads/gh-pages/context/keywords.yaml",
-    redefine="allow",
+with span("download"):
+    kw = get_keywords(theme=None)
+    kw.load_yaml(
+        cached_path(
+            "https://raw.githubusercontent.com/ssbd-ontology/core/refs/"
+            "heads/gh-pages/context/keywords.yaml"
+        ),
+        redefine="allow",
+    )
+
+    context = get_context(
+        cached_path("https://w3id.org/ssbd/context/"), theme=None
+    )
+
+# Rows that cannot pass the SHACL validation in step 2 are rejected
+# already when correcting the tables (see validation/frames.py)
+SHAPES_URLS = [
+    "https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/"
+    "gh-pages/shacl/shapes.ttl",
+    "https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/"
+    "gh-pages/shacl/shapes-ssbd.ttl",
+]
+with span("download"):
+    shapes = Graph()
+    for url in SHAPES_URLS:
+        shapes.parse(cached_path(url), format="turtle")
+    frames = FrameValidator(
+        shapes,
+        default_loader().context("https://w3id.org/ssbd/context/"),
+        prefixes=prefixes,
+        list_columns=list_columns,
+    )
+
+# The stored corrected rows are reused as long as the ontology, the
+# shapes, the correcting functions (of parseutils and of this script)
+# and the row handling are the same
+VERSION = version_hash(
+    Path(cached_path(ONTOLOGY_URL)),
+    *(Path(cached_path(url)) for url in SHAPES_URLS),
+    Path(parseutils.__file__),
+    Path(__file__),
+    Path(rowdelta.__file__),
 )
 
-context = get_context(
-    "https://w3id.org/ssbd/context/", theme=None
-)
 # Create the computatations documentation dataframe,
 # and copy/move relevant columns from the software documentation dataframe.
 ssbd_cols = [col for col in sw.columns if col.startswith("SSbD Assessment")]
@@ -125,7 +179,7 @@ comp = sw[activity_columns + ["title"]]
 sw = sw.drop(columns=activity_columns)
 
 # Correct software documentation dataframe
-print("PREPARING SW DOCUMENTATION")
+logger.info("PREPARING SW DOCUMENTATION")
 # Clean up the chemicalClass,
 # which is currently in three columns for easier annotation in the spreadsheet.
 chemicalclass_cols = [
@@ -143,18 +197,30 @@ sw = sw.drop(columns=["indicator"])
 
 sw["@type"] = "pink:Software"
 
-expanded_sw = correct_pink_dataframes(sw, onto)
-# A bit cumbersome to write file, I am sure there are better ways
-
-expanded_sw.to_csv("sw_clean.csv", index=False)
+# Only rows that were added or changed since the last run are corrected.
+# Writes sw_clean.csv (full table) and sw_delta.csv (changed rows).
+sw_delta = incremental_correct(
+    "sw",
+    sw,
+    lambda df: correct_pink_dataframes(df, onto, frames),
+    version=VERSION,
+)
 
 # Correct the computations documentation dataframe
 
 #print("PREPARING COMPUTATION TYPE DOCUMENTATION")
 
 # Make sure that the activity is related to the sofware.
-# NB! ordering in dataframe cannot have changed!
-comp["hasSoftware"] = expanded_sw["@id"]
+# The software @id is taken from the uncorrected table (aligned on the
+# index), since only changed software rows are corrected above.
+comp["hasSoftware"] = row_keys(sw)
+
+# Activities of software rows that were rejected (and are not in
+# sw_clean.csv) would refer to missing resources
+rejected = comp["hasSoftware"].isin(sw_delta.rejected)
+for key in comp.loc[rejected, "hasSoftware"]:
+    logger.warning("comp: dropping the activity of rejected %s", key)
+comp = comp[~rejected]
 
 # Create a unique id (@id) for each activity in the comp dspreadsheet
 comp["@id"] = comp.apply(
@@ -178,16 +244,24 @@ comp.drop(
     inplace=True,
 )
 
-expanded_comp = correct_pink_dataframes(comp, onto)
-expanded_comp.to_csv("comp_clean.csv", index=False)
+incremental_correct(
+    "comp",
+    comp,
+    lambda df: correct_pink_dataframes(df, onto, frames),
+    version=VERSION,
+)
 
 # Datasettype
-print("PREPARING DATASETTYPE DOCUMENTATION")
+logger.info("PREPARING DATASETTYPE DOCUMENTATION")
 # Drop indicator
 datasettypes["@type"] = [["owl:Class"]] * len(datasettypes)
 
 datasettypes = datasettypes.drop(columns=["indicator"])
-expanded_datasettypes = correct_pink_dataframes(datasettypes, onto)
-expanded_datasettypes.to_csv("datasettypes_clean.csv", index=False)
-
+incremental_correct(
+    "datasettypes",
+    datasettypes,
+    lambda df: correct_pink_dataframes(df, onto, frames),
+    version=VERSION,
+)
 
+write_metrics("step1")
@@ -7,31 +7,57 @@ and converts them to RDF triples using the TableDoc class
 from the tripper library. 
 It then validates the generated RDF against SHACL shapes and 
 saves the valid triples to a jsonlid file for later upload to the PINK KB.
+
+If step 1 has stored row deltas, only the added and changed rows (and
+the resources referring to changed or removed ones) are validated, and
+the previous snapshot is updated. The triples to add and remove are
+written to googlespreadsheet_resources.{add,remove}.nt. The row state of
+step 1 is only promoted when the validation passes, such that a failed
+run is validated again after the next run of step 1.
+
+The time, memory and counts of each stage are added to metrics.json
+(see instrument.py).
 """
 
-import json
+import logging
+import os
 import sys
 from pathlib import Path
+from typing import Optional
 
+from rdflib import SH, Graph
 from tripper import Triplestore
-from tripper.datadoc import get_context, store
 
 # from tripper.datadoc.dataset import update_context
-from tripper.datadoc.tabledoc import TableDoc
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 # pylint: disable=wrong-import-position,import-error
-from validation.validate import load_shapes, shacl_validate
+from validation.sharded import validate_sharded
+from validation.validate import load_shapes
 
 from parseutils import (
     PREFIXES as prefixes,
 )
+from jsonldwriter import load_jsonld, write_jsonld
+from tabledocs import convert_tables
+from rowdelta import (
+    RowDelta,
+    apply_jsonld_delta,
+    apply_triple_delta,
+    expand_ids,
+    load_delta,
+    promote_state,
+    referring_subjects,
+    triple_delta,
+)
+from instrument import count, setup_logging, span, write_metrics
 
+setup_logging()
+logger = logging.getLogger("step2")
 
-context = get_context(
-    "https://w3id.org/ssbd/context/", theme=None
-)
+
+CONTEXT_URL = "https://w3id.org/ssbd/context/"
 
 # NB! This is the context created from the SSbD core ontology
 # If ontology classes that are not in this ontology are
@@ -41,34 +67,64 @@ context = get_context(
 # a dict of list of dicts with classes defined. 
 
 
-datasettypedocumentation = TableDoc.parse_csv(
-    "datasettypes_clean.csv",
-    context=context,
-    prefixes=prefixes,
-)
-
+# Tables prepared in step 1.  If step 1 has stored a row delta for all
+# of them and a previous snapshot exists, only the added and changed rows
+# (in the <name>_delta.csv files) are converted and validated.
+TABLES = ["datasettypes", "sw", "comp"]
+SNAPSHOT_TTL = Path("googlespreadsheet_resources.ttl")
+SNAPSHOT_JSONLD = Path("jsonld/pink_googlespreadsheet_resources.jsonld")
 
-swdocumentation = TableDoc.parse_csv(
-    "sw_clean.csv",
-    context=context,
-    prefixes=prefixes,
-)
+# Output mode of the JSON-LD snapshot: "indent", "compact" or "ndjson"
+# (see jsonldwriter.py)
+JSONLD_MODE = "indent"
 
+# Number of processes validating the data graph in shards, 1 to validate
+# in this process (see validation/sharded.py)
+VALIDATION_WORKERS = int(os.environ.get("PINK_VALIDATION_WORKERS", "1"))
 
-compdocumentation = TableDoc.parse_csv(
-    "comp_clean.csv", 
-    context=context, 
-    prefixes=prefixes
+deltas = {name: load_delta(name) for name in TABLES}
+incremental = (
+    all(d is not None for d in deltas.values())
+    and SNAPSHOT_TTL.exists()
+    and SNAPSHOT_JSONLD.exists()
 )
-
-# Put all created resources into a list of dicts
-resources = datasettypedocumentation.asdicts() + swdocumentation.asdicts() +  compdocumentation.asdicts()
-
-# Create the local triplestore to make the graph
+delta = RowDelta()
+for d in deltas.values():
+    if d is not None:
+        delta.update(d)
+
+# Convert the tables in parallel (one worker and triple buffer per table)
+# and merge the triples into the local triplestore.
+if incremental:
+    csvfiles = [
+        f"{name}_delta.csv"
+        for name, d in deltas.items()
+        if d is not None and d.processed
+    ]
+else:
+    csvfiles = [f"{name}_clean.csv" for name in TABLES]
 ts = Triplestore("rdflib")
-
-# Store in the graph
-jsonld = store(ts, resources, context=context, prefixes=prefixes)
+logger.info("CONVERTING TABLES")
+jsonld = convert_tables(ts, csvfiles, context=CONTEXT_URL, prefixes=prefixes)
+
+if incremental:
+    logger.info("Incremental update: %s", delta.asdict())
+    snapshot = Graph().parse(SNAPSHOT_TTL, format="turtle")
+    add, remove = triple_delta(
+        snapshot, ts.backend.graph, expand_ids(delta.stale, prefixes)
+    )
+    apply_triple_delta(snapshot, add, remove)
+    data_graph = snapshot
+    # Resources referring to changed or removed resources may no longer
+    # conform either (e.g. an activity whose software was removed)
+    focus_nodes: Optional[list] = sorted(
+        expand_ids(delta.processed, prefixes)
+        | referring_subjects(snapshot, expand_ids(delta.stale, prefixes))
+    )
+else:
+    add, remove = ts.backend.graph, Graph()
+    data_graph = ts.backend.graph
+    focus_nodes = None
 
 
 # Get absolute current path to get the validation tool 
@@ -78,50 +134,84 @@ root_path = Path(__file__).parent.parent.resolve()
 validation_path = root_path / "validation"
 
 # Get shacl shapes the ssbd core ontology
-shacl_graph = load_shapes("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes.ttl")
-shacl_graph.parse("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes-ssbd.ttl", format="turtle")
-
-
-# Check validity of graph 
-conforms, results_graph, report = shacl_validate(
-    data_graph=ts.backend.graph,
-    shacl_graph=shacl_graph,
-    inference="rdfs",
-    abort_on_first=False,
-)
+with span("download"):
+    shacl_graph = load_shapes("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes.ttl")
+    shacl_graph.parse("https://raw.githubusercontent.com/ssbd-ontology/core/refs/heads/gh-pages/shacl/shapes-ssbd.ttl", format="turtle")
+
+
+# Check validity of graph. In incremental mode only the added and
+# changed resources and those referring to stale ones are used as focus
+# nodes.
+if incremental and not focus_nodes:
+    conforms, report = True, "No added or changed resources to validate."
+else:
+    with span(
+        "validate",
+        triples=len(data_graph),
+        focus_nodes=len(focus_nodes or ()),
+    ):
+        conforms, results_graph, report = validate_sharded(
+            data_graph=data_graph,
+            shacl_graph=shacl_graph,
+            max_workers=VALIDATION_WORKERS,
+            inference="rdfs",
+            abort_on_first=False,
+            focus_nodes=focus_nodes,
+        )
+    count(
+        "violations",
+        len(set(results_graph.subjects(SH.resultSeverity, SH.Violation))),
+    )
 
 
 if not conforms:
-    print("Validation failed.")
-    print(report)
+    logger.error("Validation failed.\n%s", report)
 
 if conforms:
-    print("Validation passed")
-    print("unfortunately direct pushing is no longer possible")
-    print("making a jsonld from my graph")
-    ts.serialize("googlespreadsheet_resources.ttl", format="turtle")
-    
+    logger.info("Validation passed")
+    logger.info("unfortunately direct pushing is no longer possible")
+    logger.info("making a jsonld from my graph")
+    with span("serialize", triples=len(data_graph)):
+        data_graph.serialize(SNAPSHOT_TTL, format="turtle")
+
+        # Triples to add to and remove from the KB since the last run
+        add.serialize("googlespreadsheet_resources.add.nt", format="nt")
+        remove.serialize(
+            "googlespreadsheet_resources.remove.nt", format="nt"
+        )
+    logger.info("Delta: %d triples to add, %d to remove", len(add), len(remove))
+    count("triples_added", len(add))
+    count("triples_removed", len(remove))
+
+    if incremental:
+        doc = load_jsonld(SNAPSHOT_JSONLD, mode=JSONLD_MODE)
+        jsonld = apply_jsonld_delta(
+            doc, jsonld.get("@graph", []), delta.stale, prefixes
+        )
 
     # Store the jsonlds for joh
-    with open('jsonld/pink_googlespreadsheet_resources.jsonld', 'wt') as f: 
-        json.dump(jsonld, f, indent=2)
+    with span("serialize"):
+        write_jsonld(SNAPSHOT_JSONLD, jsonld, mode=JSONLD_MODE)
+
+    # The tables of step 1 are now validated
+    for name in TABLES:
+        promote_state(name)
 
 
 
-    # Connect to PINK KB
+    # Upload to the PINK KB.  Triples are sent in chunks over a pooled
+    # connection instead of one request per triple.  The delta files
+    # can also be uploaded with scripts/bulkupload.py
     #username = keyring.get_password("PINK_graphdb", "username")
     #password = keyring.get_password("PINK_graphdb", "password")
 
-    #kb = Triplestore(
-    #    backend="sparqlwrapper", 
-    #    base_iri="https://graphdb.pink-project.eu/repositories/testing", 
-    #    username=username, 
-    #    password=password, 
-    #    update_iri="https://graphdb.pink-project.eu/repositories/testing/statements",
-    #    )
-    #for s, p, o in ts.triples():
-    #    kb.add((s, p, o))
-
-    #print(search(kb))
-
+    #from bulkupload import BulkUploader
+    #with BulkUploader(
+    #    "https://graphdb.pink-project.eu/repositories/testing/statements",
+    #    username=username,
+    #    password=password,
+    #) as uploader:
+    #    print(uploader.delete(remove))
+    #    print(uploader.insert(add))
 
+write_metrics("step2")
@@ -1,26 +1,21 @@
-from dlite.table import DMTable
-from dlite import get_instance
-from tripper import Triplestore
-from dlite.dataset import add_dataset
+"""
+Generate the DLite datamodels defined in datamodels.csv (written by
+step 1) and write them as RDF to datamodels.nt.
 
-# create triplestore as helper for 
-# making datamodels into rdf
-ts = Triplestore('rdflib')
+The datamodels are generated in a process pool, and the triples of each
+datamodel are cached in `dmcache/` by a hash of its row, so only added
+or changed rows are generated again (see dmtables.py).  The cache
+statistics are added to metrics.json (see instrument.py).
+"""
+import logging
 
-# Parse the csv table
-print('parsing csv')
-dmtable = DMTable.from_csv("datamodels.csv", unit_handling="ignore")
-print('finished parsing csv')
+from dmtables import generate_datamodels
+from instrument import setup_logging, write_metrics
 
-# Create the datamodels
-print('creating datamodels')
-dmtable.get_datamodels()
-print('finished creating datamodels')
+setup_logging()
+logger = logging.getLogger("step3")
 
-dmtable.to_triplestore(ts)
-
-print('finished putting into ts')
-
-print('serializing to turtle')
-ts.serialize('datamodels.ttl', format='turtle')
-print('finished serializing to turtle')
+logger.info('creating datamodels')
+stats = generate_datamodels("datamodels.csv", "datamodels.nt")
+logger.info('finished creating datamodels: %s', stats)
+write_metrics("step3")
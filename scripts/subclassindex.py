@@ -0,0 +1,253 @@
+"""
+Precomputed transitive closure of ``rdfs:subClassOf``.
+
+SPARQL property paths like ``?c rdfs:subClassOf+ ssbd:Dataset`` are
+evaluated by rdflib with a new graph walk for every binding, which
+makes the queries in `search_pink_kb.py` slow on the full ontology.
+
+`SubClassIndex` numbers all classes and stores the descendants of each
+class as a bitset (a Python int).  Cycles (equivalent classes declared
+as mutual subclasses) are handled by collapsing strongly connected
+components first.  The closure is available from Python through
+`is_subclass()`, `descendants()` and `ancestors()`, and can be
+materialised as ``pink:subClassOfTransitive`` triples, such that
+
+    ?c pink:subClassOfTransitive ssbd:Dataset .
+
+matches exactly the named classes matched by
+
+    ?c rdfs:subClassOf+ ssbd:Dataset .
+"""
+
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from rdflib import RDFS, BNode, Graph, Namespace, URIRef
+
+PINK = Namespace("https://pink-project.eu/")
+SUBCLASSOF_TRANSITIVE = PINK.subClassOfTransitive
+
+# Named graph holding the materialised closure in the KB store
+CLOSURE_GRAPH = URIRef("https://pink-project.eu/graph/subclass-closure")
+
+
+def _bits(mask: int) -> Iterator[int]:
+    """Yield the positions of the set bits in `mask`."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _sccs(nodes: int, edges: List[List[int]]) -> List[int]:
+    """Return the strongly connected component of each node.
+
+    Iterative Tarjan.  Components are numbered in reverse topological
+    order, i.e. a component is numbered before all components pointing
+    to it.
+    """
+    index = [-1] * nodes
+    low = [0] * nodes
+    onstack = [False] * nodes
+    comp = [-1] * nodes
+    stack: List[int] = []
+    counter = ncomp = 0
+    for root in range(nodes):
+        if index[root] >= 0:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, i = work.pop()
+            if i == 0:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                onstack[node] = True
+            recurse = False
+            for j in range(i, len(edges[node])):
+                child = edges[node][j]
+                if index[child] < 0:
+                    work.append((node, j + 1))
+                    work.append((child, 0))
+                    recurse = True
+                    break
+                if onstack[child]:
+                    low[node] = min(low[node], index[child])
+            if recurse:
+                continue
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    onstack[member] = False
+                    comp[member] = ncomp
+                    if member == node:
+                        break
+                ncomp += 1
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+    return comp
+
+
+class SubClassIndex:
+    """Transitive closure of ``rdfs:subClassOf`` in a graph.
+
+    Parameters:
+        graph: Graph (or Dataset with a union default graph) to index.
+        pairs: Alternatively, an iterable of (subclass, superclass)
+            pairs to index instead of the subClassOf triples of `graph`.
+
+    The closure follows the semantics of ``rdfs:subClassOf+``: a class
+    is only its own subclass if it is part of a cycle.
+    """
+
+    def __init__(
+        self,
+        graph: Optional[Graph] = None,
+        pairs: Optional[Iterable[Tuple]] = None,
+    ):
+        if pairs is None:
+            if graph is None:
+                raise ValueError("either graph or pairs must be given")
+            pairs = graph.subject_objects(RDFS.subClassOf, unique=True)
+        self.classes: List = []
+        self.numbers: Dict = {}
+        down: List[List[int]] = []  # superclass -> subclasses
+        up: List[List[int]] = []  # subclass -> superclasses
+
+        def number(cls) -> int:
+            n = self.numbers.get(cls)
+            if n is None:
+                n = self.numbers[cls] = len(self.classes)
+                self.classes.append(cls)
+                down.append([])
+                up.append([])
+            return n
+
+        for sub, sup in pairs:
+            s, o = number(sub), number(sup)
+            down[o].append(s)
+            up[s].append(o)
+
+        self._down = self._closure(down)
+        self._up = self._closure(up)
+
+    def _closure(self, edges: List[List[int]]) -> List[int]:
+        """Return bitsets of all nodes reachable with one or more edges."""
+        nodes = len(edges)
+        comp = _sccs(nodes, edges)
+        ncomp = max(comp) + 1 if nodes else 0
+        members = [0] * ncomp
+        cyclic = [False] * ncomp
+        for node in range(nodes):
+            members[comp[node]] |= 1 << node
+        for node, children in enumerate(edges):
+            for child in children:
+                if comp[child] == comp[node]:
+                    cyclic[comp[node]] = True
+
+        # Components are numbered such that the targets of all edges of
+        # a component are numbered before the component itself
+        reach = [0] * ncomp
+        for node, children in sorted(
+            enumerate(edges), key=lambda item: comp[item[0]]
+        ):
+            c = comp[node]
+            mask = reach[c]
+            for child in children:
+                cc = comp[child]
+                if cc != c:
+                    mask |= members[cc] | reach[cc]
+            reach[c] = mask
+        for c in range(ncomp):
+            if cyclic[c]:
+                reach[c] |= members[c]
+        return [reach[comp[node]] for node in range(nodes)]
+
+    def __len__(self) -> int:
+        return len(self.classes)
+
+    def __contains__(self, cls) -> bool:
+        return cls in self.numbers
+
+    def is_subclass(self, sub, sup) -> bool:
+        """Return whether `sub` is a (direct or indirect) subclass of `sup`.
+
+        Corresponds to the SPARQL pattern ``sub rdfs:subClassOf+ sup``.
+        """
+        s = self.numbers.get(sub)
+        o = self.numbers.get(sup)
+        if s is None or o is None:
+            return False
+        return bool(self._down[o] >> s & 1)
+
+    def descendants(self, cls) -> Set:
+        """Return all (direct and indirect) subclasses of `cls`."""
+        n = self.numbers.get(cls)
+        if n is None:
+            return set()
+        return {self.classes[i] for i in _bits(self._down[n])}
+
+    def ancestors(self, cls) -> Set:
+        """Return all (direct and indirect) superclasses of `cls`."""
+        n = self.numbers.get(cls)
+        if n is None:
+            return set()
+        return {self.classes[i] for i in _bits(self._up[n])}
+
+    def pairs(self, named: bool = True) -> Iterator[Tuple]:
+        """Yield all (subclass, superclass) pairs of the closure.
+
+        If `named` is true, pairs with blank nodes are skipped.
+        """
+        classes = self.classes
+        for o, mask in enumerate(self._down):
+            sup = classes[o]
+            if named and isinstance(sup, BNode):
+                continue
+            for s in _bits(mask):
+                sub = classes[s]
+                if not (named and isinstance(sub, BNode)):
+                    yield sub, sup
+
+    def materialise(
+        self, graph: Graph, predicate: URIRef = SUBCLASSOF_TRANSITIVE
+    ) -> int:
+        """Add the closure to `graph` as ``pink:subClassOfTransitive``.
+
+        Only pairs of named classes are added.
+
+        Returns:
+            Number of added triples.
+        """
+        triples = [(s, predicate, o) for s, o in self.pairs()]
+        graph.addN((s, p, o, graph) for s, p, o in triples)
+        return len(triples)
+
+
+def update_closure(kbstore) -> int:
+    """Materialise the subclass closure in a `kbstore.KBStore`.
+
+    The closure is stored in the named graph `CLOSURE_GRAPH` and only
+    recomputed when the set of loaded sources has changed.
+
+    Returns:
+        Number of closure triples, or -1 if the stored closure is up to
+        date.
+    """
+    key = kbstore.version
+    path = kbstore.path / "closure.json"
+    if kbstore.persistent and path.exists():
+        with open(path, "rt", encoding="utf-8") as f:
+            if json.load(f).get("key") == key:
+                return -1
+
+    dataset = kbstore.dataset
+    dataset.remove_graph(dataset.graph(CLOSURE_GRAPH))
+    index = SubClassIndex(dataset)
+    n = index.materialise(dataset.graph(CLOSURE_GRAPH))
+    if kbstore.persistent:
+        with open(path, "wt", encoding="utf-8") as f:
+            json.dump({"key": key, "classes": len(index), "triples": n}, f)
+    print(f"  materialised {n} subclass closure triples")
+    return n
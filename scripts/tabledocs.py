@@ -0,0 +1,176 @@
+"""
+Parallel conversion of cleaned resource tables to RDF triples.
+
+The datasettype, software and computation tables are independent until
+they are merged into one triplestore.  Each table is parsed with
+`TableDoc.parse_csv` and stored to its own rdflib triplestore (the
+triple buffer of a worker) in a process pool.  The buffers are then
+merged into the target triplestore in bulk.
+
+A remote context is resolved to its file in the document cache once, in
+the parent process, and loaded there before the workers are forked, so
+the workers neither access the cache index nor the network, and forked
+workers inherit the loaded context.
+
+The stage timings of the workers are added to the "download" (loading
+the context), "tabledoc" and "store" spans of `instrument.metrics`.
+"""
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from tripper import Triplestore
+from tripper.datadoc import get_context, store
+from tripper.datadoc.tabledoc import TableDoc
+
+from instrument import record
+from validation.documentloader import cached_path
+
+logger = logging.getLogger(__name__)
+
+# Contexts loaded by this process, keyed by their path
+_CONTEXTS: dict = {}
+
+
+def _context(context):
+    """Return context object for `context`, loading paths only once."""
+    if not isinstance(context, str):
+        return context
+    if context not in _CONTEXTS:
+        _CONTEXTS[context] = get_context(context, theme=None)
+    return _CONTEXTS[context]
+
+
+def convert_table(
+    csvfile: str, context: Union[str, dict], prefixes: dict
+) -> Tuple[list, list, dict, Dict[str, float]]:
+    """Parse a cleaned csv table and convert it to triples.
+
+    Parameters:
+        csvfile: Path to cleaned csv file.
+        context: Path (or dict) of the JSON-LD context.
+        prefixes: Additional prefixes.
+
+    Returns:
+        Tuple of (triples, namespaces, jsonld, timings), where timings
+        maps the stages "context", "parse", "asdicts" and "store" to
+        seconds.
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    ctx = _context(context)
+    t1 = time.perf_counter()
+    timings["context"] = t1 - t0
+
+    documentation = TableDoc.parse_csv(csvfile, context=ctx, prefixes=prefixes)
+    t2 = time.perf_counter()
+    timings["parse"] = t2 - t1
+
+    resources = documentation.asdicts()
+    t3 = time.perf_counter()
+    timings["asdicts"] = t3 - t2
+
+    ts = Triplestore("rdflib")
+    jsonld = store(ts, resources, context=ctx, prefixes=prefixes)
+    timings["store"] = time.perf_counter() - t3
+
+    graph = ts.backend.graph
+    return list(graph), list(graph.namespaces()), jsonld, timings
+
+
+def merge_jsonld(docs: Sequence[dict]) -> dict:
+    """Merge JSON-LD documents returned by `store()` into one document."""
+    context: dict = {}
+    graph: List[dict] = []
+    for doc in docs:
+        context.update(doc.get("@context", {}))
+        if "@graph" in doc:
+            graph.extend(doc["@graph"])
+        elif doc:
+            graph.append({k: v for k, v in doc.items() if k != "@context"})
+    return {"@context": context, "@graph": graph}
+
+
+def convert_tables(
+    ts: Triplestore,
+    csvfiles: Sequence[str],
+    context: Union[str, dict],
+    prefixes: dict,
+    max_workers: Optional[int] = None,
+) -> dict:
+    """Convert cleaned csv tables in parallel and store them in `ts`.
+
+    Parameters:
+        ts: An rdflib triplestore to merge the triples into.
+        csvfiles: Paths to the cleaned csv files.
+        context: Url, path or dict of the JSON-LD context.  A url is
+            resolved through the document cache.
+        prefixes: Additional prefixes.
+        max_workers: Maximum number of worker processes.  Defaults to
+            the number of tables.  If 1, the tables are converted in
+            the current process.
+
+    Returns:
+        Merged JSON-LD document of all stored resources.
+    """
+    if not csvfiles:
+        return {}
+    start = time.perf_counter()
+    if isinstance(context, str):
+        context = str(cached_path(context))
+        _context(context)
+    loaded = time.perf_counter()
+    nworkers = max_workers or len(csvfiles)
+    args = [(csvfile, context, prefixes) for csvfile in csvfiles]
+    if nworkers == 1:
+        results = [convert_table(*a) for a in args]
+    else:
+        # Fork if possible, since the calling scripts (like step 2) are
+        # not guarded by `if __name__ == "__main__"`
+        methods = multiprocessing.get_all_start_methods()
+        mp_context = multiprocessing.get_context(
+            "fork" if "fork" in methods else None
+        )
+        with ProcessPoolExecutor(
+            max_workers=nworkers, mp_context=mp_context
+        ) as executor:
+            futures = [executor.submit(convert_table, *a) for a in args]
+            results = [future.result() for future in futures]
+    converted = time.perf_counter()
+
+    graph = ts.backend.graph
+    for _, namespaces, _, _ in results:
+        for prefix, namespace in namespaces:
+            graph.bind(prefix, namespace, override=False)
+    for triples, _, _, _ in results:
+        graph.addN((s, p, o, graph) for s, p, o in triples)
+    jsonld = merge_jsonld([doc for _, _, doc, _ in results])
+    end = time.perf_counter()
+
+    # Stage timings
+    serial = 0.0
+    for csvfile, (triples, _, _, timings) in zip(csvfiles, results):
+        total = sum(timings.values())
+        serial += total
+        stages = ", ".join(f"{k} {v:.2f} s" for k, v in timings.items())
+        logger.info("%s: %d triples, %s", csvfile, len(triples), stages)
+        record("download", timings["context"])
+        record("tabledoc", timings["parse"] + timings["asdicts"], tables=1)
+        record("store", timings["store"], triples=len(triples))
+    record("download", loaded - start)
+    record("store", end - converted)
+    wall = converted - loaded
+    logger.info(
+        "converted %d tables with %d workers in %.2f s (sum of worker "
+        "stages %.2f s, speedup %.1fx)",
+        len(csvfiles),
+        nworkers,
+        wall,
+        serial,
+        serial / wall if wall else 0,
+    )
+    logger.info("merged %d triples in %.2f s", len(graph), end - converted)
+    return jsonld
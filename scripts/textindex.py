@@ -0,0 +1,476 @@
+"""
+Full-text search over the labels, descriptions and keywords of the
+knowledge base.
+
+`TextIndex` is an inverted index over the text fields (label,
+prefLabel, title, name, keyword and description) of the resources and
+agents, ranked with BM25F: term frequencies are normalised per field
+and weighted with the field boosts in `FIELDS`, such that a match in a
+label counts more than a match in a description.  Query terms also
+match terms of the index starting with them (prefix matching) and terms
+within one edit (two for long terms) of them (fuzzy matching), with a
+lower weight than exact matches.
+
+The index is built from the JSON-LD outputs in jsonld/ or from a graph,
+stored as json and updated incrementally: only resources whose text has
+changed are indexed again.
+
+Usage:
+
+    python scripts/textindex.py SMILES toxicity model
+    python scripts/textindex.py --kb "molecular dynamics"
+"""
+
+import hashlib
+import json
+import math
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
+
+from rdflib import DCAT, DCTERMS, FOAF, RDFS, SKOS, Graph, Literal, URIRef
+
+# Indexed fields and their boosts
+FIELDS = {
+    "label": 3.0,
+    "prefLabel": 3.0,
+    "title": 3.0,
+    "name": 3.0,
+    "keyword": 2.0,
+    "description": 1.0,
+}
+
+# Predicates of the indexed fields
+PREDICATES = {
+    RDFS.label: "label",
+    SKOS.prefLabel: "prefLabel",
+    DCTERMS.title: "title",
+    FOAF.name: "name",
+    DCAT.keyword: "keyword",
+    DCTERMS.description: "description",
+}
+
+# JSON-LD outputs of step 2 and of the agents
+SOURCES = [
+    "jsonld/pink_googlespreadsheet_resources.jsonld",
+    "jsonld/pink-agents.jsonld",
+]
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with".split()
+)
+
+# Weights of prefix and fuzzy matches relative to exact matches
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+
+# Maximum number of index terms a query term is expanded to
+MAX_EXPANSIONS = 50
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+Fields = Mapping[str, Union[str, Iterable[str]]]
+
+
+def tokenize(text: str) -> List[str]:
+    """Return the lower-case word tokens of `text`, without stopwords."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _deletions(term: str) -> Set[str]:
+    """Return the strings obtained by deleting one character of `term`."""
+    return {term[:i] + term[i + 1 :] for i in range(len(term))}
+
+
+def _distance(a: str, b: str, limit: int) -> int:
+    """Return the Levenshtein distance of `a` and `b`, or `limit` + 1
+    if it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ca != cb),
+                )
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _hash(fields: Fields) -> str:
+    """Return a hash of the text of `fields`."""
+    normalised = {
+        field: [value] if isinstance(value, str) else sorted(value)
+        for field, value in fields.items()
+    }
+    data = json.dumps(normalised, sort_keys=True).encode()
+    return hashlib.sha1(data).hexdigest()
+
+
+class TextIndex:
+    """Inverted index with BM25F ranking.
+
+    Parameters:
+        fields: Dict mapping the indexed fields to their boosts.
+        k1: BM25 term frequency saturation.
+        b: BM25 length normalisation.
+
+    Attributes:
+        docs: Dict mapping each indexed IRI to a dict mapping its fields
+            to the term frequencies of the field.
+        hashes: Dict mapping each indexed IRI to the hash of its text.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[Mapping[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.fields = dict(FIELDS if fields is None else fields)
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Dict[str, Counter]] = {}
+        self.hashes: Dict[str, str] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._lengths: Dict[str, float] = defaultdict(float)
+        self._doclengths: Dict[str, Dict[str, int]] = {}
+        self._vocabulary: Optional[List[str]] = None
+        self._deleted: Optional[Dict[str, Set[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, iri: str) -> bool:
+        return iri in self.docs
+
+    def add(self, iri: str, fields: Fields) -> None:
+        """Index `fields` (a dict mapping field names to a text or a list
+        of texts) of `iri`, replacing any previously indexed text."""
+        if iri in self.docs:
+            self.remove(iri)
+        doc = {}
+        for field, value in fields.items():
+            if field not in self.fields:
+                continue
+            texts = [value] if isinstance(value, str) else value
+            counts = Counter(t for text in texts for t in tokenize(text))
+            if counts:
+                doc[field] = counts
+        self._index(iri, doc)
+        self.hashes[iri] = _hash(fields)
+
+    def _index(self, iri: str, doc: Dict[str, Counter]) -> None:
+        """Add the term frequencies `doc` of `iri` to the index."""
+        self.docs[iri] = doc
+        self._doclengths[iri] = {}
+        for field, counts in doc.items():
+            length = self._doclengths[iri][field] = sum(counts.values())
+            self._lengths[field] += length
+            for term in counts:
+                if term not in self._postings:
+                    self._vocabulary = self._deleted = None
+                self._postings[term].add(iri)
+
+    def remove(self, iri: str) -> None:
+        """Remove `iri` from the index."""
+        doc = self.docs.pop(iri)
+        del self.hashes[iri]
+        lengths = self._doclengths.pop(iri)
+        for field, counts in doc.items():
+            self._lengths[field] -= lengths[field]
+            for term in counts:
+                iris = self._postings[term]
+                iris.discard(iri)
+                if not iris:
+                    del self._postings[term]
+                    self._vocabulary = self._deleted = None
+
+    def update(
+        self, docs: Mapping[str, Fields], prune: bool = False
+    ) -> Dict[str, int]:
+        """Index the changed documents of `docs`.
+
+        Parameters:
+            docs: Dict mapping IRIs to their fields.
+            prune: Whether to remove indexed IRIs not in `docs`.
+
+        Returns:
+            Dict with the number of "added", "updated", "removed" and
+            "unchanged" documents.
+        """
+        counts = dict.fromkeys(["added", "updated", "removed", "unchanged"], 0)
+        for iri, fields in docs.items():
+            if iri not in self.docs:
+                counts["added"] += 1
+            elif self.hashes[iri] != _hash(fields):
+                counts["updated"] += 1
+            else:
+                counts["unchanged"] += 1
+                continue
+            self.add(iri, fields)
+        if prune:
+            for iri in set(self.docs) - set(docs):
+                self.remove(iri)
+                counts["removed"] += 1
+        return counts
+
+    def _expand(
+        self, token: str, prefix: bool, fuzzy: bool
+    ) -> Dict[str, float]:
+        """Return the index terms matching `token`, with their weights."""
+        terms = {}
+        if token in self._postings:
+            terms[token] = 1.0
+        if prefix:
+            if self._vocabulary is None:
+                self._vocabulary = sorted(self._postings)
+            vocabulary = self._vocabulary
+            i = bisect_left(vocabulary, token)
+            while (
+                i < len(vocabulary)
+                and vocabulary[i].startswith(token)
+                and len(terms) < MAX_EXPANSIONS
+            ):
+                terms.setdefault(vocabulary[i], PREFIX_WEIGHT)
+                i += 1
+        if fuzzy and len(token) >= 4:
+            if self._deleted is None:
+                self._deleted = defaultdict(set)
+                for term in self._postings:
+                    self._deleted[term].add(term)
+                    for deleted in _deletions(term):
+                        self._deleted[deleted].add(term)
+            limit = 2 if len(token) >= 8 else 1
+            candidates = set()
+            for variant in _deletions(token) | {token}:
+                candidates |= self._deleted.get(variant, set())
+            for term in sorted(candidates - set(terms)):
+                if len(terms) >= MAX_EXPANSIONS:
+                    break
+                if _distance(token, term, limit) <= limit:
+                    terms[term] = FUZZY_WEIGHT
+        return terms
+
+    def _score(self, term: str) -> Dict[str, float]:
+        """Return the BM25F scores of `term` for the documents having it."""
+        iris = self._postings[term]
+        n = len(self.docs)
+        idf = math.log(1 + (n - len(iris) + 0.5) / (len(iris) + 0.5))
+        averages = {
+            field: length / n for field, length in self._lengths.items()
+        }
+        scores = {}
+        for iri in iris:
+            tf = 0.0
+            lengths = self._doclengths[iri]
+            for field, counts in self.docs[iri].items():
+                if term in counts:
+                    length = lengths[field]
+                    norm = 1 - self.b + self.b * length / averages[field]
+                    tf += self.fields[field] * counts[term] / norm
+            scores[iri] = idf * tf * (self.k1 + 1) / (self.k1 + tf)
+        return scores
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = 10,
+        prefix: bool = True,
+        fuzzy: bool = True,
+    ) -> List[Tuple[str, float]]:
+        """Return the IRIs best matching the free-text `query`.
+
+        Parameters:
+            query: Free text, e.g. "SMILES toxicity model".
+            limit: Maximum number of results.  None for all.
+            prefix: Whether query terms match index terms starting with
+                them.
+            fuzzy: Whether query terms match index terms within one (or
+                for terms of eight or more characters, two) edits.
+
+        Returns:
+            List of (IRI, score) tuples, best match first.
+        """
+        totals: Dict[str, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            best: Dict[str, float] = {}
+            for term, weight in self._expand(token, prefix, fuzzy).items():
+                for iri, score in self._score(term).items():
+                    if weight * score > best.get(iri, 0.0):
+                        best[iri] = weight * score
+            for iri, score in best.items():
+                totals[iri] += score
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Store the index as json."""
+        data = {
+            "fields": self.fields,
+            "k1": self.k1,
+            "b": self.b,
+            "docs": self.docs,
+            "hashes": self.hashes,
+        }
+        with open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "TextIndex":
+        """Load an index stored with `save()`."""
+        with open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["fields"], k1=data["k1"], b=data["b"])
+        for iri, doc in data["docs"].items():
+            index._index(
+                iri, {field: Counter(counts) for field, counts in doc.items()}
+            )
+        index.hashes = data["hashes"]
+        return index
+
+
+def documents_from_jsonld(
+    doc: Union[dict, str, Path], fields: Iterable[str] = FIELDS
+) -> Dict[str, Dict[str, List[str]]]:
+    """Return the text fields of the entries of a JSON-LD document (a dict
+    or a path) as written by step 2, keyed by their expanded IRI.
+
+    The fields of entries with the same IRI are merged.  Like the triples
+    of a graph, each value is only included once per field."""
+    if isinstance(doc, dict):
+        data = doc
+    else:
+        with open(doc, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    context = data.get("@context", {})
+    prefixes = {
+        k: v
+        for k, v in context.items()
+        if isinstance(v, str) and v.endswith(("/", "#"))
+    }
+    names = {str(pred): field for pred, field in PREDICATES.items()}
+    fields = set(fields)
+
+    def expand(value: str) -> str:
+        if ":" in value:
+            prefix, name = value.split(":", 1)
+            if prefix in prefixes:
+                return prefixes[prefix] + name
+        return value
+
+    docs: Dict[str, Dict[str, List[str]]] = {}
+    for entry in data.get("@graph", []):
+        if "@id" not in entry:
+            continue
+        texts: Dict[str, List[str]] = defaultdict(list)
+        for key, values in entry.items():
+            field = key if key in fields else names.get(expand(key))
+            if field not in fields:
+                continue
+            if not isinstance(values, list):
+                values = [values]
+            for value in values:
+                if isinstance(value, dict):
+                    value = value.get("@value")
+                if isinstance(value, str):
+                    texts[field].append(value)
+        if texts:
+            merge_documents(docs, {expand(entry["@id"]): texts})
+    return docs
+
+
+def merge_documents(
+    docs: Dict[str, Dict[str, List[str]]],
+    more: Dict[str, Dict[str, List[str]]],
+) -> None:
+    """Add the text fields of `more` to `docs`.
+
+    The fields of documents with the same IRI are merged, with each
+    value only included once per field."""
+    for iri, fields in more.items():
+        merged = docs.setdefault(iri, {})
+        for field, values in fields.items():
+            merged[field] = list(dict.fromkeys(merged.get(field, []) + values))
+
+
+def documents_from_graph(graph: Graph) -> Dict[str, Dict[str, List[str]]]:
+    """Return the text fields of the named resources in `graph`."""
+    docs: Dict[str, Dict[str, List[str]]] = defaultdict(
+        lambda: defaultdict(list)
+    )
+    for predicate, field in PREDICATES.items():
+        for s, o in graph.subject_objects(predicate, unique=True):
+            if isinstance(s, URIRef) and isinstance(o, Literal):
+                docs[str(s)][field].append(str(o))
+    return {iri: dict(fields) for iri, fields in docs.items()}
+
+
+def main() -> None:
+    """Search the knowledge base."""
+    import argparse
+    import time
+
+    from kbstore import STORE_DIR
+
+    parser = argparse.ArgumentParser(
+        description="Free-text search in the PINK knowledge base."
+    )
+    parser.add_argument("query", nargs="+", help="Words to search for.")
+    parser.add_argument(
+        "--source",
+        action="append",
+        help="JSON-LD file to index.  May be given multiple times.  "
+        "Defaults to the JSON-LD outputs in jsonld/.",
+    )
+    parser.add_argument(
+        "--kb",
+        action="store_true",
+        help="Index the knowledge base in the KB store instead.",
+    )
+    parser.add_argument(
+        "--store",
+        default=str(STORE_DIR),
+        help="Directory of the KB store indexed with --kb.",
+    )
+    parser.add_argument("--index", default=str(STORE_DIR / "textindex.json"))
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    path = Path(args.index)
+    index = TextIndex.load(path) if path.exists() else TextIndex()
+    docs: Dict[str, Dict[str, List[str]]] = {}
+    if args.kb:
+        from kbstore import KBStore
+
+        with KBStore(args.store) as kbstore:
+            kbstore.sync()
+            docs = documents_from_graph(kbstore.dataset)
+    else:
+        for source in args.source or SOURCES:
+            merge_documents(docs, documents_from_jsonld(source))
+    counts = index.update(docs, prune=True)
+    if counts["added"] or counts["updated"] or counts["removed"]:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        index.save(path)
+        print(f"Updated {path}: {counts}")
+
+    start = time.perf_counter()
+    results = index.search(" ".join(args.query), limit=args.limit)
+    elapsed = time.perf_counter() - start
+    for iri, score in results:
+        print(f"{score:7.3f}  {iri}")
+    print(f"{len(results)} results in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Common pytest configuration for the tests of the scripts."""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+rootdir = Path(__file__).resolve().parent.parent
+
+# The scripts are not a package, but import each other as top-level
+# modules (e.g. `from parseutils import ...`).
+sys.path.insert(0, str(rootdir / "scripts"))
+sys.path.insert(0, str(rootdir))
+
+# The budget tests compare wall-clock times with fixed baselines, so
+# they only run when asked for (on an otherwise idle machine), with
+# --budgets or PINK_BUDGETS=1.  The baselines are scaled by
+# PINK_BUDGET_FACTOR.
+BUDGET_FACTOR_DEFAULT = 3
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--budgets",
+        action="store_true",
+        default=False,
+        help="run the performance budget tests",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "budget: wall-clock budget test, run with --budgets"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--budgets") or os.environ.get("PINK_BUDGETS") in (
+        "1",
+        "true",
+    ):
+        return
+    if os.environ.get("PINK_RECORD_BUDGETS") == "1":
+        return
+    skip = pytest.mark.skip(reason="budget test, run with --budgets")
+    for item in items:
+        if item.get_closest_marker("budget"):
+            item.add_marker(skip)
+
+
+@pytest.fixture(name="budget_factor", scope="session")
+def fixture_budget_factor():
+    """Factor applied to the budgets (``PINK_BUDGET_FACTOR``)."""
+    return float(os.environ.get("PINK_BUDGET_FACTOR", BUDGET_FACTOR_DEFAULT))
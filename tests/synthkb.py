@@ -0,0 +1,127 @@
+"""
+Synthetic knowledge base with the structure queried by search_pink_kb.
+
+Generates a class hierarchy with
+
+- a generic ontology tree (standing in for EMMO),
+- CHEMINF property classes below CHEMINF_000018 and CHEMINF_000085,
+- dataset types below ssbd:Dataset with ``hasDatum`` restrictions on
+  the property classes,
+- assessments below ssbd:Assessment with ``ssbd:hasInput`` and
+  ``ssbd:hasSoftware`` restrictions, and
+- activities with ``ssbd:hasSoftware`` restrictions,
+
+where the number of classes grows linearly with `scale`.  At scale 1
+the hierarchy has about the size of SSBD with EMMO.
+"""
+
+import random
+
+from rdflib import OWL, RDF, RDFS, SKOS, BNode, Graph, Literal, Namespace
+
+SSBD = Namespace("https://w3id.org/ssbd/")
+EMMO = Namespace("https://w3id.org/emmo#")
+CHEMINF = Namespace("http://semanticscience.org/resource/")
+DATASETTYPE = Namespace("https://pink-project.eu/datasettype/")
+ACTIVITY = Namespace("https://w3id.org/pink/activity/")
+SOFTWARE = Namespace("https://w3id.org/pink/software/")
+ONTO = Namespace("https://example.com/onto#")
+
+HAS_DATUM = EMMO.EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e
+RESTRICTIONS = (OWL.someValuesFrom, OWL.allValuesFrom, OWL.onClass)
+
+
+def _tree(graph, rng, root, ns, prefix, n, depth=6):
+    """Add `n` classes in a random tree below `root` and return them."""
+    classes = [root]
+    levels = {root: 0}
+    for i in range(n):
+        parent = rng.choice(classes)
+        while levels[parent] >= depth:
+            parent = rng.choice(classes)
+        cls = ns[f"{prefix}{i:06d}"]
+        graph.add((cls, RDF.type, OWL.Class))
+        graph.add((cls, RDFS.subClassOf, parent))
+        graph.add((cls, RDFS.label, Literal(f"{prefix} {i}", lang="en")))
+        classes.append(cls)
+        levels[cls] = levels[parent] + 1
+    return classes[1:]
+
+
+def _restriction(graph, rng, cls, prop, filler, kind=None):
+    restriction = BNode()
+    kind = kind or rng.choice(RESTRICTIONS)
+    graph.add((cls, RDFS.subClassOf, restriction))
+    graph.add((restriction, RDF.type, OWL.Restriction))
+    graph.add((restriction, OWL.onProperty, prop))
+    graph.add((restriction, kind, filler))
+    if kind == OWL.onClass:
+        graph.add((restriction, OWL.qualifiedCardinality, Literal(1)))
+
+
+def synthetic_kb(scale: float = 1, seed: int = 0) -> Graph:
+    """Return a synthetic knowledge base of size proportional to `scale`."""
+    rng = random.Random(seed)
+    graph = Graph()
+    graph.bind("ssbd", SSBD)
+    graph.bind("cheminf", CHEMINF)
+    graph.bind("datasettype", DATASETTYPE)
+
+    def n(base):
+        return max(1, int(base * scale))
+
+    _tree(graph, rng, ONTO.Root, ONTO, "C", n(3000), depth=10)
+
+    properties = []
+    for root, prefix in (
+        (CHEMINF.CHEMINF_000018, "P"),
+        (CHEMINF.CHEMINF_000085, "Q"),
+    ):
+        graph.add((root, RDFS.subClassOf, CHEMINF.CHEMINF_000000))
+        properties += _tree(graph, rng, root, CHEMINF, prefix, n(200))
+
+    # The SMILES datum and dataset type referred to by the queries
+    datum = DATASETTYPE["SMILES#SMILES"]
+    graph.add((datum, RDFS.subClassOf, CHEMINF.CHEMINF_000018))
+    graph.add((datum, RDFS.label, Literal("SMILES", lang="en")))
+    properties.append(datum)
+
+    datasets = _tree(graph, rng, SSBD.Dataset, DATASETTYPE, "D", n(100))
+    for dataset in datasets:
+        graph.add((dataset, SKOS.prefLabel, Literal(str(dataset)[-7:])))
+        for prop in rng.sample(properties, 2):
+            _restriction(graph, rng, dataset, HAS_DATUM, prop)
+        if rng.random() < 0.1:
+            _restriction(graph, rng, dataset, HAS_DATUM, datum)
+
+    smiles = DATASETTYPE.SMILES
+    graph.add((smiles, RDFS.subClassOf, SSBD.Dataset))
+    graph.add((smiles, SKOS.prefLabel, Literal("SMILES")))
+    _restriction(graph, rng, smiles, HAS_DATUM, datum, OWL.onClass)
+    datasets.append(smiles)
+
+    software = [SOFTWARE[f"sw{i}"] for i in range(n(50))]
+    for sw in software:
+        graph.add((sw, SKOS.prefLabel, Literal(f"Software {sw[-3:]}")))
+
+    assessments = _tree(graph, rng, SSBD.Assessment, SSBD, "A", n(300))
+    for assessment in assessments:
+        for dataset in rng.sample(datasets, 2):
+            _restriction(graph, rng, assessment, SSBD.hasInput, dataset)
+        _restriction(
+            graph,
+            rng,
+            assessment,
+            SSBD.hasSoftware,
+            rng.choice(software),
+            OWL.hasValue,
+        )
+
+    for i in range(n(50)):
+        activity = ACTIVITY[f"activity{i}"]
+        graph.add((activity, RDF.type, OWL.Class))
+        for sw in rng.sample(software, min(3, len(software))):
+            _restriction(
+                graph, rng, activity, SSBD.hasSoftware, sw, OWL.hasValue
+            )
+    return graph
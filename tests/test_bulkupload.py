@@ -0,0 +1,169 @@
+"""Test bulk upload against a local rdflib-based endpoint."""
+
+import pytest
+import requests
+from rdflib import BNode, Graph, URIRef
+from rdflib.compare import isomorphic
+
+from bulkupload import BulkUploader, chunked, resource_groups
+from localendpoint import LocalEndpoint
+
+GRAPH = "https://w3id.org/pink/test-graph"
+
+DATA = """
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ssbd: <https://w3id.org/ssbd/> .
+@prefix pink: <https://pink-project.eu/> .
+
+pink:activity0 a owl:Class ;
+    rdfs:subClassOf ssbd:Computation , [
+        a owl:Restriction ;
+        owl:onProperty ssbd:hasSoftware ;
+        owl:hasValue pink:SoftwareA ] .
+pink:activity1 a owl:Class ;
+    rdfs:subClassOf ssbd:Computation , [
+        a owl:Restriction ;
+        owl:onProperty ssbd:hasSoftware ;
+        owl:hasValue pink:SoftwareB ] .
+pink:SoftwareA a ssbd:Software ; rdfs:label "Software A"@en .
+pink:SoftwareB a ssbd:Software ; rdfs:label "Software B"@en .
+"""
+
+
+@pytest.fixture
+def data():
+    return Graph().parse(data=DATA, format="turtle")
+
+
+@pytest.fixture
+def endpoint():
+    with LocalEndpoint() as endpoint:
+        yield endpoint
+
+
+def uploaded(endpoint, name=GRAPH):
+    return endpoint.dataset.graph(URIRef(name))
+
+
+def test_chunks_keep_blank_nodes_together(data):
+    chunks = list(chunked(data, chunk_size=3))
+    assert sum(len(c) for c in chunks) == len(data)
+    for chunk in chunks:
+        objects = {o for _, _, o in chunk}
+        for s, _, _ in chunk:
+            if not isinstance(s, URIRef):
+                assert s in objects
+
+
+@pytest.mark.parametrize("gsp", [False, True])
+def test_insert(endpoint, data, gsp):
+    uploader = BulkUploader(
+        endpoint.update_url,
+        graph_store_url=endpoint.graph_store_url if gsp else None,
+        chunk_size=3,
+        max_workers=2,
+    )
+    with uploader:
+        stats = uploader.insert(data, GRAPH)
+    assert stats.triples == len(data)
+    assert stats.requests > 1
+    assert isomorphic(uploaded(endpoint), data)
+    # Requests share a small pool of keep-alive connections
+    assert endpoint.connections <= 2 < len(endpoint.requests)
+
+
+def test_retry(endpoint, data):
+    endpoint.fail_next = 2
+    with BulkUploader(endpoint.update_url, backoff=0) as uploader:
+        uploader.insert(data, GRAPH)
+    assert isomorphic(uploaded(endpoint), data)
+    assert len(endpoint.requests) == 3
+
+
+def test_replace_graph(endpoint, data):
+    old = uploaded(endpoint)
+    old.add((URIRef("urn:old"), URIRef("urn:p"), URIRef("urn:o")))
+    with BulkUploader(endpoint.update_url, chunk_size=3) as uploader:
+        uploader.replace_graph(data, GRAPH)
+    assert isomorphic(uploaded(endpoint), data)
+    names = {str(g.identifier) for g in endpoint.dataset.graphs()}
+    assert not any("staging" in name for name in names)
+
+
+def test_delete(endpoint, data):
+    with BulkUploader(endpoint.update_url) as uploader:
+        uploader.insert(data, GRAPH)
+        extra = Graph()
+        extra.add((URIRef("urn:keep"), URIRef("urn:p"), URIRef("urn:o")))
+        uploader.insert(extra, GRAPH)
+        uploader.delete(data, GRAPH)
+    assert isomorphic(uploaded(endpoint), extra)
+
+
+def test_groups_sharing_blank_nodes_are_merged():
+    graph = Graph()
+    shared = BNode()
+    graph.add((URIRef("urn:a"), URIRef("urn:p"), shared))
+    graph.add((URIRef("urn:b"), URIRef("urn:p"), shared))
+    graph.add((shared, URIRef("urn:p"), URIRef("urn:o")))
+    graph.add((URIRef("urn:c"), URIRef("urn:p"), URIRef("urn:o")))
+    groups = list(resource_groups(graph))
+    assert sorted(len(g) for g in groups) == [1, 3]
+
+
+def test_delete_chunks(endpoint, data):
+    for i in range(10):
+        data.add((URIRef(f"urn:s{i}"), URIRef("urn:p"), URIRef("urn:o")))
+    with BulkUploader(endpoint.update_url, chunk_size=5) as uploader:
+        uploader.insert(data, GRAPH)
+        del endpoint.requests[:]
+        stats = uploader.delete(data, GRAPH)
+    assert len(uploaded(endpoint)) == 0
+    # Two DELETE WHERE for the activities and three DELETE DATA for the
+    # 14 triples without blank nodes
+    assert stats.requests == len(endpoint.requests) == 5
+    assert stats.triples == len(data)
+
+
+def test_delete_shared_blank_node(endpoint):
+    data = Graph()
+    shared = BNode()
+    data.add((URIRef("urn:a"), URIRef("urn:p"), shared))
+    data.add((URIRef("urn:b"), URIRef("urn:p"), shared))
+    data.add((shared, URIRef("urn:p"), URIRef("urn:o")))
+    with BulkUploader(endpoint.update_url, chunk_size=1) as uploader:
+        uploader.insert(data, GRAPH)
+        uploader.delete(data, GRAPH)
+    assert len(uploaded(endpoint)) == 0
+
+
+def test_no_retry_on_lost_response(endpoint, data):
+    # The response to the INSERT DATA with blank nodes is lost, resending
+    # it would add the blank nodes twice
+    endpoint.drop_next = 1
+    with BulkUploader(endpoint.update_url, backoff=0) as uploader:
+        with pytest.raises(requests.ConnectionError):
+            uploader.insert(data, GRAPH)
+    assert isomorphic(uploaded(endpoint), data)
+    assert len(endpoint.requests) == 1
+
+
+def test_retry_on_lost_response(endpoint):
+    data = Graph()
+    for i in range(10):
+        data.add((URIRef(f"urn:s{i}"), URIRef("urn:p"), URIRef("urn:o")))
+    with BulkUploader(endpoint.update_url, backoff=0) as uploader:
+        endpoint.drop_next = 1
+        uploader.insert(data, GRAPH)
+        endpoint.drop_next = 1
+        uploader.delete(data, GRAPH)
+    assert len(uploaded(endpoint)) == 0
+    assert len(endpoint.requests) == 4
+
+
+def test_replace_graph_retries_staging_load(endpoint, data):
+    endpoint.drop_next = 1
+    with BulkUploader(endpoint.update_url, backoff=0) as uploader:
+        uploader.replace_graph(data, GRAPH)
+    assert len(endpoint.requests) == 3
@@ -0,0 +1,128 @@
+"""Tests for the cached datamodel generation of step 3."""
+
+import csv
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+from rdflib.compare import isomorphic
+
+import dmtables
+
+CSV = """\
+datum1,datum2,@id,description,title
+temperature,K,http://example.com/dm/a,Model a,a-datamodel
+temperature,K,http://example.com/dm/b,Model b,b-datamodel
+pressure,,http://example.com/dm/c,Model c,c-datamodel
+"""
+
+
+def fake_convert(header, rows, unit_handling="ignore"):
+    """Stand-in for the DLite conversion, which records its calls."""
+    fake_convert.calls += len(rows)
+    return [
+        f"<{row[2]}> <http://example.com/datum> {Literal(row[0]).n3()} .\n"
+        for row in rows
+    ]
+
+
+@pytest.fixture
+def converter(monkeypatch):
+    fake_convert.calls = 0
+    monkeypatch.setattr(dmtables, "convert_rows", fake_convert)
+    return fake_convert
+
+
+def test_rows_are_cached(tmp_path, converter):
+    csvfile = tmp_path / "datamodels.csv"
+    csvfile.write_text(CSV, encoding="utf-8")
+    output = tmp_path / "datamodels.nt"
+    cache = tmp_path / "cache"
+
+    stats = dmtables.generate_datamodels(csvfile, output, cache, max_workers=1)
+    assert stats == {"rows": 3, "cached": 0, "generated": 3}
+    assert len(Graph().parse(output, format="nt")) == 3
+
+    # Only the changed row is generated again, and the stale cache file
+    # of its old content is removed
+    csvfile.write_text(CSV.replace("pressure", "volume"), encoding="utf-8")
+    stats = dmtables.generate_datamodels(csvfile, output, cache, max_workers=1)
+    assert stats == {"rows": 3, "cached": 2, "generated": 1}
+    assert converter.calls == 4
+    assert len(list(cache.glob("*.nt"))) == 3
+    graph = Graph().parse(output, format="nt")
+    assert (
+        URIRef("http://example.com/dm/c"),
+        URIRef("http://example.com/datum"),
+        Literal("volume"),
+    ) in graph
+
+
+def test_row_key():
+    header = ["datum1", "other", "@id"]
+    key = dmtables.row_key(header, ["x", "1", "ex:a"])
+    assert key == dmtables.row_key(header, ["x", "2", "ex:a"])
+    assert key != dmtables.row_key(header, ["y", "1", "ex:a"])
+    assert key != dmtables.row_key(header, ["x", "1", "ex:b"])
+    assert key != dmtables.row_key(header, ["x", "1", "ex:a"], "convert")
+
+
+def test_unit_handling_is_cached_separately(tmp_path, converter):
+    csvfile = tmp_path / "datamodels.csv"
+    csvfile.write_text(CSV, encoding="utf-8")
+    cache = tmp_path / "cache"
+    dmtables.generate_datamodels(
+        csvfile, tmp_path / "out.nt", cache, max_workers=1
+    )
+    stats = dmtables.generate_datamodels(
+        csvfile,
+        tmp_path / "out.nt",
+        cache,
+        max_workers=1,
+        unit_handling="convert",
+    )
+    assert stats == {"rows": 3, "cached": 0, "generated": 3}
+
+
+def test_rows_equal_whole_table(tmp_path):
+    """The datamodels converted row by row are those of a conversion of
+    the whole table, as step 3 did before."""
+    pytest.importorskip("dlite")
+    pytest.importorskip("tripper")
+    # pylint: disable=import-outside-toplevel
+    from dlite.table import DMTable
+    from tripper import Triplestore
+
+    csvfile = tmp_path / "datamodels.csv"
+    csvfile.write_text(CSV, encoding="utf-8")
+    dmtable = DMTable.from_csv(str(csvfile), unit_handling="ignore")
+    dmtable.get_datamodels()
+    ts = Triplestore("rdflib")
+    dmtable.to_triplestore(ts)
+    whole = Graph().parse(
+        data=ts.backend.graph.serialize(format="nt"), format="nt"
+    )
+
+    with open(csvfile, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    per_row = Graph()
+    for ntriples in dmtables.convert_rows(header, rows, "ignore"):
+        per_row.parse(data=ntriples, format="nt")
+    assert len(per_row) == len(whole)
+    assert isomorphic(per_row, whole)
+
+
+def test_parallel_equals_serial(tmp_path, converter):
+    csvfile = tmp_path / "datamodels.csv"
+    csvfile.write_text(CSV, encoding="utf-8")
+    for workers in (1, 2):
+        dmtables.generate_datamodels(
+            csvfile,
+            tmp_path / f"out{workers}.nt",
+            tmp_path / f"cache{workers}",
+            max_workers=workers,
+        )
+    assert (tmp_path / "out1.nt").read_text() == (
+        tmp_path / "out2.nt"
+    ).read_text()
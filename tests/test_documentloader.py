@@ -0,0 +1,171 @@
+"""Tests for the cached loader of remote JSON-LD contexts."""
+
+import hashlib
+import json
+import multiprocessing
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from rdflib import Literal, Namespace
+
+from validation import documentloader, validate
+from validation.documentloader import DocumentLoader
+
+EX = Namespace("http://example.com/")
+CONTEXT = {"@context": {"ex": "http://example.com/", "name": "ex:name"}}
+
+
+class Server(ThreadingHTTPServer):
+    """HTTP server of `documents` with ETag support."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.documents = {}
+        self.requests = []
+        self.url = f"http://127.0.0.1:{self.server_port}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Request handler of `Server`."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve a document, or 304 if the client's ETag matches."""
+        self.server.requests.append(self.path)
+        content = self.server.documents.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/ld+json")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    server = Server()
+    server.documents["/context.jsonld"] = json.dumps(CONTEXT).encode()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_cache_versions(server, tmp_path):
+    url = f"{server.url}/context.jsonld"
+    loader = DocumentLoader(tmp_path, keep=2)
+    path = loader.path(url)
+    assert json.loads(path.read_text(encoding="utf-8")) == CONTEXT
+    assert path.suffix == ".jsonld"
+    assert loader.load_json(url) == CONTEXT
+    assert len(server.requests) == 1
+
+    # A fresh copy is used without requests, also by a new loader
+    assert DocumentLoader(tmp_path).path(url) == path
+    assert len(server.requests) == 1
+
+    # Revalidation of an unchanged document keeps the version
+    loader.max_age = 0
+    assert loader.path(url) == path
+    assert len(server.requests) == 2
+    assert loader.entry(url)["versions"] == [path.stem]
+
+    # A changed document is stored as a new version and old versions
+    # are pruned
+    for name in "abc":
+        server.documents["/context.jsonld"] = json.dumps(
+            {"@context": {name: f"http://example.com/{name}"}}
+        ).encode()
+        newpath = loader.path(url)
+        assert loader.load_json(url) == {
+            "@context": {name: f"http://example.com/{name}"}
+        }
+    assert newpath != path and not path.exists()
+    assert len(loader.entry(url)["versions"]) == 2
+
+
+def test_offline(server, tmp_path):
+    url = f"{server.url}/context.jsonld"
+    offline = DocumentLoader(tmp_path, max_age=0, offline=True)
+    with pytest.raises(LookupError, match="offline"):
+        offline.path(url)
+    path = DocumentLoader(tmp_path).path(url)
+    assert offline.path(url) == path
+    assert len(server.requests) == 1
+
+    # The cached copy is used if the server cannot be reached
+    server.shutdown()
+    server.server_close()
+    loader = DocumentLoader(tmp_path, max_age=0, timeout=2)
+    assert loader.path(url) == path
+    with pytest.raises(LookupError, match="cannot load"):
+        loader.path(f"{server.url}/missing.jsonld")
+
+
+def test_invalid_index(server, tmp_path):
+    url = f"{server.url}/context.jsonld"
+    (tmp_path / "index.json").write_text("not json", encoding="utf-8")
+    loader = DocumentLoader(tmp_path)
+    assert loader.entry(url) is None
+    loader.path(url)
+    with pytest.raises(LookupError):
+        loader.path(f"{server.url}/missing.jsonld")
+    assert json.loads((tmp_path / "index.json").read_text())["format"] == 1
+
+
+def load_path(args):
+    """Return the cached path of `url` in a new loader of `cache_dir`."""
+    cache_dir, url = args
+    return str(DocumentLoader(cache_dir).path(url))
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="the test server runs in the parent process",
+)
+def test_concurrent_processes(server, tmp_path):
+    urls = []
+    for i in range(16):
+        server.documents[f"/c{i}.jsonld"] = json.dumps(
+            {"@context": {f"t{i}": f"http://example.com/{i}"}}
+        ).encode()
+        urls.append(f"{server.url}/c{i}.jsonld")
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        paths = pool.map(load_path, [(tmp_path, url) for url in urls])
+
+    # No process overwrote the entries of another
+    loader = DocumentLoader(tmp_path)
+    assert [str(loader.path(url)) for url in urls] == paths
+    assert len(server.requests) == len(urls)
+
+
+def test_load_graph_with_remote_context(server, tmp_path, monkeypatch):
+    url = f"{server.url}/context.jsonld"
+    loader = DocumentLoader(tmp_path / "cache")
+    monkeypatch.setattr(documentloader, "_LOADER", loader)
+    for i in range(3):
+        doc = {"@context": [url], "@id": f"ex:r{i}", "name": f"r{i}"}
+        path = tmp_path / f"r{i}.jsonld"
+        path.write_text(json.dumps(doc), encoding="utf-8")
+        graph = validate.load_graph(path)
+        assert set(graph) == {
+            (EX[f"r{i}"], EX.name, Literal(f"r{i}")),
+        }
+    assert len(server.requests) == 1
+
+    # Processed contexts are shared by documents with the same base
+    assert loader.context([url]) is loader.context([url])
+    assert loader.context([url]) is not loader.context([url], "x:")
+    assert documentloader.cached_path(url) == str(loader.path(url))
+    assert documentloader.cached_path("context.json") == "context.json"
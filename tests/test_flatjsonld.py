@@ -0,0 +1,131 @@
+"""Tests for the fast conversion of JSON-LD with a flat context."""
+
+import json
+from pathlib import Path
+
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+from rdflib.plugins.parsers.jsonld import Parser
+from rdflib.plugins.shared.jsonld.context import Context
+
+from validation.flatjsonld import term_table, to_graph
+from validation.validate import load_graph, load_resources
+
+rootdir = Path(__file__).resolve().parent.parent
+
+CONTEXT = {
+    "ex": "http://example.com/",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "name": "ex:name",
+    "title": {"@id": "ex:title", "@language": "en"},
+    "code": {"@id": "ex:code", "@language": None},
+    "creator": {"@id": "ex:creator", "@type": "@id"},
+    "kind": {"@id": "ex:kind", "@type": "@vocab"},
+    "issued": {"@id": "ex:issued", "@type": "xsd:dateTime"},
+    "label": "http://www.w3.org/2000/01/rdf-schema#label",
+    "statements": {"@id": "ex:statements", "@type": "@json"},
+    "parts": {"@id": "ex:parts", "@container": "@list"},
+    "isPartOf": {"@reverse": "ex:hasPart"},
+    "ignored": None,
+}
+
+GRAPH = [
+    {
+        "@id": "ex:a",
+        "@type": ["owl:Class", "ex:Thing", "name"],
+        "name": ["A", "a"],
+        "title": "The A",
+        "code": "A1",
+        "creator": ["ex:b", "_:x", "https://orcid.org/0000", "rel/c"],
+        "kind": "name",
+        "issued": "2024-01-01",
+        "label": [1, 2.5, True, None],
+        "ex:other": {"@value": "v", "@language": "de"},
+        "ex:typed": {"@value": "3", "@type": "xsd:integer"},
+        "ex:plain": {"@value": "p"},
+        "ex:nested": {
+            "@type": "owl:Restriction",
+            "owl:onProperty": {"@id": "ex:p"},
+            "owl:hasValue": {"@id": "ex:v", "name": "V"},
+        },
+        "ignored": "x",
+        "unknown": "y",
+    },
+    {"@id": "_:x", "name": "blank"},
+    {"name": "anonymous"},
+    {"@id": "relative", "name": "resolved against the base"},
+    {"@id": "has space", "name": "skipped"},
+    "not a node",
+]
+
+
+def rdflib_graph(data, context):
+    graph = Graph()
+    Parser().parse(data, context, graph)
+    return graph
+
+
+@pytest.mark.parametrize(
+    "name", ["pink-agents.jsonld", "pink_googlespreadsheet_resources.jsonld"]
+)
+def test_repository_files(name):
+    path = rootdir / "jsonld" / name
+    with open(path, "rt", encoding="utf-8") as f:
+        doc = json.load(f)
+    context = Context(base=path.as_uri())
+    context.load(doc.pop("@context"))
+    assert term_table(context) is not None
+    graph = Graph()
+    assert to_graph(doc, context, graph)
+    expected = rdflib_graph(doc, context)
+    assert len(graph) == len(expected) > 0
+    assert isomorphic(graph, expected)
+    assert set(graph.namespaces()) == set(expected.namespaces())
+    assert isomorphic(load_graph(path), expected)
+
+
+@pytest.mark.parametrize("data", [GRAPH, {"@graph": GRAPH}, GRAPH[0]])
+def test_same_triples_as_rdflib(data):
+    context = Context(CONTEXT, base="http://example.org/doc/")
+    graph = Graph()
+    assert to_graph(data, context, graph)
+    assert isomorphic(graph, rdflib_graph(data, context))
+
+
+@pytest.mark.parametrize(
+    "node",
+    [
+        {"@id": "ex:a", "statements": {"a": 1}},
+        {"@id": "ex:a", "parts": ["ex:b", "ex:c"]},
+        {"@id": "ex:a", "isPartOf": "ex:b"},
+        {"@id": "ex:a", "ex:list": {"@list": ["x"]}},
+        {"@id": "ex:a", "ex:p": {"@value": "x", "@direction": "ltr"}},
+        {"@id": "ex:a", "@context": {"n": "ex:n"}, "n": "x"},
+        {"@id": "ex:a", "@reverse": {"ex:p": {"@id": "ex:b"}}},
+        {"@id": "ex:a", "ex:p": [["nested", "list"]]},
+    ],
+)
+def test_fallback(node):
+    context = Context(CONTEXT)
+    data = [{"@id": "ex:first", "name": "first"}, node]
+    graph = Graph()
+    assert not to_graph(data, context, graph)
+    assert len(graph) == 0
+    # The caller falls back to rdflib
+    graph = load_resources(data, context)
+    assert isomorphic(graph, rdflib_graph(data, context))
+
+
+def test_not_flat_contexts():
+    for context in [
+        {"@vocab": "http://example.com/"},
+        {"@language": "en"},
+        {"id": "@id"},
+        {"Thing": {"@id": "ex:Thing", "@context": {"n": "ex:n"}}},
+    ]:
+        context = Context(context)
+        assert term_table(context) is None
+        assert not to_graph([{"@id": "ex:a"}], context, Graph())
+    assert not to_graph({"@id": "a", "@graph": []}, Context(CONTEXT), Graph())
@@ -0,0 +1,266 @@
+"""Tests for the pre-validation of the corrected tables."""
+
+import pandas as pd
+import pytest
+from pyshacl import validate
+from rdflib import RDF, Graph, Namespace
+from rdflib.plugins.shared.jsonld.context import Context
+
+from validation.frames import FrameValidator
+from validation.validate import load_resources
+
+EX = Namespace("http://example.com/")
+
+SHAPES = """
+@prefix sh: <http://www.w3.org/ns/shacl#> .
+@prefix ex: <http://example.com/> .
+@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+ex:SoftwareShape a sh:NodeShape ;
+    sh:targetClass ex:Software ;
+    sh:node ex:ResourceShape ;
+    sh:property [ sh:path ex:title ; sh:minCount 1 ; sh:maxCount 1 ;
+                  sh:datatype rdf:langString ] ,
+                [ sh:path ex:issued ; sh:datatype xsd:dateTime ] ,
+                [ sh:path ex:creator ; sh:class ex:Agent ] ,
+                [ sh:path ex:keyword ; sh:maxCount 2 ] .
+
+ex:ResourceShape a sh:NodeShape ;
+    sh:property [ sh:path ex:description ; sh:minCount 1 ] ,
+                [ sh:path ex:note ; sh:datatype rdf:langString ] ,
+                [ sh:path ex:version ; sh:maxCount 0 ;
+                  sh:severity sh:Warning ] .
+"""
+
+CONTEXT = {
+    "ex": "http://example.com/",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "title": {"@id": "ex:title", "@language": "en"},
+    "description": "ex:description",
+    "issued": {"@id": "ex:issued", "@type": "xsd:dateTime"},
+    "creator": {"@id": "ex:creator", "@type": "@id"},
+    "keyword": "ex:keyword",
+    "note": "ex:note",
+    "version": "ex:version",
+}
+
+COLUMNS = [
+    "@id",
+    "@type",
+    "title",
+    "description",
+    "issued",
+    "creator",
+    "keyword",
+    "keyword",
+    "keyword",
+    "version",
+    "note",
+]
+
+# (row, expected reasons)
+ROWS = [
+    (
+        [
+            "ex:ok",
+            "ex:Software",
+            "A",
+            "a",
+            "2024-01-01T00:00:00",
+            "ex:alice",
+            "k1",
+            "k2",
+            "",
+            "",
+            "",
+        ],
+        "",
+    ),
+    (
+        ["ex:minimal", "ex:Software", "B", "b", "", "", "", "", "", "", ""],
+        "",
+    ),
+    (
+        ["ex:untitled", "ex:Software", "", "c", "", "", "", "", "", "", ""],
+        "missing title",
+    ),
+    (
+        [
+            "ex:no description",
+            "ex:Software",
+            "D",
+            "",
+            "2024-13",
+            "",
+            "",
+            "",
+            "",
+            "",
+            "",
+        ],
+        "@id: no IRI; issued: no http://www.w3.org/2001/XMLSchema#dateTime; "
+        "missing description",
+    ),
+    (
+        [
+            "ex:keywords",
+            "ex:Software",
+            "E",
+            "e",
+            "",
+            "ex:bob",
+            "k1",
+            "k2",
+            "k3",
+            "",
+            "",
+        ],
+        "keyword: more than 2 value(s)",
+    ),
+    (
+        ["ex:note", "ex:Software", "F", "f", "", "", "", "", "", "", "plain"],
+        "note: http://www.w3.org/2001/XMLSchema#string instead of "
+        "http://www.w3.org/1999/02/22-rdf-syntax-ns#langString",
+    ),
+    (
+        ["ex:version", "ex:Software", "G", "g", "", "", "", "", "", "1", ""],
+        "version: more than 0 value(s)",
+    ),
+    (
+        ["ex:other", "ex:Other", "", "", "", "", "", "", "", "", "x"],
+        "",
+    ),
+]
+
+
+@pytest.fixture(name="validator")
+def fixture_validator():
+    shapes = Graph().parse(data=SHAPES, format="turtle")
+    return FrameValidator(
+        shapes,
+        Context(CONTEXT),
+        prefixes={"ex": "http://example.com/"},
+        list_columns=["@id", "@type", "keyword"],
+    )
+
+
+def frame(rows):
+    df = pd.DataFrame([row for row, _ in rows], columns=COLUMNS)
+    df.index = [10 * i for i in range(len(rows))]
+    return df
+
+
+def to_graph(df):
+    """Convert an expanded table to a graph, like TableDoc."""
+    resources = []
+    for _, row in df.iterrows():
+        resource = {}
+        for column, value in zip(df.columns, row):
+            if value:
+                resource.setdefault(column, []).append(value)
+        resource["@id"] = resource["@id"][0]
+        resources.append(resource)
+    graph = load_resources(resources, Context(CONTEXT))
+    for agent in (EX.alice, EX.bob):
+        graph.add((agent, RDF.type, EX.Agent))
+    return graph
+
+
+def test_rules(validator):
+    rules = validator.rules([EX.Software])
+    assert {rule.path for rule in rules} == {
+        EX.title,
+        EX.issued,
+        EX.creator,
+        EX.keyword,
+        EX.description,
+        EX.note,
+        EX.version,
+    }
+    assert validator.rules([EX.Other]) == ()
+    assert validator.kind("creator").datatype is None
+    assert validator.kind("title").datatype.endswith("langString")
+
+
+def test_check(validator):
+    df = frame(ROWS)
+    reasons = validator.check(df)
+    assert list(reasons.index) == list(df.index)
+    assert list(reasons) == [expected for _, expected in ROWS]
+
+
+def test_same_verdicts_as_shacl(validator):
+    df = frame(ROWS)
+    reasons = validator.check(df)
+    shapes = Graph().parse(data=SHAPES, format="turtle")
+    conforms, _, report = validate(
+        to_graph(df[reasons == ""]), shacl_graph=shapes, inference="rdfs"
+    )
+    assert conforms, report
+    for index in reasons.index[reasons != ""]:
+        graph = to_graph(df.loc[[index]])
+        if reasons[index].startswith("@id: no IRI"):
+            # The resource would be silently lost
+            assert set(graph.subjects()) == {EX.alice, EX.bob}
+            continue
+        conforms, _, _ = validate(graph, shacl_graph=shapes, inference="rdfs")
+        assert not conforms
+
+
+def test_missing_columns(validator):
+    df = frame(ROWS[:2]).drop(columns=["description"])
+    assert list(validator.check(df)) == ["missing description"] * 2
+    assert list(validator.check(df.drop(columns=["@type"]))) == ["", ""]
+    assert list(validator.check(df[["title"]])) == ["no @id"] * 2
+
+
+def test_incremental_correct_rejects_rows(validator, tmp_path, monkeypatch):
+    # pylint: disable=import-outside-toplevel
+    from parseutils import expand_df, reject_rows, split_to_list
+    from rowdelta import incremental_correct, load_state, promote_state
+
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame(
+        {
+            "@id": ["ex:a", "ex:b", "ex:c"],
+            "@type": ["ex:Software"] * 3,
+            "title": ["A", "", "C"],
+            "description": ["a", "b", "c"],
+            "keyword": ["k1 k2", "k1", "k1 k2 k3"],
+        }
+    )
+
+    def correct(df):
+        df = df.copy()
+        df["keyword"] = df["keyword"].apply(split_to_list)
+        return reject_rows(expand_df(df), validator)
+
+    delta = incremental_correct("sw", df, correct)
+    assert delta.added == {"ex:a"}
+    assert delta.rejected == {"ex:b", "ex:c"}
+    clean = pd.read_csv("sw_clean.csv")
+    assert list(clean["@id"]) == ["ex:a"]
+    assert list(clean.loc[0, ["keyword", "keyword.1"]]) == ["k1", "k2"]
+
+    # Rejected rows are corrected again in the next run
+    promote_state("sw")
+    assert set(load_state("sw")["hashes"]) == {"ex:a"}
+    df.loc[1, "title"] = "B"
+    delta = incremental_correct("sw", df, correct)
+    assert delta.added == {"ex:b"}
+    assert delta.rejected == {"ex:c"}
+    assert list(pd.read_csv("sw_clean.csv")["@id"]) == ["ex:a", "ex:b"]
+    assert list(pd.read_csv("sw_delta.csv")["@id"]) == ["ex:b"]
+    promote_state("sw")
+
+    # A rejected change keeps the previous version of the row
+    df.loc[0, "title"] = ""
+    delta = incremental_correct("sw", df, correct)
+    assert not delta
+    clean = pd.read_csv("sw_clean.csv")
+    assert list(clean["@id"]) == ["ex:a", "ex:b"]
+    assert clean.loc[0, "title"] == "A"
+    assert (
+        load_state("sw", pending=True)["hashes"] == load_state("sw")["hashes"]
+    )
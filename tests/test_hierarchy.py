@@ -0,0 +1,116 @@
+"""Tests for the drop-down list hierarchies."""
+
+import csv
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from rdflib import Graph
+
+from hierarchy import Hierarchy
+
+TTL = """\
+@prefix ex: <http://example.com/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+ex:Safety skos:prefLabel "Safety Assessment"@en .
+ex:Toxicity rdfs:subClassOf ex:Safety ;
+    skos:prefLabel "Toxicity Assessment"@en ;
+    skos:altLabel "Toxicity"@en, "Toxizitaet"@de .
+ex:Acute rdfs:subClassOf ex:Toxicity ; skos:altLabel "Acute"@en .
+ex:Oral rdfs:subClassOf ex:Acute ; rdfs:label "Oral" .
+ex:Exposure rdfs:subClassOf ex:Safety ; skos:altLabel "Exposure"@en .
+ex:Loop rdfs:subClassOf ex:Exposure .
+ex:Exposure rdfs:subClassOf ex:Loop .
+"""
+
+EX = "http://example.com/"
+
+
+def test_rows_and_tree():
+    hierarchy = Hierarchy(Graph().parse(data=TTL, format="turtle"))
+
+    # The last level lists all descendants, cycles are not followed
+    assert hierarchy.rows(["Safety Assessment"]) == [
+        ["Safety Assessment", "Exposure", "Loop"],
+        ["Safety Assessment", "Toxicity", "Acute"],
+        ["Safety Assessment", "Toxicity", "Oral"],
+    ]
+    assert hierarchy.rows([EX + "Toxicity"], depth=2) == [
+        ["Toxicity", "Acute"],
+        ["Toxicity", "Oral"],
+    ]
+    assert hierarchy.rows([EX + "Oral"], depth=2) == [["Oral", ""]]
+
+    tree = hierarchy.tree([EX + "Safety"], depth=4)
+    toxicity = tree[0]["children"][1]
+    assert toxicity["label"] == "Toxicity"
+    assert toxicity["children"] == [
+        {
+            "iri": EX + "Acute",
+            "label": "Acute",
+            "children": [{"iri": EX + "Oral", "label": "Oral"}],
+        }
+    ]
+
+
+def test_script_regenerates_on_change(tmp_path):
+    # The ontology imports part of its classes, like the SSBD ontology
+    onto = tmp_path / "onto.ttl"
+    imported = tmp_path / "imported.ttl"
+    head, tail = TTL.split("ex:Acute ", 1)
+    onto.write_text(
+        head
+        + "@prefix owl: <http://www.w3.org/2002/07/owl#> .\n"
+        + f"<onto> owl:imports <{imported.as_uri()}> .\n",
+        encoding="utf-8",
+    )
+    imported.write_text(
+        head.split("\n\n", 1)[0] + "\n\nex:Acute " + tail, encoding="utf-8"
+    )
+    output = tmp_path / "hierarchy.csv"
+    script = Path(__file__).parent.parent / "scripts"
+    command = [
+        sys.executable,
+        str(script / "make_drop_down_list_source.py"),
+        "Safety Assessment",
+        "--ontology",
+        str(onto),
+        "--store",
+        str(tmp_path / "store"),
+        "--output",
+        str(output),
+    ]
+
+    def run():
+        return subprocess.run(
+            command, capture_output=True, text=True, check=True
+        ).stderr
+
+    assert "wrote" in run()
+    assert "up to date" in run()
+    with open(output, newline="", encoding="utf-8") as f:
+        assert len(list(csv.reader(f))) == 4
+
+    # A change of the imported ontology regenerates the output
+    imported.write_text(
+        imported.read_text(encoding="utf-8").replace(
+            '"Oral"', '"Oral exposure"'
+        ),
+        encoding="utf-8",
+    )
+    assert "wrote" in run()
+    with open(output, newline="", encoding="utf-8") as f:
+        assert ["Safety Assessment", "Toxicity", "Oral exposure"] in list(
+            csv.reader(f)
+        )
+
+    command += ["--format", "json"]
+    assert "wrote" in run()
+    assert json.loads(output.read_text(encoding="utf-8"))[0] == {
+        "level1": "Safety Assessment",
+        "level2": "Exposure",
+        "level3": "Loop",
+    }
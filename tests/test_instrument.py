@@ -0,0 +1,120 @@
+"""Tests for the instrumentation of the pipeline stages."""
+
+import json
+import logging
+import time
+from pathlib import Path
+
+import instrument
+from instrument import Metrics, setup_logging
+
+
+def test_spans_counters_and_caches():
+    metrics = Metrics()
+    with metrics.span("correct", rows=10) as span:
+        with metrics.span("expand"):
+            time.sleep(0.01)
+        span.count("columns", 3)
+    with metrics.span("correct", rows=5):
+        pass
+    metrics.record("store", 0.5, triples=100)
+    metrics.record("store", 0.25, triples=50)
+    metrics.count("violations", 2)
+    metrics.count("violations")
+    metrics.cache("rows", hits=3, misses=1)
+    metrics.cache("empty")
+
+    data = metrics.asdict()
+    correct = data["spans"]["correct"]
+    assert correct["calls"] == 2
+    assert (correct["rows"], correct["columns"]) == (15, 3)
+    assert correct["seconds"] >= data["spans"]["expand"]["seconds"] >= 0.01
+    assert correct["rss_mb"] > 0
+    assert correct["rss_delta_mb"] >= 0
+    # Stages measured elsewhere have no memory of this process
+    assert data["spans"]["store"] == {
+        "seconds": 0.75,
+        "calls": 2,
+        "rss_mb": 0.0,
+        "rss_delta_mb": 0.0,
+        "triples": 150,
+    }
+    assert data["counters"] == {"violations": 3}
+    assert data["caches"] == {
+        "rows": {"hits": 3, "misses": 1, "hit_rate": 0.75},
+        "empty": {"hits": 0, "misses": 0, "hit_rate": None},
+    }
+
+    # The time of a failing stage is recorded too
+    try:
+        with metrics.span("validate"):
+            raise ValueError("invalid")
+    except ValueError:
+        pass
+    assert metrics.spans["validate"].calls == 1
+
+    metrics.reset()
+    assert metrics.asdict()["spans"] == {}
+
+
+def test_without_resource_module(monkeypatch, tmp_path):
+    monkeypatch.setattr(instrument, "resource", None)
+    metrics = Metrics()
+    with metrics.span("correct"):
+        pass
+    data = metrics.write("step", tmp_path / "metrics.json")
+    assert "peak_rss_mb" not in data
+    assert data["spans"]["correct"]["rss_mb"] == 0.0
+
+
+def test_timed():
+    metrics = Metrics()
+
+    @metrics.timed("expand", rows=len)
+    def expand(rows, factor=2):
+        """Expand the rows, each to `factor` MB."""
+        return [bytearray(factor * 2**20) for _ in rows]
+
+    kept = expand([1, 2], factor=32)
+    assert len(kept) == 2
+    expand([1])
+    assert expand.__doc__ == "Expand the rows, each to `factor` MB."
+    span = metrics.asdict()["spans"]["expand"]
+    assert (span["calls"], span["rows"]) == (2, 3)
+    assert span["rss_mb"] > 0
+    if Path("/proc/self/statm").exists():
+        # The memory kept by the first call
+        assert span["rss_delta_mb"] >= 48
+
+
+def test_write_keeps_other_scripts(tmp_path, caplog):
+    path = tmp_path / "metrics.json"
+    path.write_text("not json", encoding="utf-8")
+    first, second = Metrics(), Metrics()
+    first.count("rows", 3)
+    second.count("rows", 4)
+
+    with caplog.at_level(logging.INFO, logger="instrument"):
+        first.write("step1", path)
+        second.write("step2", path)
+    assert "overwriting invalid metrics file" in caplog.text
+    assert "step2 finished" in caplog.text
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert sorted(data) == ["step1", "step2"]
+    assert data["step1"]["counters"] == {"rows": 3}
+    assert data["step2"]["counters"] == {"rows": 4}
+
+    second.count("rows")
+    second.write("step2", path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["step2"]["counters"] == {"rows": 5}
+
+
+def test_setup_logging(monkeypatch):
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    monkeypatch.setenv("PINK_LOG_LEVEL", "debug")
+    setup_logging()
+    assert root.level == logging.DEBUG
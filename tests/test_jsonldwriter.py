@@ -0,0 +1,56 @@
+"""Test the streaming JSON-LD writer."""
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from jsonldwriter import JsonLdWriter, load_jsonld, write_jsonld
+
+jsonlddir = Path(__file__).resolve().parent.parent / "jsonld"
+
+
+@pytest.fixture(scope="module")
+def doc():
+    with open(jsonlddir / "pink-agents.jsonld", "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_indent_mode_equals_json_dump(doc):
+    expected = io.StringIO()
+    json.dump(doc, expected, indent=2)
+    written = io.StringIO()
+    assert write_jsonld(written, doc) == len(doc["@graph"])
+    assert written.getvalue() == expected.getvalue()
+
+    written = io.StringIO()
+    with JsonLdWriter(written, doc["@context"]) as writer:
+        writer.writemany(doc["@graph"])
+    assert written.getvalue() == expected.getvalue()
+
+
+@pytest.mark.parametrize(
+    "mode,suffix", [("compact", ".jsonld"), ("ndjson", ".ndjson")]
+)
+def test_roundtrip(tmp_path, doc, mode, suffix):
+    path = tmp_path / f"out{suffix}"
+    write_jsonld(path, doc, mode=mode)
+    assert load_jsonld(path) == doc
+    if mode == "ndjson":
+        lines = path.read_text(encoding="utf-8").splitlines()
+        assert len(lines) == len(doc["@graph"]) + 1
+
+
+def test_empty_graph():
+    written = io.StringIO()
+    write_jsonld(written, {"@context": {}, "@graph": []}, mode="compact")
+    assert json.loads(written.getvalue()) == {"@context": {}, "@graph": []}
+
+
+@pytest.mark.parametrize("mode", ["compact", "ndjson"])
+def test_non_ascii_is_not_escaped(mode):
+    written = io.StringIO()
+    doc = {"@context": {}, "@graph": [{"@id": "ex:a", "label": "Zürich"}]}
+    write_jsonld(written, doc, mode=mode)
+    assert "Zürich" in written.getvalue()
@@ -0,0 +1,129 @@
+"""Tests for the local knowledge base service."""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import pytest
+
+from kbservice import KBServer, KBService, RWLock
+from kbstore import has_oxigraph
+
+TTL = """\
+@prefix ex: <http://example.com/> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ssbd: <https://w3id.org/ssbd/> .
+
+ex:activity rdfs:subClassOf
+    [ a owl:Restriction ;
+      owl:onProperty ssbd:hasSoftware ;
+      owl:hasValue ex:{tool} ] .
+
+ex:{tool} rdfs:label "{tool}" .
+"""
+
+EX = "http://example.com/"
+
+stores = [False] + ([True] if has_oxigraph() else [])
+
+
+def write(path, tool):
+    path.write_text(TTL.format(tool=tool), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(params=stores, ids=["memory", "oxigraph"][: len(stores)])
+def server(request, tmp_path):
+    source = write(tmp_path / "kb.ttl", "tool")
+    service = KBService([source], tmp_path / "store", persistent=request.param)
+    httpd = KBServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", source
+    httpd.shutdown()
+    httpd.server_close()
+    service.close()
+
+
+def get(url, data=None, headers=None):
+    request = Request(url, data=data, headers=headers or {})
+    with urlopen(request) as response:
+        return response.headers["Content-Type"], response.read().decode()
+
+
+def software(base):
+    query = urlencode({"activity": EX + "activity"})
+    _, body = get(f"{base}/queries/query5?{query}")
+    bindings = json.loads(body)["results"]["bindings"]
+    return [b["softwareName"]["value"] for b in bindings]
+
+
+def test_sparql_protocol(server):
+    base, _ = server
+    query = "SELECT ?label WHERE { ?s <%s> ?label }" % (
+        "http://www.w3.org/2000/01/rdf-schema#label"
+    )
+    media_type, body = get(f"{base}/sparql?{urlencode({'query': query})}")
+    assert media_type == "application/sparql-results+json"
+    assert json.loads(body)["results"]["bindings"][0]["label"]["value"] == (
+        "tool"
+    )
+
+    media_type, body = get(
+        f"{base}/sparql",
+        data=query.encode(),
+        headers={
+            "Content-Type": "application/sparql-query",
+            "Accept": "text/csv",
+        },
+    )
+    assert media_type == "text/csv"
+    assert body.split() == ["label", "tool"]
+
+    with pytest.raises(HTTPError) as exc:
+        get(f"{base}/sparql?{urlencode({'query': 'SELECT nothing'})}")
+    assert exc.value.code == 400
+
+
+def test_named_queries_and_reload(server, tmp_path):
+    base, source = server
+    _, body = get(f"{base}/queries")
+    assert json.loads(body)["query5"] == ["activity"]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: software(base), range(32)))
+    assert results == [["tool"]] * 32
+
+    with pytest.raises(HTTPError) as exc:
+        get(f"{base}/queries/nothing")
+    assert exc.value.code == 404
+
+    write(tmp_path / "kb.ttl", "other")
+    _, body = get(f"{base}/reload?{urlencode({'source': source})}", data=b"")
+    assert json.loads(body) == {source: "reloaded"}
+    assert software(base) == ["other"]
+
+    _, body = get(f"{base}/metrics")
+    assert 'kbservice_request_seconds_count{endpoint="queries"} 35' in body
+    assert 'kbservice_request_errors_total{endpoint="queries"} 1' in body
+    assert "kbservice_reloads_total 2" in body
+
+
+def test_rwlock_excludes_writers():
+    lock = RWLock()
+    events = []
+
+    def reader():
+        with lock.read():
+            events.append("read")
+
+    with lock.write():
+        thread = threading.Thread(target=reader)
+        thread.start()
+        thread.join(0.1)
+        assert not events
+    thread.join()
+    assert events == ["read"]
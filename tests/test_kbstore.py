@@ -0,0 +1,173 @@
+"""Tests for the persistent knowledge base store."""
+
+import functools
+import gzip
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from rdflib import Dataset, Graph, URIRef
+
+from kbstore import KBStore, export_name, graph_iri, has_oxigraph, open_kb
+from subclassindex import update_closure
+
+TTL = """\
+@prefix ex: <http://example.com/> .
+ex:{name} a ex:Thing ; ex:value {value} .
+"""
+
+persistent = pytest.mark.skipif(
+    not has_oxigraph(), reason="oxrdflib is not installed"
+)
+
+
+def write(path, name, value=1):
+    path.write_text(TTL.format(name=name, value=value), encoding="utf-8")
+    return str(path)
+
+
+@persistent
+def test_reload_only_changed(tmp_path):
+    a = write(tmp_path / "a.ttl", "a")
+    b = write(tmp_path / "b.ttl", "b")
+    store = tmp_path / "store"
+
+    with KBStore(store) as kb:
+        assert kb.sync([a, b]) == {a: "loaded", b: "loaded"}
+        assert len(kb.dataset) == 4
+
+    write(tmp_path / "b.ttl", "b", value=2)
+    with KBStore(store) as kb:
+        assert kb.sync([a, b]) == {a: "unchanged", b: "reloaded"}
+        graph = kb.dataset.graph(URIRef(graph_iri(b)))
+        assert len(graph) == 2
+        values = [
+            row.v.toPython()
+            for row in kb.dataset.query(
+                "SELECT ?v WHERE { ?s <http://example.com/value> ?v }"
+            )
+        ]
+        assert sorted(values) == [1, 2]
+
+        kb.prune([a])
+        assert set(kb.manifest) == {a}
+        assert len(kb.dataset) == 2
+
+
+def test_in_memory_store_loads_every_time(tmp_path):
+    a = write(tmp_path / "a.ttl", "a")
+    store = tmp_path / "store"
+    with KBStore(store, persistent=False) as kb:
+        assert kb.sync([a]) == {a: "loaded"}
+        assert kb.sync([a]) == {a: "unchanged"}
+    with KBStore(store, persistent=False) as kb:
+        assert kb.sync([a]) == {a: "reloaded"}
+        assert len(kb.dataset) == 2
+
+
+@pytest.fixture
+def http_dir(tmp_path):
+    """Serve `tmp_path / "www"` over http and yield (directory, url)."""
+    www = tmp_path / "www"
+    www.mkdir()
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=www)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield www, f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+@persistent
+def test_remote_source_is_cached(tmp_path, http_dir):
+    www, url = http_dir
+    write(www / "onto.ttl", "onto")
+    source = f"{url}/onto.ttl"
+    store = tmp_path / "store"
+
+    with KBStore(store) as kb:
+        assert kb.sync([source]) == {source: "loaded"}
+
+    # Not downloaded again while the local copy is recent
+    (www / "onto.ttl").unlink()
+    with KBStore(store) as kb:
+        assert kb.sync([source]) == {source: "unchanged"}
+        assert len(kb.dataset) == 2
+
+    write(www / "onto.ttl", "onto", value=3)
+    with KBStore(store) as kb:
+        assert kb.sync([source], refresh=True) == {source: "reloaded"}
+        assert len(kb.dataset) == 2
+
+
+@persistent
+def test_open_kb_materialises_closure(tmp_path):
+    onto = tmp_path / "onto.ttl"
+    onto.write_text(
+        "@prefix ex: <http://example.com/> .\n"
+        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .\n"
+        "ex:B rdfs:subClassOf ex:A .\n"
+        "ex:C rdfs:subClassOf ex:B .\n",
+        encoding="utf-8",
+    )
+    query = (
+        "SELECT ?c WHERE { ?c <https://pink-project.eu/subClassOfTransitive>"
+        " <http://example.com/A> }"
+    )
+    store = tmp_path / "store"
+    ts, kb = open_kb([str(onto)], path=store)
+    assert len(list(ts.query(query))) == 2
+    kb.close()
+
+    ts, kb = open_kb([str(onto)], path=store)
+    assert update_closure(kb) == -1
+    assert len(list(ts.query(query))) == 2
+    kb.close()
+
+
+@pytest.mark.parametrize(
+    "persistent", [False] + ([True] if has_oxigraph() else [])
+)
+def test_export_only_changed(tmp_path, persistent):
+    a = write(tmp_path / "a.ttl", "a")
+    b = write(tmp_path / "b.ttl", "b")
+    out = tmp_path / "export"
+
+    with KBStore(tmp_path / "store", persistent=persistent) as kb:
+        kb.sync([a, b])
+        assert kb.export(out, fmt="nq", compress=True) == {
+            a: "written",
+            b: "written",
+        }
+        assert kb.export(out, fmt="nq", compress=True) == {
+            a: "unchanged",
+            b: "unchanged",
+        }
+        write(tmp_path / "b.ttl", "b", value=2)
+        kb.sync([a, b])
+        assert kb.export(out, fmt="nq", compress=True) == {
+            a: "unchanged",
+            b: "written",
+        }
+
+        # The N-Quads files together are the whole dataset
+        dataset = Dataset()
+        for path in sorted(out.glob("*.nq.gz")):
+            with gzip.open(path, "rb") as f:
+                dataset.parse(f, format="nquads")
+        assert set(dataset.quads()) == {
+            (s, p, o, URIRef(graph_iri(source)))
+            for source in (a, b)
+            for s, p, o in kb.dataset.graph(URIRef(graph_iri(source)))
+        }
+
+        # Switching format replaces the files, removed sources are pruned
+        kb.prune([a])
+        assert kb.export(out) == {a: "written"}
+        assert sorted(p.name for p in out.iterdir()) == [
+            f"{export_name(a)}.nt",
+            "export.json",
+        ]
+        assert len(Graph().parse(out / f"{export_name(a)}.nt")) == 2
@@ -0,0 +1,105 @@
+"""Tests for the registry of prepared search queries."""
+
+import pytest
+from rdflib import Dataset, URIRef
+
+from kbstore import has_oxigraph
+from queries import QueryRegistry, registry
+from subclassindex import CLOSURE_GRAPH, SubClassIndex
+
+TTL = """\
+@prefix ex: <http://example.com/> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ssbd: <https://w3id.org/ssbd/> .
+
+ex:activity rdfs:subClassOf
+    [ a owl:Restriction ;
+      owl:onProperty ssbd:hasSoftware ;
+      owl:hasValue ex:tool ] ,
+    [ a owl:Restriction ;
+      owl:onProperty ssbd:hasSoftware ;
+      owl:hasValue ex:other ] .
+
+ex:tool rdfs:label "tool" .
+"""
+
+EX = "http://example.com/"
+
+stores = ["default"] + (["Oxigraph"] if has_oxigraph() else [])
+
+
+def kb(store="default"):
+    dataset = Dataset(store=store)
+    dataset.default_union = True
+    dataset.graph(URIRef(EX + "kb")).parse(data=TTL, format="turtle")
+    return dataset
+
+
+@pytest.mark.parametrize("store", stores)
+def test_parameters_are_bound(store):
+    rows = registry.run(kb(store), "query5", activity=EX + "activity")
+    assert [(r.activity, r.software, str(r.softwareName)) for r in rows] == [
+        (URIRef(EX + "activity"), URIRef(EX + "other"), EX + "other"),
+        (URIRef(EX + "activity"), URIRef(EX + "tool"), "tool"),
+    ]
+    assert not registry.run(kb(store), "query5", activity=EX + "missing")
+
+
+def test_parameters_are_checked():
+    with pytest.raises(ValueError):
+        registry.run(kb(), "query5")
+    with pytest.raises(ValueError):
+        registry.run(kb(), "query1", activity=EX + "activity")
+
+    queries = QueryRegistry()
+    queries.register("q", "SELECT ?s WHERE { ?s ?p ?o }", ["o"])
+    with pytest.raises(ValueError):
+        queries.run(kb(), "q", o=EX + "tool")
+
+
+def test_results_are_cached_per_version():
+    queries = QueryRegistry()
+    queries.register("software", registry["query5"].text, ["activity"])
+    dataset = kb()
+    activity = URIRef(EX + "activity")
+
+    first = queries.run(dataset, "software", version="v1", activity=activity)
+    dataset.remove((None, None, None))
+    assert queries.run(dataset, "software", "v1", activity=activity) == first
+    assert (queries.hits, queries.misses) == (1, 1)
+
+    assert not queries.run(dataset, "software", "v2", activity=activity)
+    assert not queries.run(dataset, "software", activity=activity)
+    assert (queries.hits, queries.misses) == (1, 2)
+
+
+@pytest.mark.parametrize("store", stores)
+def test_query_all_on_closure(store):
+    dataset = kb(store)
+    dataset.graph(URIRef(EX + "kb")).parse(
+        data="""\
+@prefix ex: <http://example.com/> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ssbd: <https://w3id.org/ssbd/> .
+@prefix emmo: <https://w3id.org/emmo#> .
+
+ex:Smiles rdfs:subClassOf ex:Property .
+ex:Molecules rdfs:subClassOf ssbd:Dataset , [
+    a owl:Restriction ;
+    owl:onProperty emmo:EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e ;
+    owl:someValuesFrom ex:Smiles ] .
+ex:activity rdfs:subClassOf ssbd:Assessment , [
+    a owl:Restriction ;
+    owl:onProperty ssbd:hasInput ;
+    owl:onClass ex:Molecules ] .
+""",
+        format="turtle",
+    )
+    SubClassIndex(dataset).materialise(dataset.graph(CLOSURE_GRAPH))
+    rows = registry.run(dataset, "query_all", targetProperty=EX + "Property")
+    assert sorted(row.software for row in rows) == [
+        URIRef(EX + "other"),
+        URIRef(EX + "tool"),
+    ]
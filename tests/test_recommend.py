@@ -0,0 +1,117 @@
+"""Tests for the batch software recommendations."""
+
+from rdflib import OWL, Dataset, Graph, URIRef
+
+from queries import registry
+from recommend import Recommender
+from subclassindex import CLOSURE_GRAPH, SubClassIndex
+from synthkb import ACTIVITY, CHEMINF, DATASETTYPE, synthetic_kb
+
+TTL = """\
+@prefix ex: <http://example.com/> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+@prefix ssbd: <https://w3id.org/ssbd/> .
+@prefix emmo: <https://w3id.org/emmo#> .
+
+ex:Property rdfs:label "property" .
+ex:Smiles rdfs:subClassOf ex:Property ; rdfs:label "smiles" .
+
+ex:Molecules rdfs:subClassOf ssbd:Dataset ,
+    [ a owl:Restriction ;
+      owl:onProperty emmo:EMMO_b19aacfc_5f73_4c33_9456_469c1e89a53e ;
+      owl:someValuesFrom ex:Smiles ] ;
+    skos:prefLabel "molecules" .
+
+ex:Screening rdfs:subClassOf ssbd:Assessment ,
+    [ a owl:Restriction ;
+      owl:onProperty ssbd:hasInput ;
+      owl:onClass ex:Molecules ] ,
+    [ a owl:Restriction ;
+      owl:onProperty ssbd:hasSoftware ;
+      owl:hasValue ex:tool ] .
+
+ex:tool rdfs:label "tool" .
+"""
+
+
+def test_recommend():
+    ex = "http://example.com/"
+    recommender = Recommender(Graph().parse(data=TTL))
+    (path,) = recommender.recommend([ex + "Property"])
+    assert path.target == URIRef(ex + "Property")
+    assert path.property == URIRef(ex + "Smiles")
+    assert path.software == URIRef(ex + "tool")
+    assert (
+        path.property_label,
+        path.dataset_type_label,
+        path.assessment_label,
+        path.software_label,
+    ) == ("smiles", "molecules", ex + "Screening", "tool")
+
+    # Like rdfs:subClassOf+, a class is not its own subclass
+    assert not recommender.recommend([ex + "Smiles"])
+    assert [p.target for p in recommender.recommend_all()] == [
+        URIRef(ex + "Property")
+    ]
+
+
+def test_recommend_matches_query_all():
+    dataset = Dataset()
+    dataset.default_union = True
+    kb = dataset.graph(URIRef("https://example.com/kb"))
+    kb.addN((s, p, o, kb) for s, p, o in synthetic_kb(0.05))
+    index = SubClassIndex(dataset)
+    index.materialise(dataset.graph(CLOSURE_GRAPH))
+    recommender = Recommender(dataset, index=index)
+
+    targets = [CHEMINF.CHEMINF_000018, CHEMINF.CHEMINF_000085]
+    software = recommender.software_for(targets)
+    for target in targets:
+        expected = {
+            row.software
+            for row in registry.run(
+                dataset, "query_all", targetProperty=target
+            )
+        }
+        assert expected
+        assert software[target] == expected
+
+    batch = recommender.recommend(targets)
+    everything = recommender.recommend_all()
+    assert set(batch) <= set(everything)
+
+
+def test_rows_match_queries():
+    # search_pink_kb.py answers query3, query4 and query5 from the table
+    dataset = Dataset()
+    dataset.default_union = True
+    kb = dataset.graph(URIRef("https://example.com/kb"))
+    kb.addN((s, p, o, kb) for s, p, o in synthetic_kb(0.1))
+    index = SubClassIndex(dataset)
+    index.materialise(dataset.graph(CLOSURE_GRAPH))
+    recommender = Recommender(dataset, index=index)
+
+    smiles = DATASETTYPE.SMILES
+    activity = ACTIVITY.activity0
+    expected_rows = {}
+    for name, rows, parameters in [
+        ("query3", recommender.dataset_types(smiles + "#SMILES"), {}),
+        ("query4", recommender.assessments_for(smiles), {}),
+        (
+            "query5",
+            recommender.activity_software(activity),
+            {"activity": activity},
+        ),
+    ]:
+        expected = expected_rows[name] = registry.run(
+            dataset, name, **parameters
+        )
+        assert expected
+        assert rows == expected
+        assert rows[0]._fields == expected[0]._fields
+    # Both branches of the UNION of query3 are covered
+    kinds = {row.restrictionType for row in expected_rows["query3"]}
+    assert OWL.onClass in kinds and len(kinds) > 1
+    assert any(row.cardinality for row in expected_rows["query3"])
@@ -0,0 +1,156 @@
+"""Tests for the OWL restriction table."""
+
+import json
+from pathlib import Path
+
+import pytest
+from rdflib import OWL, Graph, Literal, Namespace, URIRef
+
+from kbstore import KBStore
+from restrictions import Restriction, RestrictionTable, restriction_table
+
+rootdir = Path(__file__).resolve().parent.parent
+
+EX = Namespace("http://example.com/")
+SSBD = Namespace("https://w3id.org/ssbd/")
+DATASETTYPE = Namespace("https://pink-project.eu/datasettype/")
+
+TTL = """\
+@prefix ex: <http://example.com/> .
+@prefix owl: <http://www.w3.org/2002/07/owl#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+
+ex:Assessment rdfs:subClassOf
+    [ a owl:Restriction ;
+      owl:onProperty ex:hasInput ;
+      owl:someValuesFrom ex:DatasetA ] ,
+    [ a owl:Restriction ;
+      owl:onProperty ex:hasInput ;
+      owl:onClass ex:DatasetB ;
+      owl:qualifiedCardinality 2 ] ,
+    [ a owl:Restriction ;
+      owl:onProperty ex:hasSoftware ;
+      owl:hasValue ex:sw1 ] ,
+    [ a owl:Restriction ;
+      owl:onProperty ex:hasOutput ;
+      owl:maxCardinality 1 ] .
+
+ex:Other rdfs:subClassOf
+    [ a owl:Restriction ;
+      owl:onProperty ex:hasInput ;
+      owl:allValuesFrom ex:DatasetA ] .
+"""
+
+
+def table():
+    return RestrictionTable.from_graph(Graph().parse(data=TTL))
+
+
+def test_from_graph():
+    t = table()
+    assert len(t) == 5
+    assert t.classes(EX.hasInput, EX.DatasetA) == {EX.Assessment, EX.Other}
+    assert t.classes(EX.hasInput, EX.DatasetA, kinds=[OWL.someValuesFrom]) == {
+        EX.Assessment
+    }
+    assert t.fillers(EX.Assessment, EX.hasInput) == {EX.DatasetA, EX.DatasetB}
+    assert t.fillers(EX.Assessment, EX.hasSoftware) == {EX.sw1}
+    assert t.restrictions(filler=EX.DatasetB, property=EX.hasInput) == [
+        Restriction(
+            EX.Assessment,
+            EX.hasInput,
+            OWL.onClass,
+            EX.DatasetB,
+            2,
+            OWL.qualifiedCardinality,
+        )
+    ]
+    assert t.restrictions(cls=EX.Assessment, property=EX.hasOutput) == [
+        Restriction(
+            EX.Assessment,
+            EX.hasOutput,
+            OWL.maxCardinality,
+            None,
+            1,
+            OWL.maxCardinality,
+        )
+    ]
+
+
+def test_save_and_load(tmp_path):
+    t = table()
+    t.save(tmp_path / "table.json", version="abc")
+    loaded, metadata = RestrictionTable.load(tmp_path / "table.json")
+    assert metadata == {"version": "abc"}
+    assert sorted(loaded) == sorted(t)
+    assert loaded.classes(EX.hasInput, EX.DatasetA) == {
+        EX.Assessment,
+        EX.Other,
+    }
+
+
+def test_from_jsonld():
+    doc = {
+        "@context": {"ex": str(EX), "subClassOf": str(EX.subClassOf)},
+        "@graph": [
+            {
+                "@id": "ex:A",
+                "subClassOf": [
+                    "ex:B",
+                    {
+                        "@type": "owl:Restriction",
+                        "owl:onProperty": "ex:hasInput",
+                        "owl:someValuesFrom": "ex:DatasetA",
+                    },
+                    {
+                        "@type": "owl:Restriction",
+                        "owl:onProperty": {"@id": "ex:p"},
+                        "owl:hasValue": {"@value": "x", "@language": "en"},
+                    },
+                ],
+            },
+            {"@id": "ex:B", "subClassOf": "ex:C"},
+        ],
+    }
+    t = RestrictionTable.from_jsonld(doc)
+    assert sorted(t) == sorted(
+        [
+            Restriction(EX.A, EX.hasInput, OWL.someValuesFrom, EX.DatasetA),
+            Restriction(EX.A, EX.p, OWL.hasValue, Literal("x", lang="en")),
+        ]
+    )
+
+
+def test_repository_resources():
+    path = rootdir / "jsonld" / "pink_googlespreadsheet_resources.jsonld"
+    t = RestrictionTable.from_jsonld(path)
+    activity = URIRef("https://w3id.org/pink/activity/activity0")
+    assert activity in t.classes(SSBD.hasInput, DATASETTYPE.SMILES)
+    assert t.fillers(activity, SSBD.hasSoftware)
+
+
+def test_restriction_table_is_cached(tmp_path):
+    pytest.importorskip("oxrdflib")
+    onto = tmp_path / "onto.ttl"
+    onto.write_text(TTL, encoding="utf-8")
+    path = tmp_path / "store" / "restrictions.json"
+    with KBStore(tmp_path / "store") as kb:
+        kb.sync([str(onto)])
+        assert len(restriction_table(kb)) == 5
+        assert path.exists()
+
+    # Tables stored in an older row format are extracted again
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["rows"] = [row[:5] for row in data["rows"]]
+    data.pop("format")
+    path.write_text(json.dumps(data), encoding="utf-8")
+    with KBStore(tmp_path / "store") as kb:
+        kb.sync([str(onto)])
+        table = restriction_table(kb)
+        assert len(table) == 5
+        assert any(r.cardinality_kind for r in table)
+
+    with KBStore(tmp_path / "store") as kb:
+        kb.sync([str(onto)])
+        kb.dataset.remove((None, None, None))  # must not be re-extracted
+        assert len(restriction_table(kb)) == 5
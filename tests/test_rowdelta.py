@@ -0,0 +1,183 @@
+"""Tests for the row-level change tracking of the spreadsheet tables."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from rdflib import OWL, RDF, RDFS, BNode, Graph, Literal, Namespace
+
+from rowdelta import (
+    RowDelta,
+    apply_jsonld_delta,
+    apply_triple_delta,
+    diff_hashes,
+    hash_row,
+    incremental_correct,
+    load_delta,
+    load_state,
+    promote_state,
+    referring_subjects,
+    triple_delta,
+    version_hash,
+)
+
+PINK = Namespace("https://pink-project.eu/")
+
+
+@pytest.fixture(name="workdir")
+def fixture_workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class Corrector:
+    """Correct a table by upper-casing the titles and count the rows."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, df):
+        self.rows.extend(df["@id"])
+        return df.assign(title=df["title"].str.upper())
+
+
+def table(titles):
+    return pd.DataFrame({"@id": list(titles), "title": list(titles.values())})
+
+
+def test_hash_row():
+    row = pd.Series({"@id": "a", "title": " A ", "keyword": np.nan})
+    same = pd.Series({"@id": "a", "title": "A", "keyword": None})
+    assert hash_row(row) == hash_row(same)
+    assert hash_row(row) != hash_row(row.replace(" A ", "B"))
+    assert hash_row(pd.Series({"k": ["x", "y"]})) != hash_row(
+        pd.Series({"k": ["y", "x"]})
+    )
+
+
+def test_diff_hashes():
+    delta = diff_hashes({"a": "1", "b": "2", "c": "3"}, {"a": "1", "b": "x"})
+    assert delta == RowDelta(changed={"b"}, removed={"c"})
+    assert delta.stale == {"b", "c"}
+    assert diff_hashes({}, {"a": "1"}).processed == {"a"}
+    assert not diff_hashes({"a": "1"}, {"a": "1"})
+
+
+def test_round_trip(workdir):
+    correct = Corrector()
+    delta = incremental_correct("t", table({"a": "x", "b": "y"}), correct)
+    assert delta == RowDelta(added={"pink:a", "pink:b"})
+    assert list(pd.read_csv("t_clean.csv")["title"]) == ["X", "Y"]
+    assert load_delta("t") == delta
+    promote_state("t")
+
+    # Only the added and changed rows are corrected
+    correct.rows.clear()
+    delta = incremental_correct("t", table({"b": "z", "c": "w"}), correct)
+    assert delta == RowDelta(
+        added={"pink:c"}, changed={"pink:b"}, removed={"pink:a"}
+    )
+    assert correct.rows == ["b", "c"]
+    clean = pd.read_csv("t_clean.csv")
+    assert list(clean["@id"]) == ["b", "c"]
+    assert list(clean["title"]) == ["Z", "W"]
+    assert list(pd.read_csv("t_delta.csv")["@id"]) == ["b", "c"]
+    promote_state("t")
+
+    correct.rows.clear()
+    delta = incremental_correct("t", table({"b": "z", "c": "w"}), correct)
+    assert not delta
+    assert not correct.rows
+    assert list(pd.read_csv("t_clean.csv")["title"]) == ["Z", "W"]
+
+
+def test_rerun_after_failed_validation(workdir):
+    incremental_correct("t", table({"a": "x"}), Corrector())
+    promote_state("t")
+    incremental_correct("t", table({"a": "y", "b": "z"}), Corrector())
+
+    # Step 2 failed and did not promote the state: the next run of
+    # step 1 still reports the rows that were not validated
+    delta = incremental_correct("t", table({"a": "y", "b": "z"}), Corrector())
+    assert delta == RowDelta(added={"pink:b"}, changed={"pink:a"})
+    assert set(load_state("t")["hashes"]) == {"pink:a"}
+    assert set(load_state("t", pending=True)["hashes"]) == {
+        "pink:a",
+        "pink:b",
+    }
+
+    assert promote_state("t")
+    assert not promote_state("t")
+    delta = incremental_correct("t", table({"a": "y", "b": "z"}), Corrector())
+    assert not delta
+
+
+def test_version(workdir):
+    version = version_hash("ontology", b"source")
+    assert version != version_hash("ontology", b"changed source")
+    incremental_correct("t", table({"a": "x"}), Corrector(), version)
+    promote_state("t")
+
+    correct = Corrector()
+    assert not incremental_correct("t", table({"a": "x"}), correct, version)
+    delta = incremental_correct("t", table({"a": "x"}), correct, "other")
+    assert delta == RowDelta(changed={"pink:a"})
+    assert correct.rows == ["a"]
+    assert load_state("t", pending=True)["version"] == "other"
+
+
+def restriction_graph(target):
+    """Return a graph with a class restricted to values of `target`."""
+    graph = Graph()
+    restriction = BNode()
+    graph.add((PINK.comp, RDF.type, OWL.Class))
+    graph.add((PINK.comp, RDFS.label, Literal("comp")))
+    graph.add((PINK.comp, RDFS.subClassOf, restriction))
+    graph.add((restriction, RDF.type, OWL.Restriction))
+    graph.add((restriction, OWL.onProperty, PINK.hasSoftware))
+    graph.add((restriction, OWL.someValuesFrom, target))
+    graph.add((PINK.sw, RDFS.label, Literal("sw")))
+    return graph
+
+
+def test_triple_delta():
+    snapshot = restriction_graph(PINK.sw)
+    new = Graph()
+    for triple in restriction_graph(PINK.other).triples((None, None, None)):
+        if triple[0] != PINK.sw:
+            new.add(triple)
+
+    add, remove = triple_delta(snapshot, new, [PINK.comp])
+    # The restriction blank node is removed with the description
+    assert len(remove) == 4
+    assert (None, OWL.someValuesFrom, PINK.sw) in remove
+    assert (PINK.comp, RDFS.label, Literal("comp")) not in remove
+    assert (None, OWL.someValuesFrom, PINK.other) in add
+    assert (PINK.comp, RDF.type, OWL.Class) not in add
+
+    apply_triple_delta(snapshot, add, remove)
+    assert len(snapshot) == 7
+    assert (None, OWL.someValuesFrom, PINK.sw) not in snapshot
+    assert len(list(snapshot.subjects(RDF.type, OWL.Restriction))) == 1
+
+
+def test_referring_subjects():
+    graph = restriction_graph(PINK.sw)
+    assert referring_subjects(graph, [PINK.sw]) == {PINK.comp}
+    assert referring_subjects(graph, [PINK.comp]) == set()
+
+
+def test_apply_jsonld_delta():
+    doc = {
+        "@context": {"pink": "https://pink-project.eu/"},
+        "@graph": [
+            {"@id": "pink:a", "title": "a"},
+            {"@id": "https://pink-project.eu/b", "title": "b"},
+            {"@id": "pink:c", "title": "c"},
+        ],
+    }
+    entries = [{"@id": "https://pink-project.eu/b", "title": "B"}]
+    doc = apply_jsonld_delta(doc, entries, ["pink:a", "pink:b"], {})
+    assert doc["@graph"] == [
+        {"@id": "pink:c", "title": "c"},
+        {"@id": "https://pink-project.eu/b", "title": "B"},
+    ]
@@ -0,0 +1,228 @@
+"""Tests for the sharded parallel SHACL validation."""
+
+import random
+import re
+
+import pytest
+from pyshacl import validate
+from rdflib import SH, BNode, Graph, URIRef
+
+from validation.sharded import make_shards, shapes_depth, validate_sharded
+
+SHAPES = """
+@prefix sh: <http://www.w3.org/ns/shacl#> .
+@prefix ex: <http://example.com/> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+ex:ThingShape a sh:NodeShape ;
+    sh:targetClass ex:Thing ;
+    sh:property [ sh:path ex:name ; sh:minCount 1 ;
+                  sh:datatype xsd:string ] ;
+    sh:property [ sh:path ex:ref ; sh:class ex:Thing ;
+                  sh:severity sh:Warning ] ;
+    sh:property [ sh:path ex:part ; sh:node ex:PartShape ] .
+
+ex:PartShape a sh:NodeShape ;
+    sh:property [ sh:path ex:label ; sh:minCount 1 ] .
+
+ex:DistributionShape a sh:NodeShape ;
+    sh:targetSubjectsOf ex:distribution ;
+    sh:property [ sh:path ( ex:distribution ex:url ) ; sh:minCount 1 ;
+                  sh:nodeKind sh:IRI ] .
+
+ex:MadeShape a sh:NodeShape ;
+    sh:targetObjectsOf ex:made ;
+    sh:property [ sh:path ex:name ; sh:maxCount 0 ;
+                  sh:severity sh:Info ] .
+"""
+
+PREFIXES = """
+@prefix sh: <http://www.w3.org/ns/shacl#> .
+@prefix ex: <http://example.com/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+"""
+
+
+def make_data(n=60, seed=1):
+    """Return a data graph of `n` random resources."""
+    rnd = random.Random(seed)
+    lines = [
+        PREFIXES,
+        "ex:Sub rdfs:subClassOf ex:Thing .",
+        "ex:made rdfs:range ex:Thing .",
+        "ex:madeBy rdfs:subPropertyOf ex:made .",
+    ]
+    for i in range(n):
+        line = f"ex:r{i} a {rnd.choice(['ex:Thing', 'ex:Sub', 'ex:Other'])}"
+        if rnd.random() < 0.8:
+            line += f' ; ex:name "r{i}"'
+        if rnd.random() < 0.5:
+            line += f" ; ex:ref ex:r{rnd.randrange(n)}"
+        if rnd.random() < 0.3:
+            line += f" ; ex:part ex:p{i}"
+        if rnd.random() < 0.3:
+            line += f" ; ex:{rnd.choice(['made', 'madeBy'])} ex:o{i}"
+        if rnd.random() < 0.3:
+            url = f"ex:u{i}" if rnd.random() < 0.7 else '"no IRI"'
+            line += f" ; ex:distribution [ a ex:Thing ; ex:url {url} ]"
+        lines.append(line + " .")
+        if rnd.random() < 0.5:
+            lines.append(f'ex:p{i} ex:label "part" .')
+        if rnd.random() < 0.2:
+            lines.append(f'ex:o{i} ex:name "o{i}" .')
+    return Graph().parse(data="\n".join(lines), format="turtle")
+
+
+def results(graph):
+    """Return the sorted results of a results graph, with blank nodes
+    replaced by their descriptions in the messages."""
+    out = []
+    for result in graph.objects(None, SH.result):
+        out.append(
+            tuple(
+                "_" if isinstance(value, BNode) else str(value)
+                for value in (
+                    graph.value(result, SH.focusNode),
+                    graph.value(result, SH.resultPath),
+                    graph.value(result, SH.sourceConstraintComponent),
+                    graph.value(result, SH.resultSeverity),
+                    graph.value(result, SH.value),
+                    graph.value(result, SH.resultMessage),
+                )
+            )
+        )
+    return sorted(out)
+
+
+def text_lines(text):
+    """Return the lines of a text report, with the descriptions of blank
+    nodes removed, since those of the data graph show the triples
+    inferred during the validation."""
+    while True:
+        stripped = re.sub(r"\[[^][]*\]", "[]", text)
+        if stripped == text:
+            return text.splitlines()
+        text = stripped
+
+
+@pytest.fixture(name="shapes", scope="module")
+def fixture_shapes():
+    return Graph().parse(data=SHAPES, format="turtle")
+
+
+@pytest.fixture(name="data", scope="module")
+def fixture_data():
+    return make_data()
+
+
+def test_shapes_depth(shapes):
+    assert shapes_depth(shapes) == 2
+    inverse = Graph().parse(
+        data=PREFIXES + "ex:S sh:targetClass ex:Thing ; sh:property "
+        "[ sh:path [ sh:inversePath ex:ref ] ; sh:maxCount 1 ] .",
+        format="turtle",
+    )
+    assert shapes_depth(inverse) is None
+    recursive = Graph().parse(
+        data=PREFIXES + "ex:S sh:targetClass ex:Thing ; sh:property "
+        "[ sh:path ex:ref ; sh:node ex:S ] .",
+        format="turtle",
+    )
+    assert shapes_depth(recursive) is None
+
+
+def test_make_shards(data, shapes):
+    shards, owner = make_shards(data, shapes, 2, 3)
+    assert len(shards) == 3
+    assert set(data.subjects()) <= set(owner)
+    assert set(owner.values()) == {0, 1, 2}
+    for s in data.subjects():
+        # Each shard holds the triples of its own nodes
+        assert set(data.triples((s, None, None))) <= set(shards[owner[s]])
+    for shard in shards:
+        assert (URIRef("http://example.com/Sub"), None, None) in shard
+        assert len(shard) < len(data)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"inference": "rdfs"},
+        {"inference": "none"},
+        {"inference": "rdfs", "allow_warnings": True},
+    ],
+)
+def test_same_results(data, shapes, options):
+    conforms, graph, text = validate(data, shacl_graph=shapes, **options)
+    result = validate_sharded(
+        data, shapes, max_workers=2, shards=3, min_triples=0, **options
+    )
+    assert result[0] == conforms
+    assert results(result[1]) == results(graph)
+    assert len(result[1]) == len(graph)
+    if options["inference"] == "none":
+        assert result[2] == text
+    assert sorted(text_lines(result[2])) == sorted(text_lines(text))
+
+
+def test_focus_nodes(data, shapes):
+    focus_nodes = [f"http://example.com/r{i}" for i in range(0, 60, 7)]
+    conforms, graph, text = validate(
+        data, shacl_graph=shapes, inference="rdfs", focus_nodes=focus_nodes
+    )
+    result = validate_sharded(
+        data,
+        shapes,
+        max_workers=2,
+        min_triples=0,
+        inference="rdfs",
+        focus_nodes=focus_nodes,
+    )
+    assert result[0] == conforms
+    assert results(result[1]) == results(graph)
+    assert sorted(text_lines(result[2])) == sorted(text_lines(text))
+
+
+def test_conforms(shapes):
+    data = make_data(20, seed=2)
+    valid = Graph()
+    for triple in data:
+        if triple[1] != URIRef("http://example.com/distribution"):
+            valid.add(triple)
+    conforms, _, text = validate_sharded(
+        valid,
+        shapes,
+        max_workers=2,
+        min_triples=0,
+        inference="rdfs",
+        allow_warnings=True,
+    )
+    assert (
+        conforms
+        == validate(
+            valid, shacl_graph=shapes, inference="rdfs", allow_warnings=True
+        )[0]
+    )
+    assert text.startswith(f"Validation Report\nConforms: {conforms}\n")
+
+
+def test_single_process_fallback(data, shapes):
+    # Small graphs, inverse paths, OWL inference and abort_on_first are
+    # validated in one process
+    inverse = Graph().parse(
+        data=PREFIXES + "ex:S sh:targetClass ex:Thing ; sh:property "
+        "[ sh:path [ sh:inversePath ex:ref ] ; sh:maxCount 1 ] .",
+        format="turtle",
+    )
+    for shacl_graph, options in [
+        (shapes, {"inference": "rdfs", "min_triples": len(data) + 1}),
+        (inverse, {"inference": "rdfs", "min_triples": 0}),
+        (shapes, {"inference": "owlrl", "min_triples": 0}),
+        (shapes, {"abort_on_first": True, "min_triples": 0}),
+    ]:
+        result = validate_sharded(data, shacl_graph, max_workers=2, **options)
+        del options["min_triples"]
+        expected = validate(data, shacl_graph=shacl_graph, **options)
+        assert result[0] == expected[0]
+        assert results(result[1]) == results(expected[1])
+        assert result[2] == expected[2]
@@ -0,0 +1,94 @@
+"""Tests for the SPARQL query profiler."""
+
+import threading
+
+from rdflib import Graph, URIRef
+from rdflib.plugins.sparql import evaluate, prepareQuery
+
+from sparqlprofile import Profile, profile_query
+
+TTL = """\
+@prefix ex: <http://example.com/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+
+ex:B rdfs:subClassOf ex:A .
+ex:C rdfs:subClassOf ex:B .
+ex:B rdfs:label "b" .
+ex:x ex:value 1 .
+ex:y ex:value 2 .
+"""
+
+PREFIXES = """\
+PREFIX ex: <http://example.com/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+"""
+
+
+def nodes(profile):
+    return {part.name: part for _, part in profile.nodes()}
+
+
+def test_profile_counts_solutions():
+    graph = Graph().parse(data=TTL, format="turtle")
+    query = PREFIXES + """
+SELECT ?c ?label WHERE {
+  ?c rdfs:subClassOf+ ex:A .
+  OPTIONAL { ?c rdfs:label ?label }
+}"""
+    original = evaluate.evalPart
+    profile, rows = profile_query(graph, query)
+    assert evaluate.evalPart is original
+    assert len(rows) == profile.rows == 2
+    assert {str(row["c"]) for row in rows} == {
+        "http://example.com/B",
+        "http://example.com/C",
+    }
+
+    optional = nodes(profile)["LeftJoin"]
+    assert profile.stats[id(optional)].solutions == 2
+    bgp = optional.p1
+    assert "PATH" in profile.flags(bgp)
+    assert profile.self_time(optional) <= profile.stats[id(optional)].time
+
+    report = profile.report()
+    assert "OPTIONAL (LeftJoin)" in report
+    assert "?c rdfs:subClassOf+ ex:A" in report
+
+
+def test_cartesian_products_are_flagged():
+    graph = Graph().parse(data=TTL, format="turtle")
+    query = PREFIXES + """
+SELECT * WHERE { ?c rdfs:subClassOf ?d . ?x ex:value ?v }"""
+    profile, rows = profile_query(graph, query)
+    assert len(rows) == 4
+    assert "CARTESIAN" in profile.flags(nodes(profile)["BGP"])
+
+    # Binding the shared variable splits the pattern in independent groups
+    query = PREFIXES + """
+SELECT * WHERE { ?c rdfs:subClassOf ?d . ?d rdfs:subClassOf ?e }"""
+    profile, rows = profile_query(
+        graph, query, {"d": URIRef("http://example.com/B")}
+    )
+    assert len(rows) == 1
+    assert "CARTESIAN" in profile.flags(nodes(profile)["BGP"])
+    profile, rows = profile_query(graph, query)
+    assert "CARTESIAN" not in profile.flags(nodes(profile)["BGP"])
+
+
+def test_other_threads_are_not_recorded():
+    profile = Profile(prepareQuery(PREFIXES + "SELECT * { ?s ?p ?o }"), set())
+    part = profile.query.algebra
+    evalpart = profile.wrap(lambda ctx, part: ["row"])
+
+    # Queries evaluated by other threads while evalPart is replaced
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(evalpart(None, part))
+    )
+    thread.start()
+    thread.join()
+    assert results == [["row"]]
+    assert not profile.stats
+
+    assert list(evalpart(None, part)) == ["row"]
+    assert profile.stats[id(part)].solutions == 1
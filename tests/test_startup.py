@@ -0,0 +1,50 @@
+"""Startup time budgets of the scripts and the validation package.
+
+The import time of each target of ``benchmarks/bench_startup.py`` must
+be within its budget, multiplied by the ``PINK_BUDGET_FACTOR``
+environment variable (default 3), and the heavy dependencies must not
+be imported at startup.  The time budgets are only checked with
+``pytest --budgets`` (or ``PINK_BUDGETS=1``), see conftest.py.
+"""
+
+import pytest
+
+from benchmarks.bench_startup import (
+    TARGETS,
+    best_of,
+    measure,
+    parse_importtime,
+    violations,
+)
+
+
+def test_parse_importtime():
+    startup = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   _io\n"
+        "import time:       200 |        300 | io\n"
+        "import time:      1000 |     250000 |     pandas.core\n"
+        "import time:      2000 |     500000 |   pandas\n"
+        "import time:       500 |     700000 | parseutils\n"
+    )
+    assert startup.imports == {"io": 0.0003, "parseutils": 0.7}
+    assert startup.seconds == pytest.approx(0.7003)
+    assert "pandas.core" in startup.modules
+
+    errors = violations("import parseutils", startup)
+    assert errors == [
+        "import parseutils: imports take 0.700 s, budget 0.250 s",
+        "import parseutils: imports pandas at startup",
+    ]
+
+
+@pytest.mark.parametrize("target", list(TARGETS))
+def test_startup_imports(target):
+    # Only the heavy imports, independent of the machine load
+    assert not violations(target, measure(target), float("inf"))
+
+
+@pytest.mark.budget
+@pytest.mark.parametrize("target", list(TARGETS))
+def test_startup_budget(target, budget_factor):
+    assert not violations(target, best_of(target), budget_factor)
@@ -0,0 +1,76 @@
+"""Tests for the subclass closure index."""
+
+import random
+
+from rdflib import RDFS, BNode, Graph, Namespace
+
+from subclassindex import SUBCLASSOF_TRANSITIVE, SubClassIndex
+
+EX = Namespace("http://example.com/")
+
+
+def random_graph(nclasses=60, nedges=120, seed=1):
+    """Return a graph with random subClassOf relations, including cycles."""
+    rng = random.Random(seed)
+    graph = Graph()
+    for _ in range(nedges):
+        graph.add(
+            (
+                EX[f"C{rng.randrange(nclasses)}"],
+                RDFS.subClassOf,
+                EX[f"C{rng.randrange(nclasses)}"],
+            )
+        )
+    # A restriction-like blank node
+    graph.add((EX.C0, RDFS.subClassOf, BNode()))
+    return graph
+
+
+def test_matches_property_path():
+    graph = random_graph()
+    index = SubClassIndex(graph)
+    for i in range(60):
+        cls = EX[f"C{i}"]
+        expected = {
+            row.c
+            for row in graph.query(
+                "SELECT ?c WHERE { ?c rdfs:subClassOf+ ?sup }",
+                initBindings={"sup": cls},
+            )
+        }
+        assert index.descendants(cls) == expected
+        for sub in expected:
+            assert index.is_subclass(sub, cls)
+            assert cls in index.ancestors(sub)
+
+
+def test_cycles_and_unknown_classes():
+    graph = Graph()
+    graph.add((EX.A, RDFS.subClassOf, EX.B))
+    graph.add((EX.B, RDFS.subClassOf, EX.A))
+    graph.add((EX.C, RDFS.subClassOf, EX.A))
+    graph.add((EX.D, RDFS.subClassOf, EX.C))
+    index = SubClassIndex(graph)
+    assert index.descendants(EX.A) == {EX.A, EX.B, EX.C, EX.D}
+    assert index.ancestors(EX.D) == {EX.A, EX.B, EX.C}
+    assert not index.is_subclass(EX.D, EX.D)
+    assert not index.is_subclass(EX.A, EX.D)
+    assert not index.is_subclass(EX.X, EX.A)
+    assert index.descendants(EX.X) == set()
+
+
+def test_materialised_triples_give_same_results():
+    graph = random_graph(seed=2)
+    closure = Graph()
+    SubClassIndex(graph).materialise(closure)
+    for i in range(0, 60, 7):
+        sup = EX[f"C{i}"]
+        path = set(
+            graph.query(f"SELECT ?c WHERE {{ ?c rdfs:subClassOf+ <{sup}> }}")
+        )
+        materialised = set(
+            closure.query(
+                f"SELECT ?c WHERE {{ ?c <{SUBCLASSOF_TRANSITIVE}> <{sup}> }}"
+            )
+        )
+        assert materialised == path
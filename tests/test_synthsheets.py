@@ -0,0 +1,65 @@
+"""Tests for the synthetic PINK spreadsheets."""
+
+import pandas as pd
+
+from benchmarks.synthsheets import (
+    CHEMICAL_CLASSES,
+    sheet_headers,
+    synthetic_sheets,
+    write_sheets,
+)
+
+
+def test_sheets():
+    sheets = synthetic_sheets(200, seed=1)
+    sw, datasettypes = sheets["sw"], sheets["datasettypes"]
+    agents, datamodels = sheets["agents"], sheets["datamodels"]
+    assert (len(sw), len(datasettypes), len(agents)) == (200, 200, 100)
+    assert synthetic_sheets(200, seed=1)["sw"].equals(sw)
+
+    # Identifiers with and without prefix
+    ids = sw["identifier"]
+    assert ids.is_unique and agents["identifier"].is_unique
+    assert ids.str.startswith("mw:").any()
+    assert (~ids.str.contains(":")).any()
+
+    # List cells refer to the other sheets
+    creators = sw["creator"].str.split(r"[,;\s]+", regex=True).explode()
+    assert creators.isin(agents["identifier"]).all()
+    assert (creators.groupby(level=0).size() > 1).any()
+    inputs = sw["inputDatasetType"].str.split(r"[,;\s]+", regex=True)
+    assert inputs.explode().isin(datasettypes["identifier"]).all()
+    assert sw[list(CHEMICAL_CLASSES)].notna().any().all()
+
+    # Dates, tier levels with explanations, comment and unnamed columns
+    dates = sw["releaseDate"].dropna()
+    assert dates.str.match(r"^\d{4}-\d\d-\d\d$").any()
+    assert dates.str.contains("/").any()
+    tiers = sw["tierLevel"].dropna()
+    assert tiers.str.match(r"^tierlevel\d$").any()
+    assert tiers.str.match(r"^tierlevel\d \(").any()
+    assert "title (comment)" in sw and "Unnamed: 20" in datasettypes
+
+    # Datum table of the datasettypes with datums
+    datums = [c for c in datamodels.columns if c.startswith("datum")]
+    assert datamodels[datums].notna().any(axis=1).all()
+    assert len(datamodels) < len(datasettypes)
+    assert datamodels["@id"].str.startswith("https://").all()
+
+
+def test_headers_and_list_columns(tmp_path):
+    headers = sheet_headers(
+        {"Identifier": "@id", "Creator": "creator", "Name": "name", None: "x"}
+    )
+    assert headers == {
+        "@id": "Identifier",
+        "creator": "Creator",
+        "name": "Name",
+    }
+    sheets = synthetic_sheets(50, headers=headers, list_columns=["@id"])
+    assert "Creator" in sheets["sw"] and "Name" in sheets["agents"]
+    assert not sheets["sw"]["Creator"].str.contains(r"[,;\s]").any()
+
+    paths = write_sheets(sheets, tmp_path)
+    assert sorted(paths) == ["agents", "datamodels", "datasettypes", "sw"]
+    assert len(pd.read_csv(paths["sw"])) == 50
@@ -0,0 +1,57 @@
+"""Test parallel conversion of resource tables."""
+
+import json
+
+from rdflib.compare import isomorphic
+from tripper import Triplestore
+
+import tabledocs
+from tabledocs import convert_tables
+
+PREFIXES = {"ex": "http://example.com/"}
+
+
+def write_tables(tmp_path):
+    csvfiles = []
+    for name in "abc":
+        csvfile = tmp_path / f"{name}.csv"
+        csvfile.write_text(
+            "@id,@type,title,description\n"
+            f"ex:{name}1,dcat:Dataset,Title {name}1,Description\n"
+            f"ex:{name}2,dcat:Dataset,Title {name}2,Description\n",
+            encoding="utf-8",
+        )
+        csvfiles.append(str(csvfile))
+    return csvfiles
+
+
+def test_parallel_equals_serial(tmp_path):
+    csvfiles = write_tables(tmp_path)
+    serial = Triplestore("rdflib")
+    parallel = Triplestore("rdflib")
+    doc1 = convert_tables(serial, csvfiles, {}, PREFIXES, max_workers=1)
+    doc2 = convert_tables(parallel, csvfiles, {}, PREFIXES)
+    assert len(doc1["@graph"]) == len(doc2["@graph"]) == 6
+    assert isomorphic(serial.backend.graph, parallel.backend.graph)
+
+
+def test_context_is_resolved_once(tmp_path, monkeypatch):
+    csvfiles = write_tables(tmp_path)
+    context = tmp_path / "context.jsonld"
+    context.write_text(
+        json.dumps({"@context": {"title": "http://purl.org/dc/terms/title"}}),
+        encoding="utf-8",
+    )
+    calls = tmp_path / "calls"
+
+    def cached_path(url):
+        # Also records the calls of forked workers
+        with open(calls, "at", encoding="utf-8") as f:
+            f.write(f"{url}\n")
+        return context
+
+    monkeypatch.setattr(tabledocs, "cached_path", cached_path)
+    url = "https://example.com/context.jsonld"
+    doc = convert_tables(Triplestore("rdflib"), csvfiles, url, PREFIXES)
+    assert len(doc["@graph"]) == 6
+    assert calls.read_text(encoding="utf-8") == f"{url}\n"
@@ -0,0 +1,141 @@
+"""Tests for the full-text search index."""
+
+import json
+from pathlib import Path
+
+from rdflib import Graph
+
+from textindex import (
+    TextIndex,
+    documents_from_graph,
+    documents_from_jsonld,
+    merge_documents,
+)
+
+rootdir = Path(__file__).resolve().parent.parent
+
+DOCS = {
+    "ex:smiles": {
+        "label": "SMILES",
+        "description": "Line notation for the structure of molecules.",
+        "keyword": ["SMILES", "structure"],
+    },
+    "ex:tox": {
+        "title": "Toxicity model",
+        "description": "Predicts the toxicity of molecules from SMILES.",
+    },
+    "ex:md": {
+        "label": "Molecular dynamics",
+        "description": "Simulation of the motion of atoms.",
+    },
+}
+
+
+def test_ranking():
+    index = TextIndex()
+    index.update(DOCS)
+    # A match in a label ranks above a match in a description
+    assert [iri for iri, _ in index.search("smiles")] == [
+        "ex:smiles",
+        "ex:tox",
+    ]
+    assert index.search("SMILES toxicity model")[0][0] == "ex:tox"
+    assert not index.search("polymer")
+
+
+def test_prefix_and_fuzzy_matching():
+    index = TextIndex()
+    index.update(DOCS)
+    assert index.search("tox")[0][0] == "ex:tox"
+    assert not index.search("tox", prefix=False)
+    assert index.search("dinamics")[0][0] == "ex:md"
+    assert not index.search("dinamics", fuzzy=False)
+    exact = dict(index.search("toxicity"))["ex:tox"]
+    assert dict(index.search("toxicty"))["ex:tox"] < exact
+
+
+def test_incremental_update(tmp_path):
+    original = TextIndex()
+    assert original.update(DOCS)["added"] == 3
+    original.save(tmp_path / "index.json")
+
+    index = TextIndex.load(tmp_path / "index.json")
+    assert index.search("SMILES toxicity model") == original.search(
+        "SMILES toxicity model"
+    )
+    assert index.update(DOCS)["unchanged"] == 3
+    docs = dict(DOCS, **{"ex:md": {"label": "Polymer builder"}})
+    del docs["ex:smiles"]
+    assert index.update(docs, prune=True) == {
+        "added": 0,
+        "updated": 1,
+        "removed": 1,
+        "unchanged": 1,
+    }
+    assert index.search("polymer")[0][0] == "ex:md"
+    assert not index.search("dynamics")
+
+    fresh = TextIndex()
+    fresh.update(docs)
+    assert index.search("molecules") == fresh.search("molecules")
+
+
+def test_documents():
+    path = rootdir / "jsonld" / "pink_googlespreadsheet_resources.jsonld"
+    docs = documents_from_jsonld(path)
+    smiles = docs["https://pink-project.eu/datasettype/SMILES"]
+    assert "label" in smiles or "prefLabel" in smiles
+
+    graph = Graph().parse(path, format="json-ld")
+    assert set(documents_from_graph(graph)) == set(docs)
+
+    index = TextIndex()
+    index.update(docs)
+    assert "https://pink-project.eu/datasettype/SMILES" in dict(
+        index.search("SMILES toxicity model")
+    )
+
+
+def test_documents_with_same_id():
+    doc = {
+        "@context": {
+            "pink": "https://pink-project.eu/",
+            "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+            "dcterms": "http://purl.org/dc/terms/",
+        },
+        "@graph": [
+            {"@id": "pink:a", "rdfs:label": "SMILES"},
+            {
+                "@id": "https://pink-project.eu/a",
+                "rdfs:label": ["SMILES", "Simplified input"],
+                "dcterms:description": "Line notation",
+            },
+        ],
+    }
+    docs = documents_from_jsonld(doc)
+    assert docs == {
+        "https://pink-project.eu/a": {
+            "label": ["SMILES", "Simplified input"],
+            "description": ["Line notation"],
+        }
+    }
+    graph = Graph().parse(data=json.dumps(doc), format="json-ld")
+    assert {
+        iri: {field: sorted(values) for field, values in fields.items()}
+        for iri, fields in documents_from_graph(graph).items()
+    } == docs
+
+
+def test_merge_documents_of_sources():
+    docs = {"urn:a": {"label": ["SMILES"]}}
+    merge_documents(
+        docs,
+        {
+            "urn:a": {"label": ["SMILES", "Smiles"], "keyword": ["line"]},
+            "urn:b": {"label": ["Other"]},
+        },
+    )
+    assert docs == {
+        "urn:a": {"label": ["SMILES", "Smiles"], "keyword": ["line"]},
+        "urn:b": {"label": ["Other"]},
+    }
@@ -0,0 +1,70 @@
+"""Test the streaming JSON-LD reader of the validation package."""
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+from validation.validate import (
+    _iter_members,
+    iter_resources,
+    load_graph,
+    load_resources,
+)
+
+rootdir = Path(__file__).resolve().parent.parent
+JSONLD_FILES = [
+    rootdir / "jsonld" / "pink-agents.jsonld",
+    rootdir / "jsonld" / "pink_googlespreadsheet_resources.jsonld",
+    rootdir / "validation" / "tests" / "dataset.jsonld",
+]
+
+
+def test_iter_members_small_chunks():
+    doc = {
+        "@context": {"ex": "http://example.com/"},
+        "@graph": [{"@id": f"ex:{i}", "ex:n": i * 1001} for i in range(20)],
+        "other": [1.5, None, True],
+    }
+    text = json.dumps(doc, indent=2)
+    members = list(_iter_members(io.StringIO(text), chunk_size=7))
+    assert members[0] == ("@context", doc["@context"])
+    assert [v for k, v in members if k == "@graph"] == doc["@graph"]
+    assert members[-1] == ("other", doc["other"])
+
+
+@pytest.mark.parametrize("path", JSONLD_FILES, ids=lambda p: p.name)
+@pytest.mark.parametrize("batch_size", [1, 7])
+def test_streamed_graph_is_isomorphic(path, batch_size):
+    expected = Graph().parse(path, format="json-ld")
+    graph = Graph()
+    for context, resources in iter_resources(path, batch_size=batch_size):
+        assert len(resources) <= batch_size
+        load_resources(resources, context, graph)
+    assert isomorphic(graph, expected)
+
+
+def test_load_graph_from_dict():
+    path = JSONLD_FILES[-1]
+    with open(path, "rt", encoding="utf-8") as f:
+        doc = json.load(f)
+    expected = Graph().parse(data=json.dumps(doc), format="json-ld")
+    assert isomorphic(load_graph(doc), expected)
+
+
+def test_context_after_graph(tmp_path):
+    with open(JSONLD_FILES[0], "rt", encoding="utf-8") as f:
+        doc = json.load(f)
+    path = tmp_path / "late-context.jsonld"
+    with open(path, "wt", encoding="utf-8") as f:
+        json.dump({"@graph": doc["@graph"], "@context": doc["@context"]}, f)
+
+    graph = Graph()
+    for context, resources in iter_resources(path, batch_size=2):
+        assert context == doc["@context"]
+        assert len(resources) <= 2
+        load_resources(resources, context, graph)
+    assert isomorphic(graph, Graph().parse(JSONLD_FILES[0], format="json-ld"))
@@ -0,0 +1,232 @@
+"""Offline SHACL validation suite with performance budgets.
+
+The shapes are generated once per session from the fixture ontology in
+``validation/tests/ontology.ttl`` and cached in the pytest cache until
+the ontology or the generator changes, so the example documents can be
+validated without network access.  The cache file is replaced
+atomically, so the suite can run in parallel workers (``pytest -n``
+with pytest-xdist).
+
+The budget tests fail if generating the shapes or validating a
+document takes longer than ``PINK_BUDGET_FACTOR`` (default 3) times the
+baseline recorded in ``validation/tests/budgets.json``.  They only run
+with ``pytest --budgets`` (or ``PINK_BUDGETS=1``), see conftest.py.
+Set ``PINK_RECORD_BUDGETS=1`` to record the measured times as the new
+baseline.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from rdflib import Graph
+
+from validation import generate_shacl
+from validation import validate as validate_module
+from validation.validate import validate, validate_stream
+
+rootdir = Path(__file__).resolve().parent.parent
+FIXTURES = rootdir / "validation" / "tests"
+ONTOLOGY = FIXTURES / "ontology.ttl"
+BUDGETS = FIXTURES / "budgets.json"
+
+RECORD = os.environ.get("PINK_RECORD_BUDGETS") == "1"
+
+# (document, should conform)
+CASES = [
+    ("dataset.jsonld", True),
+    ("dataset-invalid.jsonld", False),
+    ("dataset-no-title.jsonld", False),
+    ("dataset-plain-string-title.jsonld", False),
+]
+
+
+@contextmanager
+def offline():
+    """Make connections to other hosts than localhost fail."""
+    connect = socket.socket.connect
+
+    def guarded(sock, address):
+        if isinstance(address, tuple) and address[0] not in (
+            "127.0.0.1",
+            "::1",
+            "localhost",
+        ):
+            raise OSError(f"network access in offline tests: {address}")
+        return connect(sock, address)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(socket.socket, "connect", guarded)
+        yield
+
+
+@pytest.fixture(autouse=True, scope="module")
+def no_network():
+    with offline():
+        yield
+
+
+@pytest.fixture(scope="session")
+def shapes_path(request):
+    """Path of the shapes generated from the fixture ontology."""
+    sha = hashlib.sha256(ONTOLOGY.read_bytes())
+    sha.update(Path(generate_shacl.__file__).read_bytes())
+    cache = request.config.cache.mkdir("validation-shapes")
+    path = cache / f"shapes-{sha.hexdigest()[:16]}.ttl"
+    if not path.exists():
+        with offline():
+            shapes = generate_shacl.generate_shapes(
+                FIXTURES, None, Graph().parse(ONTOLOGY)
+            )
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        shapes.serialize(tmp, format="turtle")
+        tmp.replace(path)
+    return str(path)
+
+
+def budget(name, elapsed, factor, *keys):
+    """Check `elapsed` against `factor` times the baseline at `keys` in
+    BUDGETS."""
+    with open(BUDGETS, "rt", encoding="utf-8") as f:
+        budgets = json.load(f)
+    if RECORD:
+        item = budgets
+        for key in keys[:-1]:
+            item = item.setdefault(key, {})
+        item[keys[-1]] = round(elapsed, 3)
+        with open(BUDGETS, "wt", encoding="utf-8") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+        return
+    baseline = budgets
+    for key in keys:
+        baseline = baseline[key]
+    assert elapsed <= factor * baseline, (
+        f"{name} took {elapsed:.3f} s, more than {factor} times "
+        f"the baseline of {baseline} s"
+    )
+
+
+@pytest.mark.parametrize(
+    "filename,should_conform", CASES, ids=[c[0] for c in CASES]
+)
+def test_document(shapes_path, filename, should_conform):
+    conforms, report = validate(FIXTURES / filename, shapes_path)
+    assert conforms == should_conform, report
+
+
+def stream_verdict(source, shapes_path, batch_size):
+    """Return the verdict of `validate_stream()` and the ids of the
+    resources in failing batches."""
+    failing = set()
+    batches = list(validate_stream(source, shapes_path, batch_size))
+    for ids, conforms, _ in batches:
+        if not conforms:
+            failing.update(ids)
+    return all(conforms for _, conforms, _ in batches), failing
+
+
+def combined(path, agent_type="foaf:Agent", invalid=True):
+    """Write the fixture documents as one ``@graph`` to `path`.
+
+    The publisher and the datum of the valid dataset are separate
+    entries at the end of the ``@graph``, such that small batches split
+    them from the dataset referring to them.
+    """
+    context, graph = {}, []
+    for filename, should_conform in CASES:
+        if should_conform or invalid:
+            with open(FIXTURES / filename, "rt", encoding="utf-8") as f:
+                doc = json.load(f)
+            context.update(doc.pop("@context"))
+            graph.append(doc)
+    dataset = graph[0]
+    agent = dataset.pop("dcterms:publisher")
+    datum = dataset.pop("pink:hasPart")
+    dataset["dcterms:publisher"] = {"@id": agent["@id"]}
+    dataset["pink:hasPart"] = {"@id": datum["@id"]}
+    agent["@type"] = agent_type
+    graph.extend([datum, agent])
+    with open(path, "wt", encoding="utf-8") as f:
+        json.dump({"@context": context, "@graph": graph}, f, indent=2)
+    return path
+
+
+@pytest.mark.parametrize(
+    "filename,should_conform", CASES, ids=[c[0] for c in CASES]
+)
+def test_stream_document(shapes_path, filename, should_conform):
+    conforms, _ = stream_verdict(FIXTURES / filename, shapes_path, 1)
+    assert conforms == should_conform
+    assert conforms == validate(FIXTURES / filename, shapes_path)[0]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 50])
+@pytest.mark.parametrize("agent_type", ["foaf:Agent", "foaf:Document"])
+def test_stream_split_references(
+    shapes_path, tmp_path, batch_size, agent_type
+):
+    # Only the valid dataset, whose publisher is in another batch
+    path = combined(tmp_path / "doc.jsonld", agent_type, invalid=False)
+    expected, _ = validate(path, shapes_path)
+    assert expected == (agent_type == "foaf:Agent")
+    conforms, failing = stream_verdict(path, shapes_path, batch_size)
+    assert conforms == expected
+    if batch_size == 1 and not expected:
+        assert failing == {"https://example.org/dataset/toxicity-study-2025"}
+    elif batch_size == 1:
+        assert not failing
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 4, 50])
+def test_stream_combined(shapes_path, tmp_path, batch_size):
+    path = combined(tmp_path / "doc.jsonld")
+    assert not validate(path, shapes_path)[0]
+    conforms, failing = stream_verdict(path, shapes_path, batch_size)
+    assert not conforms
+    if batch_size == 1:
+        assert failing == {
+            "https://example.org/dataset/invalid-dataset",
+            "https://example.org/dataset/no-title-dataset",
+            "https://example.org/dataset/plain-string-title-dataset",
+        }
+
+
+def test_stream_cli(shapes_path, tmp_path, monkeypatch, capsys):
+    path = combined(tmp_path / "doc.jsonld")
+    argv = [str(path), shapes_path, "--stream", "--batch-size", "2"]
+    monkeypatch.setattr(sys, "argv", ["validate.py"] + argv)
+    with pytest.raises(SystemExit) as exc:
+        validate_module.main()
+    assert exc.value.code == 1
+    out = capsys.readouterr().out
+    assert "no-title-dataset" in out
+    assert f"✗ INVALID: {path} (6 resources)" in out
+
+
+@pytest.mark.budget
+def test_generate_shapes_budget(budget_factor):
+    ontology = Graph().parse(ONTOLOGY)
+    start = time.perf_counter()
+    shapes = generate_shacl.generate_shapes(FIXTURES, None, ontology)
+    elapsed = time.perf_counter() - start
+    assert len(shapes)
+    budget("generating the shapes", elapsed, budget_factor, "generate_shapes")
+
+
+@pytest.mark.budget
+@pytest.mark.parametrize("filename", [c[0] for c in CASES])
+def test_validate_budget(shapes_path, filename, budget_factor):
+    validate(FIXTURES / filename, shapes_path)  # warm up
+    start = time.perf_counter()
+    validate(FIXTURES / filename, shapes_path)
+    elapsed = time.perf_counter() - start
+    budget(
+        f"validating {filename}", elapsed, budget_factor, "validate", filename
+    )
@@ -0,0 +1,313 @@
+"""
+Cached loader of remote JSON-LD contexts and keyword files.
+
+`DocumentLoader` serves remote documents (like the SSbD context and
+``keywords.yaml``) from a versioned on-disk cache:
+
+- Each version of a document is stored once, named by the sha256 hash
+  of its content, in ``<cache_dir>/<hash[:2]>/<hash><suffix>``.
+- ``<cache_dir>/index.json`` maps each url to its current version, the
+  previous versions and the HTTP validators (ETag, Last-Modified) of
+  the current version.  It is updated under a lock of
+  ``<cache_dir>/index.lock``, such that processes sharing the cache
+  (like forked pools or pytest-xdist workers) do not overwrite each
+  other's entries.
+- A cached document younger than `max_age` seconds is used without
+  network access.  Older documents are revalidated with a conditional
+  request, and if the document changed, a new version is added.  Only
+  the `keep` latest versions of each document are kept.
+- In offline mode (``PINK_OFFLINE=1``), or if the server cannot be
+  reached, the cached version is used.  Only documents that were
+  never cached fail to load.
+
+Parsed documents and processed rdflib contexts are memoized in memory,
+such that parsing several JSON-LD documents with the same (inline or
+remote) context processes the context only once.  Remote contexts
+referenced by url in the top-level ``@context`` of a document are
+loaded through the cache instead of by rdflib (see `resolve_context()`).
+
+The cache directory is given by the ``PINK_DOCUMENT_CACHE`` environment
+variable and defaults to ``~/.cache/pink/documents``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from rdflib.plugins.shared.jsonld.context import Context
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is only locked in-process
+    fcntl = None  # type: ignore
+
+# Version of the layout of the cache directory
+CACHE_FORMAT = 1
+
+CACHE_DIR = Path(
+    os.environ.get("PINK_DOCUMENT_CACHE", "~/.cache/pink/documents")
+).expanduser()
+
+ACCEPT = (
+    "application/ld+json, application/json;q=0.9, "
+    "application/yaml;q=0.8, text/turtle;q=0.8, */*;q=0.1"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_url(source: Any) -> bool:
+    """Return whether `source` is an http(s) url."""
+    return isinstance(source, str) and source.startswith(
+        ("http://", "https://")
+    )
+
+
+def offline_mode() -> bool:
+    """Return whether the ``PINK_OFFLINE`` environment variable is set."""
+    return os.environ.get("PINK_OFFLINE", "") not in ("", "0")
+
+
+class DocumentLoader:
+    """Load remote documents through a versioned on-disk cache.
+
+    Parameters:
+        cache_dir: Cache directory.
+        max_age: Number of seconds a cached document is used without
+            revalidation.
+        offline: Whether to never access the network.  Defaults to
+            `offline_mode()`.
+        timeout: Timeout of requests, in seconds.
+        keep: Number of versions kept of each document.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = CACHE_DIR,
+        max_age: float = 24 * 3600,
+        offline: Optional[bool] = None,
+        timeout: float = 30,
+        keep: int = 5,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_age = max_age
+        self.offline = offline_mode() if offline is None else offline
+        self.timeout = timeout
+        self.keep = keep
+        self.requests = 0
+        self._json: Dict[str, Any] = {}
+        self._contexts: Dict[Tuple[str, Optional[str]], Context] = {}
+        self._lock = threading.RLock()
+
+    # Cache index
+    def _read_index(self) -> dict:
+        path = self.cache_dir / "index.json"
+        if path.exists():
+            try:
+                with open(path, "rt", encoding="utf-8") as f:
+                    index = json.load(f)
+                if index.get("format") == CACHE_FORMAT:
+                    return index
+            except ValueError:
+                pass
+            logger.warning("starting a new index of %s", self.cache_dir)
+        return {"format": CACHE_FORMAT, "documents": {}}
+
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Hold the lock of the index, shared with other processes."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.cache_dir / "index.lock", "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    def _write_entry(
+        self, url: str, entry: dict, pruned: Sequence[str] = ()
+    ) -> None:
+        """Store the index entry of `url` and remove the files of the
+        `pruned` versions that no document refers to."""
+        with self._index_lock():
+            index = self._read_index()
+            index["documents"][url] = entry
+            path = self.cache_dir / "index.json"
+            tmp = path.with_name(f"index.{os.getpid()}.tmp")
+            with open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(index, f, indent=2)
+            tmp.replace(path)
+
+            used = {
+                (version, doc["suffix"])
+                for doc in index["documents"].values()
+                for version in doc["versions"]
+            }
+            for version in pruned:
+                if (version, entry["suffix"]) not in used:
+                    self._file(version, entry["suffix"]).unlink(
+                        missing_ok=True
+                    )
+
+    def _file(self, version: str, suffix: str) -> Path:
+        return self.cache_dir / version[:2] / f"{version}{suffix}"
+
+    def entry(self, url: str) -> Optional[dict]:
+        """Return the index entry of `url`, or None if not cached."""
+        return self._read_index()["documents"].get(url)
+
+    # Loading
+    def _fetch(self, url: str, entry: Optional[dict]):
+        """Request `url`, conditionally if `entry` is given.
+
+        Returns:
+            Tuple of (content, headers), where content is None if the
+            cached version is still current.
+        """
+        # pylint: disable=import-outside-toplevel
+        import urllib.error
+        import urllib.request
+
+        headers = {"Accept": ACCEPT}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        request = urllib.request.Request(url, headers=headers)
+        self.requests += 1
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as r:
+                return r.read(), r.headers
+        except urllib.error.HTTPError as exc:
+            if exc.code == 304 and entry:
+                return None, exc.headers
+            raise
+
+    def path(self, url: str, refresh: bool = False) -> Path:
+        """Return the path of the cached current version of `url`.
+
+        The document is downloaded if it is not cached, and revalidated
+        if it is older than `max_age` seconds or `refresh` is true.
+
+        Raises:
+            LookupError: If the document is not cached and cannot be
+                downloaded.
+        """
+        with self._lock:
+            entry = self.entry(url)
+            if entry is not None:
+                cached = self._file(entry["current"], entry["suffix"])
+                if not cached.exists():
+                    entry = None
+            fresh = (
+                entry is not None
+                and not refresh
+                and time.time() - entry["checked"] < self.max_age
+            )
+            if entry is not None and (self.offline or fresh):
+                return cached
+            if self.offline:
+                raise LookupError(f"{url} is not cached (offline mode)")
+
+            try:
+                content, headers = self._fetch(url, entry)
+            except OSError as exc:
+                if entry is None:
+                    raise LookupError(f"cannot load {url}: {exc}") from exc
+                logger.warning("using cached %s: %s", url, exc)
+                return cached
+
+            if entry is None:
+                suffix = Path(url.split("?")[0].rstrip("/")).suffix
+                entry = {"suffix": suffix[:8], "versions": []}
+            pruned: List[str] = []
+            if content is not None:
+                version = hashlib.sha256(content).hexdigest()
+                if version != entry.get("current"):
+                    target = self._file(version, entry["suffix"])
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = target.with_name(f"{target.name}.{os.getpid()}")
+                    tmp.write_bytes(content)
+                    tmp.replace(target)
+                    versions = [version] + [
+                        v for v in entry["versions"] if v != version
+                    ]
+                    pruned = versions[self.keep :]
+                    entry["versions"] = versions[: self.keep]
+                    entry["current"] = version
+                    entry["fetched"] = datetime.now(timezone.utc).isoformat(
+                        timespec="seconds"
+                    )
+                    logger.info("cached %s as version %s", url, version[:12])
+                    self._json.pop(url, None)
+                entry["etag"] = headers.get("ETag")
+                entry["last_modified"] = headers.get("Last-Modified")
+            entry["checked"] = time.time()
+            self._write_entry(url, entry, pruned)
+            return self._file(entry["current"], entry["suffix"])
+
+    def load_json(self, url: str) -> Any:
+        """Return the parsed JSON document at `url`, memoized."""
+        with self._lock:
+            if url not in self._json:
+                with open(self.path(url), "rt", encoding="utf-8") as f:
+                    self._json[url] = json.load(f)
+            return self._json[url]
+
+    def resolve_context(self, context: Any) -> Any:
+        """Return `context` with remote context urls replaced by the
+        cached context documents."""
+        if is_url(context):
+            return self.load_json(context)
+        if isinstance(context, list):
+            return [self.resolve_context(c) for c in context]
+        return context
+
+    def context(self, context: Any, base: Optional[str] = None) -> Context:
+        """Return the processed rdflib context of `context`, memoized.
+
+        Parameters:
+            context: Context data: a url, a dict, a list of these or
+                None.
+            base: Base IRI of the document.
+
+        The returned context is shared and must not be modified.
+        """
+        data = json.dumps(context, sort_keys=True, ensure_ascii=False)
+        key = (hashlib.sha256(data.encode("utf-8")).hexdigest(), base)
+        with self._lock:
+            if key not in self._contexts:
+                processed = Context(base=base)
+                if context:
+                    processed.load(self.resolve_context(context), base)
+                self._contexts[key] = processed
+            return self._contexts[key]
+
+
+_LOADER: Optional[DocumentLoader] = None
+
+
+def default_loader() -> DocumentLoader:
+    """Return the shared document loader."""
+    global _LOADER  # pylint: disable=global-statement
+    if _LOADER is None:
+        _LOADER = DocumentLoader()
+    return _LOADER
+
+
+def cached_path(source: Union[str, Path]) -> Union[str, Path]:
+    """Return the cached file of the url `source`.
+
+    Other sources (like local paths) are returned as is.  Use this for
+    loaders taking a url or path, e.g. ``get_context(cached_path(url))``
+    or ``keywords.load_yaml(cached_path(url))``.
+    """
+    if is_url(source):
+        return str(default_loader().path(str(source)))
+    return source
@@ -0,0 +1,277 @@
+"""
+Fast conversion of JSON-LD documents with a flat context to triples.
+
+The JSON-LD written by the pipeline (e.g. ``jsonld/pink-agents.jsonld``)
+has one flat context mapping terms to IRIs, with ``@type: @id``,
+datatype or ``@language`` coercions.  Such documents do not need the
+full JSON-LD expansion algorithm: each key of a node object is a term,
+a compact IRI or ``@id``/``@type``, so the node can be converted to
+triples directly with a table of the terms, compiled once per context.
+
+`to_graph()` converts a document or a list of node objects this way.
+Anything outside of this subset (scoped contexts, containers, lists,
+reverse properties, keyword aliases, ``@vocab``, nested contexts, ...)
+makes it return False without changing the graph, such that the caller
+falls back to rdflib's parser.  IRIs are expanded with the methods of
+the rdflib context and memoized, so the triples are the same as those
+of rdflib's parser.
+"""
+
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from rdflib import XSD, BNode, Graph, Literal, URIRef
+from rdflib.plugins.parsers.jsonld import TYPE_TERM, VOCAB_DELIMS
+from rdflib.plugins.shared.jsonld.context import UNDEF, Context
+
+# Keywords that must not be aliased by the context
+_KEYWORDS = (
+    "@context",
+    "@graph",
+    "@id",
+    "@included",
+    "@json",
+    "@language",
+    "@list",
+    "@nest",
+    "@none",
+    "@reverse",
+    "@set",
+    "@type",
+    "@value",
+)
+
+# Coercions of the values of a property.  Keys of terms with other
+# definitions (containers, reverse properties, ``@json``) are _OTHER.
+_ID, _VOCAB, _TYPED, _PLAIN, _OTHER = range(5)
+
+Triple = Tuple[Any, URIRef, Any]
+
+
+class _Unsupported(Exception):
+    """Raised for JSON-LD outside of the supported subset."""
+
+
+class TermTable:
+    """Precompiled terms of a flat JSON-LD context.
+
+    Parameters:
+        context: Processed rdflib context.
+
+    Raises:
+        ValueError: If the context is not flat.
+    """
+
+    def __init__(self, context: Context):
+        if (
+            context.vocab
+            or context.language
+            or context.parent is not None
+            or context.propagate is False
+            or "@type" in context.terms
+            or any(context.get_key(key) != key for key in _KEYWORDS)
+        ):
+            raise ValueError("not a flat context")
+        self.context = context
+        # Key -> (predicate, coercion, datatype or language), or None
+        # if the key is ignored
+        self.keys: Dict[str, Optional[Tuple[URIRef, int, Any]]] = {}
+        for name, term in context.terms.items():
+            # Scoped contexts also apply to nodes of the type `name`
+            if term.context is not UNDEF:
+                raise ValueError(f"term {name} has a scoped context")
+            if term.id is None or term.id.startswith("_:"):
+                self.keys[name] = None
+            else:
+                self.keys[name] = (URIRef(term.id), *self._coercion(term))
+        self.keys["@type"] = (URIRef(TYPE_TERM.id), _VOCAB, None)
+        self.prefixes = [
+            (name, term.id)
+            for name, term in context.terms.items()
+            if term.id and term.id.endswith(VOCAB_DELIMS)
+        ]
+        self._refs: Dict[Tuple[Optional[int], str], Optional[Any]] = {}
+        self._datatypes: Dict[str, Optional[str]] = {}
+
+    def _coercion(self, term) -> Tuple[int, Any]:
+        if term.reverse or term.container or term.type in ("@json", "@type"):
+            return _OTHER, None
+        if term.type == "@id":
+            return _ID, None
+        if term.type == "@vocab":
+            return _VOCAB, None
+        if term.type:
+            return _TYPED, self.context.expand(term.type)
+        language = term.language
+        return _PLAIN, self.context.language if language is UNDEF else language
+
+    def _key(self, key: str) -> Optional[Tuple[URIRef, int, Any]]:
+        """Return the predicate and coercion of a key that is not a term."""
+        if key.startswith("@"):
+            raise _Unsupported(key)
+        iri = self.context.expand(key)
+        if not iri or iri.startswith("_:"):
+            entry = None
+        else:
+            entry = (URIRef(iri), _PLAIN, self.context.language)
+        self.keys[key] = entry
+        return entry
+
+    def _rdf_id(self, value: str) -> Optional[Any]:
+        """Return the node of an ``@id`` value, or None if it is invalid."""
+        if value.startswith("_:"):
+            if value == "_:":
+                raise _Unsupported(value)
+            return BNode(value[2:])
+        iri = self.context.resolve(value)
+        return URIRef(iri) if ":" in iri else None
+
+    def ref(self, value: str, coercion: Optional[int] = None) -> Optional[Any]:
+        """Return the node of an ``@id`` value, or of a value coerced
+        with ``@id`` or ``@vocab``, memoized."""
+        key = (coercion, value)
+        if key not in self._refs:
+            context = self.context
+            if coercion == _ID:
+                value = context.resolve(value)
+            elif coercion == _VOCAB:
+                value = context.expand(value) or context.resolve_iri(value)
+            self._refs[key] = self._rdf_id(value)
+        return self._refs[key]
+
+    def _datatype(self, datatype: str) -> Optional[str]:
+        if datatype not in self._datatypes:
+            self._datatypes[datatype] = self.context.expand(datatype)
+        return self._datatypes[datatype]
+
+    def node(self, node: dict, triples: List[Triple]) -> Optional[Any]:
+        """Add the triples of a node object and return its subject."""
+        if "@value" in node or "@context" in node:
+            raise _Unsupported(node)
+        id_val = node.get("@id")
+        if id_val is None:
+            subj = BNode()
+        elif isinstance(id_val, str):
+            subj = self.ref(id_val)
+            if subj is None:
+                return None
+        else:
+            raise _Unsupported(id_val)
+
+        keys = self.keys
+        for key, obj in node.items():
+            if key == "@id":
+                continue
+            entry = keys[key] if key in keys else self._key(key)
+            if entry is None:
+                continue
+            pred, coercion, arg = entry
+            if coercion == _OTHER:
+                raise _Unsupported(key)
+            for value in obj if isinstance(obj, list) else (obj,):
+                if isinstance(value, list):
+                    raise _Unsupported(value)
+                o = self._object(value, coercion, arg, triples)
+                if o is not None:
+                    triples.append((subj, pred, o))
+        return subj
+
+    def _object(
+        self, value: Any, coercion: int, arg: Any, triples: List[Triple]
+    ) -> Optional[Any]:
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            return self._dict_object(value, triples)
+        if coercion == _PLAIN:
+            if isinstance(value, float):
+                return Literal(value, datatype=XSD.double)
+            return Literal(value, lang=arg)
+        if coercion == _TYPED:
+            return Literal(value, datatype=arg)
+        if not isinstance(value, str):
+            raise _Unsupported(value)
+        return self.ref(value, coercion)
+
+    def _dict_object(self, value: dict, triples: List[Triple]):
+        if "@value" not in value and "@language" not in value:
+            if "@list" in value or "@set" in value:
+                raise _Unsupported(value)
+            return self.node(value, triples)
+        if not value.keys() <= {"@value", "@language", "@type"}:
+            raise _Unsupported(value)
+        lang = value.get("@language")
+        datatype = not lang and value.get("@type") or None
+        if datatype is not None and (
+            not isinstance(datatype, str) or datatype == "@json"
+        ):
+            raise _Unsupported(value)
+        if not lang and "@value" not in value:
+            raise _Unsupported(value)
+        literal = value.get("@value")
+        if literal is None or (lang and " " in lang):
+            return None
+        if lang:
+            return Literal(literal, lang=lang)
+        if datatype:
+            return Literal(literal, datatype=self._datatype(datatype))
+        return Literal(literal)
+
+
+# Term tables of the contexts used so far, None for contexts that are
+# not flat
+_TABLES: "weakref.WeakKeyDictionary[Context, Optional[TermTable]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def term_table(context: Context) -> Optional[TermTable]:
+    """Return the term table of `context`, or None if it is not flat."""
+    if context not in _TABLES:
+        try:
+            _TABLES[context] = TermTable(context)
+        except ValueError:
+            _TABLES[context] = None
+    return _TABLES[context]
+
+
+def to_graph(data: Any, context: Context, graph: Graph) -> bool:
+    """Add the triples of JSON-LD `data` to `graph`, if possible.
+
+    Parameters:
+        data: A node object, a document with a ``@graph`` (without
+            ``@context``) or a list of node objects.
+        context: Processed rdflib context of the data.
+        graph: Graph to add the triples to.
+
+    Returns:
+        Whether the data was converted.  If not, the graph is unchanged
+        and the data must be parsed by rdflib.
+    """
+    table = term_table(context)
+    if table is None:
+        return False
+    if isinstance(data, list):
+        nodes = data
+    elif isinstance(data, dict) and "@context" not in data:
+        nodes = [data]
+        if "@graph" in data:
+            if len(data) > 1:
+                return False
+            nodes = data["@graph"]
+            if not isinstance(nodes, list):
+                nodes = [nodes]
+    else:
+        return False
+
+    triples: List[Triple] = []
+    try:
+        for node in nodes:
+            if isinstance(node, dict):
+                table.node(node, triples)
+    except _Unsupported:
+        return False
+    graph.addN((s, p, o, graph) for s, p, o in triples)
+    for name, iri in table.prefixes:
+        graph.bind(name, iri)
+    return True
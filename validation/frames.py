@@ -0,0 +1,296 @@
+"""
+Pre-validation of the corrected spreadsheet tables.
+
+Constraint violations of the spreadsheet rows otherwise only show up in
+step 2, after the TableDoc conversion, storing the triples and a full
+pyshacl run.  `FrameValidator` derives the constraints that can be
+checked on a table from the SHACL shapes and the JSON-LD context that
+the table is converted with, and checks all rows at once with pandas
+column operations:
+
+- required properties (sh:minCount) and single-valued properties
+  (sh:maxCount) of the property shapes of the classes in ``@type``,
+- IRI syntax of ``@id``, ``@type`` and the columns the context coerces
+  to IRIs,
+- the lexical form of xsd:date and xsd:dateTime values, and
+- that the values of a column get the datatype (like rdf:langString,
+  from a ``@language`` in the context) or node kind (sh:class,
+  sh:nodeKind sh:IRI) that the shapes require.
+
+Only property shapes with a plain property path and severity
+sh:Violation are used, so a row that fails these checks is also
+reported by pyshacl, while a row that passes may still fail other
+constraints (like the classes of the referenced resources).
+
+pandas is imported by `FrameValidator.check()`.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from rdflib import RDF, SH, XSD, Graph, Literal, URIRef
+from rdflib.plugins.shared.jsonld.context import UNDEF, Context
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Values that can be written as IRIs or prefixed names
+_IRI = r'[^\s<>"{}|\\^`]+'
+
+# Lexical forms of the date datatypes
+_DATES = {
+    XSD.date: r"-?\d{4,}-\d{2}-\d{2}(Z|[+-]\d{2}:\d{2})?",
+    XSD.dateTime: (
+        r"-?\d{4,}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?"
+        r"(Z|[+-]\d{2}:\d{2})?"
+    ),
+}
+
+
+@dataclass(frozen=True)
+class PropertyRule:
+    """Constraints of a property shape that can be checked on a table.
+
+    Attributes:
+        path: Property IRI.
+        min_count: Minimum number of values.
+        max_count: Maximum number of values, or None.
+        datatype: Required datatype of the values, or None.
+        iri: Whether the values must be IRIs.
+    """
+
+    path: URIRef
+    min_count: int = 0
+    max_count: Optional[int] = None
+    datatype: Optional[URIRef] = None
+    iri: bool = False
+
+
+@dataclass(frozen=True)
+class ColumnKind:
+    """What the values of a column become in RDF.
+
+    Attributes:
+        iri: Property IRI of the column, or None for ``@id``, ``@type``
+            and columns that are not in the context.
+        datatype: Datatype of the literals, or None if the values are
+            IRIs.
+    """
+
+    iri: Optional[URIRef]
+    datatype: Optional[URIRef]
+
+
+class FrameValidator:
+    """Check the rows of corrected tables against SHACL shapes.
+
+    Parameters:
+        shapes: Shapes graph.
+        context: Processed rdflib context the tables are converted with.
+        prefixes: Additional prefixes of the values, like in TableDoc.
+        list_columns: Columns that may hold several values.  Other
+            columns are single-valued by construction.
+    """
+
+    def __init__(
+        self,
+        shapes: Graph,
+        context: Context,
+        prefixes: Optional[Dict[str, str]] = None,
+        list_columns: Iterable[str] = (),
+    ):
+        self.shapes = shapes
+        self.context = context
+        self.prefixes = dict(prefixes or {})
+        self.list_columns = set(list_columns)
+        self._rules: Dict[FrozenSet[URIRef], Tuple[PropertyRule, ...]] = {}
+        self._kinds: Dict[str, ColumnKind] = {}
+        # Names of the properties in the messages
+        self._names: Dict[str, str] = {}
+        for name, term in context.terms.items():
+            self._names.setdefault(term.id, name)
+
+    def expand(self, value: str) -> URIRef:
+        """Expand a prefixed name with `prefixes` or the context."""
+        prefix, sep, name = value.partition(":")
+        if sep and prefix in self.prefixes:
+            return URIRef(self.prefixes[prefix] + name)
+        return URIRef(self.context.expand(value) or value)
+
+    def kind(self, column: str) -> ColumnKind:
+        """Return what the values of `column` become in RDF."""
+        if column not in self._kinds:
+            term = self.context.terms.get(column)
+            iri = (
+                None if column.startswith("@") else self.context.expand(column)
+            )
+            if column in ("@id", "@type") or (
+                term is not None and term.type in ("@id", "@vocab")
+            ):
+                datatype = None
+            elif term is not None and term.type:
+                datatype = URIRef(self.context.expand(term.type))
+            else:
+                language = (
+                    self.context.language
+                    if term is None or term.language is UNDEF
+                    else term.language
+                )
+                datatype = RDF.langString if language else XSD.string
+            self._kinds[column] = ColumnKind(
+                URIRef(iri) if iri else None, datatype
+            )
+        return self._kinds[column]
+
+    def rules(self, types: Iterable[URIRef]) -> Tuple[PropertyRule, ...]:
+        """Return the rules of the shapes targeting instances of `types`,
+        including the shapes they refer to with sh:node."""
+        key = frozenset(types)
+        if key not in self._rules:
+            shapes = self.shapes
+            stack = [
+                s for t in key for s in shapes.subjects(SH.targetClass, t)
+            ]
+            stack = [(shape, False) for shape in stack]
+            seen = {shape for shape, _ in stack}
+            rules = []
+            while stack:
+                shape, nested = stack.pop()
+                if shapes.value(shape, SH.deactivated) == Literal(True):
+                    continue
+                for other in shapes.objects(shape, SH.node):
+                    if other not in seen:
+                        seen.add(other)
+                        stack.append((other, True))
+                for prop in shapes.objects(shape, SH.property):
+                    rule = self._rule(prop, nested)
+                    if rule is not None:
+                        rules.append(rule)
+            self._rules[key] = tuple(dict.fromkeys(rules))
+        return self._rules[key]
+
+    def _rule(self, prop, nested: bool) -> Optional[PropertyRule]:
+        """Return the rule of a property shape, or None if it has
+        nothing to check.
+
+        Results of any severity of a shape referred to with sh:node
+        (`nested`) make the node constraint fail with a violation."""
+        shapes = self.shapes
+        path = shapes.value(prop, SH.path)
+        severity = shapes.value(prop, SH.severity, default=SH.Violation)
+        if (
+            not isinstance(path, URIRef)
+            or (severity != SH.Violation and not nested)
+            or shapes.value(prop, SH.deactivated) == Literal(True)
+        ):
+            return None
+        min_count = shapes.value(prop, SH.minCount)
+        max_count = shapes.value(prop, SH.maxCount)
+        rule = PropertyRule(
+            path=path,
+            min_count=int(min_count) if min_count is not None else 0,
+            max_count=int(max_count) if max_count is not None else None,
+            datatype=shapes.value(prop, SH.datatype),
+            iri=(prop, SH["class"], None) in shapes
+            or shapes.value(prop, SH.nodeKind) == SH.IRI,
+        )
+        if rule == PropertyRule(path):
+            return None
+        return rule
+
+    def check(self, df: "pd.DataFrame") -> "pd.Series":
+        """Check the rows of an expanded table.
+
+        Parameters:
+            df: Table with one row per resource, where the values of a
+                list column are in several columns with the same header
+                (see `parseutils.expand_df()`).
+
+        Returns:
+            Series with the same index as `df`, holding the reasons why
+            a row cannot pass the validation, or an empty string.
+        """
+        # pylint: disable=import-outside-toplevel
+        import pandas as pd
+
+        reasons = pd.Series("", index=df.index)
+
+        def fail(mask: "pd.Series", reason: str) -> None:
+            nonlocal reasons
+            reasons = reasons.mask(mask, reasons + reason + "; ")
+
+        # Cells and present values of each column
+        text: Dict[str, "pd.DataFrame"] = {}
+        present: Dict[str, "pd.DataFrame"] = {}
+        for column in dict.fromkeys(df.columns):
+            if column.startswith("@") or self.kind(column).iri is not None:
+                text[column] = (
+                    df.loc[:, df.columns == column].fillna("").astype(str)
+                )
+                present[column] = text[column].apply(
+                    lambda s: s.str.strip().ne("")
+                )
+
+        # Value syntax, for all rows
+        for column, cells in text.items():
+            kind = self.kind(column)
+            if kind.datatype is None:
+                pattern, what = _IRI, "IRI"
+            elif kind.datatype in _DATES:
+                pattern, what = _DATES[kind.datatype], kind.datatype
+            else:
+                continue
+            valid = cells.apply(lambda s, p=pattern: s.str.fullmatch(p))
+            invalid = (present[column] & ~valid).any(axis=1)
+            fail(invalid, f"{column}: no {what}")
+
+        if "@id" not in text:
+            fail(pd.Series(True, index=df.index), "no @id")
+        if "@type" not in text:
+            return reasons.str.rstrip("; ")
+
+        # Constraints of the shapes of the classes of the rows, for the
+        # rows with the same types (joined column by column)
+        types = text["@type"].where(present["@type"], "")
+        keys = types.iloc[:, 0]
+        for i in range(1, types.shape[1]):
+            keys = keys + " " + types.iloc[:, i]
+        for key in keys.unique():
+            rows = keys == key
+            for rule in self.rules(self.expand(t) for t in key.split()):
+                self._check_rule(rule, rows, present, fail)
+        return reasons.str.rstrip("; ")
+
+    def _check_rule(self, rule, rows, present, fail) -> None:
+        """Check `rule` on the `rows` of a table."""
+        columns = [c for c in present if self.kind(c).iri == rule.path]
+        name = (
+            columns[0]
+            if columns
+            else self._names.get(str(rule.path), rule.path.n3())
+        )
+        counts = sum(
+            (present[c].sum(axis=1) for c in columns),
+            start=rows & False,
+        ).astype(int)
+        if rule.min_count:
+            fail(rows & (counts < rule.min_count), f"missing {name}")
+        # Other columns hold one value by construction
+        if rule.max_count is not None and (
+            rule.max_count < 1
+            or len(columns) > 1
+            or set(columns) & self.list_columns
+        ):
+            fail(
+                rows & (counts > rule.max_count),
+                f"{name}: more than {rule.max_count} value(s)",
+            )
+        for column in columns:
+            datatype = self.kind(column).datatype
+            if rule.iri and datatype is not None:
+                wrong = "literals instead of IRIs"
+            elif rule.datatype is not None and datatype != rule.datatype:
+                wrong = f"{datatype or 'IRIs'} instead of {rule.datatype}"
+            else:
+                continue
+            fail(rows & present[column].any(axis=1), f"{column}: {wrong}")
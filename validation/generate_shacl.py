@@ -371,7 +371,11 @@ def create_property_shape(
     return prop_shape
 
 
-def generate_shapes(onto_dir: Path, output_path: Path) -> None:
+def generate_shapes(
+    onto_dir: Path,
+    output_path: Optional[Path],
+    ontology: Optional[Graph] = None,
+) -> Graph:
     """
     Generate SHACL shapes for all classes in the ontology.
 
@@ -383,9 +387,16 @@ def generate_shapes(onto_dir: Path, output_path: Path) -> None:
 
     Parameters:
         onto_dir: Path to ontology directory.
-        output_path: Path to write shapes.ttl.
+        output_path: Path to write shapes.ttl.  If None, the shapes are
+                     only returned.
+        ontology: Ontology graph to generate the shapes from instead of
+                  loading it with load_ontology() (e.g. for offline tests).
+
+    Returns:
+        The shapes graph.
     """
-    ontology = load_ontology(onto_dir)
+    if ontology is None:
+        ontology = load_ontology(onto_dir)
     shapes = Graph()
 
     # Bind namespaces for readable output
@@ -457,9 +468,11 @@ def generate_shapes(onto_dir: Path, output_path: Path) -> None:
         generated_shapes[target_class] = shape_uri
 
     # Write shapes to file
-    shapes.serialize(output_path, format="turtle")
-    print(f"Generated SHACL shapes: {output_path}")
+    if output_path is not None:
+        shapes.serialize(output_path, format="turtle")
+        print(f"Generated SHACL shapes: {output_path}")
     print(f"  Total shapes: {len(sorted_classes)}")
+    return shapes
 
 
 def main() -> None:
@@ -0,0 +1,486 @@
+"""
+Sharded parallel SHACL validation of one data graph.
+
+pyshacl validates a data graph in one process.  `validate_sharded()`
+splits the subjects of the data graph into shards, validates the shards
+in a process pool and merges the results into one report, with the
+same results as a single `shacl_validate()` call:
+
+- Each shard owns a part of the subjects of the data graph, together
+  with the blank nodes and the nodes that are only objects that they
+  refer to.  A shard holds the triples of the nodes within
+  `shapes_depth()` steps of its own nodes, and the shared triples that
+  RDFS inference and the targets depend on: the RDFS schema triples,
+  the triples of properties with a range, which type their objects,
+  and the triples of the properties of sh:targetObjectsOf.
+- A shard may also find focus nodes of other shards, like a referenced
+  resource.  Only the results of its own focus nodes are kept, such
+  that each focus node is reported once, by a shard holding everything
+  that its validation looks at.
+- The text report is built from the merged results graph.
+
+Validations that sharding does not support are done in a single
+process: shapes that look backwards or arbitrarily far (inverse or
+transitive paths, SPARQL constraints or targets, recursive shapes), OWL
+inference and options like `abort_on_first`.
+
+Shards overlap and each repeats the RDFS inference over the shared
+schema, so sharding costs CPU time.  It has only been measured on one
+CPU (see benchmarks/bench_sharded.py), where it is always slower, so
+callers must ask for it with `max_workers`; step 2 validates in a
+single process unless ``PINK_VALIDATION_WORKERS`` is set.
+"""
+
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from textwrap import indent
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rdflib import RDF, RDFS, SH, BNode, Graph, Literal, URIRef
+from rdflib.collection import Collection
+
+logger = logging.getLogger(__name__)
+
+# Shape predicates that look beyond a bounded forward neighbourhood
+UNSUPPORTED = (
+    SH.inversePath,
+    SH.zeroOrMorePath,
+    SH.oneOrMorePath,
+    SH.sparql,
+    SH.target,
+    SH.rule,
+    SH.parameter,
+    SH.declare,
+)
+
+# Predicates of the RDFS schema, which are shared by all shards
+SCHEMA = (RDFS.subClassOf, RDFS.subPropertyOf, RDFS.domain, RDFS.range)
+
+# Options of shacl_validate() supported by sharding
+OPTIONS = {
+    "inference",
+    "abort_on_first",
+    "allow_warnings",
+    "allow_infos",
+    "focus_nodes",
+}
+
+_TARGETS = (
+    SH.targetClass,
+    SH.targetNode,
+    SH.targetSubjectsOf,
+    SH.targetObjectsOf,
+)
+_PAIRS = (SH.equals, SH.disjoint, SH.lessThan, SH.lessThanOrEquals)
+
+
+def _path_length(shapes: Graph, path: Any) -> Optional[int]:
+    """Return the number of steps of a SHACL path, or None if unbounded."""
+    if isinstance(path, URIRef):
+        return 1
+    if (path, RDF.first, None) in shapes:
+        lengths = [_path_length(shapes, p) for p in Collection(shapes, path)]
+        return None if None in lengths else sum(lengths)  # type: ignore
+    alternatives = shapes.value(path, SH.alternativePath)
+    if alternatives is not None:
+        lengths = [
+            _path_length(shapes, p) for p in Collection(shapes, alternatives)
+        ]
+        return None if None in lengths else max(lengths)  # type: ignore
+    optional = shapes.value(path, SH.zeroOrOnePath)
+    if optional is not None:
+        return _path_length(shapes, optional)
+    return None
+
+
+def _shape_depth(
+    shapes: Graph, shape: Any, visiting: frozenset = frozenset()
+) -> Optional[int]:
+    """Return the number of steps from its focus nodes that `shape`
+    looks at, or None if unbounded."""
+    if shape in visiting:
+        return None
+    visiting = visiting | {shape}
+    path = shapes.value(shape, SH.path)
+    steps = 0 if path is None else _path_length(shapes, path)
+    if steps is None:
+        return None
+    depth = steps
+    if any((shape, p, None) in shapes for p in _PAIRS):
+        depth = max(depth, 1)
+
+    # Shapes that the value nodes (or the focus node of a node shape)
+    # are validated against
+    nested = []
+    for p in (SH.node, SH.property, SH.qualifiedValueShape, SH["not"]):
+        nested.extend(shapes.objects(shape, p))
+    for p in (SH["and"], SH["or"], SH.xone):
+        for members in shapes.objects(shape, p):
+            nested.extend(Collection(shapes, members))
+    for other in nested:
+        other_depth = _shape_depth(shapes, other, visiting)
+        if other_depth is None:
+            return None
+        depth = max(depth, steps + other_depth)
+    return depth
+
+
+def shapes_depth(shapes: Graph) -> Optional[int]:
+    """Return the number of steps from a focus node that `shapes` look
+    at, or None if the shapes cannot be validated in shards."""
+    if any((None, p, None) in shapes for p in UNSUPPORTED):
+        return None
+    roots = {s for p in _TARGETS for s in shapes.subjects(p, None)}
+    for shape_type in (SH.NodeShape, SH.PropertyShape):
+        roots.update(shapes.subjects(RDF.type, shape_type))
+    depth = 0
+    for shape in roots:
+        shape_depth = _shape_depth(shapes, shape)
+        if shape_depth is None:
+            return None
+        depth = max(depth, shape_depth)
+    return depth
+
+
+def _shared_triples(data: Graph, shapes: Graph) -> Graph:
+    """Return the triples needed by all shards."""
+    predicates = set(SCHEMA)
+    # The triples of a node are in the shards that look at it, but an
+    # rdfs:range types the objects of triples of other nodes
+    for prop in set(data.subjects(RDFS.range, None)):
+        predicates.update(data.transitive_subjects(RDFS.subPropertyOf, prop))
+    predicates.update(shapes.objects(None, SH.targetObjectsOf))
+    shared = Graph()
+    for p in predicates:
+        for triple in data.triples((None, p, None)):
+            shared.add(triple)
+    return shared
+
+
+def _claim(
+    data: Graph, roots: Iterable[Any], shard: int, owner: Dict[Any, int]
+) -> List[Any]:
+    """Assign the blank nodes and object-only nodes that `roots` refer
+    to, and that have no owner yet, to `shard`.
+
+    Returns:
+        The nodes of the shard.
+    """
+    nodes = list(roots)
+    stack = list(nodes)
+    while stack:
+        for o in data.objects(stack.pop(), None):
+            if isinstance(o, Literal) or o in owner:
+                continue
+            if isinstance(o, BNode) or (o, None, None) not in data:
+                owner[o] = shard
+                nodes.append(o)
+                if isinstance(o, BNode):
+                    stack.append(o)
+    return nodes
+
+
+def _neighbourhood(
+    data: Graph, nodes: Iterable[Any], depth: int, graph: Graph
+) -> None:
+    """Add the triples of the nodes within `depth` steps of `nodes` to
+    `graph`.  Steps to blank nodes are not counted."""
+    steps = {node: 0 for node in nodes}
+    queue = deque(steps)
+    while queue:
+        node = queue.popleft()
+        for triple in data.triples((node, None, None)):
+            graph.add(triple)
+            o = triple[2]
+            if isinstance(o, Literal):
+                continue
+            step = steps[node] + (0 if isinstance(o, BNode) else 1)
+            if step <= depth and step < steps.get(o, depth + 1):
+                steps[o] = step
+                queue.append(o)
+
+
+def make_shards(
+    data: Graph,
+    shapes: Graph,
+    depth: int,
+    nshards: int,
+    focus_nodes: Optional[Sequence[Any]] = None,
+) -> Tuple[List[Graph], Dict[Any, int]]:
+    """Split `data` into `nshards` shard graphs.
+
+    Parameters:
+        data: Data graph.
+        shapes: Shapes graph.
+        depth: Number of steps from a focus node the shapes look at.
+        nshards: Number of shards.
+        focus_nodes: Only validate these nodes.  By default, all
+            subjects of `data` are divided between the shards.
+
+    Returns:
+        Tuple of (shards, owner), where owner maps the nodes of the data
+        graph to the index of their shard.
+    """
+    if focus_nodes is None:
+        roots = sorted(
+            s for s in set(data.subjects()) if isinstance(s, URIRef)
+        )
+    else:
+        roots = sorted(URIRef(str(node)) for node in set(focus_nodes))
+    shard_roots = [roots[i::nshards] for i in range(nshards)]
+    owner = {node: i for i, nodes in enumerate(shard_roots) for node in nodes}
+    shard_nodes = [
+        _claim(data, nodes, i, owner) for i, nodes in enumerate(shard_roots)
+    ]
+    if focus_nodes is None:
+        # Blank nodes that no resource refers to
+        orphans = [s for s in set(data.subjects()) if s not in owner]
+        for s in orphans:
+            owner.setdefault(s, 0)
+        shard_nodes[0].extend(_claim(data, orphans, 0, owner))
+
+    shared = _shared_triples(data, shapes)
+    shards = []
+    for nodes in shard_nodes:
+        graph = Graph()
+        graph += shared
+        _neighbourhood(data, nodes, depth, graph)
+        shards.append(graph)
+    return shards, owner
+
+
+def _validate_shard(
+    triples: List[Tuple[Any, Any, Any]],
+    namespaces: List[Tuple[str, Any]],
+    shapes: Graph,
+    options: dict,
+) -> Graph:
+    """Validate a shard and return its results graph."""
+    # pylint: disable=import-outside-toplevel
+    from pyshacl import validate
+
+    data = Graph()
+    for prefix, namespace in namespaces:
+        data.bind(prefix, namespace, replace=True)
+    for triple in triples:
+        data.add(triple)
+    _, results, _ = validate(data, shacl_graph=shapes, **options)
+    return results
+
+
+def _describe(node: Any, graph: Graph) -> str:
+    """Return `node` as pyshacl shows it in the text report."""
+    # pylint: disable=import-outside-toplevel
+    from pyshacl.rdfutil import stringify_node
+
+    try:
+        return stringify_node(graph, node)
+    except (LookupError, ValueError):
+        return str(node)
+
+
+def _result_text(
+    results: Graph, result: Any, data: Graph, shapes: Graph
+) -> str:
+    """Return the description of `result` in the text report.
+
+    The description is built from the triples of the result, in the
+    layout of pyshacl.
+
+    Parameters:
+        results: Results graph.
+        result: Result node.
+        data: Data graph.
+        shapes: Shapes graph.
+    """
+    severity = results.value(result, SH.resultSeverity)
+    component = results.value(result, SH.sourceConstraintComponent)
+    shape = results.value(result, SH.sourceShape)
+    text = "{} in {} ({}):\n".format(
+        (
+            "Constraint Violation"
+            if severity == SH.Violation
+            else "Validation Result"
+        ),
+        str(component).rsplit("#", 1)[-1],
+        component,
+    )
+    text += f"\tSeverity: {_describe(severity, shapes)}\n"
+    text += f"\tSource Shape: {_describe(shape, shapes)}\n"
+    focus = results.value(result, SH.focusNode)
+    text += f"\tFocus Node: {_describe(focus, data)}\n"
+    value = results.value(result, SH.value)
+    if value is not None:
+        text += f"\tValue Node: {_describe(value, data)}\n"
+    path = results.value(result, SH.resultPath)
+    if path is not None:
+        text += f"\tResult Path: {_describe(path, shapes)}\n"
+    constraint = results.value(result, SH.sourceConstraint)
+    if constraint is not None:
+        text += f"\tSource Constraint: {_describe(constraint, shapes)}\n"
+
+    # The messages of the shape come before the default messages
+    messages = set(results.objects(result, SH.resultMessage))
+    extra = messages & set(shapes.objects(shape, SH.message))
+    for group in (extra, messages - extra):
+        for message in sorted(group, key=str):
+            text += f"\tMessage: {message}\n"
+
+    details = results.objects(result, SH.detail)
+    if (result, SH.detail, None) in results:
+        text += "\tDetails:\n"
+        for detail in sorted(
+            _result_text(results, d, data, shapes) for d in details
+        ):
+            text += indent(detail, "\t\t")
+    return text
+
+
+def _copy_result(results: Graph, result: Any, merged: Graph) -> None:
+    """Copy `result` with the blank nodes it refers to to `merged`.
+
+    Nodes of the data and shapes graphs keep their blank node
+    identifier in the results of all shards, so they are only copied
+    once."""
+    stack = [result]
+    while stack:
+        for triple in results.triples((stack.pop(), None, None)):
+            merged.add(triple)
+            o = triple[2]
+            if isinstance(o, BNode) and (o, None, None) not in merged:
+                stack.append(o)
+
+
+def _conforms(graph: Graph, options: dict) -> bool:
+    allowed: set = set()
+    if options.get("allow_warnings"):
+        allowed.update((SH.Warning, SH.Info))
+    if options.get("allow_infos"):
+        allowed.add(SH.Info)
+    return all(
+        graph.value(result, SH.resultSeverity) in allowed
+        for result in graph.objects(None, SH.result)
+    )
+
+
+def validate_sharded(
+    data_graph: Graph,
+    shacl_graph: Graph,
+    max_workers: Optional[int] = None,
+    shards: Optional[int] = None,
+    min_triples: int = 0,
+    **options,
+) -> Tuple[bool, Graph, str]:
+    """Validate `data_graph` against `shacl_graph` in parallel shards.
+
+    Parameters:
+        data_graph: Data graph.
+        shacl_graph: Shapes graph.
+        max_workers: Maximum number of worker processes.  Defaults to
+            the number of CPUs.  If 1, the data graph is validated in
+            the current process.
+        shards: Number of shards.  Defaults to the number of workers.
+        min_triples: Validate data graphs with fewer triples in the
+            current process.  No threshold by default.
+        options: Further options of `shacl_validate()`, like
+            ``inference="rdfs"`` or `focus_nodes`.
+
+    Returns:
+        Tuple of (conforms, results_graph, results_text), like
+        `shacl_validate()`.  The results are the same as those of a
+        single `shacl_validate()` call.  The text report is built from
+        the merged results graph in the layout of pyshacl, showing
+        blank nodes of the data graph without the triples inferred
+        during validation.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pyshacl import validate
+
+    nworkers = max_workers or os.cpu_count() or 1
+    nshards = shards or nworkers
+    depth = shapes_depth(shacl_graph)
+    reason = None
+    if nworkers == 1 or nshards == 1:
+        reason = "one worker"
+    elif len(data_graph) < min_triples:
+        reason = "graph too small"
+    elif depth is None:
+        reason = "shapes not supported"
+    elif not options.keys() <= OPTIONS or options.get("abort_on_first"):
+        reason = "options not supported"
+    elif options.get("inference") not in (None, "none", "rdfs"):
+        reason = "inference not supported"
+    if reason or depth is None:
+        logger.debug("validating in a single process: %s", reason)
+        return validate(data_graph, shacl_graph=shacl_graph, **options)
+
+    focus_nodes = options.pop("focus_nodes", None) or None
+    graphs, owner = make_shards(
+        data_graph, shacl_graph, depth, nshards, focus_nodes
+    )
+    focus = {URIRef(str(node)) for node in focus_nodes or ()}
+    args = []
+    for i, graph in enumerate(graphs):
+        shard_options = dict(options)
+        if focus:
+            # Like a single validation, only URIs are used as focus nodes
+            shard_options["focus_nodes"] = sorted(
+                node for node, j in owner.items() if j == i and node in focus
+            )
+            if not shard_options["focus_nodes"]:
+                continue
+        args.append((i, list(graph), shard_options))
+    logger.info(
+        "validating %d triples in %d shards of %s triples, depth %d",
+        len(data_graph),
+        len(args),
+        "/".join(str(len(a[1])) for a in args),
+        depth,
+    )
+
+    # Fork if possible, like dmtables, since the pipeline scripts are
+    # not guarded by `if __name__ == "__main__"`
+    methods = multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context(
+        "fork" if "fork" in methods else None
+    )
+    namespaces = list(data_graph.namespaces())
+    with ProcessPoolExecutor(
+        max_workers=min(nworkers, len(args)), mp_context=mp_context
+    ) as executor:
+        futures = [
+            (
+                i,
+                executor.submit(
+                    _validate_shard, triples, namespaces, shacl_graph, opts
+                ),
+            )
+            for i, triples, opts in args
+        ]
+        shard_results = [(i, future.result()) for i, future in futures]
+
+    merged = Graph(bind_namespaces="core")
+    for prefix, namespace in shacl_graph.namespace_manager.namespaces():
+        merged.namespace_manager.bind(prefix, namespace)
+    report = BNode()
+    merged.add((report, RDF.type, SH.ValidationReport))
+    texts = []
+    for i, results in shard_results:
+        for result in results.objects(None, SH.result):
+            node = results.value(result, SH.focusNode)
+            if owner.get(node, 0) == i:
+                merged.add((report, SH.result, result))
+                _copy_result(results, result, merged)
+                texts.append(
+                    _result_text(merged, result, data_graph, shacl_graph)
+                )
+    conforms = _conforms(merged, options)
+    merged.add((report, SH.conforms, Literal(conforms)))
+
+    text = f"Validation Report\nConforms: {conforms}\n"
+    if texts:
+        text += f"Results ({len(texts)}):\n"
+    return conforms, merged, text + "".join(sorted(texts))
@@ -3,13 +3,47 @@ Validate JSON-LD data against SHACL shapes.
 
 Provides functions to validate JSON-LD data representing SSbD resources
 (Dataset, Software, etc.) against generated SHACL shapes.
+
+pyshacl is imported by `shacl_validate()` at the first validation, such
+that importing this module and the command line help are fast.
+
+Contexts are processed by the shared `DocumentLoader`, which loads
+remote contexts from its on-disk cache and processes each distinct
+context only once (see documentloader.py).  Documents with a flat
+context, like those written by the pipeline, are converted to triples
+without rdflib's JSON-LD expansion (see flatjsonld.py).
+
+Large data graphs can be validated in parallel shards with `workers`
+(see sharded.py).
 """
 import json
+import re
 from pathlib import Path
-from typing import Optional, Tuple, Union, cast
+from typing import IO, Any, Iterator, List, Optional, Tuple, Union, cast
 
-from pyshacl import validate as shacl_validate
-from rdflib import Graph
+from rdflib import RDF, Graph, URIRef
+from rdflib.plugins.parsers.jsonld import Parser as JsonLdParser
+from rdflib.plugins.shared.jsonld.context import Context
+
+try:
+    from .documentloader import default_loader
+    from .flatjsonld import to_graph
+    from .sharded import validate_sharded
+except ImportError:  # run as a script
+    from documentloader import default_loader  # type: ignore
+    from flatjsonld import to_graph  # type: ignore
+    from sharded import validate_sharded  # type: ignore
+
+
+def shacl_validate(*args, **kwargs):
+    """Validate with `pyshacl.validate()`, which takes the same arguments.
+
+    Returns:
+        Tuple of (conforms, results_graph, results_text).
+    """
+    from pyshacl import validate  # pylint: disable=import-outside-toplevel
+
+    return validate(*args, **kwargs)
 
 
 def load_shapes(shapes_path: Path) -> Graph:
@@ -28,18 +62,235 @@ def load_shapes(shapes_path: Path) -> Graph:
 
 
 def load_graph(source: Union[str, Path, dict]) -> Graph:
-    """Parse a JSON-LD file path or dict into an RDF graph."""
+    """Parse a JSON-LD file path or dict into an RDF graph.
+
+    The top-level context is processed by the shared document loader,
+    such that documents with the same context only process it once.
+    """
+    base = None
+    if not isinstance(source, dict):
+        base = Path(source).absolute().as_uri()
+        with open(source, "rt", encoding="utf-8") as f:
+            source = json.load(f)
     graph = Graph()
-    if isinstance(source, dict):
-        graph.parse(data=json.dumps(source), format="json-ld")
+    if isinstance(source, dict) and "@context" in source:
+        context = default_loader().context(source["@context"], base)
+        source = {k: v for k, v in source.items() if k != "@context"}
     else:
-        graph.parse(source, format="json-ld")
+        context = Context(base=base)
+    # Convert directly, without a round trip through a JSON string
+    if not to_graph(source, context, graph):
+        JsonLdParser().parse(source, context, graph)
+    return graph
+
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"\s*")
+
+
+class _JsonScanner:
+    """Incremental reader of JSON values from a text file.
+
+    Only the part of the file that is currently being decoded is kept
+    in memory.
+    """
+
+    def __init__(self, f: IO[str], chunk_size: int = 1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int) -> bool:
+        """Read more data.  Returns false at end of file."""
+        if self.eof:
+            return False
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            match = _WHITESPACE.match(self.buf, self.pos)
+            self.pos = match.end() if match else self.pos
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.chunk_size):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume and return the next character, which must be in `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f"Expected one of {chars!r} in JSON, got {char!r}"
+            )
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(max(self.chunk_size, len(self.buf))):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the file
+            if end == len(self.buf) and self._fill(self.chunk_size):
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_members(
+    f: IO[str], chunk_size: int = 1 << 16
+) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, value) for the members of the top-level JSON object.
+
+    The entries of a top-level ``@graph`` array are yielded one at a
+    time as ("@graph", entry), without reading the whole array.
+    """
+    scanner = _JsonScanner(f, chunk_size)
+    scanner.expect("{")
+    if scanner.peek() == "}":
+        return
+    while True:
+        key = scanner.value()
+        scanner.expect(":")
+        if key == "@graph" and scanner.peek() == "[":
+            scanner.expect("[")
+            if scanner.peek() == "]":
+                scanner.expect("]")
+            else:
+                while True:
+                    yield key, scanner.value()
+                    if scanner.expect(",]") == "]":
+                        break
+        else:
+            yield key, scanner.value()
+        if scanner.expect(",}") == "}":
+            return
+
+
+def _read_context(path: Path) -> Any:
+    """Return the top-level ``@context`` of a JSON-LD file, or None.
+
+    The members before it (like a ``@graph``) are read one entry at a
+    time and discarded.
+    """
+    with open(path, "rt", encoding="utf-8") as f:
+        for key, value in _iter_members(f):
+            if key == "@context":
+                return value
+    return None
+
+
+def iter_resources(
+    source: Union[str, Path, dict], batch_size: int = 1
+) -> Iterator[Tuple[Any, List[dict]]]:
+    """Iterate over the resources of a JSON-LD document in batches.
+
+    The top-level ``@graph`` of a file is read incrementally, so memory
+    use is bounded by the size of the context and of one batch.  If the
+    ``@context`` comes after the ``@graph``, it is first looked up in a
+    separate pass over the file (which parses the ``@graph`` twice).
+    NDJSON files (``.ndjson`` or ``.jsonl``), where the first line holds
+    the ``@context`` and each following line a resource, are also
+    supported.  A document without ``@graph`` is yielded as a single
+    resource.
+
+    Parameters:
+        source: A file path (str or Path) or a Python dict.
+        batch_size: Number of resources per batch.
+
+    Yields:
+        Tuples of (context, resources), where context is the top-level
+        ``@context`` (or None) and resources a list of dicts.
+    """
+    if isinstance(source, dict):
+        context = source.get("@context")
+        if "@graph" in source:
+            resources = source["@graph"]
+        else:
+            resources = [{k: v for k, v in source.items() if k != "@context"}]
+        for i in range(0, len(resources), batch_size):
+            yield context, resources[i : i + batch_size]
+        return
+
+    path = Path(source)
+    ndjson = path.suffix in (".ndjson", ".jsonl")
+    with open(path, "rt", encoding="utf-8") as f:
+        if ndjson:
+            context = json.loads(f.readline()).get("@context")
+            members: Iterator[Tuple[str, Any]] = (
+                ("@graph", json.loads(line)) for line in f if line.strip()
+            )
+        else:
+            context = None
+            members = _iter_members(f)
+
+        other: dict = {}
+        pending: List[dict] = []
+        has_graph = False
+        for key, value in members:
+            if key == "@context":
+                context = value
+            elif key == "@graph":
+                if not has_graph and context is None and not ndjson:
+                    # Instead of buffering the @graph until the context
+                    context = _read_context(path)
+                has_graph = True
+                pending.append(value)
+                if len(pending) >= batch_size:
+                    yield context, pending
+                    pending = []
+            else:
+                other[key] = value
+        if pending:
+            yield context, pending
+        if not has_graph and other:
+            yield context, [other]
+
+
+def load_resources(
+    resources: List[dict],
+    context: Union[Context, Any] = None,
+    graph: Optional[Graph] = None,
+) -> Graph:
+    """Convert JSON-LD resources (dicts) directly to triples.
+
+    Parameters:
+        resources: List of JSON-LD node objects.
+        context: A processed rdflib Context or raw JSON-LD context data.
+            Pass a processed Context to avoid reprocessing the context
+            for every batch.
+        graph: Graph to add the triples to.  A new graph by default.
+
+    Returns:
+        The graph with the triples.
+    """
+    if graph is None:
+        graph = Graph()
+    if not isinstance(context, Context):
+        context = default_loader().context(context)
+    if not to_graph(resources, context, graph):
+        JsonLdParser().parse(resources, context, graph)
     return graph
 
 
 def validate(
     source: Union[str, Path, dict],
     shapes_path: Optional[str] = None,
+    workers: Optional[int] = 1,
 ) -> Tuple[bool, str]:
     """
     Validate JSON-LD data against SHACL shapes.
@@ -51,6 +302,8 @@ def validate(
         source: JSON-LD source — a file path (str or Path) or a Python dict.
         shapes_path: Path to SHACL shapes file. Defaults to shapes.ttl
                      in the same directory as this script.
+        workers: Number of processes validating the data graph in
+                 shards.  None for the number of CPUs.
 
     Returns:
         Tuple of (conforms: bool, report: str) where conforms indicates
@@ -66,13 +319,43 @@ def validate(
     except Exception as e:
         return False, f"Failed to parse JSON-LD: {e}"
 
+    shapes_graph = load_all_shapes(shapes_path)
+    if isinstance(shapes_graph, str):
+        return False, shapes_graph
+
+    conforms, _results_graph, results_text = cast(
+        Tuple[bool, object, str],
+        validate_sharded(
+            data_graph,
+            shapes_graph,
+            max_workers=workers,
+            inference="rdfs",
+            abort_on_first=False,
+        ),
+    )
+
+    return conforms, results_text
+
+
+def load_all_shapes(shapes_path: Optional[str] = None) -> Union[Graph, str]:
+    """
+    Load the generated shapes merged with the project-specific shapes.
+
+    Parameters:
+        shapes_path: Path to SHACL shapes file. Defaults to shapes.ttl
+                     in the same directory as this script.
+
+    Returns:
+        The shapes graph, or an error message if the shapes file does
+        not exist.
+    """
     if shapes_path is None:
         shapes_file = Path(__file__).parent / "shapes.ttl"
     else:
         shapes_file = Path(shapes_path)
 
     if not shapes_file.exists():
-        return False, f"Shapes file not found: {shapes_file}. Run generate_shacl.py first."
+        return f"Shapes file not found: {shapes_file}. Run generate_shacl.py first."
 
     shapes_graph = load_shapes(shapes_file)
 
@@ -81,17 +364,107 @@ def validate(
     if ssbd_shapes_file.exists():
         shapes_graph.parse(ssbd_shapes_file, format="turtle")
 
-    conforms, _results_graph, results_text = cast(
-        Tuple[bool, object, str],
-        shacl_validate(
-            data_graph,
-            shacl_graph=shapes_graph,
-            inference="rdfs",
-            abort_on_first=False,
-        ),
-    )
+    return shapes_graph
 
-    return conforms, results_text
+
+def _type_graph(source: Union[str, Path, dict], context: Context) -> Graph:
+    """Return the rdf:type triples of all top-level resources in `source`.
+
+    Read in a separate streaming pass, so that references to resources
+    in other batches can be checked against their types (sh:class).
+    This is the only part that grows with the size of the document (one
+    triple per resource type).
+    """
+    types = Graph()
+    for _, resources in iter_resources(source, batch_size=1000):
+        stubs = [
+            {"@id": r["@id"], "@type": r["@type"]}
+            for r in resources
+            if "@id" in r and "@type" in r
+        ]
+        load_resources(stubs, context, types)
+    return types
+
+
+def validate_stream(
+    source: Union[str, Path, dict],
+    shapes_path: Optional[str] = None,
+    batch_size: int = 50,
+) -> Iterator[Tuple[List[str], bool, str]]:
+    """
+    Validate the resources of a JSON-LD document batch by batch.
+
+    The ``@graph`` is read incrementally (see `iter_resources()`) and
+    each batch of resources is converted and validated on its own, so
+    that only one batch of triples is resident at a time.  The types of
+    all resources are loaded in a first, lightweight pass, so that
+    references between resources in different batches still validate.
+    Only the resources of the batch itself are used as focus nodes.
+
+    Parameters:
+        source: JSON-LD source — a file path (str or Path) or a Python dict.
+        shapes_path: Path to SHACL shapes file. Defaults to shapes.ttl
+                     in the same directory as this script.
+        batch_size: Number of resources to validate together.
+
+    Yields:
+        Tuples of (ids, conforms, report) for each batch, where ids are
+        the ``@id`` values of the resources in the batch.
+    """
+    if isinstance(source, (str, Path)) and not Path(source).exists():
+        yield [], False, f"File not found: {source}"
+        return
+
+    shapes_graph = load_all_shapes(shapes_path)
+    if isinstance(shapes_graph, str):
+        yield [], False, shapes_graph
+        return
+
+    base = None
+    if isinstance(source, (str, Path)):
+        base = Path(source).absolute().as_uri()
+
+    context = None
+    types = None
+    for ctx_data, resources in iter_resources(source, batch_size):
+        if context is None:
+            # Process the top-level context only once
+            context = default_loader().context(ctx_data, base)
+            types = _type_graph(source, context)
+
+        ids = [r.get("@id", "") for r in resources]
+        try:
+            data_graph = load_resources(resources, context)
+        except Exception as e:
+            yield ids, False, f"Failed to parse JSON-LD: {e}"
+            continue
+
+        # Restrict validation to the typed nodes of this batch and add
+        # the types of the resources they refer to
+        focus_nodes = None
+        if all(ids):
+            focus_nodes = [
+                s
+                for s in set(data_graph.subjects(RDF.type, None))
+                if isinstance(s, URIRef)
+            ]
+        if focus_nodes and types is not None:
+            for obj in set(data_graph.objects()):
+                if isinstance(obj, URIRef):
+                    for triple in types.triples((obj, RDF.type, None)):
+                        data_graph.add(triple)
+
+        conforms, _results_graph, results_text = cast(
+            Tuple[bool, object, str],
+            shacl_validate(
+                data_graph,
+                shacl_graph=shapes_graph,
+                inference="rdfs",
+                abort_on_first=False,
+                focus_nodes=focus_nodes or None,
+            ),
+        )
+        yield ids, conforms, results_text
 
 
 def print_validation_result(jsonld_path: str, conforms: bool, report: str) -> None:
@@ -115,19 +488,55 @@ def print_validation_result(jsonld_path: str, conforms: bool, report: str) -> No
 
 def main() -> None:
     """Validate example files from command line."""
+    import argparse
     import sys
 
-    if len(sys.argv) < 2:
-        print("Usage: python validate.py <jsonld_file> [shapes_file]")
-        sys.exit(1)
-
-    jsonld_path = sys.argv[1]
-    shapes_path = sys.argv[2] if len(sys.argv) > 2 else None
-
-    conforms, report = validate(jsonld_path, shapes_path)
-    print_validation_result(jsonld_path, conforms, report)
-
-    sys.exit(0 if conforms else 1)
+    parser = argparse.ArgumentParser(
+        description="Validate JSON-LD data against SHACL shapes."
+    )
+    parser.add_argument("jsonld_file", help="JSON-LD file to validate.")
+    parser.add_argument(
+        "shapes_file", nargs="?", help="SHACL shapes file (shapes.ttl)."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read and validate the @graph incrementally in batches.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=50,
+        help="Number of resources per batch with --stream.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes validating the data graph in shards "
+        "(0 for the number of CPUs).",
+    )
+    args = parser.parse_args()
+
+    if not args.stream:
+        conforms, report = validate(
+            args.jsonld_file, args.shapes_file, workers=args.workers or None
+        )
+        print_validation_result(args.jsonld_file, conforms, report)
+        sys.exit(0 if conforms else 1)
+
+    all_conform = True
+    nresources = 0
+    for ids, conforms, report in validate_stream(
+        args.jsonld_file, args.shapes_file, batch_size=args.batch_size
+    ):
+        nresources += len(ids)
+        if not conforms:
+            all_conform = False
+            print_validation_result(", ".join(ids), conforms, report)
+    status = "✓ VALID" if all_conform else "✗ INVALID"
+    print(f"\n{status}: {args.jsonld_file} ({nresources} resources)")
+    sys.exit(0 if all_conform else 1)
 
 
 if __name__ == "__main__":